@@ -12,6 +12,7 @@ import muteria.common.mix as common_mix
 import muteria.configmanager.configurations as configurations
 import muteria.configmanager.helper as configs_helper
 from muteria.controller.main_controller import MainController
+from muteria.controller.query_engine import QueryKinds
 
 ERROR_HANDLER = common_mix.ErrorHandler
 
@@ -40,6 +41,28 @@ class CliUserInterface(object):
                                         " files and folders")
         parser_view.add_argument('--results', action='store_true', \
                                     help='Print the result folder location')
+        parser_view.add_argument('--query', \
+                        choices=[q.get_str() for q in QueryKinds], \
+                        help="Query the results (the result folder location"
+                                                " is printed when not set)")
+        parser_view.add_argument('--criterion', \
+                        help="Test criterion of the query"
+                                                " (e.g. STRONG_MUTATION)")
+        parser_view.add_argument('--element', \
+                        help="Criterion element (e.g. mutant) of the query,"
+                                                    " as <tool>:<element>")
+        parser_view.add_argument('--test', \
+                        help="Test of the query, as <tool>:<test>")
+        parser_view.add_argument('--file', help="Source file of the query")
+        parser_view.add_argument('--history', type=int, default=0, \
+                        help="Timeline history of the query (0 is latest)")
+        parser_view.add_argument('--other-history', type=int, default=1, \
+                        help="Timeline history compared (output_diff)")
+        parser_view.add_argument('--histories', type=int, nargs='+', \
+                        help="Timeline histories of the query (file_coverage)"
+                                                        ", all when not set")
+        parser_view.add_argument('--rebuild-index', action='store_true', \
+                        help="Rebuild the query indexes")
 
         parser_internal = subparsers.add_parser('internal', \
                                     help="Get informations of the"
@@ -93,6 +116,18 @@ class CliUserInterface(object):
                                 configurations.SessionMode.RESTORE_REPOS_MODE
         elif args.command == 'view':
             raw_conf['RUN_MODE'] = configurations.SessionMode.VIEW_MODE
+            if args.query is not None:
+                raw_conf['VIEW_QUERY'] = {
+                    'kind': args.query,
+                    'criterion': args.criterion,
+                    'element': args.element,
+                    'test': args.test,
+                    'filename': args.file,
+                    'history': args.history,
+                    'other_history': args.other_history,
+                    'histories': args.histories,
+                    'rebuild_index': args.rebuild_index,
+                }
         elif args.command == 'internal':
             raw_conf['RUN_MODE'] = configurations.SessionMode.INTERNAL_MODE
         elif args.command == 'customexec':
@@ -8,13 +8,19 @@
 
 from __future__ import print_function
 import os
+import glob
 import json
+import stat
+import zlib
+import struct
+import hashlib
 import tarfile
 import zipfile
+import collections
 import time
 import shutil
 import logging
-import pandas as pd
+import threading
 
 import muteria.common.mix as common_mix
 
@@ -32,20 +38,34 @@ def loadJSON (in_file_pathname):
         return json.load(fp)
 #~ loadJSON()
 
-def dumpJSON (data_object, out_file_pathname, pretty=False):
+def dumpJSON (data_object, out_file_pathname, pretty=False, atomic=False):
     '''
     Store a data object in Json format into a file.
 
     :param data_object: data to store in Json format. 
     :param out_file_pathname: Pathname of the Json file to store the data.
     :param pretty: Enables visual friendly layout of json file (spaces).
+    :param atomic: Write into a temporary file then rename it, so that
+                the file is never seen (or left) partially written. The
+                temporary file is specific to the calling thread.
     :returns: None on success and error message on failure.
     '''
-    with open(out_file_pathname, "w") as fp:
-        if pretty:
-            json.dump(data_object, fp, indent=2, sort_keys=True)
-        else:
-            json.dump(data_object, fp)
+    dest_pathname = out_file_pathname
+    if atomic:
+        out_file_pathname = "{}.tmp{}-{}".format(dest_pathname, os.getpid(), \
+                                                    threading.get_ident())
+    try:
+        with open(out_file_pathname, "w") as fp:
+            if pretty:
+                json.dump(data_object, fp, indent=2, sort_keys=True)
+            else:
+                json.dump(data_object, fp)
+        if atomic:
+            os.replace(out_file_pathname, dest_pathname)
+    except BaseException:
+        if atomic and os.path.isfile(out_file_pathname):
+            os.remove(out_file_pathname)
+        raise
 
     return None
 #~ dumpJSON()         
@@ -59,6 +79,8 @@ def loadCSV (in_file_pathname, separator=" "):
     :param separator: The separator used in the CSV file. dafault is space.
     :returns: loaded csv data as pandas dataframe.
     '''
+    # Import here since pandas is slow to load and not always needed
+    import pandas as pd
     return pd.read_csv(in_file_pathname, sep=separator, index_col=False)
 #~ loadCSV()
 
@@ -373,6 +395,1045 @@ class Zip (TarGz):
     #~ def addToArchive ()
 #~ class Zip
 
+class ArchiveCodec(common_mix.EnumAutoName):
+    """ Compression codec of the indexed archives members.
+        ZSTD and LZ4 require the packages zstandard and lz4; ZLIB is 
+        always available. All the codecs accept a dictionary: a trained
+        one for ZSTD, raw content shared by the members for ZLIB and LZ4.
+    """
+    ZLIB = "zlib"
+    LZ4 = "lz4"
+    ZSTD = "zstd"
+
+    def _get_module(self):
+        if self == ArchiveCodec.ZLIB:
+            return zlib
+        try:
+            if self == ArchiveCodec.ZSTD:
+                import zstandard
+                return zstandard
+            import lz4.block
+            return lz4.block
+        except ImportError:
+            ERROR_HANDLER.error_exit("The archive codec {} requires the "
+                                    "package {}".format(self.get_str(), \
+                                    "zstandard" if self == ArchiveCodec.ZSTD \
+                                                        else "lz4"), __file__)
+    #~ def _get_module()
+
+    def is_available(self):
+        try:
+            if self == ArchiveCodec.ZSTD:
+                import zstandard
+            elif self == ArchiveCodec.LZ4:
+                import lz4.block
+        except ImportError:
+            return False
+        return True
+    #~ def is_available()
+
+    @classmethod
+    def get_best_available(cls):
+        """ The codec with the best speed/ratio trade-off that is available
+        """
+        for codec in (cls.ZSTD, cls.LZ4, cls.ZLIB):
+            if codec.is_available():
+                return codec
+    #~ def get_best_available()
+
+    def get_default_level(self):
+        if self == ArchiveCodec.ZSTD:
+            return 10
+        if self == ArchiveCodec.LZ4:
+            # fast mode
+            return 0
+        return 6
+    #~ def get_default_level()
+
+    def get_max_dictionary_size(self):
+        if self == ArchiveCodec.ZLIB:
+            # deflate window
+            return 32 * 1024
+        if self == ArchiveCodec.LZ4:
+            return 64 * 1024
+        return 1024 * 1024
+    #~ def get_max_dictionary_size()
+
+    def compress(self, data, level=None, dictionary=None, threads=0):
+        """ :param threads: number of threads compressing data (ZSTD only)
+        """
+        module = self._get_module()
+        if level is None:
+            level = self.get_default_level()
+        if self == ArchiveCodec.ZSTD:
+            dict_data = None
+            if dictionary is not None:
+                dict_data = module.ZstdCompressionDict(dictionary)
+            return module.ZstdCompressor(level=level, dict_data=dict_data, \
+                                            threads=threads).compress(data)
+        if self == ArchiveCodec.LZ4:
+            kwargs = {}
+            if dictionary is not None:
+                kwargs['dict'] = dictionary
+            if level > 0:
+                kwargs['mode'] = 'high_compression'
+                kwargs['compression'] = level
+            return module.compress(data, **kwargs)
+        if dictionary is None:
+            return zlib.compress(data, level)
+        cobj = zlib.compressobj(level, zdict=dictionary)
+        return cobj.compress(data) + cobj.flush()
+    #~ def compress()
+
+    def decompress(self, cdata, dictionary=None):
+        module = self._get_module()
+        if self == ArchiveCodec.ZSTD:
+            dict_data = None
+            if dictionary is not None:
+                dict_data = module.ZstdCompressionDict(dictionary)
+            # the object decompressor does not need the size in the frame
+            return module.ZstdDecompressor(dict_data=dict_data)\
+                                            .decompressobj().decompress(cdata)
+        if self == ArchiveCodec.LZ4:
+            if dictionary is None:
+                return module.decompress(cdata)
+            return module.decompress(cdata, dict=dictionary)
+        if dictionary is None:
+            return zlib.decompress(cdata)
+        dobj = zlib.decompressobj(zdict=dictionary)
+        return dobj.decompress(cdata) + dobj.flush()
+    #~ def decompress()
+
+    def train_dictionary(self, samples, dict_size):
+        """ Make a dictionary for the compression of data similar to samples
+            :return: the dictionary as bytes, or None if it could not be
+                    made
+        """
+        dict_size = min(dict_size, self.get_max_dictionary_size())
+        if self == ArchiveCodec.ZSTD:
+            module = self._get_module()
+            try:
+                return module.train_dictionary(dict_size, samples).as_bytes()
+            except module.ZstdError as e:
+                logging.debug("zstd dictionary training failed: "+str(e))
+                return None
+        # No trainer for zlib and lz4: the dictionary is the content that
+        # the samples have in common, approximated by the end of the
+        # concatenation of the samples from the largest to the smallest
+        # (the end of the dictionary is the closest for the matches). Only
+        # the smallest samples that fill the dictionary are concatenated
+        samples = sorted(samples, key=len, reverse=True)
+        start, size = len(samples), 0
+        while start > 0 and size < dict_size:
+            start -= 1
+            size += len(samples[start])
+        dictionary = b"".join(samples[start:])[-dict_size:]
+        return dictionary if len(dictionary) > 0 else None
+    #~ def train_dictionary()
+#~ class ArchiveCodec
+
+class IndexedArchive(object):
+    """
+        Archive with random access to its members. Each file member is
+        compressed separately (with the archive's codec and dictionary) and
+        the member table (index) is stored at the end of the archive, so 
+        that listing the members or reading one member does not decompress
+        the others.
+        Members can be appended or removed in place: the new members and
+        the new index are written after the end of the archive, and the
+        trailer last, once they are on disk. An interrupted modification
+        leaves the former trailer the last valid one (see _find_trailer).
+        The archive is compacted when mostly made of unused data.
+        File modes and modification times are kept.
+        The members are compressed by several threads and, in a new
+        archive, a dictionary is trained on the first files added, which
+        improves much the ratio of many small similar files (mutants
+        binaries, ktests).
+        The reading methods also accept a tar.gz archive (TarGz outputs).
+
+        Layout: MAGIC | [dictionary] | members data | 
+                    index (zlib compressed JSON) | 
+                                    index offset | index size | MAGIC
+        The index is: {"codec": <ArchiveCodec value>, 
+                        "dictionary": [offset, size] or null,
+                        "members": {<member>: <entry>}}
+        The archives written with MAGIC_V1 have zlib members, no dictionary
+        and the index is the members table. They are upgraded when written.
+    """
+
+    archive_ext = ".iar"
+
+    MAGIC = b"MUTIARC2"
+    MAGIC_V1 = b"MUTIARC1"
+    _TRAILER = struct.Struct("<QQ8s")
+
+    FILE_TYPE = "file"
+    DIR_TYPE = "dir"
+    SYMLINK_TYPE = "symlink"
+
+    # Index entry fields
+    _TYPE, _OFFSET, _CSIZE, _SIZE, _MODE, _MTIME, _LINK = range(7)
+
+    # Index keys
+    _CODEC_KEY = "codec"
+    _DICTIONARY_KEY = "dictionary"
+    _MEMBERS_KEY = "members"
+
+    # Level of the index compression (zlib)
+    compress_level = 6
+
+    # Number of threads compressing the members. The CPU count if None
+    threads = None
+
+    # A dictionary of dictionary_size bytes (at most) is trained, in a new 
+    # archive, on its first dictionary_max_samples files, when at least 
+    # dictionary_min_samples of them have at most 
+    # dictionary_max_sample_size bytes. Disabled if dictionary_size is 0
+    dictionary_size = 112 * 1024
+    dictionary_min_samples = 8
+    dictionary_max_samples = 256
+    dictionary_max_sample_size = 1024 * 1024
+
+    # The members are compressed in batches of this size (bytes) at most
+    # (or of a single file)
+    _BATCH_MAX_BYTES = 64 * 1024 * 1024
+
+    # ZSTD compresses with several threads the members of this size
+    _LARGE_MEMBER_SIZE = 8 * 1024 * 1024
+
+    # The trailer of an interrupted modification is searched backward by
+    # chunks of this size (bytes)
+    _SCAN_CHUNK_BYTES = 1024 * 1024
+
+    @classmethod
+    def get_archive_filename_of(cls, file_dir):
+        return file_dir + cls.archive_ext
+    #~ def get_archive_filename_of()
+
+    @classmethod
+    def get_threads(cls):
+        if cls.threads is not None:
+            return max(1, cls.threads)
+        return os.cpu_count() or 1
+    #~ def get_threads()
+
+    @classmethod
+    def is_archive_file(cls, pathname):
+        if not os.path.isfile(pathname) or os.path.getsize(pathname) < \
+                                    len(cls.MAGIC) + cls._TRAILER.size:
+            return False
+        with open(pathname, 'rb') as fp:
+            return cls._find_trailer(fp) is not None
+    #~ def is_archive_file()
+
+    @staticmethod
+    def _is_targz(pathname):
+        return pathname.endswith(TarGz.archive_ext) and \
+                    os.path.isfile(pathname) and tarfile.is_tarfile(pathname)
+    #~ def _is_targz()
+
+    @classmethod
+    def _get_trailer_ending_at(cls, fp, end):
+        """ :return: the trailer ending at the offset end, as the tuple
+                    (index offset, index size, magic, end), or None if 
+                    there is no trailer there
+        """
+        if end < len(cls.MAGIC) + cls._TRAILER.size:
+            return None
+        fp.seek(end - cls._TRAILER.size)
+        index_offset, index_size, magic = \
+                                cls._TRAILER.unpack(fp.read(cls._TRAILER.size))
+        if magic not in (cls.MAGIC, cls.MAGIC_V1) or \
+                                    index_offset < len(cls.MAGIC) or \
+                    index_offset + index_size + cls._TRAILER.size != end:
+            return None
+        return index_offset, index_size, magic, end
+    #~ def _get_trailer_ending_at()
+
+    @classmethod
+    def _find_trailer(cls, fp):
+        """ :return: the last valid trailer of the archive (see 
+                    _get_trailer_ending_at), or None if not an archive.
+            The trailer is the end of the file, unless a modification was
+            interrupted. The former trailer is then searched backward
+            (its index must load)
+        """
+        fp.seek(0)
+        if fp.read(len(cls.MAGIC)) not in (cls.MAGIC, cls.MAGIC_V1):
+            return None
+        file_end = fp.seek(0, os.SEEK_END)
+        trailer = cls._get_trailer_ending_at(fp, file_end)
+        if trailer is not None:
+            return trailer
+        # The magic ending a trailer starts before pos (those starting 
+        # after were checked)
+        pos = file_end - len(cls.MAGIC) + 1
+        while pos > len(cls.MAGIC):
+            start = max(len(cls.MAGIC), pos - cls._SCAN_CHUNK_BYTES)
+            fp.seek(start)
+            chunk = fp.read(pos - start + len(cls.MAGIC) - 1)
+            ends = []
+            for magic in (cls.MAGIC, cls.MAGIC_V1):
+                found = chunk.rfind(magic)
+                while found >= 0:
+                    ends.append(start + found + len(magic))
+                    found = chunk.rfind(magic, 0, found)
+            for end in sorted(ends, reverse=True):
+                trailer = cls._get_trailer_ending_at(fp, end)
+                if trailer is None:
+                    continue
+                try:
+                    cls._read_index(fp, trailer)
+                except (zlib.error, ValueError):
+                    continue
+                return trailer
+            pos = start
+        return None
+    #~ def _find_trailer()
+
+    @classmethod
+    def _read_index(cls, fp, trailer=None):
+        """ :param trailer: trailer of the index (see _find_trailer), the
+                    last valid one if None
+            :return: pair of the index (see the class doc) and its offset
+        """
+        if trailer is None:
+            trailer = cls._find_trailer(fp)
+            ERROR_HANDLER.assert_true(trailer is not None, \
+                                        "invalid indexed archive", __file__)
+        index_offset, index_size, magic, _ = trailer
+        fp.seek(index_offset)
+        index = json.loads(zlib.decompress(fp.read(index_size))\
+                    .decode('utf-8'), object_pairs_hook=collections.OrderedDict)
+        if magic == cls.MAGIC_V1:
+            index = {cls._CODEC_KEY: ArchiveCodec.ZLIB.get_field_value(), \
+                        cls._DICTIONARY_KEY: None, cls._MEMBERS_KEY: index}
+        return index, index_offset
+    #~ def _read_index()
+
+    @classmethod
+    def _read_dictionary(cls, fp, index):
+        if index[cls._DICTIONARY_KEY] is None:
+            return None
+        offset, size = index[cls._DICTIONARY_KEY]
+        fp.seek(offset)
+        return fp.read(size)
+    #~ def _read_dictionary()
+
+    @classmethod
+    def _load_index(cls, archive_pathname):
+        ERROR_HANDLER.assert_true(cls.is_archive_file(archive_pathname), \
+                    "Invalid {} file: {}".format(cls.archive_ext, \
+                                                archive_pathname), __file__)
+        with open(archive_pathname, 'rb') as fp:
+            return cls._read_index(fp)[0]
+    #~ def _load_index()
+
+    @staticmethod
+    def _sync(fp):
+        fp.flush()
+        os.fsync(fp.fileno())
+    #~ def _sync()
+
+    @staticmethod
+    def _sync_dir(pathname):
+        """ Make durable the renaming into the directory of pathname
+        """
+        dir_fd = os.open(os.path.dirname(os.path.abspath(pathname)), \
+                                                                os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    #~ def _sync_dir()
+
+    @classmethod
+    def _write_index(cls, fp, index, index_offset):
+        """ Write the index at index_offset, then the trailer once the data
+            and the index are on disk
+        """
+        fp.seek(index_offset)
+        index_data = zlib.compress(json.dumps(index).encode('utf-8'), \
+                                                            cls.compress_level)
+        fp.write(index_data)
+        cls._sync(fp)
+        fp.write(cls._TRAILER.pack(index_offset, len(index_data), cls.MAGIC))
+        fp.truncate()
+        cls._sync(fp)
+        # Upgrade a former format archive (same magic size), the new 
+        # trailer is valid with either magic
+        fp.seek(0)
+        if fp.read(len(cls.MAGIC)) != cls.MAGIC:
+            fp.seek(0)
+            fp.write(cls.MAGIC)
+            cls._sync(fp)
+    #~ def _write_index()
+
+    @classmethod
+    def _get_wasted_size(cls, index, index_offset):
+        """ Size of the data of the removed or replaced members
+        """
+        used = len(cls.MAGIC)
+        if index[cls._DICTIONARY_KEY] is not None:
+            used += index[cls._DICTIONARY_KEY][1]
+        for entry in index[cls._MEMBERS_KEY].values():
+            used += entry[cls._CSIZE]
+        return index_offset - used
+    #~ def _get_wasted_size()
+
+    @classmethod
+    def _collect_path(cls, pathname, arcname, items):
+        """ Append to items the members of the file or directory 
+            (recursively) pathname added as arcname. Each item is:
+            [arcname, type, mode, mtime, link, size, source file]
+        """
+        st = os.lstat(pathname)
+        if os.path.islink(pathname):
+            items.append([arcname, cls.SYMLINK_TYPE, st.st_mode, \
+                            st.st_mtime, os.readlink(pathname), 0, None])
+        elif os.path.isdir(pathname):
+            items.append([arcname, cls.DIR_TYPE, st.st_mode, st.st_mtime, \
+                                                                None, 0, None])
+            for name in sorted(os.listdir(pathname)):
+                cls._collect_path(os.path.join(pathname, name), \
+                                                arcname + '/' + name, items)
+        else:
+            items.append([arcname, cls.FILE_TYPE, st.st_mode, st.st_mtime, \
+                                                None, st.st_size, pathname])
+        return items
+    #~ def _collect_path()
+
+    @classmethod
+    def _parallel_map(cls, func, args_list):
+        n_jobs = min(cls.get_threads(), len(args_list))
+        if n_jobs <= 1:
+            return [func(args) for args in args_list]
+        # Import here since joblib is slow to load (see common_fs.loadCSV)
+        import joblib
+        # The codecs release the GIL while compressing
+        return joblib.Parallel(n_jobs=n_jobs, require='sharedmem')\
+                        (joblib.delayed(func)(args) for args in args_list)
+    #~ def _parallel_map()
+
+    #################################################################
+    ######################## PUBLIC INTERFACE #######################
+    #################################################################
+
+    @classmethod
+    def list_members(cls, archive_pathname):
+        """ List the members of the archive (without decompressing)
+        """
+        if cls._is_targz(archive_pathname):
+            with tarfile.open(archive_pathname, TarGz.open_read_flag) as tar:
+                return [os.path.normpath(n).replace(os.sep, '/') \
+                                                    for n in tar.getnames()]
+        return list(cls._load_index(archive_pathname)[cls._MEMBERS_KEY])
+    #~ def list_members()
+
+    @classmethod
+    def read_member(cls, archive_pathname, member):
+        """ Read the content of a file member (decompressing only it)
+            :return: the content as bytes
+        """
+        if cls._is_targz(archive_pathname):
+            with tarfile.open(archive_pathname, TarGz.open_read_flag) as tar:
+                try:
+                    tinfo = tar.getmember(member)
+                except KeyError:
+                    tinfo = None
+                ERROR_HANDLER.assert_true(tinfo is not None and \
+                            tinfo.isfile(), \
+                            "Member {} is not a file in archive {}".format(\
+                                    member, archive_pathname), __file__)
+                return tar.extractfile(tinfo).read()
+        with open(archive_pathname, 'rb') as fp:
+            index, _ = cls._read_index(fp)
+            members = index[cls._MEMBERS_KEY]
+            ERROR_HANDLER.assert_true(member in members and \
+                            members[member][cls._TYPE] == cls.FILE_TYPE, \
+                            "Member {} is not a file in archive {}".format(\
+                                    member, archive_pathname), __file__)
+            dictionary = cls._read_dictionary(fp, index)
+            fp.seek(members[member][cls._OFFSET])
+            return ArchiveCodec(index[cls._CODEC_KEY]).decompress(\
+                            fp.read(members[member][cls._CSIZE]), dictionary)
+    #~ def read_member()
+
+    @classmethod
+    def compressDir (cls, in_directory, out_archive_pathname=None, 
+                    remove_in_directory=False, codec=None):
+        ERROR_HANDLER.assert_true(os.path.isdir(in_directory), \
+                                        "invalid in_directory: "+in_directory)
+        err_msg = cls._compressFileOrDir(in_directory, out_archive_pathname, \
+                                                                codec=codec)
+        if remove_in_directory:
+            shutil.rmtree(in_directory)
+        return err_msg
+    #~ def compressDir()
+
+    @classmethod
+    def compressFile (cls, in_file, out_archive_pathname=None, 
+                    remove_in_file=False, codec=None):
+        ERROR_HANDLER.assert_true(os.path.isfile(in_file), \
+                                        "invalid in_file: "+in_file)
+        err_msg = cls._compressFileOrDir(in_file, out_archive_pathname, \
+                                                                codec=codec)
+        if remove_in_file:
+            os.remove(in_file)
+        return err_msg
+    #~ def compressFile()
+
+    @classmethod
+    def _compressFileOrDir (cls, in_pathname, out_archive_pathname=None, \
+                                                                codec=None):
+        """ The members are named after the basename of in_pathname
+            (like TarGz). An existing archive is replaced
+        """
+        if out_archive_pathname is None:
+            out_archive_pathname = in_pathname + cls.archive_ext
+        with cls.Writer(out_archive_pathname, codec=codec, \
+                                                    overwrite=True) as writer:
+            writer.add(in_pathname, \
+                            os.path.basename(os.path.normpath(in_pathname)))
+        return None
+    #~ def _compressFileOrDir()
+
+    @classmethod
+    def decompressDir (cls, in_archive_pathname, out_directory=None, 
+                                                    remove_in_archive=False):
+        return cls._extract_members(in_archive_pathname, None, \
+                                    out_directory, remove_in_archive)
+    #~ def decompressDir()
+
+    @classmethod
+    def decompressFile (cls, in_archive_pathname, out_directory=None, 
+                                                    remove_in_archive=False):
+        return cls._extract_members(in_archive_pathname, None, \
+                                    out_directory, remove_in_archive)
+    #~ def decompressFile()
+
+    @classmethod
+    def _extract_targz_members (cls, in_archive_pathname, prefix, \
+                                                            out_directory):
+        with tarfile.open(in_archive_pathname, TarGz.open_read_flag) as tar:
+            members = None
+            if prefix is not None:
+                members = [m for m in tar.getmembers() \
+                        if os.path.normpath(m.name).replace(os.sep, '/') \
+                                                            in (prefix, '.') \
+                        or os.path.normpath(m.name).replace(os.sep, '/')\
+                                                    .startswith(prefix + '/')]
+            tar.extractall(path=out_directory, members=members)
+    #~ def _extract_targz_members()
+
+    @classmethod
+    def _extract_members (cls, in_archive_pathname, prefix, out_directory, \
+                                                            remove_in_archive):
+        """ Extract the members (all or those that are prefix or under 
+            prefix) into out_directory (the archive's directory if None)
+        """
+        is_targz = cls._is_targz(in_archive_pathname)
+        if not is_targz and not cls.is_archive_file(in_archive_pathname):
+            return " ".join(["Invalid", cls.archive_ext, "file:", \
+                                                        in_archive_pathname])
+        if out_directory is None:
+            out_directory = os.path.dirname(in_archive_pathname)
+        ERROR_HANDLER.assert_true(os.path.isdir(out_directory), \
+                                    "Extract location is missing", __file__)
+        if is_targz:
+            cls._extract_targz_members(in_archive_pathname, prefix, \
+                                                                out_directory)
+            if remove_in_archive:
+                os.remove(in_archive_pathname)
+            return None
+        dir_times = []
+        with open(in_archive_pathname, 'rb') as fp:
+            index, _ = cls._read_index(fp)
+            codec = ArchiveCodec(index[cls._CODEC_KEY])
+            dictionary = cls._read_dictionary(fp, index)
+            for member, entry in index[cls._MEMBERS_KEY].items():
+                if prefix is not None and member != prefix and \
+                                        not member.startswith(prefix + '/'):
+                    continue
+                dest = os.path.join(out_directory, *member.split('/'))
+                if entry[cls._TYPE] == cls.DIR_TYPE:
+                    if not os.path.isdir(dest):
+                        os.makedirs(dest)
+                    dir_times.append((dest, entry))
+                    continue
+                if not os.path.isdir(os.path.dirname(dest)):
+                    os.makedirs(os.path.dirname(dest))
+                if os.path.lexists(dest):
+                    os.remove(dest)
+                if entry[cls._TYPE] == cls.SYMLINK_TYPE:
+                    os.symlink(entry[cls._LINK], dest)
+                    continue
+                fp.seek(entry[cls._OFFSET])
+                with open(dest, 'wb') as out_fp:
+                    out_fp.write(codec.decompress(\
+                                    fp.read(entry[cls._CSIZE]), dictionary))
+                os.chmod(dest, stat.S_IMODE(entry[cls._MODE]))
+                os.utime(dest, (entry[cls._MTIME], entry[cls._MTIME]))
+        # Set the directories properties after their content is created
+        for dest, entry in reversed(dir_times):
+            os.chmod(dest, stat.S_IMODE(entry[cls._MODE]))
+            os.utime(dest, (entry[cls._MTIME], entry[cls._MTIME]))
+        if remove_in_archive:
+            os.remove(in_archive_pathname)
+        return None
+    #~ def _extract_members()
+
+    @classmethod
+    def extractFromArchive (cls, in_archive_pathname, extract_pathname, \
+                                        out_location=None, is_folder=False):
+        is_targz = cls._is_targz(in_archive_pathname)
+        if not is_targz and not cls.is_archive_file(in_archive_pathname):
+            return " ".join(["Invalid", cls.archive_ext, "file:", \
+                                                        in_archive_pathname])
+        if extract_pathname not in cls.list_members(in_archive_pathname):
+            return " ".join(["Member", extract_pathname, \
+                                    "abscent in archive", in_archive_pathname])
+        if out_location is None:
+            out_location = os.path.dirname(in_archive_pathname)
+        err_msg = cls._extract_members(in_archive_pathname, extract_pathname, \
+                                        out_location, remove_in_archive=False)
+        if err_msg is not None:
+            return err_msg
+        dest = os.path.join(out_location, extract_pathname)
+        if is_folder and not os.path.isdir(dest):
+            return " ".join(["The extracted directory", dest, \
+                                                "is missing after decompress"])
+        if not is_folder and not os.path.isfile(dest):
+            return " ".join(["The extracted file", dest, \
+                                                "is missing after decompress"])
+        return None
+    #~ def extractFromArchive()
+
+    @classmethod
+    def addToArchive (cls, archive_pathname, added_pathname, \
+                        in_archive_name=None, is_folder=False, codec=None):
+        """ Add a file or folder to the archive, in place. Create the
+            archive (with codec, see Writer) if not existing. An existing
+            member with the same name is replaced.
+        """
+        if in_archive_name is None:
+            in_archive_name = os.path.basename(os.path.normpath(\
+                                                            added_pathname))
+        if is_folder:
+            ERROR_HANDLER.assert_true(os.path.isdir(added_pathname), \
+                            "invalid added folder: "+added_pathname, __file__)
+        else:
+            ERROR_HANDLER.assert_true(os.path.isfile(added_pathname), \
+                            "invalid added file: "+added_pathname, __file__)
+        if os.path.isfile(archive_pathname) and \
+                                    not cls.is_archive_file(archive_pathname):
+            return " ".join(["Invalid", cls.archive_ext, "file:", \
+                                                            archive_pathname])
+        with cls.Writer(archive_pathname, codec=codec) as writer:
+            writer.add(added_pathname, in_archive_name)
+        cls._compact_if_mostly_unused(archive_pathname)
+        return None
+    #~ def addToArchive ()
+
+    @classmethod
+    def removeFromArchive (cls, in_archive_pathname, rem_pathname, \
+                                                            is_folder=False):
+        """ Remove a file or folder from the archive, in place (without
+            decompressing the other members). The archive is compacted when
+            more than half of it is removed data.
+        """
+        if not cls.is_archive_file(in_archive_pathname):
+            return " ".join(["Invalid", cls.archive_ext, "file:", \
+                                                        in_archive_pathname])
+        with cls.Writer(in_archive_pathname) as writer:
+            removed = writer.remove(rem_pathname)
+        if len(removed) == 0:
+            return " ".join(["Member", rem_pathname, \
+                                    "abscent in archive", in_archive_pathname])
+        cls._compact_if_mostly_unused(in_archive_pathname)
+        return None
+    #~ def removeFromArchive ()
+
+    @classmethod
+    def _compact_if_mostly_unused(cls, archive_pathname):
+        """ Compact the archive when more than half of it is the data of
+            removed or replaced members and former indexes
+        """
+        with open(archive_pathname, 'rb') as fp:
+            index, index_offset = cls._read_index(fp)
+        if 2 * cls._get_wasted_size(index, index_offset) > index_offset:
+            cls.compact(archive_pathname)
+    #~ def _compact_if_mostly_unused()
+
+    @classmethod
+    def compact (cls, archive_pathname):
+        """ Rewrite the archive without the data of the removed or replaced
+            members and the former indexes (the compressed data is copied 
+            as is). The archive is replaced once the rewritten one is on disk
+        """
+        tmp_archive = archive_pathname + '.tmp'
+        with open(archive_pathname, 'rb') as fp, \
+                                            open(tmp_archive, 'w+b') as out_fp:
+            index, _ = cls._read_index(fp)
+            out_fp.write(cls.MAGIC)
+            offset = len(cls.MAGIC)
+            dictionary = cls._read_dictionary(fp, index)
+            if dictionary is not None:
+                out_fp.write(dictionary)
+                index[cls._DICTIONARY_KEY] = [offset, len(dictionary)]
+                offset += len(dictionary)
+            for entry in index[cls._MEMBERS_KEY].values():
+                if entry[cls._TYPE] == cls.FILE_TYPE:
+                    fp.seek(entry[cls._OFFSET])
+                    out_fp.write(fp.read(entry[cls._CSIZE]))
+                entry[cls._OFFSET] = offset
+                offset += entry[cls._CSIZE]
+            cls._write_index(out_fp, index, offset)
+        os.replace(tmp_archive, archive_pathname)
+        cls._sync_dir(archive_pathname)
+    #~ def compact()
+
+    @classmethod
+    def migrateFromTarGz (cls, targz_pathname, out_archive_pathname=None, \
+                                            remove_targz=False, codec=None):
+        """ Convert a tar.gz archive into an indexed archive, reading the 
+            tar members as a stream (nothing is written on disk but the
+            new archive).
+            :param out_archive_pathname: the tar.gz pathname with the
+                    extension archive_ext instead of TarGz.archive_ext 
+                    if None
+            :param codec: codec of the new archive (see Writer)
+        """
+        if out_archive_pathname is None:
+            out_archive_pathname = cls.get_migrated_archive_filename_of(\
+                                                                targz_pathname)
+        with tarfile.open(targz_pathname, TarGz.open_read_flag) as tar, \
+                            cls.Writer(out_archive_pathname, codec=codec, \
+                                                    overwrite=True) as writer:
+            for tinfo in tar:
+                name = os.path.normpath(tinfo.name).replace(os.sep, '/')
+                if tinfo.isdir():
+                    writer.add_member(name, cls.DIR_TYPE, \
+                                    tinfo.mode | stat.S_IFDIR, tinfo.mtime)
+                elif tinfo.issym():
+                    writer.add_member(name, cls.SYMLINK_TYPE, \
+                                    tinfo.mode | stat.S_IFLNK, tinfo.mtime, \
+                                                        link=tinfo.linkname)
+                elif tinfo.isfile():
+                    writer.add_member(name, cls.FILE_TYPE, \
+                                    tinfo.mode | stat.S_IFREG, tinfo.mtime, \
+                                        data=tar.extractfile(tinfo).read())
+        if remove_targz:
+            os.remove(targz_pathname)
+        return None
+    #~ def migrateFromTarGz()
+
+    @classmethod
+    def get_migrated_archive_filename_of(cls, targz_pathname):
+        ERROR_HANDLER.assert_true(targz_pathname.endswith(TarGz.archive_ext), \
+                        "not a {} file: {}".format(TarGz.archive_ext, \
+                                                    targz_pathname), __file__)
+        return targz_pathname[:-len(TarGz.archive_ext)] + cls.archive_ext
+    #~ def get_migrated_archive_filename_of()
+
+    @classmethod
+    def get_archive_migrating_targz(cls, archive_pathname, codec=None):
+        """ Get the indexed archive to use for archive_pathname.
+            If archive_pathname is a tar.gz, it is migrated, once, into
+            an indexed archive (of codec, see Writer) next to it (migrated
+            again if the tar.gz is newer). The tar.gz is kept.
+        """
+        if not archive_pathname.endswith(TarGz.archive_ext):
+            return archive_pathname
+        migrated = cls.get_migrated_archive_filename_of(archive_pathname)
+        if not os.path.isfile(migrated) or os.path.getmtime(migrated) < \
+                                        os.path.getmtime(archive_pathname):
+            cls.migrateFromTarGz(archive_pathname, migrated, codec=codec)
+        return migrated
+    #~ def get_archive_migrating_targz()
+
+    class Writer(object):
+        """ Add several members to an archive (created if not existing)
+            writing the index once, when closed. An existing member with
+            the same name as an added one is replaced.
+            The files are compressed by several threads, and several 
+            threads can add members concurrently (the files are compressed
+            outside of the lock).
+            In a new archive, the first files added are kept in memory 
+            until the dictionary is trained on them (see IndexedArchive).
+            A new archive is written into a temporary file, renamed when
+            closed. The members added to an existing archive are written 
+            after its end, the former archive stays valid until closed
+            (see IndexedArchive). Nothing is changed when the writer is
+            discarded (e.g. exception raised within the with statement).
+
+            Example:
+                with IndexedArchive.Writer(archive) as writer:
+                    for f in files:
+                        writer.add(f, "dir/"+os.path.basename(f))
+
+            :param codec: codec of a new archive (the best available
+                        if None). An existing archive keeps its codec.
+            :param overwrite: replace the existing archive by a new one
+        """
+        def __init__(self, archive_pathname, codec=None, overwrite=False):
+            self.archive_pathname = archive_pathname
+            self.lock = threading.Lock()
+            # Raw files waiting for the dictionary training: 
+            # list of (member, index entry, data). None when not training
+            self.pending = None
+            self.pending_size = 0
+            # Temporary file of a new archive
+            self.tmp_pathname = None
+            if os.path.isfile(archive_pathname) and not overwrite:
+                self.fp = open(archive_pathname, 'r+b')
+                trailer = IndexedArchive._find_trailer(self.fp)
+                ERROR_HANDLER.assert_true(trailer is not None, \
+                                    "invalid indexed archive: {}".format(\
+                                                archive_pathname), __file__)
+                index, _ = IndexedArchive._read_index(self.fp, trailer)
+                # Drop the data of an interrupted modification
+                self.archive_end = trailer[3]
+                self.fp.truncate(self.archive_end)
+                self.offset = self.archive_end
+                self.codec = ArchiveCodec(index[IndexedArchive._CODEC_KEY])
+                self.dictionary = IndexedArchive._read_dictionary(self.fp, \
+                                                                        index)
+                self.dictionary_loc = index[IndexedArchive._DICTIONARY_KEY]
+                self.index = index[IndexedArchive._MEMBERS_KEY]
+            else:
+                self.tmp_pathname = archive_pathname + '.tmp'
+                self.fp = open(self.tmp_pathname, 'w+b')
+                self.fp.write(IndexedArchive.MAGIC)
+                self.codec = codec if codec is not None else \
+                                            ArchiveCodec.get_best_available()
+                self.dictionary = None
+                self.dictionary_loc = None
+                self.index = collections.OrderedDict()
+                self.offset = len(IndexedArchive.MAGIC)
+                if IndexedArchive.dictionary_size > 0:
+                    self.pending = []
+        #~ def __init__()
+
+        def add(self, added_pathname, in_archive_name):
+            """ Add the file or folder (recursively) added_pathname as
+                in_archive_name
+            """
+            items = IndexedArchive._collect_path(added_pathname, \
+                                                        in_archive_name, [])
+            with self.lock:
+                self._remove_members(in_archive_name)
+            self._add_items(items)
+        #~ def add()
+
+        def add_member(self, in_archive_name, member_type, mode, mtime, \
+                                                        link=None, data=None):
+            """ Add a member from its properties (data is the content of
+                a file member, as bytes)
+            """
+            with self.lock:
+                self._remove_members(in_archive_name)
+            self._add_items([[in_archive_name, member_type, mode, mtime, \
+                                    link, 0 if data is None else len(data), \
+                                                                    data]])
+        #~ def add_member()
+
+        def remove(self, in_archive_name):
+            """ Remove the member in_archive_name (and the members under it)
+                :return: the list of removed members
+            """
+            with self.lock:
+                return self._remove_members(in_archive_name)
+        #~ def remove()
+
+        def _remove_members(self, in_archive_name):
+            removed = [m for m in self.index if m == in_archive_name or \
+                                    m.startswith(in_archive_name + '/')]
+            for member in removed:
+                del self.index[member]
+            return removed
+        #~ def _remove_members()
+
+        def _load_item(self, item):
+            """ :return: the content of the file item
+            """
+            if item[1] != IndexedArchive.FILE_TYPE:
+                return None
+            if isinstance(item[6], bytes):
+                return item[6]
+            with open(item[6], 'rb') as in_fp:
+                return in_fp.read()
+        #~ def _load_item()
+
+        def _compress(self, data):
+            threads = 0
+            if len(data) >= IndexedArchive._LARGE_MEMBER_SIZE:
+                threads = IndexedArchive.get_threads()
+            return self.codec.compress(data, dictionary=self.dictionary, \
+                                                            threads=threads)
+        #~ def _compress()
+
+        def _load_and_compress_item(self, item):
+            data = self._load_item(item)
+            if data is None:
+                return None
+            return self._compress(data)
+        #~ def _load_and_compress_item()
+
+        def _add_items(self, items):
+            # Batches of bounded size, each loaded and compressed in 
+            # parallel, then written
+            batch, batch_size = [], 0
+            for item in items:
+                batch.append(item)
+                batch_size += item[5]
+                if batch_size >= IndexedArchive._BATCH_MAX_BYTES:
+                    self._add_batch(batch)
+                    batch, batch_size = [], 0
+            if len(batch) > 0:
+                self._add_batch(batch)
+        #~ def _add_items()
+
+        def _add_batch(self, batch):
+            with self.lock:
+                training = self.pending is not None
+            if training:
+                datas = IndexedArchive._parallel_map(self._load_item, batch)
+            else:
+                cdatas = IndexedArchive._parallel_map(\
+                                        self._load_and_compress_item, batch)
+            with self.lock:
+                if training and self.pending is None:
+                    # The training finished meanwhile (other thread)
+                    cdatas = [None if d is None else self._compress(d) \
+                                                                for d in datas]
+                    training = False
+                for pos, item in enumerate(batch):
+                    entry = [item[1], self.offset, 0, item[5], item[2], \
+                                                            item[3], item[4]]
+                    self.index[item[0]] = entry
+                    if item[1] != IndexedArchive.FILE_TYPE:
+                        continue
+                    if training:
+                        entry[IndexedArchive._SIZE] = len(datas[pos])
+                        self.pending.append((item[0], entry, datas[pos]))
+                        self.pending_size += len(datas[pos])
+                    else:
+                        self._write_data(entry, cdatas[pos])
+                if training and (len(self.pending) >= \
+                                    IndexedArchive.dictionary_max_samples or \
+                                    self.pending_size >= \
+                                            IndexedArchive._BATCH_MAX_BYTES):
+                    self._flush_pending()
+        #~ def _add_batch()
+
+        def _write_data(self, entry, cdata):
+            self.fp.seek(self.offset)
+            self.fp.write(cdata)
+            entry[IndexedArchive._OFFSET] = self.offset
+            entry[IndexedArchive._CSIZE] = len(cdata)
+            self.offset += len(cdata)
+        #~ def _write_data()
+
+        def _flush_pending(self):
+            """ Train the dictionary on the pending files and write them.
+                Called with the lock held
+            """
+            pending, self.pending = self.pending, None
+            self.pending_size = 0
+            samples = [data for _, _, data in pending if 0 < len(data) <= \
+                                    IndexedArchive.dictionary_max_sample_size]
+            if len(samples) >= IndexedArchive.dictionary_min_samples:
+                self.dictionary = self.codec.train_dictionary(samples, \
+                                            IndexedArchive.dictionary_size)
+                if self.dictionary is not None:
+                    self.fp.seek(self.offset)
+                    self.fp.write(self.dictionary)
+                    self.dictionary_loc = [self.offset, len(self.dictionary)]
+                    self.offset += len(self.dictionary)
+            # The replaced members are not written
+            pending = [(entry, data) for member, entry, data in pending \
+                                            if self.index.get(member) is entry]
+            cdatas = IndexedArchive._parallel_map(self._compress, \
+                                            [data for _, data in pending])
+            for (entry, _), cdata in zip(pending, cdatas):
+                self._write_data(entry, cdata)
+        #~ def _flush_pending()
+
+        def close(self):
+            with self.lock:
+                if self.fp is None:
+                    return
+                if self.pending is not None:
+                    self._flush_pending()
+                index = {\
+                        IndexedArchive._CODEC_KEY: self.codec.get_field_value(),
+                        IndexedArchive._DICTIONARY_KEY: self.dictionary_loc, \
+                        IndexedArchive._MEMBERS_KEY: self.index}
+                IndexedArchive._write_index(self.fp, index, self.offset)
+                self.fp.close()
+                self.fp = None
+                if self.tmp_pathname is not None:
+                    os.replace(self.tmp_pathname, self.archive_pathname)
+                    IndexedArchive._sync_dir(self.archive_pathname)
+        #~ def close()
+
+        def discard(self):
+            """ Close without changing the archive
+            """
+            with self.lock:
+                if self.fp is None:
+                    return
+                if self.tmp_pathname is None:
+                    self.fp.truncate(self.archive_end)
+                self.fp.close()
+                self.fp = None
+                if self.tmp_pathname is not None:
+                    os.remove(self.tmp_pathname)
+        #~ def discard()
+
+        def __enter__(self):
+            return self
+        #~ def __enter__()
+
+        def __exit__(self, exc_type, exc_value, traceback):
+            if exc_type is None:
+                self.close()
+            else:
+                self.discard()
+        #~ def __exit__()
+    #~ class Writer
+#~ class IndexedArchive
+
+def remove_duplicate_files(top_dir):
+    """ Remove the files with the same content (recursively in top_dir), 
+        keeping the first in sorted path order of each duplicate set
+        (as 'fdupes -r -d -N top_dir' does).
+        :return: the list of removed files
+    """
+    size2files = collections.defaultdict(list)
+    for root, dirs, files in os.walk(top_dir):
+        dirs.sort()
+        for f in sorted(files):
+            fpath = os.path.join(root, f)
+            if os.path.isfile(fpath) and not os.path.islink(fpath):
+                size2files[os.path.getsize(fpath)].append(fpath)
+    removed = []
+    for files in size2files.values():
+        if len(files) < 2:
+            continue
+        seen_digests = set()
+        for fpath in files:
+            with open(fpath, 'rb') as fp:
+                digest = hashlib.blake2b(fp.read()).digest()
+            if digest in seen_digests:
+                os.remove(fpath)
+                removed.append(fpath)
+            else:
+                seen_digests.add(digest)
+    return removed
+#~ def remove_duplicate_files()
+
 class FileDirStructureHandling(object):
     '''
     Can be used for the organization of the output directory.
@@ -493,6 +1554,9 @@ class CheckpointState(object):
     AGG_TIME_KEY = "AGGREGATED_TIME"
     DETAILED_TIME_KEY = "DETAILED_TIME"
     CHECKPOINT_DATA_KEY = "CHECKPOINT_DATA"
+    # suffix of the work units journals (see
+    # muteria.drivers.checkpoint_handler.WorkUnitsCheckpoint)
+    WORK_UNITS_SUFFIX = ".units."
 
     '''
         The different states are:
@@ -531,6 +1595,7 @@ class CheckpointState(object):
     def destroy_checkpoint(self):
         for dep_cp in self.dep_checkpoint_states:
             dep_cp.destroy_checkpoint()
+        self._remove_work_units_files()
         if os.path.isfile(self.backup_filepath):
             os.remove(self.backup_filepath)
         if os.path.isfile(self.store_filepath):
@@ -542,6 +1607,19 @@ class CheckpointState(object):
         self.prev_aggregated_time = None
     #~ def destroy_checkpoint()
 
+    def get_work_units_filepath(self, name):
+        """ :return: the pathname of the work units journal named name,
+                    removed with the checkpoint (destroy and restart)
+        """
+        return self.store_filepath + self.WORK_UNITS_SUFFIX + name
+    #~ def get_work_units_filepath()
+
+    def _remove_work_units_files(self):
+        for fn in glob.glob(glob.escape(self.store_filepath + \
+                                            self.WORK_UNITS_SUFFIX) + '*'):
+            os.remove(fn)
+    #~ def _remove_work_units_files()
+
     def set_finished(self, detailed_exectime_obj=None):
         if not self.started:
             ERROR_HANDLER.error_exit("%s" % \
@@ -576,6 +1654,7 @@ class CheckpointState(object):
     def restart_task(self):
         for dep_cp in self.dep_checkpoint_states:
             dep_cp.restart_task()
+        self._remove_work_units_files()
         self.started = True
         self.finished = False
         self.prev_aggregated_time = 0.0
@@ -618,7 +1697,7 @@ class CheckpointState(object):
                     self.DETAILED_TIME_KEY: detailed_exectime_obj, \
                     self.CHECKPOINT_DATA_KEY: json_obj, \
         }
-        dumpJSON(raw_obj, self.store_filepath, pretty=True)
+        dumpJSON(raw_obj, self.store_filepath, pretty=True, atomic=True)
         if remove_back and os.path.isfile(self.backup_filepath):
             os.remove(self.backup_filepath)
     #~ def write_checkpoint()
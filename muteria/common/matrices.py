@@ -3,9 +3,11 @@ from __future__ import print_function
 
 import os
 import sys
+import json
+import shutil
 import itertools
 import copy
-import pandas as pd
+import numpy as np
 
 import muteria.common.mix as common_mix
 import muteria.common.fs as common_fs
@@ -98,6 +100,8 @@ class RawExecutionMatrix(object):
                                     "filename inexistant. filename is " +
                                     str(self.filename), __file__)
             ordered_cols = [self.key_column_name] + self.non_key_col_list
+            # Import here since pandas is slow to load (see common_fs)
+            import pandas as pd
             self.dataframe = \
                     pd.DataFrame({c:[] for c in ordered_cols})[ordered_cols]
             self.dataframe = self.dataframe.astype(cell_dtype)\
@@ -160,6 +164,16 @@ class RawExecutionMatrix(object):
         """
         return self.uncertain_cell_default_val[0]
 
+    def getResourceLimitCellVal(self, limit_index):
+        """ Get the active cell value that represents an execution that
+            violated the resource limit of index limit_index (in the order
+            of common.mix.GlobalConstants.RESOURCE_LIMIT_TEST_VERDICTS), 
+            the active cell default value if the matrix has no such value
+        """
+        if len(self.active_cell_default_val) > limit_index + 1:
+            return self.active_cell_default_val[limit_index + 1]
+        return self.active_cell_default_val[0]
+
     def serialize(self):
         """ Serialize the matrix to its corresponding file if not None
         """
@@ -197,7 +211,36 @@ class RawExecutionMatrix(object):
         True
         """
         self.dataframe[list(self.get_nonkey_colname_list())] = value
-        
+
+    def set_cells_from_array(self, values):
+        """ Replace all the cells values by those of a 2D array, in a
+            single step (rows in the order of the keys and columns in 
+            the order of the non key columns)
+        :param values: 2D array-like (NumPy array or list of lists)
+        :return: nothing
+
+        Example:
+        >>> nc = ['a', 'b', 'c']
+        >>> mat = ExecutionMatrix(non_key_col_list=nc)
+        >>> mat.add_row_by_key('k', [1, 2, 3])
+        >>> mat.add_row_by_key('r', [3, 2, 3])
+        >>> mat.set_cells_from_array([[0, 1, 0], [-1, 0, 1]])
+        >>> mat._get_key_values_dict() == {'k': {'a':0,'b':1,'c':0}, \
+        ...                                 'r': {'a':-1,'b':0,'c':1}}
+        True
+        """
+        import pandas as pd
+        values = np.asarray(values)
+        ERROR_HANDLER.assert_true(values.shape == (len(self.get_keys()), \
+                                        len(self.get_nonkey_colname_list())), \
+                            "shape mismatch when setting cells from array", \
+                                                                    __file__)
+        new_df = pd.DataFrame(values, index=self.dataframe.index, \
+                            columns=list(self.get_nonkey_colname_list()))
+        new_df.insert(0, self.key_column_name, \
+                                        self.dataframe[self.key_column_name])
+        self.dataframe = new_df
+    #~ def set_cells_from_array()
     
     def add_row_by_key(self, key, values, serialize=True):
         """ add a row to the matrix
@@ -309,7 +352,7 @@ class RawExecutionMatrix(object):
         Example:
         >>> nc = ['a', 'b', 'c']
         >>> mat = ExecutionMatrix(non_key_col_list=nc)
-        >>> type(mat.get_keys()) == pd.core.series.Series
+        >>> type(mat.get_keys()).__name__ == 'Series'
         True
         >>> len(mat.get_keys())
         0
@@ -580,6 +623,27 @@ class RawExecutionMatrix(object):
         return result
     #~ def query_uncertain_rows_of_columns()
 
+    def get_view(self):
+        """ Get a compact (NumPy) view of the current matrix, to compute 
+            row and column reductions without iterating over the rows.
+            Note that the view is not updated when the matrix is modified.
+        :return: ExecutionMatrixView object of this matrix
+
+        Example:
+        >>> nc = ['a', 'b', 'c']
+        >>> mat = ExecutionMatrix(non_key_col_list=nc)
+        >>> mat.add_row_by_key('k', [0, -1, 1])
+        >>> mat.add_row_by_key('r', [1, 1, 0])
+        >>> view = mat.get_view()
+        >>> list(view.count_active_per_row())
+        [1, 2]
+        >>> view.active_columns_of_rows() == \
+        ...                             mat.query_active_columns_of_rows()
+        True
+        """
+        return ExecutionMatrixView(self)
+    #~ def get_view()
+
     def _get_key_values_dict(self, keys=None):
         """ compute a dict object with key each element of keys and value
             the corresponding dict representation of the row(without the key)
@@ -740,13 +804,528 @@ class ExecutionMatrix(RawExecutionMatrix):
         This class is the default extension of the class RawExecutionMatrix. 
     '''
     def __init__(self, filename=None, non_key_col_list=None):
+        # The other active values represent the executions that violated
+        # a resource limit, one per limit (see getResourceLimitCellVal)
         RawExecutionMatrix.__init__(self, filename=filename, \
-                                            non_key_col_list=non_key_col_list)
+                                        non_key_col_list=non_key_col_list, \
+                                        active_cell_default_val=[1, 2, 3, 4, 5])
     #~ def __init__()
 #~ class ExecutionMatrix
 
+class ExecutionMatrixView(object):
+    '''
+        Compact read-only view of a RawExecutionMatrix, where the active
+        and the uncertain cells are represented as NumPy boolean 2D arrays
+        (one row per key and one column per non key column).
+        The reductions over rows and columns (count, any) are vectorized.
+        The rows and columns can be restricted using masks (see
+        get_rows_mask and get_cols_mask).
+    '''
+    def __init__(self, matrix):
+        self.row_keys = [sys.intern(str(k)) for k in matrix.get_keys()]
+        self.col_names = [sys.intern(c) for c in \
+                                            matrix.get_nonkey_colname_list()]
+        self.row_pos = {k: i for i, k in enumerate(self.row_keys)}
+        self.col_pos = {c: i for i, c in enumerate(self.col_names)}
+        values = matrix.dataframe[self.col_names].values
+        self.active = self._apply_cell_func(matrix.is_active_cell_func, \
+                                                                        values)
+        self.uncertain = self._apply_cell_func(\
+                                    matrix.is_uncertain_cell_func, values)
+    #~ def __init__()
+
+    @staticmethod
+    def _apply_cell_func(cell_func, values):
+        """ Apply the cell function on all the values, directly on the 
+            array if the function supports it, element-wise otherwise
+        """
+        if values.size == 0:
+            return np.zeros(values.shape, dtype=bool)
+        try:
+            res = cell_func(values)
+            if isinstance(res, np.ndarray) and res.shape == values.shape:
+                return res.astype(bool)
+        except (TypeError, ValueError):
+            pass
+        return np.vectorize(cell_func, otypes=[bool])(values)
+    #~ def _apply_cell_func()
+
+    def get_row_keys(self):
+        return self.row_keys
+    #~ def get_row_keys()
+
+    def get_col_names(self):
+        return self.col_names
+    #~ def get_col_names()
+
+    def get_rows_mask(self, row_key_list=None):
+        """ get the boolean mask of the rows in row_key_list 
+            (all rows if None)
+        """
+        if row_key_list is None:
+            return np.ones(len(self.row_keys), dtype=bool)
+        mask = np.zeros(len(self.row_keys), dtype=bool)
+        for k in row_key_list:
+            ERROR_HANDLER.assert_true(k in self.row_pos, \
+                            "row key {} not in the matrix".format(k), __file__)
+            mask[self.row_pos[k]] = True
+        return mask
+    #~ def get_rows_mask()
+
+    def get_cols_mask(self, non_key_col_list=None):
+        """ get the boolean mask of the columns in non_key_col_list 
+            (all columns if None)
+        """
+        if non_key_col_list is None:
+            return np.ones(len(self.col_names), dtype=bool)
+        mask = np.zeros(len(self.col_names), dtype=bool)
+        for c in non_key_col_list:
+            ERROR_HANDLER.assert_true(c in self.col_pos, \
+                            "column {} not in the matrix".format(c), __file__)
+            mask[self.col_pos[c]] = True
+        return mask
+    #~ def get_cols_mask()
+
+    def get_active_array(self, row_key_list=None, non_key_col_list=None):
+        """ get the active cells boolean 2D array with the rows and 
+            columns ordered as in row_key_list and non_key_col_list
+            (the view's order when None)
+        """
+        arr = self.active
+        if row_key_list is not None:
+            arr = arr[[self.row_pos[k] for k in row_key_list], :]
+        if non_key_col_list is not None:
+            arr = arr[:, [self.col_pos[c] for c in non_key_col_list]]
+        return arr
+    #~ def get_active_array()
+
+    def count_active_per_row(self, cols_mask=None):
+        """ :return: NumPy array of the number of active cells of each row
+                    (only considering the columns in cols_mask)
+        """
+        if cols_mask is None:
+            return self.active.sum(axis=1)
+        return self.active[:, cols_mask].sum(axis=1)
+    #~ def count_active_per_row()
+
+    def count_active_per_col(self, rows_mask=None):
+        """ :return: NumPy array of the number of active cells of each 
+                    column (only considering the rows in rows_mask)
+        """
+        if rows_mask is None:
+            return self.active.sum(axis=0)
+        return self.active[rows_mask, :].sum(axis=0)
+    #~ def count_active_per_col()
+
+    def rows_with_active(self, cols_mask=None):
+        """ :return: boolean mask of the rows having an active cell
+                    (only considering the columns in cols_mask)
+        """
+        if cols_mask is None:
+            return self.active.any(axis=1)
+        return self.active[:, cols_mask].any(axis=1)
+    #~ def rows_with_active()
+
+    def rows_with_uncertain(self, cols_mask=None):
+        """ :return: boolean mask of the rows having an uncertain cell
+                    (only considering the columns in cols_mask)
+        """
+        if cols_mask is None:
+            return self.uncertain.any(axis=1)
+        return self.uncertain[:, cols_mask].any(axis=1)
+    #~ def rows_with_uncertain()
+
+    def active_columns_of_rows(self, cols_mask=None):
+        """ Same as RawExecutionMatrix.query_active_columns_of_rows, for
+            all the rows, only considering the columns in cols_mask.
+        """
+        active = self.active
+        if cols_mask is not None:
+            active = active & cols_mask
+        result = {k: [] for k in self.row_keys}
+        for r, c in zip(*np.nonzero(active)):
+            result[self.row_keys[r]].append(self.col_names[c])
+        return result
+    #~ def active_columns_of_rows()
+
+    def active_rows_of_columns(self, rows_mask=None):
+        """ Same as RawExecutionMatrix.query_active_rows_of_columns, for
+            all the columns, only considering the rows in rows_mask.
+        """
+        active = self.active
+        if rows_mask is not None:
+            active = active & rows_mask[:, np.newaxis]
+        result = {c: [] for c in self.col_names}
+        for c, r in zip(*np.nonzero(active.T)):
+            result[self.col_names[c]].append(self.row_keys[r])
+        return result
+    #~ def active_rows_of_columns()
+#~ class ExecutionMatrixView
+
+
+class _InternTable(object):
+    '''
+        Table of interned values (element names or output hashes) of the 
+        output log data, the id of a value being its position.
+
+        The table is stored encoded (see write): the kind (KINDS_DTYPE) and
+        the end offset (ENDS_DTYPE) of each value, then the values' bytes.
+        The integers (e.g. output fingerprints) are stored in a multiple of
+        8 bytes and the hexadecimal digests (e.g. SHA-512) as bytes.
+        A table of a file is only read when accessed, each value is only
+        decoded when accessed and the ids of the values are only computed
+        when a value is looked up (get_id and intern). The encoded table
+        can be streamed by chunks (see iter_encoded_chunks), without
+        reading the whole table of a file.
+    '''
+    KIND_STR = 0
+    KIND_INT = 1
+    KIND_NEG_INT = 2
+    KIND_HEX = 3
+    KINDS_DTYPE = np.dtype('u1')
+    ENDS_DTYPE = np.dtype('<u8')
+    # Number of values of the chunks when streaming the table
+    CHUNK_COUNT = 65536
+    _UNDECODED = object()
+
+    def __init__(self, values=None, intern_strings=False):
+        self.intern_strings = intern_strings
+        # the values (_UNDECODED when not yet decoded), None when the 
+        # table of a file is not accessed
+        self._values = []
+        # value -> id, None when not yet computed
+        self._value2id = {}
+        # (kinds, ends, values bytes) of the first values (read from a
+        # file), None if not read
+        self._encoded = None
+        self._encoded_loader = None
+        # (filename, position, count, values size) of the table of a file
+        self._file_location = None
+        if values is not None:
+            for value in values:
+                self.intern(value)
+    #~ def __init__()
+
+    @classmethod
+    def get_encoded_size(cls, count, values_size):
+        return count * (cls.KINDS_DTYPE.itemsize + cls.ENDS_DTYPE.itemsize) \
+                                                                + values_size
+    #~ def get_encoded_size()
+
+    @classmethod
+    def from_file(cls, filename, position, count, values_size, \
+                                                        intern_strings=False):
+        """ Table of count values (values_size bytes) written at position
+            in the file. The file is read when the table is accessed.
+        """
+        table = cls(intern_strings=intern_strings)
+        table._values = None
+        table._value2id = None
+        table._file_location = (filename, position, count, values_size)
+        size = cls.get_encoded_size(count, values_size)
+        def _loader():
+            with open(filename, 'rb') as fp:
+                fp.seek(position)
+                raw = fp.read(size)
+            ERROR_HANDLER.assert_true(len(raw) == size, \
+                            "truncated outlog data file " + filename, __file__)
+            ends_start = count * cls.KINDS_DTYPE.itemsize
+            values_start = ends_start + count * cls.ENDS_DTYPE.itemsize
+            return (np.frombuffer(raw, dtype=cls.KINDS_DTYPE, count=count), \
+                    np.frombuffer(raw, dtype=cls.ENDS_DTYPE, count=count, \
+                                                        offset=ends_start), \
+                    raw[values_start:])
+        #~ def _loader()
+        table._encoded_loader = _loader
+        return table
+    #~ def from_file()
+
+    def _get_encoded(self):
+        if self._encoded_loader is not None:
+            self._encoded = self._encoded_loader()
+            self._encoded_loader = None
+        return self._encoded
+    #~ def _get_encoded()
+
+    def _get_values(self):
+        if self._values is None:
+            self._values = [self._UNDECODED] * self._file_location[2]
+        return self._values
+    #~ def _get_values()
+
+    def __len__(self):
+        if self._values is None:
+            return self._file_location[2]
+        return len(self._values)
+    #~ def __len__()
+
+    def __getitem__(self, vid):
+        values = self._get_values()
+        value = values[vid]
+        if value is self._UNDECODED:
+            kinds, ends, data = self._get_encoded()
+            start = 0 if vid == 0 else int(ends[vid - 1])
+            value = self.decode_value(int(kinds[vid]), \
+                                                data[start:int(ends[vid])])
+            if self.intern_strings and isinstance(value, str):
+                value = sys.intern(value)
+            values[vid] = value
+        return value
+    #~ def __getitem__()
+
+    def __iter__(self):
+        for vid in range(len(self)):
+            yield self[vid]
+    #~ def __iter__()
+
+    def _get_value2id(self):
+        if self._value2id is None:
+            self._value2id = {value: vid for vid, value in enumerate(self)}
+        return self._value2id
+    #~ def _get_value2id()
+
+    def get_id(self, value, default=None):
+        return self._get_value2id().get(value, default)
+    #~ def get_id()
+
+    def intern(self, value):
+        """ Get the id of value, adding it if needed
+        """
+        value2id = self._get_value2id()
+        vid = value2id.get(value, None)
+        if vid is None:
+            values = self._get_values()
+            vid = len(values)
+            values.append(value)
+            value2id[value] = vid
+        return vid
+    #~ def intern()
+
+    @classmethod
+    def encode_value(cls, value):
+        """ :return: pair of the kind and the bytes of value
+        """
+        if isinstance(value, (int, np.integer)) and \
+                                                not isinstance(value, bool):
+            value = int(value)
+            kind = cls.KIND_INT if value >= 0 else cls.KIND_NEG_INT
+            value = abs(value)
+            return kind, value.to_bytes(\
+                        max(1, (value.bit_length() + 63) // 64) * 8, 'little')
+        ERROR_HANDLER.assert_true(isinstance(value, str), \
+                    "unsupported outlog value: {}".format(repr(value)), \
+                                                                    __file__)
+        try:
+            digest = bytes.fromhex(value)
+            if digest.hex() == value:
+                return cls.KIND_HEX, digest
+        except ValueError:
+            pass
+        return cls.KIND_STR, value.encode('utf-8', 'surrogatepass')
+    #~ def encode_value()
+
+    @classmethod
+    def decode_value(cls, kind, data):
+        if kind == cls.KIND_INT:
+            return int.from_bytes(data, 'little')
+        if kind == cls.KIND_NEG_INT:
+            return -int.from_bytes(data, 'little')
+        if kind == cls.KIND_HEX:
+            return data.hex()
+        return data.decode('utf-8', 'surrogatepass')
+    #~ def decode_value()
+
+    def _iter_file_chunks(self, max_count):
+        filename, position, count, _ = self._file_location
+        ends_start = position + count * self.KINDS_DTYPE.itemsize
+        values_start = ends_start + count * self.ENDS_DTYPE.itemsize
+        prev_end = 0
+        with open(filename, 'rb') as fp:
+            for start in range(0, count, max_count):
+                n = min(max_count, count - start)
+                fp.seek(position + start * self.KINDS_DTYPE.itemsize)
+                kinds = np.fromfile(fp, dtype=self.KINDS_DTYPE, count=n)
+                fp.seek(ends_start + start * self.ENDS_DTYPE.itemsize)
+                ends = np.fromfile(fp, dtype=self.ENDS_DTYPE, count=n)
+                ERROR_HANDLER.assert_true(len(kinds) == n and len(ends) == n,\
+                            "truncated outlog data file " + filename, __file__)
+                fp.seek(values_start + prev_end)
+                data = fp.read(int(ends[-1]) - prev_end)
+                ERROR_HANDLER.assert_true(\
+                            len(data) == int(ends[-1]) - prev_end, \
+                            "truncated outlog data file " + filename, __file__)
+                yield kinds, ends - prev_end, data
+                prev_end = int(ends[-1])
+    #~ def _iter_file_chunks()
+
+    def iter_encoded_chunks(self, max_count=None):
+        """ Iterate over the encoded table by chunks of at most max_count
+            (default CHUNK_COUNT) values, as triples (kinds, ends, values 
+            bytes) where the ends are relative to the chunk. The table of
+            a file that is not accessed is read by chunks, and the values
+            read from a file are not decoded.
+        """
+        if max_count is None:
+            max_count = self.CHUNK_COUNT
+        n_encoded = 0
+        if self._encoded_loader is not None:
+            # Not accessed, thus not extended
+            for chunk in self._iter_file_chunks(max_count):
+                yield chunk
+            return
+        if self._encoded is not None:
+            kinds, ends, data = self._encoded
+            n_encoded = len(kinds)
+            for start in range(0, n_encoded, max_count):
+                stop = min(start + max_count, n_encoded)
+                prev_end = 0 if start == 0 else int(ends[start - 1])
+                yield kinds[start:stop], ends[start:stop] - prev_end, \
+                                            data[prev_end:int(ends[stop - 1])]
+        values = self._get_values()
+        for start in range(n_encoded, len(values), max_count):
+            chunk_values = values[start:start + max_count]
+            kinds = np.empty(len(chunk_values), dtype=self.KINDS_DTYPE)
+            ends = np.empty(len(chunk_values), dtype=self.ENDS_DTYPE)
+            data_parts = []
+            data_size = 0
+            for pos, value in enumerate(chunk_values):
+                kinds[pos], data = self.encode_value(value)
+                data_size += len(data)
+                ends[pos] = data_size
+                data_parts.append(data)
+            yield kinds, ends, b''.join(data_parts)
+    #~ def iter_encoded_chunks()
+
+    def write(self, fp):
+        """ Write the encoded table into the file object fp, by chunks. 
+            The values read from a file are not decoded.
+            :return: the size of the values' bytes
+        """
+        writer = _InternTableWriter(fp, len(self))
+        for kinds, ends, data in self.iter_encoded_chunks():
+            writer.write_chunk(kinds, ends, data)
+        return writer.close()
+    #~ def write()
+#~ class _InternTable
+
+class _InternTableWriter(object):
+    '''
+        Write an encoded table (see _InternTable) of count values into the
+        file object fp, at its current position, by chunks of values.
+    '''
+    def __init__(self, fp, count):
+        self.fp = fp
+        self.count = count
+        self.kinds_position = fp.tell()
+        self.ends_position = self.kinds_position + \
+                                    count * _InternTable.KINDS_DTYPE.itemsize
+        self.values_position = self.ends_position + \
+                                    count * _InternTable.ENDS_DTYPE.itemsize
+        self.written = 0
+        self.data_size = 0
+    #~ def __init__()
+
+    def write_chunk(self, kinds, ends, data):
+        """ Write the values (kinds, ends relative to the chunk, and values
+            bytes) after the written ones
+        """
+        n = len(kinds)
+        ERROR_HANDLER.assert_true(self.written + n <= self.count, \
+                                "too many values for the table", __file__)
+        self.fp.seek(self.kinds_position + self.written * \
+                                        _InternTable.KINDS_DTYPE.itemsize)
+        self.fp.write(np.asarray(kinds, \
+                                dtype=_InternTable.KINDS_DTYPE).tobytes())
+        self.fp.seek(self.ends_position + self.written * \
+                                        _InternTable.ENDS_DTYPE.itemsize)
+        self.fp.write((np.asarray(ends, dtype=_InternTable.ENDS_DTYPE) \
+                                                + self.data_size).tobytes())
+        self.fp.seek(self.values_position + self.data_size)
+        self.fp.write(data)
+        self.written += n
+        self.data_size += len(data)
+    #~ def write_chunk()
+
+    def close(self):
+        """ Place the file position after the table.
+            :return: the size of the values' bytes
+        """
+        ERROR_HANDLER.assert_true(self.written == self.count, \
+                                "missing values of the table", __file__)
+        self.fp.seek(self.values_position + self.data_size)
+        return self.data_size
+    #~ def close()
+#~ class _InternTableWriter
+
+class _SelectedInternTables(object):
+    '''
+        Table made of the selected values of several tables (see 
+        _InternTable), in order, written by chunks (see write) without
+        reading or decoding the whole tables.
+        :param tables_selections: list of pairs (table, selection) where
+                    the selection is the bit packed (see numpy.packbits) 
+                    mask of the selected values of the table
+    '''
+    def __init__(self, tables_selections):
+        self.tables_selections = tables_selections
+    #~ def __init__()
+
+    def __len__(self):
+        return sum(int(np.unpackbits(selection, count=len(table)).sum()) \
+                            for table, selection in self.tables_selections)
+    #~ def __len__()
+
+    def write(self, fp):
+        writer = _InternTableWriter(fp, len(self))
+        for table, selection in self.tables_selections:
+            mask = np.unpackbits(selection, count=len(table)).astype(bool)
+            start = 0
+            for kinds, ends, data in table.iter_encoded_chunks():
+                chunk_mask = mask[start:start + len(kinds)]
+                start += len(kinds)
+                lengths = np.diff(ends, prepend=np.uint64(0))
+                data_mask = np.repeat(chunk_mask, lengths.astype(np.int64))
+                kept_data = np.frombuffer(data, dtype=np.uint8)[data_mask]
+                writer.write_chunk(kinds[chunk_mask], \
+                                np.cumsum(lengths[chunk_mask], \
+                                    dtype=_InternTable.ENDS_DTYPE), \
+                                                    kept_data.tobytes())
+        return writer.close()
+    #~ def write()
+#~ class _SelectedInternTables
 
 class OutputLogData(object):
+    '''
+        Output log data (output length, output hash, return code and 
+        timeout) of the execution of tests (elements) for each objective
+        (the program or the criteria elements such as mutants).
+
+        The data is stored in columnar form: each objective has a NumPy
+        record array sorted by element id, with the fields elem (element 
+        id), len, hash (id in the deduplication table of the output hashes),
+        retcode and timedout. The element names and the hashes are
+        interned in tables shared by all the objectives (see _InternTable).
+
+        The storing file is binary: a magic, a fixed size header (sizes of
+        the next sections), a small JSON header (record dtype and 
+        fingerprint mode), the position of each objective's records, the 
+        tables of the objectives, of the elements and of the hashes, then
+        the records of each objective. Only the objectives are decoded when
+        the file is opened: the element and hash tables are only read when
+        accessed, and the records of an objective are only loaded from the
+        file when accessed. A file in the legacy JSON format 
+        ({objective: {test: data}}) or in the former binary format (JSON 
+        header with the tables) is loaded and migrated to the current 
+        format on the next serialization.
+
+        The header also records the fingerprint mode of the output hashes
+        (see set_fingerprint_mode): the data of different modes are never
+        mixed or compared.
+
+        The storing files have the extension FILE_EXTENSION. When such a
+        file does not exist but the file with the legacy extension does
+        (output directory of an older version), the latter is loaded.
+    '''
     #OBJECTIVE_ID = "OBJECTIVE_ID"
     #TEST_ID = "TEST_ID"
     OUTLOG_LEN = "OUTLOG_LEN"       # int
@@ -756,6 +1335,7 @@ class OutputLogData(object):
     #ordered_cols = [OBJECTIVE_ID, TEST_ID, OUTLOG_LEN, OUTLOG_HASH, \
     #                                                            RETURN_CODE]
     Dat_Keys = {OUTLOG_LEN, OUTLOG_HASH, RETURN_CODE, TIMEDOUT}
+    _ordered_dat_keys = (OUTLOG_LEN, OUTLOG_HASH, RETURN_CODE, TIMEDOUT)
     
     UNCERTAIN_TEST_OUTLOGDATA = {
                 OUTLOG_LEN: common_mix.GlobalConstants.COMMAND_UNCERTAIN,
@@ -764,6 +1344,27 @@ class OutputLogData(object):
                 TIMEDOUT: common_mix.GlobalConstants.COMMAND_UNCERTAIN,
     }
 
+    # Binary storage
+    FILE_MAGIC = b"MUTOLOG\x02"
+    FILE_EXTENSION = ".mutolog"
+    LEGACY_FILE_EXTENSION = ".json"
+    # Former binary format, with a JSON header of size _HEADER_SIZE_DTYPE
+    LEGACY_FILE_MAGIC = b"MUTOLOG\x01"
+    _HEADER_SIZE_DTYPE = np.dtype('<u8')
+    # Sizes (bytes) of the JSON header and of the tables' values, and the
+    # numbers of objectives, elements and hashes
+    _FIXED_HEADER_DTYPE = np.dtype([('meta_size', '<u8'), \
+                    ('n_objectives', '<u8'), ('objectives_size', '<u8'), \
+                    ('n_elems', '<u8'), ('elems_size', '<u8'), \
+                    ('n_hashes', '<u8'), ('hashes_size', '<u8')])
+    _OBJECTIVES_INDEX_DTYPE = np.dtype([('offset', '<u8'), ('count', '<u8')])
+    _RECORDS_DTYPE = np.dtype([('elem', '<i8'), ('len', '<i8'), \
+                                ('hash', '<i8'), ('retcode', '<i8'), \
+                                                        ('timedout', 'i1')])
+    # Representation of None (uncertain) in the records
+    _NONE_INT = np.iinfo(np.int64).min
+    _NONE_ID = -1
+
     @classmethod
     def outlogdata_equiv(cls, outlogdata1, outlogdata2):
         if outlogdata1 == cls.UNCERTAIN_TEST_OUTLOGDATA or \
@@ -777,32 +1378,346 @@ class OutputLogData(object):
 
     def __init__(self, filename=None):
         self.filename = filename
-        if self.filename is None or not os.path.isfile(self.filename):
-            self.data = {}
-        else:
-            self.data = {objective: self._mem_optimize_sub_dat(test2dat) \
-                                for objective, test2dat in \
-                                    common_fs.loadJSON(self.filename).items()}
+        # interned element names and output hashes
+        self._elems = _InternTable(intern_strings=True)
+        self._hashes = _InternTable()
+        # objective -> records, or None when not yet loaded from the file
+        self._objectives = {}
+        # objective -> (offset, count) of the records in the file
+        self._file_index = {}
+        self._file_data_start = None
+        # Name of the fingerprint mode of the hashes (None if unknown)
+        self.fingerprint_mode = None
+        # File from which the objectives not yet loaded are read
+        self._source_filename = self.get_existing_store_file(self.filename)
+        if self._source_filename is not None:
+            with open(self._source_filename, 'rb') as fp:
+                magic = fp.read(len(self.FILE_MAGIC))
+            if magic == self.FILE_MAGIC:
+                self._load_header()
+            elif magic == self.LEGACY_FILE_MAGIC:
+                self._load_legacy_header()
+            else:
+                # Legacy JSON file
+                for objective, elem2dat in \
+                            common_fs.loadJSON(self._source_filename).items():
+                    self._objectives[objective] = \
+                                            self._dict_to_records(elem2dat)
     #~ def __init__()
 
     @classmethod
-    def _mem_optimize_sub_dat(cls, test2dat):
-        res = {}
-        for t, dat in test2dat.items():
-            t = sys.intern(t)
-            dat[cls.OUTLOG_HASH] = sys.intern(dat[cls.OUTLOG_HASH])
-            res[t] = dat
-        return res
-    #~ def _mem_optimize_sub_dat()
+    def get_existing_store_file(cls, filename):
+        """ :return: the file to load for filename: filename if it exists, 
+                    else the file with the legacy extension if it exists,
+                    else None
+        """
+        if filename is None:
+            return None
+        if os.path.isfile(filename):
+            return filename
+        if filename.endswith(cls.FILE_EXTENSION):
+            legacy = filename[:-len(cls.FILE_EXTENSION)] \
+                                                + cls.LEGACY_FILE_EXTENSION
+            if os.path.isfile(legacy):
+                return legacy
+        return None
+    #~ def get_existing_store_file()
+
+    def _check_records_dtype(self, dtype_descr):
+        ERROR_HANDLER.assert_true(\
+                    np.dtype([tuple(f) for f in dtype_descr]) == \
+                                                        self._RECORDS_DTYPE, \
+                    "unsupported records format in "+self._source_filename, \
+                                                                    __file__)
+    #~ def _check_records_dtype()
+
+    def _load_header(self):
+        filename = self._source_filename
+        with open(filename, 'rb') as fp:
+            fp.seek(len(self.FILE_MAGIC))
+            fixed = fp.read(self._FIXED_HEADER_DTYPE.itemsize)
+            ERROR_HANDLER.assert_true(\
+                            len(fixed) == self._FIXED_HEADER_DTYPE.itemsize, \
+                            "truncated outlog data file " + filename, __file__)
+            fixed = {k: int(v) for k, v in zip(self._FIXED_HEADER_DTYPE.names,\
+                    np.frombuffer(fixed, dtype=self._FIXED_HEADER_DTYPE)[0])}
+            meta = json.loads(fp.read(fixed['meta_size']).decode('utf-8'))
+            n_objectives = fixed['n_objectives']
+            objectives_index = np.frombuffer(fp.read(n_objectives * \
+                                self._OBJECTIVES_INDEX_DTYPE.itemsize), \
+                                        dtype=self._OBJECTIVES_INDEX_DTYPE)
+        self._check_records_dtype(meta['dtype'])
+        self.fingerprint_mode = meta.get('fingerprint_mode', None)
+        position = len(self.FILE_MAGIC) + \
+                            self._FIXED_HEADER_DTYPE.itemsize + \
+                            fixed['meta_size'] + objectives_index.nbytes
+        tables = []
+        for count, size in ((n_objectives, fixed['objectives_size']), \
+                            (fixed['n_elems'], fixed['elems_size']), \
+                            (fixed['n_hashes'], fixed['hashes_size'])):
+            tables.append(_InternTable.from_file(filename, position, count, \
+                                size, intern_strings=(len(tables) == 1)))
+            position += _InternTable.get_encoded_size(count, size)
+        objectives, self._elems, self._hashes = tables
+        self._file_data_start = position
+        for objective, (offset, count) in zip(objectives, \
+                                                objectives_index.tolist()):
+            self._objectives[objective] = None
+            self._file_index[objective] = (offset, count)
+    #~ def _load_header()
+
+    def _load_legacy_header(self):
+        """ Load the header of the former binary format (JSON header)
+        """
+        with open(self._source_filename, 'rb') as fp:
+            fp.seek(len(self.LEGACY_FILE_MAGIC))
+            header_size = int(np.frombuffer(\
+                                fp.read(self._HEADER_SIZE_DTYPE.itemsize), \
+                                        dtype=self._HEADER_SIZE_DTYPE)[0])
+            header = json.loads(fp.read(header_size).decode('utf-8'))
+        self._check_records_dtype(header['dtype'])
+        self._file_data_start = len(self.LEGACY_FILE_MAGIC) + \
+                                self._HEADER_SIZE_DTYPE.itemsize + header_size
+        self._elems = _InternTable(header['elements'], intern_strings=True)
+        self._hashes = _InternTable(header['hashes'])
+        for objective, offset, count in header['objectives']:
+            self._objectives[objective] = None
+            self._file_index[objective] = (offset, count)
+        self.fingerprint_mode = header.get('fingerprint_mode', None)
+    #~ def _load_legacy_header()
+
+    def get_fingerprint_mode(self):
+        return self.fingerprint_mode
+    #~ def get_fingerprint_mode()
+
+    def set_fingerprint_mode(self, fingerprint_mode):
+        """ Set the name of the fingerprint mode of the output hashes (e.g.
+            the name of an OutlogFingerprintMode). It is an error to set
+            a mode different from the mode of the existing data.
+        """
+        self.assert_compatible_fingerprint_mode(fingerprint_mode)
+        if fingerprint_mode is not None:
+            self.fingerprint_mode = fingerprint_mode
+    #~ def set_fingerprint_mode()
+
+    def assert_compatible_fingerprint_mode(self, other):
+        """ Fail if the hashes of self and other (OutputLogData or 
+            fingerprint mode name) have different fingerprint modes.
+            An unknown mode (None) is compatible with every mode.
+        """
+        if isinstance(other, OutputLogData):
+            other = other.fingerprint_mode
+        ERROR_HANDLER.assert_true(self.fingerprint_mode is None or \
+                        other is None or self.fingerprint_mode == other, \
+                    "mixing the output fingerprint modes {} and {}".format(\
+                                    self.fingerprint_mode, other), __file__)
+    #~ def assert_compatible_fingerprint_mode()
+
+    def _read_records(self, objective):
+        """ Read the records of the objective from the file
+        """
+        offset, count = self._file_index[objective]
+        with open(self._source_filename, 'rb') as fp:
+            fp.seek(self._file_data_start + offset)
+            records = np.fromfile(fp, dtype=self._RECORDS_DTYPE, count=count)
+        ERROR_HANDLER.assert_true(len(records) == count, \
+                                "truncated outlog data file " \
+                                        + self._source_filename, __file__)
+        return records
+    #~ def _read_records()
+
+    def _get_records(self, objective):
+        """ Get the records of the objective, loading them from the 
+            file if needed
+        """
+        records = self._objectives[objective]
+        if records is None:
+            records = self._read_records(objective)
+            self._objectives[objective] = records
+        return records
+    #~ def _get_records()
+
+    def _dict_to_records(self, elem2dat):
+        """ Convert the dict {element: data} into records sorted by element
+        """
+        records = np.empty(len(elem2dat), dtype=self._RECORDS_DTYPE)
+        none_int = self._NONE_INT
+        for pos, (elem, dat) in enumerate(elem2dat.items()):
+            o_len = dat[self.OUTLOG_LEN]
+            o_hash = dat[self.OUTLOG_HASH]
+            retcode = dat[self.RETURN_CODE]
+            timedout = dat[self.TIMEDOUT]
+            records[pos] = (\
+                self._elems.intern(elem), \
+                none_int if o_len is None else o_len, \
+                self._NONE_ID if o_hash is None else \
+                                                self._hashes.intern(o_hash), \
+                none_int if retcode is None else retcode, \
+                self._NONE_ID if timedout is None else int(bool(timedout)))
+        return np.sort(records, order='elem')
+    #~ def _dict_to_records()
+
+    def _make_dat(self, o_len, o_hash, retcode, timedout):
+        """ Make the data dict of a record's values
+        """
+        return {
+            self.OUTLOG_LEN: None if o_len == self._NONE_INT else o_len,
+            self.OUTLOG_HASH: None if o_hash == self._NONE_ID else \
+                                                        self._hashes[o_hash],
+            self.RETURN_CODE: None if retcode == self._NONE_INT else retcode,
+            self.TIMEDOUT: None if timedout == self._NONE_ID else \
+                                                            bool(timedout),
+        }
+    #~ def _make_dat()
+
+    def _records_to_dict(self, records):
+        """ Convert the records into the dict {element: data}
+        """
+        return {self._elems[elem]: self._make_dat(*dat_vals) \
+                            for elem, *dat_vals in records.tolist()}
+    #~ def _records_to_dict()
 
     def is_empty(self):
-        return len(self.data) == 0
+        return len(self._objectives) == 0
     #~ def is_empty()
 
+    def get_objectives(self):
+        return list(self._objectives)
+    #~ def get_objectives()
+
+    def get_objective_data(self, objective):
+        """ Get the data of an objective as dict {element: data}
+        """
+        return self._records_to_dict(self._get_records(objective))
+    #~ def get_objective_data()
+
     def get_zip_objective_and_data(self):
-        return self.data.items()
+        """ Iterate over the pairs (objective, {element: data}). 
+            The data of each objective is loaded when reached.
+        """
+        for objective in list(self._objectives):
+            yield objective, self.get_objective_data(objective)
     #~ def get_zip_objective_and_data()
 
+    @property
+    def data(self):
+        """ All the data as dict {objective: {element: data}}
+        """
+        return dict(self.get_zip_objective_and_data())
+    #~ def data()
+
+    # Codes used by get_coded_arrays
+    UNCERTAIN_CODE = -1
+    MISSING_CODE = -2
+
+    def get_coded_arrays(self, elem_list, outlog_codes=None):
+        """ Encode the output log data of each objective as integer 
+            arrays, to compare the outputs in bulk.
+            Two output log data get the same code if and only if they are
+            equal. The uncertain data get the code UNCERTAIN_CODE and the
+            elements missing for an objective get the code MISSING_CODE.
+
+        :param elem_list: list of the elements (tests) to encode, in order
+        :param outlog_codes: dict shared by the calls (on different 
+                    OutputLogData objects) whose codes must be comparable.
+                    It is updated with the new outputs.
+        :return: dict with key the objective and value the pair of 
+                    NumPy arrays (codes, timedout) over elem_list.
+
+        Example:
+        >>> old = OutputLogData()
+        >>> d1 = {OutputLogData.OUTLOG_LEN: 2, OutputLogData.OUTLOG_HASH: \
+        ...     'x', OutputLogData.RETURN_CODE: 0, OutputLogData.TIMEDOUT: False}
+        >>> d2 = dict(d1)
+        >>> d2[OutputLogData.RETURN_CODE] = 1
+        >>> old.add_data({'o': {'a': d1, 'b': d2, \
+        ...                 'c': dict(OutputLogData.UNCERTAIN_TEST_OUTLOGDATA)}})
+        >>> codes = {}
+        >>> res = old.get_coded_arrays(['a', 'b', 'c', 'd'], codes)
+        >>> list(res['o'][0])
+        [0, 1, -1, -2]
+        >>> res = old.get_coded_arrays(['b'], codes)
+        >>> list(res['o'][0])
+        [1]
+        """
+        if outlog_codes is None:
+            outlog_codes = {}
+        uncertain_key = tuple(self.UNCERTAIN_TEST_OUTLOGDATA[k] \
+                                            for k in self._ordered_dat_keys)
+        outlog_codes[uncertain_key] = self.UNCERTAIN_CODE
+        elem_ids = np.array([self._elems.get_id(e, self._NONE_ID) \
+                                        for e in elem_list], dtype=np.int64)
+        res = {}
+        found_sel = []
+        for objective in self._objectives:
+            records = self._get_records(objective)
+            codes = np.full(len(elem_list), self.MISSING_CODE, dtype=np.int64)
+            timedout = np.zeros(len(elem_list), dtype=bool)
+            # position of each element in the (sorted) records
+            pos = np.minimum(np.searchsorted(records['elem'], elem_ids), \
+                                                    max(len(records) - 1, 0))
+            found = (elem_ids != self._NONE_ID)
+            if len(records) > 0:
+                found &= (records['elem'][pos] == elem_ids)
+            else:
+                found[:] = False
+            sel = records[pos[found]]
+            timedout[found] = (sel['timedout'] == 1)
+            res[objective] = (codes, timedout)
+            found_sel.append((found, sel))
+
+        # Code each distinct data once, over all the objectives
+        dat_cols = np.concatenate([np.stack([sel['len'], sel['hash'], \
+                                sel['retcode'], \
+                                sel['timedout'].astype(np.int64)], axis=1) \
+                                            for _, sel in found_sel] \
+                                    + [np.empty((0, 4), dtype=np.int64)])
+        if len(dat_cols) == 0:
+            return res
+        uniq, inverse = np.unique(dat_cols, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        uniq_codes = np.empty(len(uniq), dtype=np.int64)
+        for u_pos, u_vals in enumerate(uniq.tolist()):
+            u_dat = self._make_dat(*u_vals)
+            dat_key = tuple(u_dat[k] for k in self._ordered_dat_keys)
+            code = outlog_codes.get(dat_key, None)
+            if code is None:
+                # The uncertain key (code -1) is always in outlog_codes
+                code = len(outlog_codes) - 1
+                outlog_codes[dat_key] = code
+            uniq_codes[u_pos] = code
+        start = 0
+        for (codes, _), (found, sel) in zip(res.values(), found_sel):
+            codes[found] = uniq_codes[inverse[start:start + len(sel)]]
+            start += len(sel)
+        return res
+    #~ def get_coded_arrays()
+
+    def _merge_records(self, objective, records, override_existing, \
+                                        ask_confirmation_with_exist_missing):
+        """ Merge the (sorted) records into those of the objective.
+            The new records replace the existing ones of the same elements
+        """
+        if objective not in self._objectives:
+            self._objectives[objective] = records
+            return
+        existing = self._get_records(objective)
+        if not override_existing or ask_confirmation_with_exist_missing:
+            has_overlap = np.isin(records['elem'], existing['elem']).any()
+            ERROR_HANDLER.assert_true(override_existing or not has_overlap, \
+                            "Override_existing not set but there is overlap", \
+                                                                    __file__)
+            if ask_confirmation_with_exist_missing and has_overlap:
+                ERROR_HANDLER.assert_true(common_mix.confirm_execution(\
+                                            "Some values are existing, "
+                                            "do you confirm their override?"),\
+                             "Existing values were not overriden", __file__)
+        # Keep the last (new) record of each element
+        combined = np.concatenate((existing, records))[::-1]
+        _, last_pos = np.unique(combined['elem'], return_index=True)
+        self._objectives[objective] = combined[last_pos]
+    #~ def _merge_records()
+
     def add_data (self, data_dict, check_all=True, override_existing=False, \
                                 ask_confirmation_with_exist_missing=False, \
                                                             serialize=False):
@@ -821,27 +1736,20 @@ class OutputLogData(object):
                     ERROR_HANDLER.assert_true(set(t_obj) == self.Dat_Keys , \
                                 "Invalid data for o "+o+' and t '+t, __file__)
 
-        intersect_objective = set(self.data) & set(data_dict)
-        onlynew_objective = set(data_dict) - intersect_objective
         if not override_existing:
-            for objective in intersect_objective:
-                ERROR_HANDLER.assert_true(len(set(self.data[objective]) & \
-                                            set(data_dict[objective])) == 0, \
+            for objective in set(self._objectives) & set(data_dict):
+                existing = self._get_records(objective)
+                ERROR_HANDLER.assert_true(not np.isin(\
+                            [self._elems.get_id(e, self._NONE_ID) \
+                                    for e in data_dict[objective]], \
+                                                    existing['elem']).any(), \
                             "Override_existing not set but there is overlap", \
-                                                                    __file__)            
-        for objective in intersect_objective:
-            if ask_confirmation_with_exist_missing and \
-                                        len(set(self.data[objective]) & \
-                                            set(data_dict[objective])) != 0:
-                ERROR_HANDLER.assert_true(common_mix.confirm_execution(\
-                                            "Some values are existing, "
-                                            "do you confirm their override?"),\
-                             "Existing values were not overriden", __file__)
-            self.data[objective].update(self._mem_optimize_sub_dat(\
-                                                        data_dict[objective]))
-        for objective in onlynew_objective:
-            self.data[objective] = self._mem_optimize_sub_dat(\
-                                                        data_dict[objective])
+                                                                    __file__)
+        for objective, elem2dat in data_dict.items():
+            self._merge_records(objective, self._dict_to_records(elem2dat), \
+                                    override_existing=True, \
+                                    ask_confirmation_with_exist_missing=\
+                                        ask_confirmation_with_exist_missing)
         if serialize:
             self.serialize()
     #~ def add_data ()
@@ -850,23 +1758,538 @@ class OutputLogData(object):
                                 override_existing=False, \
                                 ask_confirmation_with_exist_missing=False, \
                                 serialize=False):
-        self.add_data(other_execoutput.data, check_all=False, \
-                                override_existing=override_existing, \
-                                ask_confirmation_with_exist_missing=\
-                                    ask_confirmation_with_exist_missing, \
-                                serialize=serialize)
+        self.set_fingerprint_mode(other_execoutput.fingerprint_mode)
+        # Map the element and hash ids of other into those of self
+        elem_map = np.array([self._elems.intern(e) \
+                            for e in other_execoutput._elems], dtype=np.int64)
+        hash_map = np.array([self._hashes.intern(h) \
+                        for h in other_execoutput._hashes] + [self._NONE_ID], \
+                                                            dtype=np.int64)
+        if not override_existing:
+            for objective in set(self._objectives) & \
+                                        set(other_execoutput._objectives):
+                other_elems = elem_map[\
+                        other_execoutput._get_records(objective)['elem']]
+                ERROR_HANDLER.assert_true(not np.isin(other_elems, \
+                                self._get_records(objective)['elem']).any(), \
+                            "Override_existing not set but there is overlap", \
+                                                                    __file__)
+        for objective in other_execoutput.get_objectives():
+            records = other_execoutput._get_records(objective).copy()
+            if len(records) > 0:
+                records['elem'] = elem_map[records['elem']]
+                # The None hash id (-1) maps to the last hash_map element
+                records['hash'] = hash_map[records['hash']]
+                records = np.sort(records, order='elem')
+            self._merge_records(objective, records, override_existing=True, \
+                                    ask_confirmation_with_exist_missing=\
+                                        ask_confirmation_with_exist_missing)
+        if serialize:
+            self.serialize()
     #~ def update_with_other_matrix()
 
     def serialize(self):
-        """ Serialize the matrix to its corresponding file if not None
+        """ Serialize the data to its corresponding file if not None.
+            The objectives not yet loaded are copied from the current file.
+            The file is written in a temporary file that then replaces it.
         """
-        if self.filename is not None:
-            common_fs.dumpJSON(self.data, self.filename, pretty=True)
+        if self.filename is None:
+            return
+        objectives = list(self._objectives)
+        index = []
+        offset = 0
+        for objective in objectives:
+            if self._objectives[objective] is None:
+                count = self._file_index[objective][1]
+            else:
+                count = len(self._objectives[objective])
+            index.append((objective, offset, count))
+            offset += count * self._RECORDS_DTYPE.itemsize
+        tmp_filename = self.filename + '.tmp'
+        with open(tmp_filename, 'wb') as fp:
+            data_start = self._write_header(fp, self._elems, self._hashes, \
+                                        index, self.fingerprint_mode)
+            for objective in objectives:
+                records = self._objectives[objective]
+                if records is None:
+                    records = self._read_records(objective)
+                fp.write(records.tobytes())
+        os.replace(tmp_filename, self.filename)
+        self._source_filename = self.filename
+        self._file_data_start = data_start
+        self._file_index = {o: (off, cnt) for o, off, cnt in index}
     #~ def serialize()
 
+    @classmethod
+    def _write_header(cls, fp, elems, hashes, index, fingerprint_mode):
+        """ Write the magic and the header of a binary file, before the
+            records, at the start of the file object fp. elems and hashes
+            are the tables (_InternTable), index is the list of 
+            (objective, offset, count).
+            :return: the position of the records
+        """
+        meta = json.dumps({
+                    'dtype': cls._RECORDS_DTYPE.descr,
+                    'fingerprint_mode': fingerprint_mode,
+                }).encode('utf-8')
+        objectives_index = np.array([(offset, count) \
+                                        for _, offset, count in index], \
+                                        dtype=cls._OBJECTIVES_INDEX_DTYPE)
+        fp.write(cls.FILE_MAGIC)
+        # The sizes of the tables are only known once written
+        fixed_position = fp.tell()
+        fp.write(bytes(cls._FIXED_HEADER_DTYPE.itemsize))
+        fp.write(meta)
+        fp.write(objectives_index.tobytes())
+        objectives_size = _InternTable([o for o, _, _ in index]).write(fp)
+        elems_size = elems.write(fp)
+        hashes_size = hashes.write(fp)
+        data_start = fp.tell()
+        fp.seek(fixed_position)
+        fp.write(np.array([(len(meta), len(index), objectives_size, \
+                            len(elems), elems_size, len(hashes), hashes_size)],\
+                                dtype=cls._FIXED_HEADER_DTYPE).tobytes())
+        fp.seek(data_start)
+        return data_start
+    #~ def _write_header()
+
     def get_store_filename(self):
         """ Get the name of the storing file
         """
         return self.filename
     #~ def get_store_filename()
 #~ class OutputLogData
+
+class MatricesStreamMerger(object):
+    '''
+        Memory bounded merge of matrices and output log data files (e.g.
+        those of the criteria tools into the global ones).
+
+        The sources are consumed one after the other, by chunks of rows
+        (matrices) or one objective at a time (output log data): no more
+        than one chunk of a source is in memory. The merged rows are
+        buffered and spilled to disk (appended to a temporary file)
+        whenever the buffer exceeds its share of the memory ceiling. The
+        merged file then replaces the output file, which may also be a
+        source (its data are then kept).
+
+        Each source is a pair (filename, key_transform) where key_transform
+        is a function applied to the keys (objectives) of the source, or
+        None. The transformed keys must be unique across the sources,
+        except for the output file when it is a source: its keys that are
+        in the other sources are replaced by the other sources' data. Thus
+        the merge is idempotent (e.g. when redone on resume, after an
+        interruption that followed the replacement of the output file).
+    '''
+    DEFAULT_MEMORY_CEILING_MB = 256
+    # Estimate of the memory size of a matrix cell in a dataframe (bytes)
+    _CELL_SIZE_ESTIMATE = 64
+
+    def __init__(self, memory_ceiling_mb=None):
+        if memory_ceiling_mb is None:
+            memory_ceiling_mb = self.DEFAULT_MEMORY_CEILING_MB
+        ERROR_HANDLER.assert_true(memory_ceiling_mb > 0, \
+                    "invalid memory ceiling: {}".format(memory_ceiling_mb), \
+                                                                    __file__)
+        # Half for the chunk read, half for the merged data buffer
+        self.buffer_max_bytes = int(memory_ceiling_mb * 1024 * 1024) // 2
+    #~ def __init__()
+
+    @staticmethod
+    def _is_output_source(filename, out_filename):
+        return os.path.abspath(filename) == os.path.abspath(out_filename)
+    #~ def _is_output_source()
+
+    def get_chunk_rows(self, n_columns):
+        """ Number of rows of a matrix chunk with n_columns columns
+        """
+        return max(1, self.buffer_max_bytes // \
+                            (max(1, n_columns) * self._CELL_SIZE_ESTIMATE))
+    #~ def get_chunk_rows()
+
+    def merge_matrices(self, sources, out_filename, \
+                                key_column_name=DEFAULT_KEY_COLUMN_NAME, \
+                                non_key_col_list=None):
+        """ Merge the rows of the source matrices files into out_filename.
+            The non key columns of the sources must be the same (the order
+            may differ), they are ordered as non_key_col_list in the output.
+            When non_key_col_list is None, the order of the first source 
+            is used.
+        """
+        # Import here since pandas is slow to load (see common_fs)
+        import pandas as pd
+        for filename, _ in sources:
+            ERROR_HANDLER.assert_true(os.path.isfile(filename), \
+                                "missing matrix file: "+filename, __file__)
+            columns = list(pd.read_csv(filename, sep=" ", index_col=False, \
+                                                                nrows=0))
+            ERROR_HANDLER.assert_true(columns[:1] == [key_column_name], \
+                                "mismatch on key column name", __file__)
+            if non_key_col_list is None:
+                non_key_col_list = columns[1:]
+            ERROR_HANDLER.assert_true(\
+                                set(columns[1:]) == set(non_key_col_list), \
+                                "mismatch on non key column names", __file__)
+        ERROR_HANDLER.assert_true(non_key_col_list is not None, \
+                        "non_key_col_list needed without source", __file__)
+        ordered_cols = [key_column_name] + list(non_key_col_list)
+
+        chunk_rows = self.get_chunk_rows(len(ordered_cols))
+        # The keys of the other sources, replacing those of the output
+        replaced_keys = set()
+        for filename, key_transform in sources:
+            if self._is_output_source(filename, out_filename):
+                continue
+            for chunk in pd.read_csv(filename, sep=" ", index_col=False, \
+                                        usecols=[key_column_name], \
+                                        dtype={key_column_name: str}, \
+                                        chunksize=chunk_rows):
+                keys = chunk[key_column_name]
+                if key_transform is not None:
+                    keys = keys.map(key_transform)
+                replaced_keys.update(keys)
+
+        tmp_filename = out_filename + '.merge.tmp'
+        buffered = []
+        buffered_bytes = 0
+        seen = set()
+        # write the header (also for an empty matrix)
+        pd.DataFrame({c: [] for c in ordered_cols})[ordered_cols].to_csv(\
+                                        tmp_filename, sep=" ", index=False)
+        for filename, key_transform in sources:
+            is_output = self._is_output_source(filename, out_filename)
+            for chunk in pd.read_csv(filename, sep=" ", index_col=False, \
+                                        dtype={key_column_name: str}, \
+                                        chunksize=chunk_rows):
+                chunk = chunk.reindex(columns=ordered_cols)
+                if key_transform is not None:
+                    chunk[key_column_name] = \
+                                    chunk[key_column_name].map(key_transform)
+                if is_output:
+                    chunk = chunk[~chunk[key_column_name].isin(replaced_keys)]
+                keys = chunk[key_column_name]
+                ERROR_HANDLER.assert_true(not keys.duplicated().any() and \
+                                not keys.isin(seen).any(), \
+                                "key in several sources (or repeated) in "+\
+                                                            filename, __file__)
+                seen.update(keys)
+                buffered.append(chunk)
+                buffered_bytes += int(chunk.memory_usage(deep=True).sum())
+                if buffered_bytes > self.buffer_max_bytes:
+                    self._spill_dataframes(buffered, tmp_filename)
+                    buffered, buffered_bytes = [], 0
+        self._spill_dataframes(buffered, tmp_filename)
+        os.replace(tmp_filename, out_filename)
+    #~ def merge_matrices()
+
+    @staticmethod
+    def _spill_dataframes(dataframes, filename):
+        for dataframe in dataframes:
+            dataframe.to_csv(filename, sep=" ", index=False, header=False, \
+                                                                    mode='a')
+    #~ def _spill_dataframes()
+
+    def merge_outlogs(self, sources, out_filename):
+        """ Merge the objectives of the source output log data files into
+            out_filename (binary format). A missing source file is empty.
+            The records are spilled to a temporary file, written after the
+            header (only known at the end) into the output file.
+            The hash tables of the sources are not loaded: the merged hash
+            table is made of the hashes of each source that are used by 
+            its merged records, streamed by chunks from the source files
+            (only a bit per hash is kept in memory). The element tables
+            (tests) are interned in memory.
+        """
+        # The objectives of the other sources, replacing those of the output
+        replaced_objectives = set()
+        for filename, key_transform in sources:
+            if not self._is_output_source(filename, out_filename):
+                for objective in OutputLogData(\
+                                        filename=filename).get_objectives():
+                    if key_transform is not None:
+                        objective = key_transform(objective)
+                    replaced_objectives.add(objective)
+        merged = OutputLogData()
+        index = []
+        offset = 0
+        seen = set()
+        spill_filename = out_filename + '.merge.spill'
+        buffered = []
+        buffered_bytes = 0
+        # Per source: number of records and bit packed mask of the used 
+        # hashes. The spilled records have the hash ids of their source
+        sources_records_count = []
+        sources_hashes_used = []
+        with open(spill_filename, 'wb') as spill_fp:
+            for filename, key_transform in sources:
+                is_output = self._is_output_source(filename, out_filename)
+                src = OutputLogData(filename=filename)
+                merged.set_fingerprint_mode(src.fingerprint_mode)
+                # Map the element ids of src into those of merged
+                elem_map = np.array([merged._elems.intern(e) \
+                                        for e in src._elems], dtype=np.int64)
+                hashes_used = np.zeros(len(src._hashes), dtype=bool)
+                records_count = 0
+                for objective in src.get_objectives():
+                    if is_output and (objective if key_transform is None \
+                                        else key_transform(objective)) in \
+                                                        replaced_objectives:
+                        continue
+                    if src._objectives[objective] is None:
+                        # Not cached in src
+                        records = src._read_records(objective)
+                    else:
+                        records = src._objectives[objective].copy()
+                    if len(records) > 0:
+                        records['elem'] = elem_map[records['elem']]
+                        records = np.sort(records, order='elem')
+                        hashes_used[records['hash'][records['hash'] != \
+                                            OutputLogData._NONE_ID]] = True
+                    if key_transform is not None:
+                        objective = key_transform(objective)
+                    ERROR_HANDLER.assert_true(objective not in seen, \
+                            "objective in several sources: "+str(objective),\
+                                                                    __file__)
+                    seen.add(objective)
+                    index.append((objective, offset, len(records)))
+                    offset += records.nbytes
+                    records_count += len(records)
+                    buffered.append(records)
+                    buffered_bytes += records.nbytes
+                    if buffered_bytes > self.buffer_max_bytes:
+                        for rec in buffered:
+                            spill_fp.write(rec.tobytes())
+                        buffered, buffered_bytes = [], 0
+                sources_records_count.append(records_count)
+                sources_hashes_used.append(np.packbits(hashes_used))
+                del src, hashes_used
+            for rec in buffered:
+                spill_fp.write(rec.tobytes())
+            del buffered
+
+        tmp_filename = out_filename + '.merge.tmp'
+        chunk_records = max(1, self.buffer_max_bytes // \
+                                        OutputLogData._RECORDS_DTYPE.itemsize)
+        with open(tmp_filename, 'wb') as fp:
+            hashes = _SelectedInternTables([\
+                        (OutputLogData(filename=filename)._hashes, used) \
+                                for (filename, _), used in \
+                                    zip(sources, sources_hashes_used)])
+            OutputLogData._write_header(fp, merged._elems, hashes, index, \
+                                                    merged.fingerprint_mode)
+            # Map the hash ids of each source into those of the merged table
+            hash_offset = 0
+            with open(spill_filename, 'rb') as spill_fp:
+                for (table, used), records_count in \
+                                        zip(hashes.tables_selections, \
+                                                    sources_records_count):
+                    used = np.unpackbits(used, \
+                                        count=len(table)).astype(bool)
+                    hash_map = np.append(hash_offset + np.cumsum(used) - 1, \
+                                            OutputLogData._NONE_ID)
+                    hash_offset += int(used.sum())
+                    del used
+                    while records_count > 0:
+                        records = np.fromfile(spill_fp, \
+                                        dtype=OutputLogData._RECORDS_DTYPE, \
+                                count=min(chunk_records, records_count))
+                        ERROR_HANDLER.assert_true(len(records) > 0, \
+                                "truncated spill file "+spill_filename, \
+                                                                    __file__)
+                        records_count -= len(records)
+                        # The None hash id (-1) maps to the last element
+                        records['hash'] = hash_map[records['hash']]
+                        fp.write(records.tobytes())
+        os.remove(spill_filename)
+        os.replace(tmp_filename, out_filename)
+    #~ def merge_outlogs()
+#~ class MatricesStreamMerger
+
+class ExecutionCostData(object):
+    '''
+        Resource usage cost of the execution of tests (elements) for each
+        objective (the program or the criteria elements such as mutants).
+        The data are aligned with the execution matrices: the objectives
+        are their rows and the tests their columns (see get_cost_matrix).
+
+        The cost of an execution is a dict with the keys:
+        - WALL_TIME: elapsed time (seconds),
+        - CPU_TIME: user and system CPU time of the executed processes 
+                (seconds),
+        - MAX_RSS: peak resident set size of the executed processes 
+                (kilobytes),
+        - IO_BLOCKS: number of file system input and output blocks.
+        A value is None when it could not be measured.
+
+        The storing file is JSON ({objective: {test: cost}}).
+    '''
+    WALL_TIME = "WALL_TIME"
+    CPU_TIME = "CPU_TIME"
+    MAX_RSS = "MAX_RSS"
+    IO_BLOCKS = "IO_BLOCKS"
+    Cost_Keys = (WALL_TIME, CPU_TIME, MAX_RSS, IO_BLOCKS)
+
+    @classmethod
+    def make_cost(cls, wall_time=None, cpu_time=None, max_rss=None, \
+                                                            io_blocks=None):
+        return {
+            cls.WALL_TIME: wall_time,
+            cls.CPU_TIME: cpu_time,
+            cls.MAX_RSS: max_rss,
+            cls.IO_BLOCKS: io_blocks,
+        }
+    #~ def make_cost()
+
+    @classmethod
+    def accumulate_cost(cls, total, cost):
+        """ Accumulate cost into total (updated): the times and blocks are 
+            summed and the peak memory is the maximum
+        """
+        for key in cls.Cost_Keys:
+            if cost[key] is None:
+                continue
+            if total[key] is None:
+                total[key] = cost[key]
+            elif key == cls.MAX_RSS:
+                total[key] = max(total[key], cost[key])
+            else:
+                total[key] += cost[key]
+        return total
+    #~ def accumulate_cost()
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.data = {}
+        if self.filename is not None and os.path.isfile(self.filename):
+            self.data = common_fs.loadJSON(self.filename)
+    #~ def __init__()
+
+    def is_empty(self):
+        return len(self.data) == 0
+    #~ def is_empty()
+
+    def get_objectives(self):
+        return list(self.data)
+    #~ def get_objectives()
+
+    def get_objective_data(self, objective):
+        """ Get the costs of an objective as dict {test: cost}
+        """
+        return self.data[objective]
+    #~ def get_objective_data()
+
+    def add_data(self, data_dict, override_existing=False, serialize=False):
+        """ Add the costs of data_dict ({objective: {test: cost}})
+        """
+        for objective, test2cost in data_dict.items():
+            for test, cost in test2cost.items():
+                ERROR_HANDLER.assert_true(set(cost) == set(self.Cost_Keys), \
+                        "Invalid cost for o "+objective+' and t '+test, \
+                                                                    __file__)
+            if not override_existing and objective in self.data:
+                ERROR_HANDLER.assert_true(\
+                        len(set(test2cost) & set(self.data[objective])) == 0,\
+                            "Override_existing not set but there is overlap", \
+                                                                    __file__)
+            self.data.setdefault(objective, {}).update(test2cost)
+        if serialize:
+            self.serialize()
+    #~ def add_data()
+
+    def update_with_other(self, other_costdata, key_transform=None, \
+                                override_existing=False, serialize=False):
+        """ Add the costs of other_costdata, with the objectives transformed
+            with the function key_transform if not None
+        """
+        if key_transform is None:
+            data = other_costdata.data
+        else:
+            data = {key_transform(o): v \
+                                    for o, v in other_costdata.data.items()}
+        self.add_data(data, override_existing=override_existing, \
+                                                        serialize=serialize)
+    #~ def update_with_other()
+
+    def get_cost_matrix(self, cost_key, non_key_col_list=None, \
+                                                                filename=None):
+        """ Get the matrix of the cost cost_key, with a row per objective 
+            and a column per test (those of non_key_col_list, all the
+            tests if None). The cells without cost are uncertain (-1).
+
+        Example:
+        >>> cdat = ExecutionCostData()
+        >>> cdat.add_data({'m1': {'t1': ExecutionCostData.make_cost(1.5), \\
+        ...                       't2': ExecutionCostData.make_cost(0.5)}, \\
+        ...                'm2': {'t2': ExecutionCostData.make_cost(2.0)}})
+        >>> mat = cdat.get_cost_matrix(ExecutionCostData.WALL_TIME)
+        >>> mat.get_nonkey_colname_list()
+        ['t1', 't2']
+        >>> mat._get_key_values_dict() == {'m1': {'t1': 1.5, 't2': 0.5}, \\
+        ...                                'm2': {'t1': -1.0, 't2': 2.0}}
+        True
+        """
+        ERROR_HANDLER.assert_true(cost_key in self.Cost_Keys, \
+                                "invalid cost key: "+str(cost_key), __file__)
+        if non_key_col_list is None:
+            non_key_col_list = sorted(set(itertools.chain.from_iterable(\
+                                                    self.data.values())))
+        uncertain = -1.0
+        matrix = RawExecutionMatrix(filename=filename, \
+                                        non_key_col_list=non_key_col_list, \
+                                        uncertain_cell_default_val=[uncertain],
+                                        cell_dtype=float)
+        # Import here since pandas is slow to load (see common_fs)
+        import pandas as pd
+        objectives = list(self.data)
+        columns = {matrix.get_key_colname(): objectives}
+        for test in non_key_col_list:
+            column = []
+            for objective in objectives:
+                cost = self.data[objective].get(test, None)
+                if cost is None or cost[cost_key] is None:
+                    column.append(uncertain)
+                else:
+                    column.append(float(cost[cost_key]))
+            columns[test] = column
+        matrix.dataframe = pd.DataFrame(columns)[\
+                                [matrix.get_key_colname()] + non_key_col_list]
+        matrix.dataframe = matrix.dataframe.astype(\
+                                    {test: float for test in non_key_col_list})
+        matrix.keys_set = set(objectives)
+        if filename is not None:
+            matrix.serialize()
+        return matrix
+    #~ def get_cost_matrix()
+
+    def get_most_expensive(self, cost_key, count=10, by_objective=False):
+        """ Get the count most expensive tests (or objectives when 
+            by_objective is True) w.r.t. cost_key, summed over the 
+            objectives (or tests).
+            :return: list of pairs (test or objective, total cost), 
+                        decreasing cost
+        """
+        ERROR_HANDLER.assert_true(cost_key in self.Cost_Keys, \
+                                "invalid cost key: "+str(cost_key), __file__)
+        totals = {}
+        for objective, test2cost in self.data.items():
+            for test, cost in test2cost.items():
+                if cost[cost_key] is None:
+                    continue
+                key = objective if by_objective else test
+                totals[key] = totals.get(key, 0) + cost[cost_key]
+        return sorted(totals.items(), key=lambda x: (-x[1], x[0]))[:count]
+    #~ def get_most_expensive()
+
+    def serialize(self):
+        """ Serialize the data to its corresponding file if not None
+        """
+        if self.filename is not None:
+            common_fs.dumpJSON(self.data, self.filename)
+    #~ def serialize()
+
+    def get_store_filename(self):
+        """ Get the name of the storing file
+        """
+        return self.filename
+    #~ def get_store_filename()
+#~ class ExecutionCostData
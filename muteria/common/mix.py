@@ -106,6 +106,23 @@ class GlobalConstants(object):
     FAIL_TEST_VERDICT = 1
 
     TEST_EXECUTION_ERROR = -1
+
+    # The test execution violated a sandbox resource limit (see
+    # muteria.drivers.sandbox.ResourceLimit). Considered as a failure, with
+    # a distinct verdict (and matrix value) per limit
+    MEMORY_LIMIT_TEST_VERDICT = 2
+
+    PIDS_LIMIT_TEST_VERDICT = 3
+
+    CPU_LIMIT_TEST_VERDICT = 4
+
+    DISK_LIMIT_TEST_VERDICT = 5
+
+    # In the order of muteria.drivers.sandbox.ResourceLimit
+    RESOURCE_LIMIT_TEST_VERDICTS = (MEMORY_LIMIT_TEST_VERDICT, \
+                                    PIDS_LIMIT_TEST_VERDICT, \
+                                    CPU_LIMIT_TEST_VERDICT, \
+                                    DISK_LIMIT_TEST_VERDICT)
     
     ELEMENT_UNCERTAIN_VERDICT = None
 
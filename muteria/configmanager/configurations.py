@@ -28,6 +28,7 @@ import logging
 import muteria.common.mix as common_mix 
 
 from muteria.drivers.testgeneration import TestToolType
+from muteria.drivers.testgeneration import OutlogFingerprintMode
 
 ERROR_HANDLER = common_mix.ErrorHandler
 
@@ -91,6 +92,13 @@ class CompleteConfiguration(object):
     # Decide whether to start over, deleting previous, for execution mode
     EXECUTION_CLEANSTART=False
 
+    # Decide whether to only re-execute the (test, criterion element) pairs
+    # affected by the source changes since the previous run (history 1),
+    # carrying forward the other results (see
+    # muteria.controller.incremental_analysis). A finished latest run is
+    # archived into history 1 before the new run
+    INCREMENTAL_ANALYSIS = False
+
     # Value of type SessionMode (Mandatory)
     RUN_MODE = None
 
@@ -108,8 +116,41 @@ class CompleteConfiguration(object):
     # Decides whether to hash the output log
     HASH_OUTLOG = True
 
+    # Record the resource usage cost (wall and CPU time, peak memory, IO)
+    # of each test execution (program and separated criteria elements)
+    GET_EXECUTION_COST_DATA = True
+
+    # Fingerprint used as hash of the output log (value of type 
+    # OutlogFingerprintMode). The non SHA512 modes are faster and smaller
+    # The mode is recorded in the output log data, the data of different
+    # modes are not compared (changing the mode requires new executions)
+    OUTLOG_FINGERPRINT_MODE = OutlogFingerprintMode.SHA512
+
+    # Verify that equal fingerprints come from equal outputs (non SHA512 modes)
+    # The check is per process: the outputs of different processes or runs
+    # (e.g. merged matrices) are not compared
+    OUTLOG_FINGERPRINT_COLLISION_CHECK = False
+
+    # Codec of the indexed archives of the mutants and tests (value of type
+    # common_fs.ArchiveCodec). The best available if None (ZSTD, LZ4, ZLIB)
+    ARCHIVE_CODEC = None
+
     # PARALELISM
     SINGLE_REPO_PARALLELISM = 1 # Max number of parallel exec in a repo dir
+    # Max number of parallel jobs for the code instrumentation (criteria
+    # tools instrumenting concurrently, mutants compiled concurrently)
+    INSTRUMENTATION_PARALLELISM = 1
+    # Max number of test generation tools running concurrently, total
+    # memory (MB, None: unbounded) given to the concurrent test generations
+    # (see TEST_GENERATION_MEMORY_ESTIMATE_MB of the tools) and maximum
+    # generation time of each tool (seconds, None: tool's configuration)
+    TEST_GENERATION_PARALLELISM = 1
+    TEST_GENERATION_MEMORY_BUDGET_MB = None
+    TEST_GENERATION_TIME_SLICE = None
+    # Memory ceiling (MB, None: default of 256) of the merge of the criteria
+    # tools' matrices and output logs into the global ones (the data are
+    # streamed by chunks and spilled to disk beyond the ceiling)
+    CRITERIA_MATRICES_MERGE_MEMORY_MB = None
 
     # MICRO CONTROLS
     EXECUTE_ONLY_CURENT_CHECKPOINT_META_TASK = False # for Debugging
@@ -123,6 +164,12 @@ class CompleteConfiguration(object):
     # Enable logging debug data
     LOG_DEBUG = False
 
+    # Query of the VIEW mode: dict of the arguments of
+    # muteria.controller.query_engine.ResultsQueryEngine.query, with
+    # 'rebuild_index' to force the rebuild of the query indexes. The
+    # results directory is printed when None
+    VIEW_QUERY = None
+
     #######################################################
     #######             Reporting Parameters         ######
     #######################################################
@@ -244,6 +291,19 @@ class CompleteConfiguration(object):
 
     TESTCASES_SELECTION = None
 
+    # Test prioritization strategies and their weights, ordering the tests
+    # of the tests execution and of the criteria tests execution (with the
+    # criteria optimizer PRIORITIZED). Example:
+    # >>> {PrioritizationStrategies.ADDITIONAL_COVERAGE: 1.0,
+    #      PrioritizationStrategies.EXECUTION_COST: 1.0}
+    # (see muteria.drivers.optimizers.testexecution.prioritization)
+    # When None, the tests execution is not prioritized and the criteria
+    # optimizer PRIORITIZED uses the default strategies
+    TESTCASES_PRIORITIZATION = None
+    # Changed code, for the DIFF_IMPACT prioritization strategy:
+    # {<source file>: <list of changed lines or None for all the lines>}
+    TESTCASES_PRIORITIZATION_CHANGED_CODE = None
+
     # Reporting
     REPORT_NUMBER_OF_TESTS_GENERATED = True
     REPORT_NUMBER_OF_DUPLICATED_TESTS = True
@@ -299,6 +359,12 @@ class CompleteConfiguration(object):
     CRITERIA_RESTRICTION_ENABLED = True  # Enable restricting mutation(scope)
 
     # criterion: selection tools. Example: SM and TCE or E-SELECTIVE
+    # The selection is a function (testobjectivelist, maxselcount),
+    # 'DummyRandom' or a CriteriaElementSelectionTechniques (or its name).
+    # Example:
+    # >>> {STRONG_MUTATION: CriteriaElementSelectionTechniques
+    #                                           .STRATIFIED_BY_OPERATOR}
+    # (see muteria.drivers.criteria.element_selection)
     CRITERIA_ELEM_SELECTIONS = {
         
     }
@@ -307,6 +373,18 @@ class CompleteConfiguration(object):
 
     MAX_CRITERIA_ELEM_SELECTION_NUM_PERCENT = '100%'
 
+    # Seed of the criteria elements selection (for reproducibility). When
+    # None, a random seed is used. The seed is recorded in the checkpoint
+    CRITERIA_ELEM_SELECTION_SEED = None
+
+    # Operators (mutant types) kept by the OPERATOR_BASED selection
+    CRITERIA_ELEM_SELECTION_OPERATORS = None
+
+    # Target width and confidence level of the confidence interval of the
+    # score, for the INCREMENTAL_SAMPLING criteria optimizer
+    CRITERIA_ELEM_SAMPLING_CI_WIDTH = 0.1
+    CRITERIA_ELEM_SAMPLING_CI_CONFIDENCE = 0.95
+
     # Criterion: guider dict. ex: {STRONG_MUTATION: Surviving}
     CRITERIA_TESTGEN_GUIDANCE = {
 
@@ -428,6 +506,9 @@ class TestcaseToolsConfig(BaseToolConfig):
     TEST_GENERATION_MAXTIME = 7200.0 # in seconds
     # time givn by the framework before sending alt signal
     TEST_GEN_TIMEOUT_FRAMEWORK_GRACE = 100 # in second
+    # Estimated peak memory used by the test generation, used to schedule
+    # the concurrent test generations (None: negligible)
+    TEST_GENERATION_MEMORY_ESTIMATE_MB = None
     ONE_TEST_EXECUTION_TIMEOUT = 60.0 # in seconds (Handle inifnite loops)
 
     # consider test execution error as a test failure
@@ -443,11 +524,30 @@ class TestcaseToolsConfig(BaseToolConfig):
     # Scaling factor to apply on recorded test execution time before using
     # as timeout on cosecutive executions
     RECORDED_TEST_TIMEOUT_FACTOR = 5
+
+    # Resource limits of each test execution (sandbox). None means no 
+    # limit. Each execution is placed in its own cgroup (v2) when available,
+    # otherwise the limits are set with rlimits. The executions violating
+    # a limit get the verdict of the limit (distinct matrix value per limit)
+    # - maximum memory in MB
+    TEST_EXECUTION_MEMORY_LIMIT_MB = None
+    # - maximum number of processes (and threads)
+    TEST_EXECUTION_MAX_PIDS = None
+    # - maximum CPU usage, as a number of CPUs (e.g. 0.5)
+    TEST_EXECUTION_CPU_QUOTA = None
+    # - maximum size in MB of the execution's private temporary directory
+    #   (TMPDIR), checked after the execution, and of each file written by
+    #   the execution anywhere (RLIMIT_FSIZE)
+    TEST_EXECUTION_DISK_QUOTA_MB = None
+    # Use the cgroups (v2) when available, rlimits otherwise
+    TEST_EXECUTION_SANDBOX_USE_CGROUPS = True
     
     def set_test_gen_maxtime(self, max_time):
         self.TEST_GENERATION_MAXTIME = max_time
     def set_test_gen_timeout_framework_grace(self, grace_time):
         self.TEST_GEN_TIMEOUT_FRAMEWORK_GRACE = grace_time
+    def set_test_gen_memory_estimate_mb(self, memory_mb):
+        self.TEST_GENERATION_MEMORY_ESTIMATE_MB = memory_mb
     def set_one_test_execution_timeout(self, timeout):
         self.ONE_TEST_EXECUTION_TIMEOUT = timeout
     def set_test_oracle_test(self, value):
@@ -458,16 +558,43 @@ class TestcaseToolsConfig(BaseToolConfig):
         self.OUTLOG_MAX_ALLOWED_BYTES_SIZE = value
     def set_recorded_test_timeout_factor(self, value):
         self.RECORDED_TEST_TIMEOUT_FACTOR = value
+    def set_test_execution_memory_limit_mb(self, value):
+        self.TEST_EXECUTION_MEMORY_LIMIT_MB = value
+    def set_test_execution_max_pids(self, value):
+        self.TEST_EXECUTION_MAX_PIDS = value
+    def set_test_execution_cpu_quota(self, value):
+        self.TEST_EXECUTION_CPU_QUOTA = value
+    def set_test_execution_disk_quota_mb(self, value):
+        self.TEST_EXECUTION_DISK_QUOTA_MB = value
+    def set_test_execution_sandbox_use_cgroups(self, value):
+        self.TEST_EXECUTION_SANDBOX_USE_CGROUPS = value
 #~class TestcaseToolsConfig
     
 class CriteriaToolsConfig(BaseToolConfig):
     SEPARATED_TEST_EXECUTION_EXTRA_TIMEOUT_TIMES = 1.5 # proportion
     META_TEST_EXECUTION_EXTRA_TIMEOUT_TIMES = 100.0 # proportion
+    # Execute the separately instrumented criteria elements (e.g. strong
+    # mutation mutants) with a single meta program (schemata) where the
+    # element is selected through an environment variable, forked from an
+    # initialized process when possible (the elements reached during the
+    # initialization are executed directly), instead of storing and
+    # swapping an executable per element. Tools without support ignore it
+    SEPARATED_CRITERIA_SCHEMATA_EXECUTION = False
+    # Detect the trivial compiler equivalence (TCE) of the separately
+    # compiled criteria elements (e.g. strong mutation mutants) by hashing
+    # their normalized executables. Only one element of each class of
+    # duplicates is executed, its results are fanned out to the others.
+    # Tools without support ignore it
+    SEPARATED_CRITERIA_TRIVIAL_COMPILER_EQUIVALENCE = True
     
     def set_separated_test_execution_extra_timeout_times(self, timeout_times):
         self.SEPARATED_TEST_EXECUTION_EXTRA_TIMEOUT_TIMES = timeout_times
     def set_meta_test_execution_extra_timeout_times(self, timeout_times):
         self.META_TEST_EXECUTION_EXTRA_TIMEOUT_TIMES = timeout_times
+    def set_separated_criteria_schemata_execution(self, value):
+        self.SEPARATED_CRITERIA_SCHEMATA_EXECUTION = value
+    def set_separated_criteria_trivial_compiler_equivalence(self, value):
+        self.SEPARATED_CRITERIA_TRIVIAL_COMPILER_EQUIVALENCE = value
 #~class CriteriaToolsConfig
 
 
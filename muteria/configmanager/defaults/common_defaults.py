@@ -11,6 +11,7 @@ from muteria.drivers.criteria import TestCriteria
 from muteria.drivers.criteria import CriteriaToolType
 
 from muteria.drivers.testgeneration import TestToolType
+from muteria.drivers.testgeneration import OutlogFingerprintMode
 
 
 #######################################################
@@ -24,6 +25,13 @@ from muteria.drivers.testgeneration import TestToolType
 # Decide whether to start over, deleting previous, for execution mode
 EXECUTION_CLEANSTART=False
 
+# Decide whether to only re-execute the (test, criterion element) pairs
+# affected by the source changes since the previous run (history 1),
+# carrying forward the other results (see
+# muteria.controller.incremental_analysis). A finished latest run is
+# archived into history 1 before the new run
+INCREMENTAL_ANALYSIS = False
+
 # Value of type SessionMode (Mandatory)
 RUN_MODE = None
 
@@ -41,8 +49,41 @@ CRITERIA_WITH_OUTPUT_SUMMARY = []
 # Decides whether to hash the output log
 HASH_OUTLOG = True
 
+# Record the resource usage cost (wall and CPU time, peak memory, IO)
+# of each test execution (program and separated criteria elements)
+GET_EXECUTION_COST_DATA = True
+
+# Fingerprint used as hash of the output log (value of type 
+# OutlogFingerprintMode). The non SHA512 modes are faster and smaller
+# The mode is recorded in the output log data, the data of different
+# modes are not compared (changing the mode requires new executions)
+OUTLOG_FINGERPRINT_MODE = OutlogFingerprintMode.SHA512
+
+# Verify that equal fingerprints come from equal outputs (non SHA512 modes)
+# The check is per process: the outputs of different processes or runs
+# (e.g. merged matrices) are not compared
+OUTLOG_FINGERPRINT_COLLISION_CHECK = False
+
+# Codec of the indexed archives of the mutants and tests (value of type
+# common_fs.ArchiveCodec). The best available if None (ZSTD, LZ4, ZLIB)
+ARCHIVE_CODEC = None
+
 # PARALELISM
 SINGLE_REPO_PARALLELISM = 1 # Max number of parallel exec in a repo dir
+# Max number of parallel jobs for the code instrumentation (criteria
+# tools instrumenting concurrently, mutants compiled concurrently)
+INSTRUMENTATION_PARALLELISM = 1
+# Max number of test generation tools running concurrently, total
+# memory (MB, None: unbounded) given to the concurrent test generations
+# (see TEST_GENERATION_MEMORY_ESTIMATE_MB of the tools) and maximum
+# generation time of each tool (seconds, None: tool's configuration)
+TEST_GENERATION_PARALLELISM = 1
+TEST_GENERATION_MEMORY_BUDGET_MB = None
+TEST_GENERATION_TIME_SLICE = None
+# Memory ceiling (MB, None: default of 256) of the merge of the criteria
+# tools' matrices and output logs into the global ones (the data are
+# streamed by chunks and spilled to disk beyond the ceiling)
+CRITERIA_MATRICES_MERGE_MEMORY_MB = None
 
 # MICRO CONTROLS
 EXECUTE_ONLY_CURENT_CHECKPOINT_META_TASK = False # for Debugging
@@ -56,6 +97,12 @@ OUTPUT_ROOT_DIR = None
 # Enable logging debug data
 LOG_DEBUG = False
 
+# Query of the VIEW mode: dict of the arguments of
+# muteria.controller.query_engine.ResultsQueryEngine.query, with
+# 'rebuild_index' to force the rebuild of the query indexes. The
+# results directory is printed when None
+VIEW_QUERY = None
+
 #######################################################
 #######             Reporting Parameters         ######
 #######################################################
@@ -177,6 +224,19 @@ TESTCASE_TOOLS_CONFIGS = [
 
 TESTCASES_SELECTION = None
 
+# Test prioritization strategies and their weights, ordering the tests
+# of the tests execution and of the criteria tests execution (with the
+# criteria optimizer PRIORITIZED). Example:
+# >>> {PrioritizationStrategies.ADDITIONAL_COVERAGE: 1.0,
+#      PrioritizationStrategies.EXECUTION_COST: 1.0}
+# (see muteria.drivers.optimizers.testexecution.prioritization)
+# When None, the tests execution is not prioritized and the criteria
+# optimizer PRIORITIZED uses the default strategies
+TESTCASES_PRIORITIZATION = None
+# Changed code, for the DIFF_IMPACT prioritization strategy:
+# {<source file>: <list of changed lines or None for all the lines>}
+TESTCASES_PRIORITIZATION_CHANGED_CODE = None
+
 # Reporting
 REPORT_NUMBER_OF_TESTS_GENERATED = True
 REPORT_NUMBER_OF_DUPLICATED_TESTS = True
@@ -232,6 +292,12 @@ TESTCASE_TOOLALIASES_TO_SKIP_CRITERIA_COVERAGE = []
 CRITERIA_RESTRICTION_ENABLED = True  # Enable restricting mutation(scope)
 
 # criterion: selection tools. Example: SM and TCE or E-SELECTIVE
+# The selection is a function (testobjectivelist, maxselcount),
+# 'DummyRandom' or a CriteriaElementSelectionTechniques (or its name).
+# Example:
+# >>> {STRONG_MUTATION: CriteriaElementSelectionTechniques
+#                                           .STRATIFIED_BY_OPERATOR}
+# (see muteria.drivers.criteria.element_selection)
 CRITERIA_ELEM_SELECTIONS = {
 
 }
@@ -240,6 +306,18 @@ ONLY_EXECUTE_SELECTED_CRITERIA_ELEM = True
 
 MAX_CRITERIA_ELEM_SELECTION_NUM_PERCENT = '100%'
 
+# Seed of the criteria elements selection (for reproducibility). When
+# None, a random seed is used. The seed is recorded in the checkpoint
+CRITERIA_ELEM_SELECTION_SEED = None
+
+# Operators (mutant types) kept by the OPERATOR_BASED selection
+CRITERIA_ELEM_SELECTION_OPERATORS = None
+
+# Target width and confidence level of the confidence interval of the
+# score, for the INCREMENTAL_SAMPLING criteria optimizer
+CRITERIA_ELEM_SAMPLING_CI_WIDTH = 0.1
+CRITERIA_ELEM_SAMPLING_CI_CONFIDENCE = 0.95
+
 # Criterion: guider dict. ex: {STRONG_MUTATION: Surviving}
 CRITERIA_TESTGEN_GUIDANCE = {
 
@@ -18,8 +18,6 @@ from __future__ import print_function
 import logging
 import collections
 
-import networkx
-
 import muteria.common.mix as common_mix
 
 ERROR_HANDLER = common_mix.ErrorHandler
@@ -128,6 +126,9 @@ class TaskOrderingDependency(object):
     #~ def get_as_json_object()
 
     def export_graph(self, graph_out_filename):
+        # Import here since networkx is slow to load and rarely needed
+        import networkx
+
         graph = networkx.Graph()
         # add nodes
         for key_t in Tasks:
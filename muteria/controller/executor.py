@@ -5,6 +5,7 @@ TODO: Add support for multi versions of results
 from __future__ import print_function
 
 import os 
+import time
 import logging
 import shutil
 import glob
@@ -15,24 +16,31 @@ import inspect
 
 import muteria.common.mix as common_mix
 import muteria.common.fs as common_fs
+import muteria.common.matrices as common_matrices
 
 from muteria.repositoryandcode.repository_manager import RepositoryManager
 from muteria.repositoryandcode.code_builds_factory import CodeBuildsFactory
 
 from muteria.drivers import DriversUtils
 from muteria.drivers.testgeneration import TestToolType
+from muteria.drivers.testgeneration import OutlogFingerprinter
 from muteria.drivers.testgeneration.meta_testcasetool import MetaTestcaseTool
 import muteria.drivers.criteria as criteria_pkg
 from muteria.drivers.criteria.meta_testcriteriatool import MetaCriteriaTool
+from muteria.drivers.criteria.element_selection import \
+                                                    CriteriaElementSelector
 
 import muteria.drivers.optimizers.criteriatestexecution.optimizerdefs as \
                                                                 crit_opt_module
+import muteria.drivers.optimizers.testexecution.optimizerdefs as \
+                                                                test_opt_module
 
 from muteria.statistics.main import StatsComputer
 
 import muteria.controller.explorer as outdir_struct
 import muteria.controller.logging_setup as logging_setup
 import muteria.controller.checkpoint_tasks as checkpoint_tasks
+from muteria.controller.incremental_analysis import IncrementalAnalysis
 
 ERROR_HANDLER = common_mix.ErrorHandler
 
@@ -44,10 +52,12 @@ class CheckpointData(dict):
     #~ def __init__()
 
     def update_all(self, tasks_obj, test_types, test_types_pos, \
-                                criteria_set, criteria_set_pos):
+                                criteria_set, criteria_set_pos, \
+                                criteria_elem_selection=None):
         self.update_tasks_obj(tasks_obj)
         self.update_test_types(test_types_pos, test_types)
         self.update_criteria_set(criteria_set_pos, criteria_set)
+        self.update_criteria_elem_selection(criteria_elem_selection)
     #~ def update_all()
 
     def get_json_obj(self):
@@ -117,6 +127,14 @@ class CheckpointData(dict):
         self.criteria_set = criteria_set
         self.criteria_set_pos = criteria_set_pos
     #~ def update_criteria_set()
+
+    def update_criteria_elem_selection(self, criteria_elem_selection):
+        """ :param criteria_elem_selection: record of the criteria elements
+                selection (seed and selection by criterion), for
+                reproducibility
+        """
+        self.criteria_elem_selection = criteria_elem_selection
+    #~ def update_criteria_elem_selection()
 #~ class CheckpointData
 
 class Executor(object):
@@ -132,20 +150,28 @@ class Executor(object):
         self.top_timeline_explorer = top_timeline_explorer
 
         self.head_explorer = self.top_timeline_explorer.get_latest_explorer()
+        # Incremental analysis: a new run starts after a finished one
+        if self.config.INCREMENTAL_ANALYSIS.get_val():
+            self._archive_finished_latest()
         # Initialize output structure
         self._initialize_output_structure(cleanstart=\
                                 self.config.EXECUTION_CLEANSTART.get_val())
         if not logging_setup.is_setup():
+            run_id = "{}-{}".format(time.strftime("%Y%m%d%H%M%S"), \
+                                                                os.getpid())
+            logfile = self.head_explorer.get_file_pathname(\
+                                                outdir_struct.MAIN_LOG_FILE)
+            json_logfile = self.head_explorer.get_file_pathname(\
+                                            outdir_struct.MAIN_JSON_LOG_FILE)
             if self.config.LOG_DEBUG.get_val():
                 logging_setup.setup(file_level=logging.DEBUG, \
                             console_level=logging.DEBUG, \
-                            logfile=self.head_explorer.get_file_pathname(\
-                                                outdir_struct.MAIN_LOG_FILE))
+                            logfile=logfile, json_logfile=json_logfile, \
+                            run_id=run_id)
                 logging.debug("Logging Debug Level")
             else:
-                logging_setup.setup(\
-                            logfile=self.head_explorer.get_file_pathname(\
-                                                outdir_struct.MAIN_LOG_FILE))
+                logging_setup.setup(logfile=logfile, \
+                            json_logfile=json_logfile, run_id=run_id)
         # Create repo manager
         # XXX The repo manager automatically revert any previous problem
         self.repo_mgr = Executor.create_repo_manager(config)
@@ -229,6 +255,19 @@ class Executor(object):
                         criteria_set=None,\
                         criteria_set_pos=None)
             self.checkpointer.write_checkpoint(self.cp_data.get_json_obj())
+            # Record the sources (for the next incremental analysis)
+            self.head_explorer.remove_file_and_get(\
+                                    outdir_struct.INCREMENTAL_ANALYSIS_INFO)
+            IncrementalAnalysis.save_source_snapshot(self.head_explorer, \
+                                self.repo_mgr.get_repository_dir_path(), \
+                                            self.repo_mgr.source_files_list)
+
+        # Incremental analysis w.r.t. the previous run
+        self.incremental_analysis = None
+        if self.config.INCREMENTAL_ANALYSIS.get_val():
+            self.incremental_analysis = IncrementalAnalysis.create(\
+                                            self.top_timeline_explorer, \
+                                    self.repo_mgr.get_repository_dir_path())
 
         # Ensure that the repository exe and obj are in default state
         self.cb_factory.set_repo_to_build_default()
@@ -302,7 +341,8 @@ class Executor(object):
                 
                 # 3. execute the tasks  (TODO: parallelism)
                 for task in task_set:
-                    self._execute_task(task)
+                    with logging_setup.log_context(task=task.get_str()):
+                        self._execute_task(task)
 
                 # (Break flow)
                 if self.config.EXECUTE_ONLY_CURENT_CHECKPOINT_META_TASK.\
@@ -567,7 +607,13 @@ class Executor(object):
             # Generate the tests without criteria instrumented
             self.meta_testcase_tool.generate_tests(\
                             meta_criteria_tool_obj=None, \
-                            test_tool_type_list=self.cp_data.test_types)
+                            test_tool_type_list=self.cp_data.test_types, \
+                            parallel_testgen_count=self.config.\
+                                        TEST_GENERATION_PARALLELISM.get_val(), \
+                            testgen_memory_budget_mb=self.config.\
+                                    TEST_GENERATION_MEMORY_BUDGET_MB.get_val(), \
+                            testgen_time_slice=self.config.\
+                                        TEST_GENERATION_TIME_SLICE.get_val())
 
             # @Checkpointing
             self.cp_data.tasks_obj.set_task_completed(task)
@@ -590,7 +636,13 @@ class Executor(object):
             # Generate the tests using criteria
             self.meta_testcase_tool.generate_tests(\
                             meta_criteria_tool_obj=self.meta_criteria_tool, \
-                            test_tool_type_list=self.cp_data.test_types)
+                            test_tool_type_list=self.cp_data.test_types, \
+                            parallel_testgen_count=self.config.\
+                                        TEST_GENERATION_PARALLELISM.get_val(), \
+                            testgen_memory_budget_mb=self.config.\
+                                    TEST_GENERATION_MEMORY_BUDGET_MB.get_val(), \
+                            testgen_time_slice=self.config.\
+                                        TEST_GENERATION_TIME_SLICE.get_val())
 
             # @Checkpointing
             self.cp_data.tasks_obj.set_task_completed(task)
@@ -631,11 +683,21 @@ class Executor(object):
             sel_tech = self.config.TESTCASES_SELECTION.get_val()
             # selection method
             if inspect.isfunction(sel_tech):
-                ERROR_HANDLER.assert_true(\
-                                    len(inspect.getargspec(sel_tech).args) == 2, \
+                ERROR_HANDLER.assert_true(len(\
+                                inspect.getfullargspec(sel_tech).args) == 2, \
                                     "Test selection function must take 2 args "
                                     "(testlist, maxselcount)", __file__)
                 
+            elif sel_tech is None and \
+                            self.meta_testexec_optimization_tool is not None:
+                # order the tests with the prioritization
+                def sel_tech(testlist, maxselcount):
+                    self.meta_testexec_optimization_tool.reset(None, \
+                                testlist, test_execution_times=\
+                                    self.meta_testcase_tool\
+                                        .get_recorded_test_execution_times())
+                    return self.meta_testexec_optimization_tool\
+                                .select_tests(maxselcount, is_proportion=False)
             else:
                 if sel_tech is not None and sel_tech != 'DummyRandom':
                     ERROR_HANDLER.error_exit(\
@@ -645,16 +707,23 @@ class Executor(object):
                 sel_tech = random.sample
 
             # make selection
-            selected_tests = sel_tech(selected_tests, len(selected_tests))
+            if len(selected_tests) > 0:
+                selected_tests = sel_tech(selected_tests, len(selected_tests))
 
-            # Check for flakiness
+            # Check for flakiness (of the tests to execute)
             logging.debug("# Checking for tests flakiness ...")
+            flakiness_candidates = selected_tests
+            if self.incremental_analysis is not None:
+                flakiness_candidates = self.incremental_analysis\
+                                        .get_tests_to_execute(selected_tests)
             flaky_tests = self.meta_testcase_tool.check_get_flakiness(\
-                                                                selected_tests)
+                                                        flakiness_candidates)
             if len(flaky_tests) > 0:
                 if self.config.DISCARD_FLAKY_TESTS.get_val():
-                    selected_tests = \
-                                list(set(selected_tests) - set(flaky_tests))
+                    # keep the order of the selection
+                    flaky_tests = set(flaky_tests)
+                    selected_tests = [t for t in selected_tests \
+                                                    if t not in flaky_tests]
                 else:
                     ERROR_HANDLER.error_exit("There are Flaky tests!!", \
                                                                     __file__)
@@ -688,6 +757,15 @@ class Executor(object):
                                                            execoutput_file_key)
             else:
                 execoutput_file = None
+
+            if self.config.GET_EXECUTION_COST_DATA.get_val():
+                # Make sure that the exec cost dir exists
+                self.head_explorer.get_or_create_and_get_dir(\
+                                    outdir_struct.RESULTS_EXECUTION_COSTS_DIR)
+                cost_file = self.head_explorer.get_file_pathname(\
+                                    outdir_struct.PROGRAM_TESTEXECUTION_COST)
+            else:
+                cost_file = None
                                     
             # @Checkpointing
             if task_untouched:
@@ -708,18 +786,47 @@ class Executor(object):
 
             meta_testcases = common_fs.loadJSON(test_list_file)
 
+            # Incremental analysis: only execute the affected tests
+            carried_tests = []
+            if self.incremental_analysis is not None:
+                exec_tests = self.incremental_analysis.get_tests_to_execute(\
+                                                                meta_testcases)
+                carried_tests = [t for t in meta_testcases \
+                                                    if t not in set(exec_tests)]
+                meta_testcases = exec_tests
+
             # Check pass fail
-            self.meta_testcase_tool.runtests(meta_testcases=meta_testcases, \
+            if len(meta_testcases) > 0 or self.incremental_analysis is None:
+                self.meta_testcase_tool.runtests(\
+                        meta_testcases=meta_testcases, \
                         stop_on_failure=\
                                 self.config.STOP_TESTS_EXECUTION_ON_FAILURE\
                                                                 .get_val(), \
                         recalculate_execution_times=True, \
                         fault_test_execution_matrix_file=matrix_file, \
                         fault_test_execution_execoutput_file=execoutput_file, \
+                        fault_test_execution_cost_file=cost_file, \
                         test_prioritization_module=\
                                         self.meta_testexec_optimization_tool, \
                         parallel_test_count=None, \
                         finish_destroy_checkpointer=False)
+
+            if self.incremental_analysis is not None:
+                prev_matrix_file = self.incremental_analysis\
+                        .get_previous_file(outdir_struct.TEST_PASS_FAIL_MATRIX)
+                prev_execoutput_file = None
+                if execoutput_file is not None:
+                    prev_execoutput_file = self.incremental_analysis\
+                                            .get_previous_file(outdir_struct\
+                                                .PROGRAM_TESTEXECUTION_OUTPUT)
+                prev_keys = common_matrices.ExecutionMatrix(\
+                                    filename=prev_matrix_file).get_keys()
+                self.incremental_analysis.carry_forward(\
+                                IncrementalAnalysis.PASSFAIL_NAME, \
+                                matrix_file, prev_matrix_file, \
+                                {k: k for k in prev_keys}, carried_tests, \
+                                outlog_file=execoutput_file, \
+                                prev_outlog_file=prev_execoutput_file)
             
             # @Checkpointing
             self.cp_data.tasks_obj.set_task_completed(task)
@@ -746,6 +853,8 @@ class Executor(object):
             if self.config.ENABLED_CRITERIA.get_val():
                 self.meta_criteria_tool.instrument_code(criteria_enabled_list=\
                                     self.config.ENABLED_CRITERIA.get_val(), \
+                                    parallel_count=self.config.\
+                                        INSTRUMENTATION_PARALLELISM.get_val(), \
                                     finish_destroy_checkpointer=False)
 
             # @Checkpointing
@@ -774,6 +883,17 @@ class Executor(object):
 
             if self.config.ENABLED_CRITERIA.get_val():
 
+                # @Checkpointing: reuse the recorded seed when re-executing
+                seed = self.config.CRITERIA_ELEM_SELECTION_SEED.get_val()
+                if seed is None and self.cp_data.criteria_elem_selection \
+                                                                is not None:
+                    seed = self.cp_data.criteria_elem_selection['seed']
+                selector = CriteriaElementSelector(seed=seed, operators=\
+                        self.config.CRITERIA_ELEM_SELECTION_OPERATORS.get_val())
+                sel_record = {'seed': selector.get_seed(), 'criteria': {}}
+                self.cp_data.update_criteria_elem_selection(sel_record)
+                self.checkpointer.write_checkpoint(self.cp_data.get_json_obj())
+
                 selected_TO = {crit.get_str(): None \
                             for crit in self.config.ENABLED_CRITERIA.get_val()}
                 for crit, sel_tech in \
@@ -783,6 +903,8 @@ class Executor(object):
                     if info_obj is None:
                         continue
                     all_to = info_obj.get_elements_list()
+                    if len(all_to) == 0:
+                        continue
                     
                     sel_count = self.config\
                             .MAX_CRITERIA_ELEM_SELECTION_NUM_PERCENT.get_val()
@@ -809,25 +931,36 @@ class Executor(object):
 
                     # selection method
                     if inspect.isfunction(sel_tech):
-                        ERROR_HANDLER.assert_true(\
-                                        len(inspect.getargspec().args) == 2, \
+                        ERROR_HANDLER.assert_true(len(\
+                                inspect.getfullargspec(sel_tech).args) == 2, \
                                         "Selection function must take 2 args "
                                         "(testobjectivelist, maxselcount)", \
                                             __file__)
-                        
+                        selected_TO[crit.get_str()] = \
+                                                sel_tech(all_to, sel_count)
+                        tech_name = sel_tech.__name__
                     else:
-                        if sel_tech != 'DummyRandom':
-                            ERROR_HANDLER.error_exit(\
-                                'only random TO selection supported now!', \
-                                                                    __file__)
-                        # make DummyRandom selection
-                        sel_tech = random.sample
-
-                    # make selection
-                    selected_TO[crit.get_str()] = sel_tech(all_to, sel_count)
+                        matrix_key = outdir_struct.CRITERIA_MATRIX[crit]
+                        matrix_file = None
+                        if self.head_explorer.file_exists(matrix_key):
+                            matrix_file = \
+                                self.head_explorer.get_file_pathname(matrix_key)
+                        selected_TO[crit.get_str()] = selector.select(\
+                                        sel_tech, all_to, sel_count, \
+                                        info_obj=info_obj, \
+                                        matrix_file=matrix_file, \
+                                        rng_salt=crit.get_str())
+                        tech_name = selector.get_technique(sel_tech).get_str()
+
+                    sel_record['criteria'][crit.get_str()] = {
+                        'technique': tech_name,
+                        'total': len(all_to),
+                        'selected': len(selected_TO[crit.get_str()]),
+                    }
                 
                 # write down selection
                 common_fs.dumpJSON(selected_TO, out_file)
+                self.cp_data.update_criteria_elem_selection(sel_record)
             # @Checkpointing
             self.cp_data.tasks_obj.set_task_completed(task)
             self.checkpointer.write_checkpoint(self.cp_data.get_json_obj())
@@ -861,6 +994,15 @@ class Executor(object):
                 else:
                     execoutput_files[criterion] = None
 
+            cost_files = None
+            if self.config.GET_EXECUTION_COST_DATA.get_val():
+                # Make sure that the exec cost dir exists
+                self.head_explorer.get_or_create_and_get_dir(\
+                                    outdir_struct.RESULTS_EXECUTION_COSTS_DIR)
+                cost_files = {c: self.head_explorer.get_file_pathname(\
+                                    outdir_struct.CRITERIA_EXECUTION_COST[c]) \
+                            for c in self.config.ENABLED_CRITERIA.get_val()}
+
             # @Checkpointing
             if task_untouched:
                 if self.meta_criteria_tool.has_checkpointer():
@@ -944,8 +1086,17 @@ class Executor(object):
                     #       The same goes for after the matrix is written to 
                     #       'update_matrix_to_cover_when_difference'
 
+                    # Incremental analysis: only execute the affected pairs
+                    incremental_plan = None
+                    if self.incremental_analysis is not None:
+                        incremental_plan = self._get_incremental_criteria_plan(\
+                                        criteria_set, meta_testcases, \
+                                                    used_crit_TO_list_by_crit)
+                        meta_testcases = incremental_plan['exec_tests']
+
                     # XXX execute
-                    self.meta_criteria_tool.runtests_criteria_coverage( \
+                    if len(meta_testcases) > 0 or incremental_plan is None:
+                        self.meta_criteria_tool.runtests_criteria_coverage( \
                                 testcases=meta_testcases, \
                                 criterion_to_matrix=criterion_to_matrix, \
                                 criterion_to_executionoutput=\
@@ -956,7 +1107,13 @@ class Executor(object):
                                     COVER_CRITERIA_ELEMENTS_ONCE.get_val(),\
                                 prioritization_module_by_criteria=\
                                     self.meta_criteriaexec_optimization_tools,\
-                                finish_destroy_checkpointer=True)
+                                finish_destroy_checkpointer=True, \
+                                criterion_to_executioncost=cost_files)
+
+                    if incremental_plan is not None:
+                        self._execute_incremental_criteria_plan(\
+                                        incremental_plan, criterion_to_matrix, \
+                                                    criterion_to_execoutput)
 
                     # Update matrix if needed to have output diff or such
                     for crit in criteria_set & set(self.config\
@@ -1114,6 +1271,10 @@ class Executor(object):
     #~ def create_repo_manager()
 
     def _create_meta_test_tool(self, config, head_explorer):
+        outlog_fingerprinter = OutlogFingerprinter(\
+                            mode=config.OUTLOG_FINGERPRINT_MODE.get_val(), \
+                            collision_check=\
+                            config.OUTLOG_FINGERPRINT_COLLISION_CHECK.get_val())
         # create and return the metatest_tool
         meta_test_tool = MetaTestcaseTool(\
                         language=config.PROGRAMMING_LANGUAGE.get_val(),\
@@ -1123,7 +1284,9 @@ class Executor(object):
                         test_tool_config_list=\
                                     config.TESTCASE_TOOLS_CONFIGS.get_val(),\
                         head_explorer=head_explorer, \
-                        hash_outlog=config.HASH_OUTLOG.get_val())
+                        hash_outlog=config.HASH_OUTLOG.get_val(), \
+                        outlog_fingerprinter=outlog_fingerprinter, \
+                        archive_codec=config.ARCHIVE_CODEC.get_val())
         return meta_test_tool
     #~ def _create_meta_test_tool()
 
@@ -1140,7 +1303,9 @@ class Executor(object):
                                         self.head_explorer.get_dir_pathname(\
                                             outdir_struct.CRITERIA_WORKDIR),\
                     code_builds_factory=self.cb_factory,
-                    tools_config_by_criterion_dict=criterion2toolconf,)
+                    tools_config_by_criterion_dict=criterion2toolconf,
+                    merge_memory_ceiling_mb=\
+                            config.CRITERIA_MATRICES_MERGE_MEMORY_MB.get_val())
         return meta_criteria_tool
     #~ def _create_meta_criteria_tool()
 
@@ -1152,9 +1317,10 @@ class Executor(object):
     #~ def _create_meta_testgen_guidance()
 
     def _create_meta_testexec_optimization(self, config):
-        # TODO
-        #ERROR_HANDLER.error_exit("To be implemented", __file__)
         teo_tool = None
+        if config.TESTCASES_PRIORITIZATION.get_val() is not None:
+            teo_tool = test_opt_module.TestOptimizers.PRIORITIZED\
+                            .get_optimizer()(config, self.head_explorer)
         return teo_tool
     #~ def _create_meta_testexec_optimization()
 
@@ -1195,6 +1361,142 @@ class Executor(object):
             self.head_explorer.get_or_create_and_get_dir(folder)
     #~ def _initialize_output_structure()
 
+    def _archive_finished_latest(self):
+        """ Archive the latest run into history 1 when it is finished, so
+            that the new run is analyzed incrementally w.r.t. it
+        """
+        if not self.head_explorer.file_exists(outdir_struct.EXECUTION_STATE):
+            return
+        if len(self.config.RE_EXECUTE_FROM_CHECKPOINT_META_TASKS.get_val()) \
+                                                                        > 0:
+            return
+        if not common_fs.CheckpointState(\
+                            *self._get_checkpoint_files()).is_finished():
+            return
+        self.top_timeline_explorer.archive_latest()
+        self.head_explorer = self.top_timeline_explorer.get_latest_explorer()
+    #~ def _archive_finished_latest()
+
+    def _get_incremental_criteria_plan(self, criteria_set, meta_testcases, \
+                                                        crit_TO_list_by_crit):
+        """ Split the criteria execution into the cells to execute and the
+            cells carried forward from the previous run
+            :return: dict with the tests to execute on all the elements
+                    ('exec_tests'), the carried forward tests
+                    ('carried_tests'), the map of the carried forward
+                    elements by criterion ('elem_maps') and the elements 
+                    to execute with the carried forward tests by 
+                    criterion ('partial_elems')
+        """
+        inc = self.incremental_analysis
+        elem_maps = {}
+        partial_elems = {}
+        prev_columns = {}
+        for criterion in criteria_set:
+            prev_matrix_file = inc.get_previous_file(\
+                                    outdir_struct.CRITERIA_MATRIX[criterion])
+            if prev_matrix_file is None:
+                # Nothing to carry forward, execute all
+                return {'exec_tests': meta_testcases, 'carried_tests': [], \
+                                    'elem_maps': {}, 'partial_elems': {}}
+            prev_matrix = common_matrices.ExecutionMatrix(\
+                                                    filename=prev_matrix_file)
+            prev_columns[criterion] = set(\
+                                        prev_matrix.get_nonkey_colname_list())
+            info_obj = self.meta_criteria_tool.get_criterion_info_object(\
+                                                                    criterion)
+            prev_info_obj = None
+            if info_obj is not None:
+                prev_info_file = inc.get_previous_pathname(\
+                    self.meta_criteria_tool.get_criterion_info_file(criterion))
+                if os.path.isfile(prev_info_file):
+                    prev_info_obj = type(info_obj)()
+                    prev_info_obj.load_from_file(prev_info_file)
+            elem_maps[criterion] = inc.map_elements(prev_matrix.get_keys(), \
+                                info_obj=info_obj, prev_info_obj=prev_info_obj)
+            if info_obj is not None:
+                elements = None
+                if crit_TO_list_by_crit is not None:
+                    elements = crit_TO_list_by_crit.get(criterion, None)
+                if elements is None:
+                    elements = info_obj.get_elements_list()
+                elements_set = set(elements)
+                elem_maps[criterion] = {e: o for e, o in \
+                        elem_maps[criterion].items() if e in elements_set}
+                partial_elems[criterion] = [e for e in elements \
+                                            if e not in elem_maps[criterion]]
+
+        carried_tests = [t for t in meta_testcases if all(\
+                                inc.is_test_carried(t, prev_columns[c]) \
+                                                    for c in criteria_set)]
+        carried_set = set(carried_tests)
+        return {
+            'exec_tests': [t for t in meta_testcases if t not in carried_set],
+            'carried_tests': carried_tests,
+            'elem_maps': elem_maps,
+            'partial_elems': partial_elems,
+        }
+    #~ def _get_incremental_criteria_plan()
+
+    def _execute_incremental_criteria_plan(self, plan, criterion_to_matrix, \
+                                                    criterion_to_execoutput):
+        """ Execute the carried forward tests on the affected elements and
+            carry forward the other cells (see _get_incremental_criteria_plan)
+        """
+        if len(plan['elem_maps']) == 0:
+            return
+        partial_matrix = {}
+        partial_execoutput = {}
+        partial_elems = {}
+        for criterion, elems in plan['partial_elems'].items():
+            partial_matrix[criterion] = self.head_explorer.remove_file_and_get(\
+                        outdir_struct.PARTIAL_TMP_CRITERIA_MATRIX[criterion])
+            partial_execoutput[criterion] = None
+            if criterion_to_execoutput[criterion] is not None:
+                partial_execoutput[criterion] = \
+                                    self.head_explorer.remove_file_and_get(\
+                                        outdir_struct\
+                            .PARTIAL_TMP_CRITERIA_EXECUTION_OUTPUT[criterion])
+            if len(elems) > 0:
+                partial_elems[criterion] = elems
+        if len(partial_elems) > 0 and len(plan['carried_tests']) > 0:
+            self.meta_criteria_tool.runtests_criteria_coverage( \
+                            testcases=plan['carried_tests'], \
+                            criterion_to_matrix={c: partial_matrix[c] \
+                                                    for c in partial_elems}, \
+                            criterion_to_executionoutput=\
+                                            {c: partial_execoutput[c] \
+                                                    for c in partial_elems}, \
+                            criteria_element_list_by_criteria=partial_elems,
+                            cover_criteria_elements_once=self.config.\
+                                    COVER_CRITERIA_ELEMENTS_ONCE.get_val(),\
+                            prioritization_module_by_criteria=\
+                                    self.meta_criteriaexec_optimization_tools,\
+                            finish_destroy_checkpointer=True)
+
+        for criterion, elem_map in plan['elem_maps'].items():
+            prev_execoutput_file = None
+            if criterion_to_execoutput[criterion] is not None:
+                prev_execoutput_file = self.incremental_analysis\
+                                .get_previous_file(outdir_struct\
+                                    .CRITERIA_EXECUTION_OUTPUT[criterion])
+            self.incremental_analysis.carry_forward(criterion.get_str(), \
+                    criterion_to_matrix[criterion], \
+                    self.incremental_analysis.get_previous_file(\
+                                    outdir_struct.CRITERIA_MATRIX[criterion]), \
+                    elem_map, plan['carried_tests'], \
+                    outlog_file=criterion_to_execoutput[criterion], \
+                    prev_outlog_file=prev_execoutput_file, \
+                    partial_matrix_file=partial_matrix.get(criterion, None), \
+                    partial_outlog_file=partial_execoutput.get(criterion, \
+                                                                    None), \
+                    infer_inactive=(criterion not in plan['partial_elems']))
+            for f in (partial_matrix.get(criterion, None), \
+                                    partial_execoutput.get(criterion, None)):
+                if f is not None and os.path.isfile(f):
+                    os.remove(f)
+    #~ def _execute_incremental_criteria_plan()
+
     def _get_checkpoint_files(self):
         cp_file = self.head_explorer.get_file_pathname(\
                                         outdir_struct.EXECUTION_STATE)
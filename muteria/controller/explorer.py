@@ -22,6 +22,7 @@ TESTSCASES_WORKDIR = "testscases_workdir"
 RESULTS_DATA_DIR = "RESULTS_DATA"
 RESULTS_MATRICES_DIR = "matrices"
 RESULTS_TESTEXECUTION_OUTPUTS_DIR = "testexecution_outputs"
+RESULTS_EXECUTION_COSTS_DIR = "execution_costs"
 RESULTS_STATS_DIR = "statistics"
 OTHER_COPIED_RESULTS = "other_copied_results"
 
@@ -32,6 +33,7 @@ CTRL_CHECKPOINT_DIR = "checkpoint_states"
 CTRL_LOGS_DIR = "logs"
 
 EXECUTION_TMP_DIR = "execution_tmp"
+QUERY_INDEX_DIR = "query_index"
 
 # Files
 ## CONSTANTS
@@ -40,6 +42,9 @@ EXECUTION_STATE = "execution_state"
 EXECUTION_STATE_BAKUP = "execution_state" + ".bak"
 EXECUTION_TIMES = "execution_times"
 MAIN_LOG_FILE = "ctrl_log.log"
+MAIN_JSON_LOG_FILE = "ctrl_log.jsonl"
+SOURCE_SNAPSHOT = "source_snapshot.json"
+INCREMENTAL_ANALYSIS_INFO = "incremental_analysis.json"
 
 TEST_PASS_FAIL_MATRIX = "PASSFAIL.csv"
 CRITERIA_MATRIX = {}
@@ -61,21 +66,29 @@ for criterion in TestCriteria:
 TMP_SELECTED_TESTS_LIST = "tmp_selected_test.json"
 TMP_SELECTED_CRITERIA_OBJECTIVES_LIST = "tmp_selected_criteria_objectives.json"
 
-# OUTPUT Hashed
-PROGRAM_TESTEXECUTION_OUTPUT = "program_output.json" 
-TMP_PROGRAM_TESTEXECUTION_OUTPUT = "tmp_program_output.json" 
-PARTIAL_TMP_PROGRAM_TESTEXECUTION_OUTPUT = "partial_tmp_program_output.json"
+# OUTPUT Hashed (binary format of OutputLogData, older versions used JSON)
+PROGRAM_TESTEXECUTION_OUTPUT = "program_output.mutolog"
+TMP_PROGRAM_TESTEXECUTION_OUTPUT = "tmp_program_output.mutolog"
+PARTIAL_TMP_PROGRAM_TESTEXECUTION_OUTPUT = \
+                                        "partial_tmp_program_output.mutolog"
 CRITERIA_EXECUTION_OUTPUT = {}
 for criterion in TestCriteria:
-    CRITERIA_EXECUTION_OUTPUT[criterion] = criterion.get_str()+"_output.json"
+    CRITERIA_EXECUTION_OUTPUT[criterion] = \
+                                    criterion.get_str()+"_output.mutolog"
 TMP_CRITERIA_EXECUTION_OUTPUT = {}
 for criterion in TestCriteria:
     TMP_CRITERIA_EXECUTION_OUTPUT[criterion] = \
-                                    "tmp_"+criterion.get_str()+"_output.json"
+                                "tmp_"+criterion.get_str()+"_output.mutolog"
 PARTIAL_TMP_CRITERIA_EXECUTION_OUTPUT = {}
 for criterion in TestCriteria:
     PARTIAL_TMP_CRITERIA_EXECUTION_OUTPUT[criterion] = \
-                            "partial_tmp_"+criterion.get_str()+"_output.json"
+                        "partial_tmp_"+criterion.get_str()+"_output.mutolog"
+
+# Execution costs (resource usage)
+PROGRAM_TESTEXECUTION_COST = "program_cost.json"
+CRITERIA_EXECUTION_COST = {}
+for criterion in TestCriteria:
+    CRITERIA_EXECUTION_COST[criterion] = criterion.get_str()+"_cost.json"
 # ---------------------------------------------------------
 
 def get_outputdir_structure_by_filesdirs():
@@ -94,13 +107,16 @@ def get_outputdir_structure_by_filesdirs():
         RESULTS_MATRICES_DIR: [RESULTS_DATA_DIR, RESULTS_MATRICES_DIR],
         RESULTS_TESTEXECUTION_OUTPUTS_DIR: [RESULTS_DATA_DIR, \
                                             RESULTS_TESTEXECUTION_OUTPUTS_DIR],
+        RESULTS_EXECUTION_COSTS_DIR: [RESULTS_DATA_DIR, \
+                                                RESULTS_EXECUTION_COSTS_DIR],
         RESULTS_STATS_DIR: [RESULTS_DATA_DIR, RESULTS_STATS_DIR],
         OTHER_COPIED_RESULTS: [RESULTS_DATA_DIR, OTHER_COPIED_RESULTS],
         CB_FACTORY_WORKDIR: [CB_FACTORY_WORKDIR],
         CONTROLLER_DATA_DIR: [CONTROLLER_DATA_DIR],
         CTRL_CHECKPOINT_DIR: [CONTROLLER_DATA_DIR, CTRL_CHECKPOINT_DIR],
         CTRL_LOGS_DIR: [CONTROLLER_DATA_DIR, CTRL_LOGS_DIR],
-        EXECUTION_TMP_DIR: [CONTROLLER_DATA_DIR, EXECUTION_TMP_DIR]
+        EXECUTION_TMP_DIR: [CONTROLLER_DATA_DIR, EXECUTION_TMP_DIR],
+        QUERY_INDEX_DIR: [CONTROLLER_DATA_DIR, QUERY_INDEX_DIR]
     }
 
     # Files
@@ -116,6 +132,13 @@ def get_outputdir_structure_by_filesdirs():
                                         + [EXECUTION_TIMES]
     TopExecutionDir[MAIN_LOG_FILE] = TopExecutionDir[CTRL_LOGS_DIR] \
                                         + [MAIN_LOG_FILE]
+    TopExecutionDir[MAIN_JSON_LOG_FILE] = TopExecutionDir[CTRL_LOGS_DIR] \
+                                        + [MAIN_JSON_LOG_FILE]
+    TopExecutionDir[SOURCE_SNAPSHOT] = TopExecutionDir[CONTROLLER_DATA_DIR] \
+                                        + [SOURCE_SNAPSHOT]
+    TopExecutionDir[INCREMENTAL_ANALYSIS_INFO] = \
+                                    TopExecutionDir[RESULTS_DATA_DIR] \
+                                                + [INCREMENTAL_ANALYSIS_INFO]
 
     TopExecutionDir[TEST_PASS_FAIL_MATRIX] = \
                 TopExecutionDir[RESULTS_MATRICES_DIR] + [TEST_PASS_FAIL_MATRIX]
@@ -155,6 +178,14 @@ def get_outputdir_structure_by_filesdirs():
         TopExecutionDir[PARTIAL_TMP_CRITERIA_EXECUTION_OUTPUT[criterion]] = \
                                     TopExecutionDir[EXECUTION_TMP_DIR] + \
                             [PARTIAL_TMP_CRITERIA_EXECUTION_OUTPUT[criterion]]
+    # Execution costs
+    TopExecutionDir[PROGRAM_TESTEXECUTION_COST] = \
+                    TopExecutionDir[RESULTS_EXECUTION_COSTS_DIR] + \
+                                                [PROGRAM_TESTEXECUTION_COST]
+    for criterion in TestCriteria:
+        TopExecutionDir[CRITERIA_EXECUTION_COST[criterion]] = \
+                        TopExecutionDir[RESULTS_EXECUTION_COSTS_DIR] + \
+                                        [CRITERIA_EXECUTION_COST[criterion]]
     
     TopExecutionDir[TMP_SELECTED_TESTS_LIST] = \
                 TopExecutionDir[EXECUTION_TMP_DIR] + [TMP_SELECTED_TESTS_LIST]
@@ -0,0 +1,565 @@
+""" Change impact driven incremental re-analysis across timeline histories.
+
+    The source files of the repository are recorded (SOURCE_SNAPSHOT) at
+    the start of each run. In the incremental analysis, the sources are
+    compared with those of the previous run (history 1):
+    - The changed lines are mapped onto the tests through the statement
+        coverage matrix of the previous run. A test is affected when it
+        covered a changed line. When a change has no executable line
+        (insertion, comment, brace...), the nearest executable lines
+        before and after the change are used.
+    - The criteria elements are mapped onto the elements of the previous
+        run through their location: the file and line in the element name
+        (<tool>:<file>:<line>..., as the gcov elements), or the signature
+        of the mutants, since the mutation tools renumber the mutants
+        across runs. The signature of a mutant is made of its tool, type,
+        function and source locations (mutant_srclocs of the info object,
+        with the columns), and of its IR positions in its function
+        (IRPosInFunc) when the mutants of the function are the same in
+        both runs (unchanged function). An element is affected when it is
+        located on a changed line, when its location or its previous
+        result cannot be found, or when its signature is not unique.
+    Only the pairs (test, element) where the test or the element is
+    affected are re-executed. The other cells of the matrices (and the
+    corresponding outputs) are carried forward from the previous run.
+
+    The analysis is recorded in the results (INCREMENTAL_ANALYSIS_INFO):
+    the changed lines, the affected tests and, for each matrix, the cells
+    carried forward (the 'rows', mapped to the previous run's rows, times
+    the 'tests'). When the criterion elements are only known after the
+    execution (coverage), the rows that are not carried forward are set
+    inactive for the carried forward tests (an unaffected test does not
+    reach the changed code). These cells are recorded as
+    'inferred_inactive'.
+
+    All the tests are affected when a source file is added or removed,
+    or when a changed file has no line in the previous statement coverage
+    matrix. The tests are assumed deterministic and unchanged (a test
+    with the same name in both runs is the same test).
+"""
+
+from __future__ import print_function
+
+import os
+import bisect
+import difflib
+import collections
+import hashlib
+import logging
+
+import muteria.common.fs as common_fs
+import muteria.common.mix as common_mix
+import muteria.common.matrices as common_matrices
+
+from muteria.drivers import DriversUtils
+from muteria.drivers.criteria import TestCriteria
+
+import muteria.controller.explorer as outdir_struct
+
+ERROR_HANDLER = common_mix.ErrorHandler
+
+class FileDiff(object):
+    """ Changed lines of a source file between the previous (old) and the
+        current (new) versions. The lines are numbered from 1.
+    """
+    def __init__(self, old_lines, new_lines):
+        self.changed_old = set()
+        self.changed_new = set()
+        self.old2new = {}
+        self.new2old = {}
+        # pairs (start, end) of the changed old lines (0-based, end
+        # excluded). start == end for an insertion before the line start+1
+        self.hunks = []
+        matcher = difflib.SequenceMatcher(None, old_lines, new_lines, \
+                                                            autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                for k in range(i2 - i1):
+                    self.old2new[i1 + k + 1] = j1 + k + 1
+                    self.new2old[j1 + k + 1] = i1 + k + 1
+            else:
+                self.changed_old.update(range(i1 + 1, i2 + 1))
+                self.changed_new.update(range(j1 + 1, j2 + 1))
+                self.hunks.append((i1, i2))
+    #~ def __init__()
+
+    def get_old_lines_of_hunk(self, hunk, executable_lines):
+        """ :param executable_lines: sorted list of the executable old lines
+            :return: the executable old lines of the hunk, or the nearest
+                    ones before and after the hunk when it has none
+        """
+        start, end = hunk
+        lo = bisect.bisect_left(executable_lines, start + 1)
+        hi = bisect.bisect_left(executable_lines, end + 1)
+        if hi > lo:
+            return executable_lines[lo:hi]
+        lines = []
+        if lo > 0:
+            lines.append(executable_lines[lo - 1])
+        if hi < len(executable_lines):
+            lines.append(executable_lines[hi])
+        return lines
+    #~ def get_old_lines_of_hunk()
+#~ class FileDiff
+
+class IncrementalAnalysis(object):
+    """ Incremental analysis of the latest run w.r.t. the previous run.
+        Use `create` to get an object (None when there is no previous
+        run to use).
+    """
+    # Matrix name of the pass fail matrix in the recorded information
+    PASSFAIL_NAME = "PASSFAIL"
+
+    def __init__(self, head_explorer, prev_explorer, repository_rootdir):
+        self.head_explorer = head_explorer
+        self.prev_explorer = prev_explorer
+        self.repository_rootdir = repository_rootdir
+
+        self.old_files = common_fs.loadJSON(prev_explorer\
+                .get_existing_file_pathname(outdir_struct.SOURCE_SNAPSHOT))
+        self.new_files = common_fs.loadJSON(head_explorer\
+                .get_existing_file_pathname(outdir_struct.SOURCE_SNAPSHOT))
+
+        self.added_files = sorted(set(self.new_files) - set(self.old_files))
+        self.removed_files = sorted(set(self.old_files) - \
+                                                        set(self.new_files))
+        self.file_diffs = {}
+        for fname in sorted(set(self.old_files) & set(self.new_files)):
+            old_dat = self.old_files[fname]
+            new_dat = self.new_files[fname]
+            if old_dat['hash'] != new_dat['hash']:
+                self.file_diffs[fname] = FileDiff(old_dat['lines'], \
+                                                            new_dat['lines'])
+
+        self.prev_tests = set(common_matrices.ExecutionMatrix(\
+                        filename=prev_explorer.get_existing_file_pathname(\
+                                    outdir_struct.TEST_PASS_FAIL_MATRIX))\
+                                                .get_nonkey_colname_list())
+
+        # Recorded information (reloaded when resuming)
+        info_file = self.head_explorer.get_file_pathname(\
+                                        outdir_struct.INCREMENTAL_ANALYSIS_INFO)
+        if os.path.isfile(info_file):
+            self.info = common_fs.loadJSON(info_file)
+        else:
+            self.info = self._compute_info()
+            self._write_info()
+        self.affected_tests = set(self.info['affected_tests'])
+    #~ def __init__()
+
+    @classmethod
+    def create(cls, top_timeline_explorer, repository_rootdir):
+        """ :return: the incremental analysis object, or None when the
+                    previous run (history 1) is missing or incomplete
+        """
+        head_explorer = top_timeline_explorer.get_latest_explorer()
+        if len(top_timeline_explorer.explorer_list) < 2:
+            logging.info("incremental analysis: no previous run, "
+                                                        "full analysis")
+            return None
+        prev_explorer = top_timeline_explorer.get_explorer_list(1)
+        for explorer, fkey in ((prev_explorer, \
+                                        outdir_struct.SOURCE_SNAPSHOT), \
+                        (prev_explorer, outdir_struct.TEST_PASS_FAIL_MATRIX), \
+                        (head_explorer, outdir_struct.SOURCE_SNAPSHOT)):
+            if not explorer.file_exists(fkey):
+                logging.info("incremental analysis: missing {} in {}, "
+                                "full analysis".format(fkey, \
+                                explorer.get_dir_pathname(\
+                                        outdir_struct.TOP_OUTPUT_DIR_KEY)))
+                return None
+        return cls(head_explorer, prev_explorer, repository_rootdir)
+    #~ def create()
+
+    @staticmethod
+    def save_source_snapshot(explorer, repository_rootdir, source_files):
+        """ Record the content of the source files (relative paths)
+        """
+        snapshot = {}
+        for fname in source_files:
+            fname = os.path.normpath(fname)
+            abs_path = os.path.join(repository_rootdir, fname)
+            if not os.path.isfile(abs_path):
+                continue
+            with open(abs_path, 'rb') as fp:
+                content = fp.read()
+            snapshot[fname] = {
+                'hash': hashlib.sha1(content).hexdigest(),
+                'lines': content.decode('utf-8', 'replace').splitlines(),
+            }
+        common_fs.dumpJSON(snapshot, explorer.get_file_pathname(\
+                                outdir_struct.SOURCE_SNAPSHOT), atomic=True)
+    #~ def save_source_snapshot()
+
+    def _write_info(self):
+        common_fs.dumpJSON(self.info, self.head_explorer.get_file_pathname(\
+                                    outdir_struct.INCREMENTAL_ANALYSIS_INFO), \
+                                                    pretty=True, atomic=True)
+    #~ def _write_info()
+
+    def _compute_info(self):
+        changed = {}
+        for fname, diff in self.file_diffs.items():
+            changed[fname] = {'old_lines': sorted(diff.changed_old), \
+                                        'new_lines': sorted(diff.changed_new)}
+        affected, reason = self._compute_affected_tests()
+        logging.info("incremental analysis: {} changed files, {} of {} "
+                    "tests affected".format(len(changed) + \
+                        len(self.added_files) + len(self.removed_files), \
+                                    len(affected), len(self.prev_tests)))
+        return {
+            'previous_run': os.path.basename(self.prev_explorer\
+                            .get_dir_pathname(\
+                                        outdir_struct.TOP_OUTPUT_DIR_KEY)),
+            'changed_files': changed,
+            'added_files': self.added_files,
+            'removed_files': self.removed_files,
+            'all_tests_affected_reason': reason,
+            'affected_tests': sorted(affected),
+            'matrices': {},
+        }
+    #~ def _compute_info()
+
+    def _compute_affected_tests(self):
+        """ :return: pair of the affected tests of the previous run and the
+                    reason when all the tests are affected (else None)
+        """
+        if len(self.added_files) + len(self.removed_files) > 0:
+            return self.prev_tests, "added or removed source files"
+        if len(self.file_diffs) == 0:
+            return set(), None
+        cov_key = outdir_struct.CRITERIA_MATRIX[TestCriteria.STATEMENT_COVERAGE]
+        if not self.prev_explorer.file_exists(cov_key):
+            return self.prev_tests, "no previous statement coverage matrix"
+        view = common_matrices.ExecutionMatrix(filename=self.prev_explorer\
+                                .get_existing_file_pathname(cov_key)).get_view()
+        # executable lines of the changed files
+        line_rows = {}
+        for pos, row_key in enumerate(view.get_row_keys()):
+            loc = self.parse_location(\
+                            DriversUtils.reverse_meta_element(row_key)[1], \
+                                                                self.old_files)
+            if loc is not None and loc[0] in self.file_diffs \
+                                                    and loc[1] is not None:
+                line_rows.setdefault(loc[0], {})\
+                                            .setdefault(loc[1], []).append(pos)
+        rows = []
+        for fname, diff in self.file_diffs.items():
+            if fname not in line_rows:
+                return self.prev_tests, \
+                                "no previous coverage of changed "+fname
+            executable_lines = sorted(line_rows[fname])
+            for hunk in diff.hunks:
+                for line in diff.get_old_lines_of_hunk(hunk, \
+                                                            executable_lines):
+                    rows.extend(line_rows[fname][line])
+        if len(rows) == 0:
+            return set(), None
+        # uncertain cells are considered as covered
+        reached = (view.active[rows, :] | view.uncertain[rows, :]).any(axis=0)
+        return set(c for c, r in zip(view.get_col_names(), reached) if r), \
+                                                                        None
+    #~ def _compute_affected_tests()
+
+    def parse_location(self, location, files):
+        """ :param files: the source files (dict) of the version
+            :return: tuple (file, line, pos) where pos is the position of
+                    the line in the location split by ':'. line and pos are
+                    None when the location only has the file. None when
+                    the file is not found.
+
+            Example: 'src/a.c:12:3' -> ('src/a.c', 12, 1)
+        """
+        parts = str(location).split(':')
+        for pos in range(len(parts), 0, -1):
+            fname = ':'.join(parts[:pos])
+            if os.path.isabs(fname):
+                fname = os.path.relpath(fname, self.repository_rootdir)
+            fname = os.path.normpath(fname)
+            if fname in files:
+                if pos < len(parts) and parts[pos].isdigit():
+                    return fname, int(parts[pos]), pos
+                return fname, None, None
+        return None
+    #~ def parse_location()
+
+    def has_changes(self):
+        return len(self.file_diffs) + len(self.added_files) + \
+                                                len(self.removed_files) > 0
+    #~ def has_changes()
+
+    def is_test_carried(self, test, prev_columns=None):
+        """ Whether the results of the test are carried forward (the test
+            is not affected and was executed in the previous run)
+            :param prev_columns: the tests of the previous matrix (the
+                    previous pass fail matrix when None)
+        """
+        if prev_columns is None:
+            prev_columns = self.prev_tests
+        return test not in self.affected_tests and test in prev_columns
+    #~ def is_test_carried()
+
+    def get_tests_to_execute(self, tests):
+        """ :return: the tests (in the order of tests) to re-execute
+        """
+        return [t for t in tests if not self.is_test_carried(t)]
+    #~ def get_tests_to_execute()
+
+    def get_previous_pathname(self, pathname):
+        """ :return: the pathname, in the previous run's directory, of a
+                    pathname in the latest run's directory
+        """
+        head_top = self.head_explorer.get_dir_pathname(\
+                                            outdir_struct.TOP_OUTPUT_DIR_KEY)
+        prev_top = self.prev_explorer.get_dir_pathname(\
+                                            outdir_struct.TOP_OUTPUT_DIR_KEY)
+        return os.path.join(prev_top, os.path.relpath(pathname, head_top))
+    #~ def get_previous_pathname()
+
+    def get_previous_file(self, file_key):
+        """ :return: the pathname of the file in the previous run, None if
+                    it does not exist
+        """
+        if self.prev_explorer.file_exists(file_key):
+            return self.prev_explorer.get_existing_file_pathname(file_key)
+        return None
+    #~ def get_previous_file()
+
+    def map_elements(self, prev_elements, info_obj=None, \
+                                                        prev_info_obj=None):
+        """ Map the unaffected elements onto the previous run's elements.
+            :param prev_elements: the elements of the previous run
+            :param info_obj: the criterion's info object of the latest
+                    run. When not None, the elements are mutants, matched
+                    by their signature (see _get_mutants_signatures), and
+                    the previous run's info object is needed. Else, the
+                    elements are located by their name, which is mapped
+                    onto the latest run's lines.
+            :return: dict of the unaffected elements of the latest run to
+                    their previous run's elements
+        """
+        if info_obj is not None:
+            if prev_info_obj is None:
+                return {}
+            return self._map_mutants(prev_elements, info_obj, prev_info_obj)
+        elem_map = {}
+        for old_elem in prev_elements:
+            toolalias, elem = DriversUtils.reverse_meta_element(old_elem)
+            loc = self.parse_location(elem, self.old_files)
+            if loc is None:
+                # Not located, only unaffected without any change
+                if not self.has_changes():
+                    elem_map[old_elem] = old_elem
+                continue
+            fname, line, pos = loc
+            if fname not in self.new_files:
+                continue
+            if line is None:
+                # Same name in the same file (function)
+                elem_map[old_elem] = old_elem
+                continue
+            new_line = self._get_new_line(fname, line)
+            if new_line is None:
+                continue
+            parts = elem.split(':')
+            parts[pos] = str(new_line)
+            elem_map[DriversUtils.make_meta_element(':'.join(parts), \
+                                                toolalias)] = old_elem
+        return elem_map
+    #~ def map_elements()
+
+    def _get_mutants_signatures(self, elements, info_obj, is_old):
+        """ :param is_old: whether the elements are of the previous run,
+                    their lines are then mapped onto the latest run's lines
+            :return: dict of the elements, that are located on unchanged
+                    lines, to their function (tool, file, function name),
+                    location signature (type and source locations, with
+                    the columns) and IR positions in the function
+        """
+        files = self.old_files if is_old else self.new_files
+        signatures = {}
+        for elem in elements:
+            if not info_obj.has_element(elem):
+                continue
+            dat = info_obj.get_element_data(elem)
+            srclocs = dat.get('mutant_srclocs', None)
+            if not isinstance(srclocs, (list, tuple)):
+                srclocs = [] if srclocs is None else [srclocs]
+            locs = []
+            for srcloc in srclocs:
+                loc = self.parse_location(srcloc, files)
+                if loc is None:
+                    break
+                fname, line, pos = loc
+                if is_old:
+                    line = self._get_new_line(fname, line)
+                    if line is None and loc[1] is not None \
+                                            or fname not in self.new_files:
+                        break
+                columns = '' if pos is None else \
+                                    ':'.join(str(srcloc).split(':')[pos+1:])
+                locs.append((fname, line, columns))
+            if len(locs) == 0 or len(locs) != len(srclocs):
+                continue
+            ir_pos = dat.get('IRPosInFunc', None)
+            if isinstance(ir_pos, list):
+                ir_pos = tuple(ir_pos)
+            toolalias, _ = DriversUtils.reverse_meta_element(elem)
+            signatures[elem] = ((toolalias, locs[0][0], \
+                                    dat.get('mutant_function_name', None)), \
+                                    (dat.get('mutant_type', None), \
+                                                    tuple(locs)), ir_pos)
+        return signatures
+    #~ def _get_mutants_signatures()
+
+    def _map_mutants(self, prev_elements, info_obj, prev_info_obj):
+        """ Map the mutants with the same unique signature in both runs.
+            The IR positions are part of the signature in the unchanged
+            functions (same signatures and IR positions in both runs)
+        """
+        old_sigs = self._get_mutants_signatures(prev_elements, \
+                                                prev_info_obj, is_old=True)
+        new_sigs = self._get_mutants_signatures(\
+                    info_obj.get_elements_list(), info_obj, is_old=False)
+        func_muts = {}
+        for pos, sigs in enumerate((old_sigs, new_sigs)):
+            for func, loc_sig, ir_pos in sigs.values():
+                if func not in func_muts:
+                    func_muts[func] = (collections.Counter(), \
+                                                    collections.Counter())
+                func_muts[func][pos][(loc_sig, ir_pos)] += 1
+        unchanged_funcs = set(f for f, (o, n) in func_muts.items() if o == n)
+
+        by_sig = collections.defaultdict(lambda: ([], []))
+        for pos, sigs in enumerate((old_sigs, new_sigs)):
+            for elem, (func, loc_sig, ir_pos) in sigs.items():
+                if func in unchanged_funcs:
+                    by_sig[(func, loc_sig, ir_pos)][pos].append(elem)
+                else:
+                    by_sig[(func, loc_sig)][pos].append(elem)
+        elem_map = {}
+        for old_elems, new_elems in by_sig.values():
+            # A mutant with a non unique signature is affected
+            if len(old_elems) == 1 and len(new_elems) == 1:
+                elem_map[new_elems[0]] = old_elems[0]
+        return elem_map
+    #~ def _map_mutants()
+
+    def _get_new_line(self, fname, old_line):
+        """ :return: the latest run's line of the unchanged old line, None
+                    if changed. old_line is returned when None (file only)
+        """
+        if fname not in self.new_files:
+            return None
+        if fname not in self.file_diffs or old_line is None:
+            return old_line
+        return self.file_diffs[fname].old2new.get(old_line, None)
+    #~ def _get_new_line()
+
+    def carry_forward(self, name, matrix_file, prev_matrix_file, elem_map, \
+                                tests, outlog_file=None, prev_outlog_file=None,\
+                                partial_matrix_file=None, \
+                                partial_outlog_file=None, \
+                                infer_inactive=False):
+        """ Complete the matrix (and the outputs) of the executed cells with
+            the cells carried forward from the previous run, and record
+            them in the INCREMENTAL_ANALYSIS_INFO file.
+            :param name: name of the matrix in the recorded information
+            :param matrix_file: matrix of the executed cells (may not
+                    exist), overridden by the complete matrix
+            :param elem_map: dict of the carried forward rows to the
+                    previous run's rows (see map_elements)
+            :param tests: the carried forward tests (columns)
+            :param partial_matrix_file: matrix of other executed cells (may
+                    not exist), merged into the complete matrix
+            :param infer_inactive: set the rows that are not carried forward
+                    inactive for the carried forward tests (see module doc)
+        """
+        prev_matrix = common_matrices.ExecutionMatrix(\
+                                                    filename=prev_matrix_file)
+        key_col = prev_matrix.get_key_colname()
+        prev_df = prev_matrix.to_pandas_df().set_index(key_col)
+        tests = [t for t in tests if t in prev_df.columns]
+        elem_map = {e: o for e, o in elem_map.items() if o in prev_df.index}
+
+        executed_dfs = []
+        for m_file in (matrix_file, partial_matrix_file):
+            if m_file is not None and os.path.isfile(m_file):
+                executed_dfs.append(common_matrices.ExecutionMatrix(\
+                        filename=m_file).to_pandas_df().set_index(key_col))
+
+        rows, cols = [], []
+        for df in executed_dfs:
+            rows.extend(df.index)
+            cols.extend(df.columns)
+        rows = list(dict.fromkeys(rows + list(elem_map)))
+        cols = list(dict.fromkeys(cols + tests))
+        executed_tests = [c for c in cols if c not in set(tests)]
+
+        # Import here since pandas is slow to load (see common_fs)
+        import pandas as pd
+        result = pd.DataFrame(prev_matrix.getUncertainCellDefaultVal(), \
+                                                index=rows, columns=cols)
+        for df in executed_dfs:
+            if len(df.index) > 0 and len(df.columns) > 0:
+                result.loc[df.index, df.columns] = df.values
+        carried_rows = list(elem_map)
+        if len(carried_rows) > 0 and len(tests) > 0:
+            result.loc[carried_rows, tests] = prev_df.loc[\
+                            [elem_map[e] for e in carried_rows], tests].values
+        inferred_rows = []
+        if infer_inactive and len(tests) > 0:
+            inferred_rows = [r for r in rows if r not in elem_map]
+            if len(inferred_rows) > 0:
+                result.loc[inferred_rows, tests] = \
+                                            prev_matrix.getInactiveCellVal()
+        result.index.name = key_col
+        result = result.astype(int).reset_index()
+        result[key_col] = result[key_col].astype(str)
+        common_fs.dumpCSV(result, matrix_file)
+
+        if outlog_file is not None:
+            outlog = common_matrices.OutputLogData(filename=outlog_file)
+            if partial_outlog_file is not None and \
+                                        os.path.isfile(partial_outlog_file):
+                outlog.update_with_other(common_matrices.OutputLogData(\
+                                        filename=partial_outlog_file), \
+                                        override_existing=True)
+            if prev_outlog_file is not None and \
+                                            os.path.isfile(prev_outlog_file):
+                prev_outlog = common_matrices.OutputLogData(\
+                                                    filename=prev_outlog_file)
+                # The carried hashes must be comparable with the new ones
+                outlog.assert_compatible_fingerprint_mode(prev_outlog)
+                prev_objectives = set(prev_outlog.get_objectives())
+                tests_set = set(tests)
+                carried = {}
+                for elem, old_elem in elem_map.items():
+                    if old_elem not in prev_objectives:
+                        continue
+                    dat = {t: d for t, d in prev_outlog.get_objective_data(\
+                                        old_elem).items() if t in tests_set}
+                    if len(dat) > 0:
+                        carried[elem] = dat
+                if len(carried) > 0:
+                    outlog.add_data(carried, override_existing=True)
+            outlog.serialize()
+
+        self.info['matrices'][name] = {
+            'executed_tests': executed_tests,
+            'carried_forward': {
+                'rows': elem_map,
+                'tests': tests,
+                'cells': len(elem_map) * len(tests),
+            },
+            'inferred_inactive': {
+                'rows': inferred_rows,
+                'tests': tests if len(inferred_rows) > 0 else [],
+                'cells': len(inferred_rows) * len(tests),
+            },
+        }
+        self._write_info()
+        logging.info("incremental analysis: {} cells of {} carried forward"\
+                                    .format(len(elem_map) * len(tests), name))
+    #~ def carry_forward()
+#~ class IncrementalAnalysis
@@ -2,37 +2,288 @@
     The logging facility make use of the standard logging lib.
 
     - The function `console_tmp_log_setup` set the format of the log
-        to stdout to display logs before the directory containing the 
-        project's log files is created. 
+        to stdout to display logs before the directory containing the
+        project's log files is created.
         (allow to pretty print status or error on stdout)
     - The function `setup` sets up the log facility to log into files.
         The function must be called only Once
+    - The context manager `log_context` sets the identifiers (task, tool,
+        test, element) added to the records logged in its scope. The
+        context is per thread: the functions executed by worker threads
+        (e.g. joblib with require='sharedmem') are wrapped with
+        `bind_log_context` to keep the context of the submitting thread.
+
+    The records are put in a queue by the logging threads and written to
+    the files and console by a background thread, so that the logging
+    threads do not wait for the file I/O. The records are also written as
+    JSON lines, with the run, task, tool, test and element identifiers,
+    when a JSON log file is given.
+    The log files are rotated on size and on time, and the rotated files
+    older than the retention period are deleted.
+    In a forked child process (joblib workers, subprocess pools), where
+    the background thread does not exist, the records are directly
+    appended to the log files (without rotation).
 """
 
 
 from __future__ import print_function
 
+import os
+import time
+import json
+import glob
+import queue
+import atexit
 import logging
+import threading
+import contextlib
+import contextvars
 import logging.handlers
 
 # private static variable of this module
 _SETUP_DONE = False
+_LISTENER = None
+
+# Identifiers added to the records
+CONTEXT_FIELDS = ('run', 'task', 'tool', 'test', 'element')
+
+_CONTEXT = contextvars.ContextVar('muteria_log_context', default={})
 
 def is_setup():
     return _SETUP_DONE
 #def is_setup()
 
-def setup(logfile=None, logconsole=False, file_level=logging.INFO, 
-            console_level=logging.INFO, file_max_bytes=20000, 
-            n_file_backups=1, root_name=''):
+@contextlib.contextmanager
+def log_context(**identifiers):
+    """ Add the identifiers (see CONTEXT_FIELDS) to the records logged in
+        the scope, by the current thread.
+
+        Example:
+        >>> with log_context(task='TESTS_EXECUTION', tool='klee'):
+        ...     get_log_context()['tool']
+        'klee'
+    """
+    for field in identifiers:
+        assert field in CONTEXT_FIELDS, "invalid log context field "+field
+    context = dict(_CONTEXT.get())
+    context.update(identifiers)
+    token = _CONTEXT.set(context)
+    try:
+        yield
+    finally:
+        _CONTEXT.reset(token)
+#~ def log_context()
+
+def get_log_context():
+    return dict(_CONTEXT.get())
+#~ def get_log_context()
+
+def bind_log_context(func):
+    """ :return: a function calling func within the log context of the
+                current thread (at the call of bind_log_context), for the
+                execution of func in other threads. To call before the
+                submission of the work (joblib may consume the generator of
+                the calls in its own threads).
+
+        Example:
+        >>> with log_context(tool='klee'):
+        ...     func = bind_log_context(lambda: get_log_context()['tool'])
+        >>> func()
+        'klee'
+    """
+    context = get_log_context()
+    def _in_context(*args, **kwargs):
+        with log_context(**context):
+            return func(*args, **kwargs)
+    return _in_context
+#~ def bind_log_context()
+
+class ContextFilter(logging.Filter):
+    """ Add the log context identifiers to the records (in the logging
+        thread)
+    """
+    def __init__(self, run_id=None):
+        logging.Filter.__init__(self)
+        self.run_id = run_id
+    #~ def __init__()
+
+    def filter(self, record):
+        context = _CONTEXT.get()
+        for field in CONTEXT_FIELDS:
+            if not hasattr(record, field):
+                setattr(record, field, context.get(field, None))
+        if record.run is None:
+            record.run = self.run_id
+        return True
+    #~ def filter()
+#~ class ContextFilter
+
+class RateLimitFilter(logging.Filter):
+    """ Limit the repetitive messages: at most max_count records with the
+        same logger, level and message (template) per interval (seconds).
+        The number of suppressed records is added to the next record
+        logged with the same message.
+    """
+    def __init__(self, max_count=20, interval=60.0):
+        logging.Filter.__init__(self)
+        self.max_count = max_count
+        self.interval = interval
+        # key -> [window start, count in window, suppressed]
+        self.windows = {}
+        self.lock = threading.Lock()
+    #~ def __init__()
+
+    def filter(self, record):
+        key = (record.name, record.levelno, str(record.msg))
+        now = time.time()
+        with self.lock:
+            window = self.windows.get(key, None)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = 0 if window is None else window[2]
+                self.windows[key] = [now, 1, 0]
+                if len(self.windows) > 10000:
+                    self._drop_old_windows(now)
+            elif window[1] < self.max_count:
+                window[1] += 1
+                suppressed = 0
+            else:
+                window[2] += 1
+                return False
+        if suppressed > 0:
+            record.msg = "{} (and {} similar messages suppressed)".format(\
+                                                    record.msg, suppressed)
+        return True
+    #~ def filter()
+
+    def _drop_old_windows(self, now):
+        for key in [k for k, w in self.windows.items() \
+                                            if now - w[0] >= self.interval]:
+            del self.windows[key]
+    #~ def _drop_old_windows()
+#~ class RateLimitFilter
+
+class JsonLinesFormatter(logging.Formatter):
+    """ Format the records as JSON objects (one per line)
+    """
+    def format(self, record):
+        obj = {
+            'time': record.created,
+            'level': record.levelname,
+            'logger': record.name,
+            'process': record.process,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            val = getattr(record, field, None)
+            if val is not None:
+                obj[field] = val
+        if record.exc_info:
+            obj['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            obj['exception'] = record.exc_text
+        return json.dumps(obj, default=str)
+    #~ def format()
+#~ class JsonLinesFormatter
+
+class SizeAndTimeRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """ Rotate the log file when it reaches max_bytes or is older than
+        rotation_interval (seconds). The rotated files older than
+        retention (seconds) are deleted.
+    """
+    def __init__(self, filename, max_bytes, backup_count, \
+                            rotation_interval=None, retention=None):
+        logging.handlers.RotatingFileHandler.__init__(self, filename, \
+                                mode='a', maxBytes=max_bytes, \
+                                backupCount=backup_count, encoding='utf-8')
+        self.rotation_interval = rotation_interval
+        self.retention = retention
+        self.rollover_at = None
+        if self.rotation_interval is not None:
+            start = time.time()
+            if os.path.exists(self.baseFilename):
+                start = os.path.getmtime(self.baseFilename)
+            self.rollover_at = start + self.rotation_interval
+    #~ def __init__()
+
+    def shouldRollover(self, record):
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return True
+        return logging.handlers.RotatingFileHandler.shouldRollover(self, \
+                                                                    record)
+    #~ def shouldRollover()
+
+    def doRollover(self):
+        logging.handlers.RotatingFileHandler.doRollover(self)
+        if self.rotation_interval is not None:
+            self.rollover_at = time.time() + self.rotation_interval
+        if self.retention is not None:
+            limit = time.time() - self.retention
+            for fn in glob.glob(glob.escape(self.baseFilename) + '.*'):
+                try:
+                    if os.path.getmtime(fn) < limit:
+                        os.remove(fn)
+                except OSError:
+                    pass
+    #~ def doRollover()
+#~ class SizeAndTimeRotatingFileHandler
+
+class ProcessSafeQueueHandler(logging.handlers.QueueHandler):
+    """ Put the records in the queue of the background writer. In a forked
+        child process, the records are directly appended to the files
+        (see the module doc).
+        :param direct_files: list of pairs of file name and formatter
+    """
+    def __init__(self, log_queue, direct_files):
+        logging.handlers.QueueHandler.__init__(self, log_queue)
+        self.pid = os.getpid()
+        self.direct_files = direct_files
+        self.direct_handlers = None
+    #~ def __init__()
+
+    def emit(self, record):
+        if os.getpid() == self.pid:
+            logging.handlers.QueueHandler.emit(self, record)
+            return
+        if self.direct_handlers is None:
+            self.direct_handlers = []
+            for filename, formatter, level in self.direct_files:
+                fh = logging.FileHandler(filename, mode='a', \
+                                                        encoding='utf-8')
+                fh.setFormatter(formatter)
+                fh.setLevel(level)
+                self.direct_handlers.append(fh)
+        for fh in self.direct_handlers:
+            if record.levelno >= fh.level:
+                fh.handle(record)
+    #~ def emit()
+#~ class ProcessSafeQueueHandler
+
+def setup(logfile=None, logconsole=False, file_level=logging.INFO,
+            console_level=logging.INFO, file_max_bytes=20 * 1024 * 1024,
+            n_file_backups=20, root_name='', json_logfile=None,
+            rotation_interval=24 * 3600, retention=7 * 24 * 3600,
+            rate_limit=(20, 60.0), run_id=None):
+    """ Setup the logging into the log file, the JSON lines log file and
+        the console.
+        :param rotation_interval: maximum age (seconds) of the log file
+                    before rotation, no time rotation when None
+        :param retention: maximum age (seconds) of the rotated log files,
+                    kept until n_file_backups when None
+        :param rate_limit: pair of maximum count and interval (seconds)
+                    of the repetitive messages (see RateLimitFilter), no
+                    limit when None
+        :param run_id: identifier of the run added to the records
+    """
 
     global _SETUP_DONE
+    global _LISTENER
 
-    # skip if already setup        
+    # skip if already setup
     if _SETUP_DONE:
         return
 
-    # create logger 
+    # create logger
     logger = logging.getLogger(root_name)
     logger.setLevel(min(file_level, console_level))
 
@@ -40,28 +291,61 @@ def setup(logfile=None, logconsole=False, file_level=logging.INFO,
     formatter = logging.Formatter(\
                     fmt='%(asctime)s [%(name)s] [%(levelname)s] %(message)s', \
                     datefmt='%m/%d/%Y %I:%M:%S %p')
+    json_formatter = JsonLinesFormatter()
 
-    # create file handler?
-    if logfile is not None:
-        #fh = logging.FileHandler(logfile, mode='w')
-        fh = logging.handlers.RotatingFileHandler(logfile, mode='a', \
-                        maxBytes=file_max_bytes, backupCount=n_file_backups)
+    handlers = []
+    direct_files = []
+    # create file handlers?
+    for filename, fmt in ((logfile, formatter), (json_logfile, \
+                                                            json_formatter)):
+        if filename is None:
+            continue
+        fh = SizeAndTimeRotatingFileHandler(filename, \
+                                max_bytes=file_max_bytes, \
+                                backup_count=n_file_backups, \
+                                rotation_interval=rotation_interval, \
+                                retention=retention)
         fh.setLevel(file_level)
-        fh.setFormatter(formatter)
-        # add the handlers to the logger
-        logger.addHandler(fh)
+        fh.setFormatter(fmt)
+        handlers.append(fh)
+        direct_files.append((filename, fmt, file_level))
 
     # create console handler?
     if logconsole:
         ch = logging.StreamHandler()
         ch.setLevel(console_level)
         ch.setFormatter(formatter)
-        # add the handlers to the logger
-        logger.addHandler(ch)
+        handlers.append(ch)
+
+    if len(handlers) > 0:
+        # The handlers are used by the background writer
+        log_queue = queue.Queue(-1)
+        qh = ProcessSafeQueueHandler(log_queue, direct_files)
+        qh.addFilter(ContextFilter(run_id=run_id))
+        if rate_limit is not None:
+            qh.addFilter(RateLimitFilter(*rate_limit))
+        _LISTENER = logging.handlers.QueueListener(log_queue, *handlers, \
+                                                respect_handler_level=True)
+        _LISTENER.start()
+        atexit.register(shutdown)
+        # add the handler to the logger
+        logger.addHandler(qh)
 
     _SETUP_DONE = True
 #~ def setup()
 
+def shutdown():
+    """ Write the queued records and stop the background writer
+    """
+    global _LISTENER
+    if _LISTENER is not None:
+        listener = _LISTENER
+        _LISTENER = None
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+#~ def shutdown()
+
 def console_tmp_log_setup(loglevel=logging.INFO, root_name=''):
     logging.basicConfig(level=loglevel, \
                 format='%(asctime)s [%(name)s] [%(levelname)s] %(message)s', \
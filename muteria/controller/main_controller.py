@@ -24,22 +24,20 @@ from __future__ import print_function
 import os, sys
 import glob
 import copy
+import json
 
 import importlib
 import logging
 
 import muteria.common.mix as common_mix
 import muteria.common.fs as common_fs
-import muteria.common.matrices as common_matrices
 
 import muteria.configmanager.configurations as configurations
 from muteria.configmanager.helper import ConfigurationHelper
-from muteria.repositoryandcode.repository_manager import RepositoryManager
 
 # from this package
 import muteria.controller.logging_setup as logging_setup
 import muteria.controller.explorer as explorer
-import muteria.controller.executor as executor
 
 ERROR_HANDLER = common_mix.ErrorHandler
 
@@ -64,16 +62,52 @@ class MainController (object):
     #~ def __init__()
 
     def internal_infos(self, config):
-        # TODO
-        ERROR_HANDLER.error_exit("FIXME: TODO: Implement the internal")
+        """ Print the languages supported and their tools (with their
+            capabilities from the tools manifest, no tool is imported)
+        """
+        # Import here to not load the tools modules in the other modes
+        from muteria.drivers import ToolsModulesLoader
+
+        infos = {}
+        for category in (ToolsModulesLoader.TESTCASES_TOOLS, \
+                                        ToolsModulesLoader.CRITERIA_TOOLS):
+            manifest = ToolsModulesLoader.get_tools_manifest(category)
+            for language, tools in manifest.items():
+                infos.setdefault(language, {})[category] = tools
+        for language in sorted(infos):
+            print("# {}".format(language))
+            for category in sorted(infos[language]):
+                print("    {}:".format(category))
+                for toolname, entry in sorted(infos[language][category]\
+                                                                    .items()):
+                    if entry is None:
+                        print("        {} (not in manifest)".format(toolname))
+                        continue
+                    print("        {}: {}".format(toolname, "; ".join(\
+                            "{}={}".format(k, ",".join(entry[k])) \
+                                                    for k in sorted(entry))))
     #~ def internal_infos()
 
     def view(self, top_timeline_explorer, config):
         '''
         Method used to navigate in the output dir and make simple queries
+        (see muteria.controller.query_engine). The result is printed as JSON
         '''
-        # TODO
-        ERROR_HANDLER.error_exit("FIXME: TODO: Implement the View")
+        view_query = config.VIEW_QUERY.get_val()
+        if view_query is None:
+            explorer_obj = top_timeline_explorer.get_latest_explorer()
+            print(explorer_obj.get_dir_pathname(explorer.RESULTS_DATA_DIR))
+            return
+
+        # Import here to only load the query engine in view mode
+        import muteria.controller.query_engine as query_engine
+
+        view_query = dict(view_query)
+        rebuild = view_query.pop('rebuild_index', False)
+        engine = query_engine.ResultsQueryEngine(top_timeline_explorer, \
+                                                            rebuild=rebuild)
+        result = engine.query(**view_query)
+        print(json.dumps(result, indent=2, sort_keys=True))
     #~ def view()
 
     #def log_run_summary(self):
@@ -106,6 +140,13 @@ class MainController (object):
         # XXX Actual Execution based on the mode
         mode = final_config.RUN_MODE.get_val()
 
+        # Import here to not load the executor (and the tools drivers) in
+        # the view and internal modes
+        if mode in (configurations.SessionMode.EXECUTE_MODE, \
+                            configurations.SessionMode.CUSTOM_EXECUTION_MODE, \
+                            configurations.SessionMode.RESTORE_REPOS_MODE):
+            import muteria.controller.executor as executor
+
         if mode == configurations.SessionMode.EXECUTE_MODE:
             # Executor
             # XXX Main Execution
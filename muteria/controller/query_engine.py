@@ -0,0 +1,594 @@
+""" Offline queries on the results of the output directory (VIEW mode).
+
+    The matrices and the program output logs of each timeline directory
+    (latest and histories) are indexed into persistent indexes, stored in
+    the directory QUERY_INDEX_DIR of the timeline directory, so that the
+    queries do not load the whole CSV matrices and output logs:
+    - A matrix index stores the row keys and the column names with their
+        sorted order (binary search lookups), and the active and uncertain
+        cells as bit-packed arrays, by row and by column (transposed). The
+        arrays are memory mapped, a lookup only reads the needed row.
+    - An output log index stores, for each test (sorted), the output
+        length, hash, return code and timeout of the program execution.
+
+    An index is rebuilt when its source file changed (size or
+    modification time).
+
+    The queries (see QueryKinds) are:
+    - TESTS_OF_ELEMENT: the tests covering (killing) a criterion element.
+    - ELEMENTS_OF_TEST: the criterion elements covered (killed) by a test.
+    - FAILING_TESTS: the tests failing (pass fail matrix).
+    - TOOLS: the tools with their number of tests and elements.
+    - FILE_COVERAGE: the number of elements and covered elements of a
+            source file, for each timeline history. The elements must be
+            named with their file (<tool>:<file>:..., as the gcov elements).
+    - OUTPUT_DIFF: the tests whose program output differs between two
+            timeline histories.
+"""
+
+from __future__ import print_function
+
+import os
+import json
+import shutil
+import logging
+
+import numpy as np
+
+import muteria.common.mix as common_mix
+import muteria.common.matrices as common_matrices
+
+from muteria.drivers.criteria import TestCriteria
+
+import muteria.controller.explorer as fd_structure
+
+ERROR_HANDLER = common_mix.ErrorHandler
+
+class QueryKinds(common_mix.EnumAutoName):
+    TESTS_OF_ELEMENT = "tests_of_element"
+    ELEMENTS_OF_TEST = "elements_of_test"
+    FAILING_TESTS = "failing_tests"
+    TOOLS = "tools"
+    FILE_COVERAGE = "file_coverage"
+    OUTPUT_DIFF = "output_diff"
+#~ class QueryKinds
+
+def _get_source_stamp(source_file):
+    """ :return: the stamp (size and modification time) of the source file
+    """
+    stat = os.stat(source_file)
+    return [stat.st_size, stat.st_mtime_ns]
+#~ def _get_source_stamp()
+
+def _replace_index_dir(tmp_dir, index_dir):
+    if os.path.isdir(index_dir):
+        shutil.rmtree(index_dir)
+    os.rename(tmp_dir, index_dir)
+#~ def _replace_index_dir()
+
+def _make_str_array(str_list):
+    if len(str_list) == 0:
+        return np.array([], dtype='<U1')
+    return np.array(str_list, dtype=str)
+#~ def _make_str_array()
+
+class _BaseIndex(object):
+    """ Persistent index of a source file, stored in a directory with a
+        meta data file and NumPy arrays (memory mapped when loaded)
+    """
+    META_FILE = "index_meta.json"
+    FORMAT_VERSION = 1
+    ARRAY_NAMES = ()
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, self.META_FILE)) as fp:
+            self.meta = json.load(fp)
+        for name in self.ARRAY_NAMES:
+            setattr(self, name, np.load(os.path.join(index_dir, name+'.npy'),\
+                                                            mmap_mode='r'))
+    #~ def __init__()
+
+    @classmethod
+    def is_up_to_date(cls, source_file, index_dir):
+        meta_file = os.path.join(index_dir, cls.META_FILE)
+        if not os.path.isfile(meta_file):
+            return False
+        try:
+            with open(meta_file) as fp:
+                meta = json.load(fp)
+        except ValueError:
+            return False
+        return meta.get('version', None) == cls.FORMAT_VERSION and \
+                        meta.get('stamp', None) == \
+                                                _get_source_stamp(source_file)
+    #~ def is_up_to_date()
+
+    @classmethod
+    def _write(cls, source_file, index_dir, arrays, stamp, **meta):
+        """ Write the index (atomically replacing the existing one)
+        """
+        tmp_dir = index_dir + ".tmp"
+        if os.path.isdir(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+        for name in cls.ARRAY_NAMES:
+            np.save(os.path.join(tmp_dir, name+'.npy'), arrays[name])
+        meta.update({'version': cls.FORMAT_VERSION, 'stamp': stamp, \
+                                'source': os.path.basename(source_file)})
+        with open(os.path.join(tmp_dir, cls.META_FILE), 'w') as fp:
+            json.dump(meta, fp)
+        _replace_index_dir(tmp_dir, index_dir)
+    #~ def _write()
+
+    @classmethod
+    def get_source_file(cls, pathname):
+        """ :return: the file to index for pathname, None if missing
+        """
+        return pathname if os.path.isfile(pathname) else None
+    #~ def get_source_file()
+
+    @classmethod
+    def get(cls, source_file, index_dir, rebuild=False):
+        """ Load the index of source_file, (re)building it if needed
+        """
+        if rebuild or not cls.is_up_to_date(source_file, index_dir):
+            logging.debug("building the query index of {}".format(\
+                                                                source_file))
+            cls.build(source_file, index_dir)
+        return cls(index_dir)
+    #~ def get()
+
+    @classmethod
+    def build(cls, source_file, index_dir):
+        ERROR_HANDLER.error_exit("must be implemented in the subclass", \
+                                                                    __file__)
+    #~ def build()
+
+    @staticmethod
+    def _lookup(keys, order, key):
+        """ :return: the position of key in keys (order is the sorted order
+                    of keys), or None if missing
+        """
+        if len(keys) == 0:
+            return None
+        sorted_pos = _BaseIndex._sorted_search(keys, order, key)
+        if sorted_pos >= len(keys) or keys[order[sorted_pos]] != key:
+            return None
+        return int(order[sorted_pos])
+    #~ def _lookup()
+
+    @staticmethod
+    def _sorted_search(keys, order, key):
+        """ Binary search of key in keys through order, without
+            materializing the sorted keys
+        """
+        low, high = 0, len(order)
+        while low < high:
+            mid = (low + high) // 2
+            if keys[order[mid]] < key:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+    #~ def _sorted_search()
+
+    @staticmethod
+    def _prefix_range(keys, order, prefix):
+        """ :return: the positions of the keys starting with prefix
+        """
+        low = _BaseIndex._sorted_search(keys, order, prefix)
+        high = _BaseIndex._sorted_search(keys, order, prefix + chr(0x10ffff))
+        return order[low:high]
+    #~ def _prefix_range()
+#~ class _BaseIndex
+
+class MatrixIndex(_BaseIndex):
+    """ Index of an execution matrix (rows are the elements or the program,
+        columns are the tests)
+    """
+    ARRAY_NAMES = ('row_keys', 'row_order', 'col_names', 'col_order', \
+                        'active_by_row', 'uncertain_by_row', \
+                        'active_by_col', 'uncertain_by_col', 'row_has_active')
+
+    @classmethod
+    def build(cls, source_file, index_dir):
+        stamp = _get_source_stamp(source_file)
+        view = common_matrices.ExecutionMatrix(filename=source_file)\
+                                                                .get_view()
+        row_keys = _make_str_array(view.row_keys)
+        col_names = _make_str_array(view.col_names)
+        active = np.asarray(view.active, dtype=bool)\
+                                    .reshape(len(row_keys), len(col_names))
+        uncertain = np.asarray(view.uncertain, dtype=bool)\
+                                    .reshape(len(row_keys), len(col_names))
+        arrays = {
+            'row_keys': row_keys,
+            'row_order': np.argsort(row_keys, kind='stable'),
+            'col_names': col_names,
+            'col_order': np.argsort(col_names, kind='stable'),
+            'active_by_row': np.packbits(active, axis=1),
+            'uncertain_by_row': np.packbits(uncertain, axis=1),
+            'active_by_col': np.packbits(active.T, axis=1),
+            'uncertain_by_col': np.packbits(uncertain.T, axis=1),
+            'row_has_active': active.any(axis=1),
+        }
+        cls._write(source_file, index_dir, arrays, stamp, \
+                                n_rows=len(row_keys), n_cols=len(col_names))
+    #~ def build()
+
+    def get_row_keys(self):
+        return [str(k) for k in self.row_keys]
+    #~ def get_row_keys()
+
+    def get_col_names(self):
+        return [str(c) for c in self.col_names]
+    #~ def get_col_names()
+
+    def has_row(self, row_key):
+        return self._lookup(self.row_keys, self.row_order, row_key) \
+                                                                    is not None
+    #~ def has_row()
+
+    def has_col(self, col_name):
+        return self._lookup(self.col_names, self.col_order, col_name) \
+                                                                    is not None
+    #~ def has_col()
+
+    def get_active_cols_of_row(self, row_key, uncertain=False):
+        """ :return: the list of the active (or uncertain) columns of the
+                    row, None if the row is missing
+        """
+        pos = self._lookup(self.row_keys, self.row_order, row_key)
+        if pos is None:
+            return None
+        bits = self.uncertain_by_row if uncertain else self.active_by_row
+        mask = np.unpackbits(bits[pos], count=len(self.col_names))\
+                                                                .astype(bool)
+        return [str(c) for c in self.col_names[mask]]
+    #~ def get_active_cols_of_row()
+
+    def get_active_rows_of_col(self, col_name, uncertain=False):
+        """ :return: the list of the active (or uncertain) rows of the
+                    column, None if the column is missing
+        """
+        pos = self._lookup(self.col_names, self.col_order, col_name)
+        if pos is None:
+            return None
+        bits = self.uncertain_by_col if uncertain else self.active_by_col
+        mask = np.unpackbits(bits[pos], count=len(self.row_keys))\
+                                                                .astype(bool)
+        return [str(r) for r in self.row_keys[mask]]
+    #~ def get_active_rows_of_col()
+
+    def get_rows_with_prefix(self, prefix):
+        """ :return: the positions of the rows whose key starts with prefix
+        """
+        return self._prefix_range(self.row_keys, self.row_order, prefix)
+    #~ def get_rows_with_prefix()
+
+    def get_cols_with_prefix(self, prefix):
+        """ :return: the positions of the columns starting with prefix
+        """
+        return self._prefix_range(self.col_names, self.col_order, prefix)
+    #~ def get_cols_with_prefix()
+#~ class MatrixIndex
+
+class OutlogIndex(_BaseIndex):
+    """ Index of the program output log data of the tests
+    """
+    ARRAY_NAMES = ('tests', 'test_order', 'outlog_len', 'outlog_hash', \
+                                                    'retcode', 'timedout')
+    # The meta records the fingerprint mode of the output hashes
+    FORMAT_VERSION = 2
+    # Representation of None (uncertain) in the integer arrays
+    NONE_INT = np.iinfo(np.int64).min
+
+    @classmethod
+    def get_source_file(cls, pathname):
+        # The output log of an older version may have the legacy name
+        return common_matrices.OutputLogData.get_existing_store_file(pathname)
+    #~ def get_source_file()
+
+    @classmethod
+    def build(cls, source_file, index_dir):
+        stamp = _get_source_stamp(source_file)
+        outlog = common_matrices.OutputLogData(filename=source_file)
+        objectives = outlog.get_objectives()
+        ERROR_HANDLER.assert_true(len(objectives) <= 1, \
+                    "the program output log must have a single objective", \
+                                                                    __file__)
+        data = {} if len(objectives) == 0 else \
+                                    outlog.get_objective_data(objectives[0])
+        tests = _make_str_array(list(data))
+        arrays = {
+            'tests': tests,
+            'test_order': np.argsort(tests, kind='stable'),
+        }
+        cols = (('outlog_len', outlog.OUTLOG_LEN), \
+                    ('outlog_hash', outlog.OUTLOG_HASH), \
+                    ('retcode', outlog.RETURN_CODE), \
+                    ('timedout', outlog.TIMEDOUT))
+        for name, key in cols:
+            vals = [data[t][key] for t in data]
+            if name == 'outlog_hash':
+                arrays[name] = _make_str_array(\
+                                    ['' if v is None else v for v in vals])
+            else:
+                arrays[name] = np.array([cls.NONE_INT if v is None else \
+                                                int(v) for v in vals], \
+                                                            dtype=np.int64)
+        cls._write(source_file, index_dir, arrays, stamp, n_tests=len(tests),\
+                                    fingerprint_mode=outlog.fingerprint_mode)
+    #~ def build()
+
+    def get_tests(self):
+        return [str(t) for t in self.tests]
+    #~ def get_tests()
+
+    def get_test_data(self, test):
+        """ :return: the tuple (length, hash, return code, timedout) of the
+                    test's output (None values when uncertain), or None
+                    when the test is missing
+        """
+        pos = self._lookup(self.tests, self.test_order, test)
+        if pos is None:
+            return None
+        o_hash = str(self.outlog_hash[pos])
+        res = [None if int(self.outlog_len[pos]) == self.NONE_INT else \
+                                                int(self.outlog_len[pos]), \
+                None if o_hash == '' else o_hash]
+        for arr in (self.retcode, self.timedout):
+            res.append(None if int(arr[pos]) == self.NONE_INT else \
+                                                                int(arr[pos]))
+        if res[3] is not None:
+            res[3] = bool(res[3])
+        return tuple(res)
+    #~ def get_test_data()
+
+    def get_uncertain_mask(self):
+        return (np.asarray(self.outlog_len) == self.NONE_INT) | \
+                            (np.asarray(self.retcode) == self.NONE_INT) | \
+                            (np.asarray(self.timedout) == self.NONE_INT)
+    #~ def get_uncertain_mask()
+#~ class OutlogIndex
+
+class ResultsQueryEngine(object):
+    """ Query the results of all the timeline histories of the output
+        directory (see the module doc).
+        :param top_timeline_explorer: TopExplorer of the output directory
+        :param rebuild: force the rebuild of the indexes
+    """
+    def __init__(self, top_timeline_explorer, rebuild=False):
+        self.top_timeline_explorer = top_timeline_explorer
+        self.rebuild = rebuild
+        # (history, matrix file key) -> index
+        self.indexes = {}
+    #~ def __init__()
+
+    def get_history_count(self):
+        return len(self.top_timeline_explorer.explorer_list)
+    #~ def get_history_count()
+
+    def _get_index(self, history, file_key, index_class):
+        """ :return: the index of the file, None if the file does not
+                    exist in the history
+        """
+        if (history, file_key) in self.indexes:
+            return self.indexes[(history, file_key)]
+        explorer = self.top_timeline_explorer.get_explorer_list(history)
+        index = None
+        source_file = index_class.get_source_file(\
+                                        explorer.get_file_pathname(file_key))
+        if source_file is not None:
+            index_dir = os.path.join(explorer.get_or_create_and_get_dir(\
+                                            fd_structure.QUERY_INDEX_DIR), \
+                                    os.path.splitext(file_key)[0])
+            index = index_class.get(source_file, index_dir, \
+                                                        rebuild=self.rebuild)
+        self.indexes[(history, file_key)] = index
+        return index
+    #~ def _get_index()
+
+    def get_matrix_index(self, criterion=None, history=0):
+        """ :param criterion: TestCriteria of the matrix, the pass fail
+                    matrix when None
+            :return: the MatrixIndex, None if the matrix does not exist
+        """
+        if criterion is None:
+            file_key = fd_structure.TEST_PASS_FAIL_MATRIX
+        else:
+            file_key = fd_structure.CRITERIA_MATRIX[criterion]
+        return self._get_index(history, file_key, MatrixIndex)
+    #~ def get_matrix_index()
+
+    def get_outlog_index(self, history=0):
+        """ :return: the OutlogIndex of the program output, None if the
+                    output log does not exist
+        """
+        return self._get_index(history, \
+                    fd_structure.PROGRAM_TESTEXECUTION_OUTPUT, OutlogIndex)
+    #~ def get_outlog_index()
+
+    def _get_existing_matrix_index(self, criterion, history):
+        index = self.get_matrix_index(criterion, history)
+        ERROR_HANDLER.assert_true(index is not None, \
+                    "no {} matrix in history {}".format(\
+                        "pass fail" if criterion is None else \
+                                    criterion.get_str(), history), __file__)
+        return index
+    #~ def _get_existing_matrix_index()
+
+    @staticmethod
+    def get_criterion(criterion):
+        """ :return: the TestCriteria of criterion (or its name)
+        """
+        if isinstance(criterion, TestCriteria):
+            return criterion
+        ERROR_HANDLER.assert_true(criterion is not None and \
+                            TestCriteria.has_element_named(criterion), \
+                        "invalid test criterion: {}".format(criterion), \
+                                                                    __file__)
+        return TestCriteria[criterion]
+    #~ def get_criterion()
+
+    ########################## QUERIES ##########################
+
+    def tests_of_element(self, criterion, element, history=0, \
+                                                            uncertain=False):
+        """ :return: the tests covering (killing) the element (meta), None
+                    if the element is not in the matrix
+        """
+        index = self._get_existing_matrix_index(\
+                                    self.get_criterion(criterion), history)
+        return index.get_active_cols_of_row(element, uncertain=uncertain)
+    #~ def tests_of_element()
+
+    def elements_of_test(self, criterion, test, history=0, uncertain=False):
+        """ :return: the elements covered (killed) by the test (meta), None
+                    if the test is not in the matrix
+        """
+        index = self._get_existing_matrix_index(\
+                                    self.get_criterion(criterion), history)
+        return index.get_active_rows_of_col(test, uncertain=uncertain)
+    #~ def elements_of_test()
+
+    def failing_tests(self, history=0):
+        """ :return: the failing tests, None if no pass fail data
+        """
+        index = self._get_existing_matrix_index(None, history)
+        row_keys = index.get_row_keys()
+        if len(row_keys) == 0:
+            return []
+        return index.get_active_cols_of_row(row_keys[0])
+    #~ def failing_tests()
+
+    def tools(self, criterion=None, history=0):
+        """ :return: dict of the tools with their number of tests and of
+                    elements in the matrix of the criterion (pass fail
+                    matrix when None)
+        """
+        index = self._get_existing_matrix_index(\
+                        None if criterion is None else \
+                                self.get_criterion(criterion), history)
+        res = {}
+        for what, names in (('tests', index.col_names), \
+                                                ('elements', index.row_keys)):
+            if criterion is None and what == 'elements':
+                continue
+            if len(names) == 0:
+                continue
+            tools, counts = np.unique(\
+                        np.char.partition(np.asarray(names), ':')[:, 0], \
+                                                        return_counts=True)
+            for tool, count in zip(tools.tolist(), counts.tolist()):
+                res.setdefault(tool, {'tests': 0, 'elements': 0})
+                res[tool][what] = count
+        return res
+    #~ def tools()
+
+    def file_coverage(self, criterion, filename, histories=None):
+        """ :param histories: list of the timeline histories, all when None
+            :return: dict of history and the dict of the number of
+                    elements ('total'), of covered elements ('covered') of
+                    the file, or None when the matrix does not exist
+        """
+        criterion = self.get_criterion(criterion)
+        if histories is None:
+            histories = range(self.get_history_count())
+        filename = os.path.normpath(filename)
+        res = {}
+        for history in histories:
+            index = self.get_matrix_index(criterion, history)
+            if index is None:
+                res[history] = None
+                continue
+            if len(index.row_keys) == 0:
+                res[history] = {'total': 0, 'covered': 0}
+                continue
+            # <tool>:<file>:...
+            files = np.char.partition(np.char.partition(\
+                        np.asarray(index.row_keys), ':')[:, 2], ':')[:, 0]
+            mask = (files == filename) | \
+                            np.char.endswith(files, os.sep + filename)
+            res[history] = {'total': int(mask.sum()), \
+                'covered': int((mask & np.asarray(index.row_has_active))\
+                                                                    .sum())}
+        return res
+    #~ def file_coverage()
+
+    def output_diff(self, history=0, other_history=1):
+        """ :return: the tests, executed in both histories with certain
+                    outputs, whose program output differ. The outputs of
+                    two timed out executions are equivalent
+                    (see OutputLogData.outlogdata_equiv).
+        """
+        indexes = []
+        for h in (history, other_history):
+            index = self.get_outlog_index(h)
+            ERROR_HANDLER.assert_true(index is not None, \
+                        "no program output log in history {}".format(h), \
+                                                                    __file__)
+            indexes.append(index)
+        idx, other = indexes
+        modes = [i.meta.get('fingerprint_mode', None) for i in indexes]
+        ERROR_HANDLER.assert_true(None in modes or modes[0] == modes[1], \
+                    "the outputs of the histories have different fingerprint "
+                            "modes ({} and {})".format(*modes), __file__)
+        if len(idx.tests) == 0 or len(other.tests) == 0:
+            return []
+        # align the other's tests on the index's tests
+        other_sorted = np.asarray(other.tests)[np.asarray(other.test_order)]
+        pos = np.minimum(np.searchsorted(other_sorted, np.asarray(idx.tests)),\
+                                                        len(other_sorted) - 1)
+        found = (other_sorted[pos] == np.asarray(idx.tests))
+        o_pos = np.asarray(other.test_order)[pos]
+        certain = found & ~idx.get_uncertain_mask() \
+                                        & ~other.get_uncertain_mask()[o_pos]
+        differ = np.zeros(len(idx.tests), dtype=bool)
+        for name in ('outlog_len', 'outlog_hash', 'retcode', 'timedout'):
+            differ |= (np.asarray(getattr(idx, name)) != \
+                                    np.asarray(getattr(other, name))[o_pos])
+        both_timedout = (np.asarray(idx.timedout) == 1) & \
+                                        (np.asarray(other.timedout)[o_pos] == 1)
+        differ &= certain & ~both_timedout
+        return sorted(str(t) for t in np.asarray(idx.tests)[differ])
+    #~ def output_diff()
+
+    def query(self, kind, criterion=None, element=None, test=None, \
+                                    filename=None, history=0, \
+                                    other_history=1, histories=None):
+        """ Run a query of kind (QueryKinds or its name)
+            :return: the JSON serializable result
+        """
+        if not isinstance(kind, QueryKinds):
+            ERROR_HANDLER.assert_true(kind is not None and \
+                                    QueryKinds.has_element_named(kind), \
+                            "invalid query kind: {}".format(kind), __file__)
+            kind = QueryKinds[kind]
+        ERROR_HANDLER.assert_true(history < self.get_history_count(), \
+                    "invalid history {} (only {} histories)".format(\
+                                history, self.get_history_count()), __file__)
+
+        def _required(val, name):
+            ERROR_HANDLER.assert_true(val is not None, \
+                        "{} must be specified for the query {}".format(\
+                                            name, kind.get_str()), __file__)
+            return val
+
+        if kind == QueryKinds.TESTS_OF_ELEMENT:
+            return self.tests_of_element(_required(criterion, 'criterion'), \
+                                _required(element, 'element'), history)
+        if kind == QueryKinds.ELEMENTS_OF_TEST:
+            return self.elements_of_test(_required(criterion, 'criterion'), \
+                                            _required(test, 'test'), history)
+        if kind == QueryKinds.FAILING_TESTS:
+            return self.failing_tests(history)
+        if kind == QueryKinds.TOOLS:
+            return self.tools(criterion, history)
+        if kind == QueryKinds.FILE_COVERAGE:
+            return self.file_coverage(_required(criterion, 'criterion'), \
+                                    _required(filename, 'file'), histories)
+        return self.output_diff(history, other_history)
+    #~ def query()
+#~ class ResultsQueryEngine
@@ -4,15 +4,62 @@ import importlib
 import subprocess
 import signal
 import time
+import threading
+import copy
+import contextlib
+import collections.abc
 
 import muteria.common.fs as common_fs
 import muteria.common.mix as common_mix
-import muteria.common.matrices as common_matrices
 
 ERROR_HANDLER = common_mix.ErrorHandler
 
+class LazyToolsModules(collections.abc.Mapping):
+    """ Read-only mapping {<toolname>: <module>} of the tools of a language,
+        where a tool driver package is only imported the first time it is
+        accessed. The membership checks and the iteration over the tool
+        names do not import anything.
+    """
+    def __init__(self, load_strings):
+        # {<toolname>: <module import string>}
+        self.load_strings = dict(load_strings)
+        self.loaded = {}
+        self.lock = threading.Lock()
+    #~ def __init__()
+
+    def __getitem__(self, toolname):
+        if toolname not in self.load_strings:
+            raise KeyError(toolname)
+        with self.lock:
+            if toolname not in self.loaded:
+                self.loaded[toolname] = importlib.import_module(\
+                                                self.load_strings[toolname])
+            return self.loaded[toolname]
+    #~ def __getitem__()
+
+    def __contains__(self, toolname):
+        # Mapping's default would import the tool
+        return toolname in self.load_strings
+    #~ def __contains__()
+
+    def __iter__(self):
+        return iter(self.load_strings)
+    #~ def __iter__()
+
+    def __len__(self):
+        return len(self.load_strings)
+    #~ def __len__()
+
+    def is_loaded(self, toolname):
+        return toolname in self.loaded
+    #~ def is_loaded()
+#~ class LazyToolsModules
+
 class ToolsModulesLoader(object):
     """ Load tools drivers
+        The tools drivers are imported lazily (when a tool is used). The
+        static manifest `TOOLS_MANIFEST` gives the tools' capabilities
+        without importing them.
         Example:
         >>> import muteria.drivers as md
         >>> md.ToolsModulesLoader.get_tools_modules(\
@@ -33,16 +80,67 @@ class ToolsModulesLoader(object):
     # containing corresponding tools
     COMMON_TOOLS_BY_LANGUAGE_DIR = "tools_by_languages"
 
+    # Keys of a tool's manifest entry
+    MANIFEST_TOOL_TYPES = "tool_types"
+    MANIFEST_CRITERIA = "criteria"
+
+    # Static manifest of the tools shipped with muteria:
+    # {<category>: {<language>: {<toolname>: {<key>: <value>}}}}
+    # The tool types are the attributes (not None) of the tool package and
+    # the criteria are the names of the supported criteria.
+    # XXX: Update this when adding a tool. A tool that is present but not
+    # listed here is still loadable, but its capabilities are only known
+    # after it is imported.
+    TOOLS_MANIFEST = {
+        TESTCASES_TOOLS: {
+            "c": {
+                "klee": {
+                    MANIFEST_TOOL_TYPES: ["StaticTestcaseTool"],
+                },
+                "semu": {
+                    MANIFEST_TOOL_TYPES: ["DynamicTestcaseTool"],
+                },
+                "shadow_se": {
+                    MANIFEST_TOOL_TYPES: ["DynamicTestcaseTool"],
+                },
+            },
+        },
+        CRITERIA_TOOLS: {
+            "c": {
+                "gcov": {
+                    MANIFEST_TOOL_TYPES: ["StaticCriteriaTool"],
+                    MANIFEST_CRITERIA: ["STATEMENT_COVERAGE", \
+                                    "BRANCH_COVERAGE", "FUNCTION_COVERAGE"],
+                },
+                "gpmutation": {
+                    MANIFEST_TOOL_TYPES: ["StaticCriteriaTool"],
+                    MANIFEST_CRITERIA: ["STRONG_MUTATION"],
+                },
+                "mart": {
+                    MANIFEST_TOOL_TYPES: ["StaticCriteriaTool"],
+                    MANIFEST_CRITERIA: ["MUTANT_COVERAGE", "WEAK_MUTATION", \
+                                                        "STRONG_MUTATION"],
+                },
+            },
+            "python": {
+                "coverage_py": {
+                    MANIFEST_TOOL_TYPES: ["StaticCriteriaTool"],
+                    MANIFEST_CRITERIA: ["STATEMENT_COVERAGE", \
+                                                        "BRANCH_COVERAGE"],
+                },
+            },
+        },
+    }
+
     @classmethod
-    def get_tools_modules(cls, tool_category):
-        '''
-        Import all tools modules of the specified tool category into a Dict 
-        as following:  {<language>: {<toolname>: <module>}}
-        '''
+    def _get_tools_load_strings(cls, tool_category):
+        """ Scan the tools directories of the category (without importing)
+            and return {<language>: {<toolname>: <module import string>}}
+        """
         if tool_category not in cls.TOOL_CATEGORIES_DIRS:
             logging.error("%s: %s" % ("invalid tool_category", tool_category))
 
-        modules = {}
+        load_strings = {}
         
         to_skip = ('__pycache__',)
 
@@ -82,19 +180,52 @@ class ToolsModulesLoader(object):
                                     cls.COMMON_TOOLS_BY_LANGUAGE_DIR,\
                                                         language, toolname])
 
-                # import the mutation tool 
-                tool_pkg = importlib.import_module(load_string)
-
                 # Add into dict
-                if language not in modules:
-                    modules[language] = {}
-                if toolname in modules[language]:
+                if language not in load_strings:
+                    load_strings[language] = {}
+                if toolname in load_strings[language]:
                     logging.error("%s %s %s %s " % ("tool", toolname, \
                         "appearing multiple times for same language", language))
                     ERROR_HANDLER.error_exit()
-                modules[language][toolname] = tool_pkg
+                load_strings[language][toolname] = load_string
 
+        return load_strings
+    #~ def _get_tools_load_strings()
+
+    @classmethod
+    def get_tools_modules(cls, tool_category):
+        '''
+        Get all tools modules of the specified tool category into a Dict 
+        as following:  {<language>: {<toolname>: <module>}}
+        The inner dicts are `LazyToolsModules`: a tool module is only
+        imported when it is accessed.
+        '''
+        modules = {}
+        for language, load_strings in \
+                        cls._get_tools_load_strings(tool_category).items():
+            modules[language] = LazyToolsModules(load_strings)
         return modules
+    #~ def get_tools_modules()
+
+    @classmethod
+    def get_tools_manifest(cls, tool_category):
+        '''
+        Get the capabilities of the tools of the specified category, without
+        importing them, as following: {<language>: {<toolname>: <entry>}}
+        The entry is None for a tool that is not in the static manifest.
+        '''
+        static = cls.TOOLS_MANIFEST.get(tool_category, {})
+        manifest = {}
+        for language, load_strings in \
+                        cls._get_tools_load_strings(tool_category).items():
+            manifest[language] = {}
+            for toolname in load_strings:
+                entry = static.get(language, {}).get(toolname, None)
+                if entry is not None:
+                    entry = copy.deepcopy(entry)
+                manifest[language][toolname] = entry
+        return manifest
+    #~ def get_tools_manifest()
 #~ class ToolsModulesLoader
 
 class RepoFileToCustomMap(dict):
@@ -149,6 +280,82 @@ class RepoFileToCustomMap(dict):
         
 #~ class RepoFileToCustomMap
 
+class _OutputReaderThread(threading.Thread):
+    """ Read a pipe by chunks and give them to the consumer
+    """
+    def __init__(self, pipe, consumer, chunk_size):
+        threading.Thread.__init__(self, daemon=True)
+        self.fd = pipe.fileno()
+        self.consumer = consumer
+        self.chunk_size = chunk_size
+        self.error = None
+    #~ def __init__()
+
+    def run(self):
+        try:
+            while True:
+                data = os.read(self.fd, self.chunk_size)
+                if not data:
+                    break
+                self.consumer(data)
+        except BaseException as e:
+            self.error = e
+            # drain the pipe so that the process does not block
+            while os.read(self.fd, self.chunk_size):
+                pass
+    #~ def run()
+#~ class _OutputReaderThread
+
+class _TimeoutWatchdog(threading.Thread):
+    """ Terminate the process group of the child when the execution is not
+        done before the timeout: SIGTERM, then SIGKILL after the grace
+        period (in seconds)
+    """
+    def __init__(self, pgid, timeout, grace_period):
+        threading.Thread.__init__(self, daemon=True)
+        self.pgid = pgid
+        self.timeout = timeout
+        self.grace_period = grace_period
+        self.done = threading.Event()
+        self.timedout = False
+    #~ def __init__()
+
+    def _killpg(self, sig):
+        try:
+            os.killpg(self.pgid, sig)
+        except ProcessLookupError:
+            pass
+    #~ def _killpg()
+
+    def run(self):
+        if self.done.wait(self.timeout):
+            return
+        self.timedout = True
+        self._killpg(signal.SIGTERM)
+        if not self.done.wait(self.grace_period):
+            self._killpg(signal.SIGKILL)
+    #~ def run()
+#~ class _TimeoutWatchdog
+
+def _wait4_child(p):
+    """ Reap the child of the Popen object p with wait4 and set its
+        returncode. 
+        Return the resource usage of the child and its reaped descendants
+        (None if the status of the child cannot be obtained)
+    """
+    try:
+        _, sts, rusage = os.wait4(p.pid, 0)
+    except ChildProcessError:
+        # The child is dead but its status cannot be obtained
+        p.returncode = 0
+        return None
+    if os.WIFSIGNALED(sts):
+        p.returncode = -os.WTERMSIG(sts)
+    else:
+        p.returncode = os.WEXITSTATUS(sts)
+    return rusage
+#~ def _wait4_child()
+
 class DriversUtils(object):
 
     ################### Meta to non meta and vice versa ####################
@@ -193,54 +400,262 @@ class DriversUtils(object):
         return True
     #~ def check_tool()
 
+    # Size of the chunks of output given to the output consumer
+    OUTPUT_CHUNK_SIZE = 65536
+
+    # Environment variable set, when the resource usage is collected, to
+    # a file descriptor where the executed program reports the resource
+    # usage of the executions that it delegated to processes that are not
+    # its descendants (e.g. the mutant schemata fork server client), as
+    # a line: <user time (s)> <system time (s)> <max RSS (KB)>
+    # <input blocks> <output blocks>
+    RESOURCE_USAGE_REPORT_FD_ENV_VAR = "MUTERIA_RESOURCE_USAGE_REPORT_FD"
+
+    # Per thread stack of the resource usage collectors
+    _resource_usage_collectors = threading.local()
+
+    @classmethod
+    @contextlib.contextmanager
+    def collect_resource_usage(cls):
+        """ Context manager accumulating the resource usage of all the 
+            executions (see execute_and_get_retcode_out_err) made by the 
+            current thread within the context. The collectors can be nested.
+            Yields the cost dict (see common.matrices.ExecutionCostData)
+            that is updated with each execution.
+        """
+        # Import here since pandas is slow to load (see common_fs)
+        import muteria.common.matrices as common_matrices
+        usage = common_matrices.ExecutionCostData.make_cost()
+        stack = getattr(cls._resource_usage_collectors, 'stack', None)
+        if stack is None:
+            stack = []
+            cls._resource_usage_collectors.stack = stack
+        stack.append(usage)
+        try:
+            yield usage
+        finally:
+            stack.pop()
+    #~ def collect_resource_usage()
+
+    @classmethod
+    def _get_resource_usage_collectors(cls, resource_usage):
+        collectors = list(getattr(cls._resource_usage_collectors, \
+                                                                'stack', []))
+        if resource_usage is not None:
+            collectors.append(resource_usage)
+        return collectors
+    #~ def _get_resource_usage_collectors()
+
+    @classmethod
+    def _read_reported_resource_usage(cls, report_fd):
+        """ Read the resource usage reported by the program on the pipe
+            report_fd (see RESOURCE_USAGE_REPORT_FD_ENV_VAR), without 
+            blocking. 
+            :return: list of the reported cost dicts
+        """
+        # Import here since pandas is slow to load (see common_fs)
+        import muteria.common.matrices as common_matrices
+        os.set_blocking(report_fd, False)
+        data = b''
+        try:
+            while True:
+                chunk = os.read(report_fd, cls.OUTPUT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                data += chunk
+        except BlockingIOError:
+            pass
+        costs = []
+        for line in data.decode('UTF-8', 'replace').splitlines():
+            try:
+                utime, stime, max_rss, inblock, oublock = line.split()
+                costs.append(common_matrices.ExecutionCostData.make_cost(\
+                                cpu_time=float(utime) + float(stime), \
+                                max_rss=int(max_rss), \
+                                io_blocks=int(inblock) + int(oublock)))
+            except ValueError:
+                logging.warning("invalid resource usage report: "+line)
+        return costs
+    #~ def _read_reported_resource_usage()
+
+    @classmethod
+    def _record_resource_usage(cls, rusage, wall_time, resource_usage, \
+                                                        reported_costs=()):
+        collectors = cls._get_resource_usage_collectors(resource_usage)
+        if len(collectors) == 0:
+            return
+        # Import here since pandas is slow to load (see common_fs)
+        import muteria.common.matrices as common_matrices
+        if rusage is None:
+            cost = common_matrices.ExecutionCostData.make_cost(\
+                                                        wall_time=wall_time)
+        else:
+            cost = common_matrices.ExecutionCostData.make_cost(\
+                    wall_time=wall_time, \
+                    cpu_time=rusage.ru_utime + rusage.ru_stime, \
+                    max_rss=rusage.ru_maxrss, \
+                    io_blocks=rusage.ru_inblock + rusage.ru_oublock)
+        for reported in reported_costs:
+            common_matrices.ExecutionCostData.accumulate_cost(cost, reported)
+        for usage in collectors:
+            common_matrices.ExecutionCostData.accumulate_cost(usage, cost)
+    #~ def _record_resource_usage()
+
+    # Per thread stack of the active sandboxes and their violated limits
+    _active_sandboxes = threading.local()
+
+    @classmethod
+    @contextlib.contextmanager
+    def sandboxed_execution(cls, sandbox):
+        """ Context manager running, in the sandbox (see 
+            muteria.drivers.sandbox.ExecutionSandbox), all the executions 
+            (see execute_and_get_retcode_out_err) made by the current 
+            thread within the context. Nothing is sandboxed when sandbox 
+            is None.
+            Yields the list of the resource limits violated by the
+            executions (see muteria.drivers.sandbox.ResourceLimit).
+        """
+        violations = []
+        if sandbox is None:
+            yield violations
+            return
+        stack = getattr(cls._active_sandboxes, 'stack', None)
+        if stack is None:
+            stack = []
+            cls._active_sandboxes.stack = stack
+        stack.append((sandbox, violations))
+        try:
+            yield violations
+        finally:
+            stack.pop()
+    #~ def sandboxed_execution()
+
     @classmethod
     def execute_and_get_retcode_out_err(cls, prog, args_list=[], env=None, \
                             stdin=None, timeout=None, timeout_grace_period=5, \
                             out_on=True, err_on=True, merge_err_to_out=True, \
-                            cwd=None, shell=False):
+                            cwd=None, shell=False, out_consumer=None, \
+                            resource_usage=None):
+        """ Execute the program and return the return code, output and
+            error (str, None if not collected).
+            :param out_consumer: function called with the chunks (bytes)
+                    of the output as they are read. The output is then not
+                    kept (returned as None). Requires the error to be
+                    merged into the output or not collected.
+            :param resource_usage: cost dict (see 
+                    common.matrices.ExecutionCostData) accumulating the
+                    resource usage (wall and CPU time, peak memory and IO)
+                    of the execution, obtained with wait4, and the usage
+                    reported by the program (see 
+                    RESOURCE_USAGE_REPORT_FD_ENV_VAR). 
+                    The usage is also accumulated into the active collectors
+                    (see collect_resource_usage).
+            The execution is made in the active sandbox, if any (see
+            sandboxed_execution).
+        """
         #print(prog, args_list, env is None, timeout, out_on, err_on, merge_err_to_out)
+        if out_consumer is not None:
+            ERROR_HANDLER.assert_true(out_on and \
+                                    (merge_err_to_out or not err_on), \
+                        "out_consumer requires the output, and the error "
+                                    "merged into the output or off", __file__)
         tmp_env = os.environ if env is None else env
         out = subprocess.PIPE if out_on else subprocess.DEVNULL
         if err_on:
             err = subprocess.STDOUT if merge_err_to_out else subprocess.PIPE
         else:
             err = subprocess.DEVNULL
-        # use setsid to kill the process group
-        p = subprocess.Popen([prog]+args_list, env=tmp_env, cwd=cwd, shell=shell, \
-                                                            #close_fds=True, \
+        cmd = [prog] + args_list
+        sandboxed = None
+        sandboxes = getattr(cls._active_sandboxes, 'stack', [])
+        if len(sandboxes) > 0:
+            sandbox, violations = sandboxes[-1]
+            sandboxed = sandbox.start_execution(timeout=timeout)
+            tmp_env = sandboxed.get_env(tmp_env)
+            # The sandbox is set by exec wrappers of the command (no code
+            # between fork and exec)
+            if shell:
+                cmd = ['/bin/sh', '-c'] + cmd
+                shell = False
+            cmd = sandboxed.wrap_command(cmd)
+        report_r, report_w = None, None
+        if len(cls._get_resource_usage_collectors(resource_usage)) > 0:
+            report_r, report_w = os.pipe()
+            tmp_env = dict(tmp_env)
+            tmp_env[cls.RESOURCE_USAGE_REPORT_FD_ENV_VAR] = str(report_w)
+        start_time = time.monotonic()
+        try:
+            # new session (setsid) to kill the process group
+            p = subprocess.Popen(cmd, env=tmp_env, cwd=cwd, \
+                                                        shell=shell, \
+                                                        #close_fds=True, \
                                                         stdin=stdin, \
                                                         stderr=err, \
                                                         stdout=out, \
-                                                        preexec_fn=os.setsid)
+                                pass_fds=() if report_w is None \
+                                                        else (report_w,), \
+                                                    start_new_session=True)
+        except BaseException:
+            if report_r is not None:
+                os.close(report_r)
+            if sandboxed is not None:
+                sandboxed.finish(None)
+            raise
+        finally:
+            if report_w is not None:
+                os.close(report_w)
+        # The outputs are read by threads, while the child is reaped with
+        # wait4 (to get its resource usage). The watchdog terminates the
+        # process group (the child runs in its own session, pgid == pid)
+        # when the child is not reaped or the outputs not closed in time
+        out_chunks, err_chunks = [], []
+        readers = []
+        if p.stdout is not None:
+            readers.append(_OutputReaderThread(p.stdout, \
+                            out_chunks.append if out_consumer is None \
+                                                        else out_consumer, \
+                                                    cls.OUTPUT_CHUNK_SIZE))
+        if p.stderr is not None:
+            readers.append(_OutputReaderThread(p.stderr, err_chunks.append, \
+                                                    cls.OUTPUT_CHUNK_SIZE))
+        for reader in readers:
+            reader.start()
+        watchdog = None
+        if timeout is not None:
+            watchdog = _TimeoutWatchdog(p.pid, timeout, timeout_grace_period)
+            watchdog.start()
+        reported_costs = ()
         try:
-            stdout, stderr = p.communicate(timeout=timeout)
-        except subprocess.TimeoutExpired:
-            #p.terminate() # TODO: Chose the signal to send
-            group_id = os.getpgid(p.pid)
-            #os.killpg(p.pid, signal.SIGTERM)
-            os.killpg(group_id, signal.SIGTERM)
-            #p.send_signal(signal.SIGINT) # TODO: Chose the signal to send
-            # give timeout_grace_period seconds to stop
-            stopped = False
-            for _ in range(timeout_grace_period):
-                if p.poll() is None:
-                    time.sleep(1)
-                else:
-                    stopped = True
-                    break
-            if not stopped:
-                #os.killpg(p.pid, signal.SIGKILL)
-                os.killpg(group_id, signal.SIGKILL)
-                p.kill() # TODO: Chose the signal to send
-            stdout, stderr = p.communicate()
-        if stdout is not None:
-            stdout = stdout.decode('UTF-8', 'backslashreplace')
-        if stderr is not None:
-            stderr = stderr.decode('UTF-8', 'backslashreplace')
-        #retcode = p.wait()
-        retcode = p.poll()
-        ERROR_HANDLER.assert_true(retcode is not None, \
-                                "child process still running after timeout")
+            rusage = _wait4_child(p)
+            for reader in readers:
+                reader.join()
+            if report_r is not None:
+                reported_costs = cls._read_reported_resource_usage(report_r)
+        finally:
+            if report_r is not None:
+                os.close(report_r)
+            if watchdog is not None:
+                watchdog.done.set()
+                watchdog.join()
+            for pipe in (p.stdin, p.stdout, p.stderr):
+                if pipe is not None:
+                    pipe.close()
+        timedout = watchdog is not None and watchdog.timedout
+        for reader in readers:
+            if reader.error is not None:
+                raise reader.error
+        stdout, stderr = None, None
+        if p.stdout is not None and out_consumer is None:
+            stdout = b''.join(out_chunks).decode('UTF-8', 'backslashreplace')
+        if p.stderr is not None:
+            stderr = b''.join(err_chunks).decode('UTF-8', 'backslashreplace')
+        retcode = p.returncode
+        cls._record_resource_usage(rusage, time.monotonic() - start_time, \
+                                            resource_usage, reported_costs)
+        if sandboxed is not None:
+            violation = sandboxed.finish(retcode, timedout=timedout)
+            if violation is not None:
+                violations.append(violation)
         return retcode, stdout, stderr
     #~ def execute_and_get_retcode_out_err()
 
@@ -250,6 +665,21 @@ class DriversUtils(object):
     def update_matrix_to_cover_when_difference(cls, \
                                 target_matrix_file, target_outdata_file, \
                                 comparing_vector_file, comparing_outdata_file):
+        """ Update the target matrix so that each cell is active when the 
+            execution of the target objective (row) with the test (column)
+            differs from the comparing vector's (e.g. original program)
+            execution with the test, inactive otherwise, and uncertain when
+            it differs but the target or the vector cell is uncertain.
+            The difference is computed using the output data when both
+            target_outdata_file and comparing_outdata_file are set, using
+            the matrices active cells otherwise.
+            The computation is done in bulk on NumPy arrays and the matrix
+            is written in one step.
+        """
+        # Import here to not load them when only loading the tools drivers
+        import numpy as np
+        import muteria.common.matrices as common_matrices
+
         ERROR_HANDLER.assert_true(target_matrix_file is not None \
                                 and comparing_vector_file is not None, \
                                 "target or comparing matrix is None", __file__)
@@ -264,13 +694,15 @@ class DriversUtils(object):
                             set(comparing_vector.get_nonkey_colname_list()) \
                                      ) == 0, "Mismatch of columns", __file__)
 
+        target_view = target_matrix.get_view()
+        vector_view = comparing_vector.get_view()
+        cols = target_view.get_col_names()
+        vector_row = vector_view.get_row_keys()[:1]
+        vector_pos = [vector_view.col_pos[c] for c in cols]
+
         # Get uncertain
-        target_uncertain_cols_dict = \
-                                target_matrix.query_uncertain_columns_of_rows()
-        vector_uncertain_cols = \
-                            comparing_vector.query_uncertain_columns_of_rows()
-        vector_uncertain_cols = \
-                    set(vector_uncertain_cols[list(vector_uncertain_cols)[0]])
+        vector_uncertain = vector_view.uncertain[0, vector_pos]
+        uncertain = target_view.uncertain | vector_uncertain[np.newaxis, :]
 
         # Check if outdata and proceed accordingly
         if target_outdata_file is not None and \
@@ -280,62 +712,48 @@ class DriversUtils(object):
                                                 filename=target_outdata_file)
             vector_outdata = common_matrices.OutputLogData(\
                                             filename=comparing_outdata_file)
-
-            _, vector_outdata_uniq = list(\
-                                vector_outdata.get_zip_objective_and_data())[0]
-
-            ## Compare using output
-            timedout_key = common_matrices.OutputLogData.TIMEDOUT
-            key_to_diffs = {}
-            for key, key_data in target_outdata.get_zip_objective_and_data():
-                intersect = set(vector_outdata_uniq) & set(key_data)
-                ERROR_HANDLER.assert_true(set(key_data) == intersect, \
+            target_outdata.assert_compatible_fingerprint_mode(vector_outdata)
+
+            ## Encode the outputs as integers (same code for same output)
+            outlog_codes = {}
+            _, (vector_codes, vector_timedout) = list(\
+                        vector_outdata.get_coded_arrays(cols, \
+                                                        outlog_codes).items())[0]
+            target_coded = target_outdata.get_coded_arrays(cols, outlog_codes)
+
+            ERROR_HANDLER.assert_true(\
+                            set(target_coded) <= set(target_view.row_pos), \
+                            "The target outdata has objectives missing in"
+                            " the target matrix", __file__)
+
+            ## Compare using output, in bulk
+            missing_code = common_matrices.OutputLogData.MISSING_CODE
+            uncertain_code = common_matrices.OutputLogData.UNCERTAIN_CODE
+            diffs = np.zeros(target_view.active.shape, dtype=bool)
+            for key, (codes, timedout) in target_coded.items():
+                present = codes != missing_code
+                ERROR_HANDLER.assert_true(\
+                                not (vector_codes[present] == missing_code)\
+                                                                    .any(), \
                             "The elements in target must all be in vector",\
                                                                     __file__)
-                key_to_diffs[key] = set()
-                for elem in intersect:
-                    ol_equiv = common_matrices.OutputLogData.outlogdata_equiv(\
-                                    key_data[elem], vector_outdata_uniq[elem])
-                    if not ol_equiv:
-                        key_to_diffs[key].add(elem)
+                # Not equivalent when any is uncertain, or when different
+                # and not both timed out (see outlogdata_equiv)
+                ol_equiv = (codes != uncertain_code) & \
+                                    (vector_codes != uncertain_code) & \
+                                    ((codes == vector_codes) | \
+                                                (timedout & vector_timedout))
+                diffs[target_view.row_pos[key]] = present & ~ol_equiv
         else:
             # outdata is not set use difference of matrices
-            ## obtain the active cols for each rows
-            target_active_cols_dict = \
-                                target_matrix.query_active_columns_of_rows()
-            
-            vector_active_cols = \
-                                comparing_vector.query_active_columns_of_rows()
-            vector_active_cols = \
-                        set(vector_active_cols[list(vector_active_cols)[0]])
-
-            ## for each row of target matrix, get diff
-            target_matrix_allcol = set(target_matrix.get_nonkey_colname_list())
-            key_to_diffs = {}
-            for row_key, row_active in target_active_cols_dict.items():
-                key_to_diffs[row_key] = (set(row_active) - vector_active_cols)\
-                                    | (vector_active_cols - set(row_active))
-                key_to_diffs[row_key] &= target_matrix_allcol
-
-        # Clear matrix to inactive
-        target_matrix.clear_cells_to_value(target_matrix.getInactiveCellVal())
-        
-        # Update matrix based on diff
-        for key, diffs in key_to_diffs.items():
-            # gather the uncertain and set to uncertain
-            uncertain = vector_uncertain_cols | \
-                                        set(target_uncertain_cols_dict[key])
-            set_uncertain = uncertain & diffs
-            diffs -= uncertain
-
-            values = {}
-            for col in set_uncertain:
-                values[col] = target_matrix.getUncertainCellDefaultVal()
-            for col in diffs:
-                values[col] = target_matrix.getActiveCellDefaultVal()
-
-            if len(values) > 0:
-                target_matrix.update_cells(key, values)
+            vector_active = vector_view.get_active_array(vector_row, cols)[0]
+            diffs = target_view.active ^ vector_active[np.newaxis, :]
+
+        # Set the cells: inactive, then active or uncertain on differences
+        values = np.full(diffs.shape, target_matrix.getInactiveCellVal())
+        values[diffs & ~uncertain] = target_matrix.getActiveCellDefaultVal()
+        values[diffs & uncertain] = target_matrix.getUncertainCellDefaultVal()
+        target_matrix.set_cells_from_array(values)
 
         target_matrix.serialize()
     #~ def update_matrix_to_cover_when_difference()
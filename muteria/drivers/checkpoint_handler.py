@@ -1,10 +1,32 @@
 
+import os
+import json
+import time
+import fcntl
+import socket
 import logging
+import threading
+import contextlib
 
 import muteria.common.mix as common_mix
 
 ERROR_HANDLER = common_mix.ErrorHandler
 
+# Random identifier of the current process, in the worker ids, so that a
+# lease of a crashed process whose pid is reused by the current process
+# (e.g. pid 1 in containers) is not considered held by the current process.
+# Renewed in the forked processes
+_process_nonce = None
+
+def _renew_process_nonce():
+    global _process_nonce
+    _process_nonce = os.urandom(8).hex()
+#~ def _renew_process_nonce()
+
+_renew_process_nonce()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_renew_process_nonce)
+
 class CheckPointHandler(object):
     FUNC_NAME_KEY = "method_name"
     TASK_ID_KEY = "task_id"
@@ -67,6 +89,17 @@ class CheckPointHandler(object):
         self.used_checkpointer.set_finished( \
                                 detailed_exectime_obj=detailed_exectime_obj)
 
+    def get_work_units(self, func_name, taskid=None, tool=None, \
+                                                        lease_duration=None):
+        """ :return: the WorkUnitsCheckpoint of the work units of the task
+                    (removed when the checkpoint is restarted or destroyed)
+        """
+        name = "_".join([str(v) for v in (func_name, taskid, tool) \
+                                                            if v is not None])
+        return WorkUnitsCheckpoint(\
+                        self.used_checkpointer.get_work_units_filepath(name), \
+                                            lease_duration=lease_duration)
+
     def get_optional_payload(self):
         if self.current_data is None:
             return None
@@ -79,3 +112,311 @@ class CheckPointHandler(object):
         self.used_checkpointer.destroy_checkpoint()
 #~ class CheckPointHandler
 
+
+class WorkUnitsCheckpoint(object):
+    """ Checkpoint of work units (tests, mutants, tools, ...) processed by
+        concurrent workers (threads or processes).
+
+        A worker claims a unit for a lease duration before processing it,
+        then records its completion with its result (payload). The claims
+        and completions are records appended (in a single write) to a JSON
+        lines journal, under an exclusive file lock. Every worker replays
+        the new records of the journal before changing it, so that no
+        record is rewritten and an interruption at any moment only loses
+        the units being processed (claimed but not completed).
+        The units claimed by crashed workers are reclaimed when their lease
+        expires, or as soon as their process is dead (same host). The
+        worker ids contain a random identifier of their process to
+        distinguish a dead process from the current process with the same
+        pid.
+
+        :param journal_filepath: pathname of the journal
+        :param lease_duration: duration (seconds) of the claims
+    """
+    DEFAULT_LEASE_DURATION = 3600.0
+    POLL_INTERVAL = 0.5
+
+    CLAIM_OP = "claim"
+    DONE_OP = "done"
+    RELEASE_OP = "release"
+
+    def __init__(self, journal_filepath, lease_duration=None):
+        self.journal_filepath = journal_filepath
+        self.lock_filepath = journal_filepath + ".lock"
+        if lease_duration is None:
+            lease_duration = self.DEFAULT_LEASE_DURATION
+        ERROR_HANDLER.assert_true(lease_duration > 0, \
+                                    "lease duration must be positive", __file__)
+        self.lease_duration = lease_duration
+        self.thread_lock = threading.RLock()
+        self._reset_state()
+    #~ def __init__()
+
+    def _reset_state(self):
+        # unit -> payload
+        self.done = {}
+        # unit -> (worker, expiration time)
+        self.leases = {}
+        # position of the replayed records in the journal
+        self.offset = 0
+        self.inode = None
+        self.ends_with_newline = True
+    #~ def _reset_state()
+
+    @staticmethod
+    def get_worker_id():
+        """ :return: the identifier of the calling worker (thread):
+                    <host>:<pid>:<process nonce>:<thread id>
+        """
+        return "{}:{}:{}:{}".format(socket.gethostname(), os.getpid(), \
+                                    _process_nonce, threading.get_ident())
+    #~ def get_worker_id()
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """ Lock the journal (threads and processes) and replay the new
+            records
+        """
+        with self.thread_lock:
+            with open(self.lock_filepath, 'a') as lock_fp:
+                fcntl.flock(lock_fp, fcntl.LOCK_EX)
+                try:
+                    self._replay()
+                    yield
+                finally:
+                    fcntl.flock(lock_fp, fcntl.LOCK_UN)
+    #~ def _locked()
+
+    def _replay(self):
+        try:
+            stat = os.stat(self.journal_filepath)
+        except OSError:
+            self._reset_state()
+            return
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            # new or compacted journal
+            self._reset_state()
+            self.inode = stat.st_ino
+        if stat.st_size == self.offset:
+            return
+        with open(self.journal_filepath, 'rb') as fp:
+            fp.seek(self.offset)
+            data = fp.read()
+        # an incomplete last line is left by an interrupted writer
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            self._apply(line)
+        self.offset += end
+        self.ends_with_newline = (end == len(data))
+    #~ def _replay()
+
+    def _apply(self, line):
+        if len(line.strip()) == 0:
+            return
+        try:
+            record = json.loads(line.decode('utf-8'))
+        except ValueError:
+            logging.warning("Skipping a corrupted record of the journal {}"\
+                                            .format(self.journal_filepath))
+            return
+        unit = record['unit']
+        if record['op'] == self.CLAIM_OP:
+            if unit not in self.done:
+                self.leases[unit] = (record['worker'], record['expires'])
+        elif record['op'] == self.DONE_OP:
+            # the first completion is kept
+            if unit not in self.done:
+                self.done[unit] = record.get('payload', None)
+            self.leases.pop(unit, None)
+        elif record['op'] == self.RELEASE_OP:
+            self.leases.pop(unit, None)
+    #~ def _apply()
+
+    def _append(self, records):
+        """ Append the records (in a single write) and replay them.
+            Must be called with the lock
+        """
+        data = "".join([json.dumps(r) + "\n" for r in records])\
+                                                            .encode('utf-8')
+        if not self.ends_with_newline:
+            data = b'\n' + data
+        fd = os.open(self.journal_filepath, \
+                                os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            while len(data) > 0:
+                data = data[os.write(fd, data):]
+        finally:
+            os.close(fd)
+        self._replay()
+    #~ def _append()
+
+    def _is_live(self, lease, worker, now):
+        """ check whether the lease is held by another live worker
+        """
+        holder, expires = lease
+        if holder == worker or expires <= now:
+            return False
+        # <host>:<pid>:<nonce>:<thread id>, or <host>:<pid>:<thread id>
+        # before the process nonce
+        parts = holder.split(':')
+        if len(parts) not in (3, 4) or parts[0] != socket.gethostname():
+            return True
+        if parts[1] == str(os.getpid()):
+            # held by another thread of the current process, or by a dead
+            # process that had the same pid
+            return len(parts) == 4 and parts[2] == _process_nonce
+        try:
+            os.kill(int(parts[1]), 0)
+        except ProcessLookupError:
+            # the holder process is dead
+            return False
+        except (OSError, ValueError):
+            pass
+        return True
+    #~ def _is_live()
+
+    def _claim_locked(self, unit, worker, now):
+        if unit in self.done:
+            return False
+        lease = self.leases.get(unit, None)
+        if lease is not None and self._is_live(lease, worker, now):
+            return False
+        self._append([{'op': self.CLAIM_OP, 'unit': unit, 'worker': worker, \
+                                    'expires': now + self.lease_duration}])
+        return True
+    #~ def _claim_locked()
+
+    def claim(self, unit, worker=None):
+        """ Claim (or renew the claim of) the unit.
+            :return: True if claimed, False if completed or claimed by
+                    another live worker
+        """
+        if worker is None:
+            worker = self.get_worker_id()
+        with self._locked():
+            return self._claim_locked(unit, worker, time.time())
+    #~ def claim()
+
+    def claim_next(self, units, worker=None):
+        """ Claim the first claimable unit of the list units.
+            :return: the claimed unit, None if there is none
+        """
+        if worker is None:
+            worker = self.get_worker_id()
+        with self._locked():
+            now = time.time()
+            for unit in units:
+                if self._claim_locked(unit, worker, now):
+                    return unit
+        return None
+    #~ def claim_next()
+
+    def complete(self, unit, payload=None, worker=None):
+        """ Record the completion of the unit with its result (JSON
+            serializable)
+        """
+        if worker is None:
+            worker = self.get_worker_id()
+        with self._locked():
+            self._append([{'op': self.DONE_OP, 'unit': unit, \
+                                    'worker': worker, 'payload': payload}])
+    #~ def complete()
+
+    def release(self, unit, worker=None):
+        """ Give up the claim of the unit (not completed)
+        """
+        if worker is None:
+            worker = self.get_worker_id()
+        with self._locked():
+            lease = self.leases.get(unit, None)
+            if lease is not None and lease[0] == worker:
+                self._append([{'op': self.RELEASE_OP, 'unit': unit, \
+                                                        'worker': worker}])
+    #~ def release()
+
+    def reclaim_expired(self):
+        """ Release the units claimed by crashed workers (expired leases or
+            dead processes), to be called on resume.
+            :return: the list of the released units
+        """
+        with self._locked():
+            now = time.time()
+            expired = [u for u, lease in self.leases.items() \
+                                    if not self._is_live(lease, None, now)]
+            if len(expired) > 0:
+                logging.debug("Reclaiming {} units of {}".format(\
+                                        len(expired), self.journal_filepath))
+                self._append([{'op': self.RELEASE_OP, 'unit': u, \
+                                        'worker': None} for u in expired])
+        return expired
+    #~ def reclaim_expired()
+
+    def wait_for(self, unit, worker=None):
+        """ Wait until the unit is completed or its claim is not live.
+            :return: the pair of whether the unit is completed and its
+                    payload
+        """
+        if worker is None:
+            worker = self.get_worker_id()
+        while True:
+            with self._locked():
+                if unit in self.done:
+                    return True, self.done[unit]
+                lease = self.leases.get(unit, None)
+                if lease is None or \
+                            not self._is_live(lease, worker, time.time()):
+                    return False, None
+            time.sleep(self.POLL_INTERVAL)
+    #~ def wait_for()
+
+    def get_done(self):
+        """ :return: dict of the completed units and their payload
+        """
+        with self._locked():
+            return dict(self.done)
+    #~ def get_done()
+
+    def is_done(self, unit):
+        with self._locked():
+            return unit in self.done
+    #~ def is_done()
+
+    def get_claimed(self):
+        """ :return: dict of the units claimed by live workers and their
+                    worker
+        """
+        with self._locked():
+            now = time.time()
+            return {u: lease[0] for u, lease in self.leases.items() \
+                                        if self._is_live(lease, None, now)}
+    #~ def get_claimed()
+
+    def compact(self):
+        """ Rewrite the journal with only the completions and the live
+            claims (atomically)
+        """
+        with self._locked():
+            now = time.time()
+            records = [{'op': self.DONE_OP, 'unit': u, 'worker': None, \
+                                'payload': p} for u, p in self.done.items()]
+            records += [{'op': self.CLAIM_OP, 'unit': u, 'worker': l[0], \
+                        'expires': l[1]} for u, l in self.leases.items() \
+                                        if self._is_live(l, None, now)]
+            tmp_file = self.journal_filepath + ".tmp"
+            with open(tmp_file, 'w') as fp:
+                for record in records:
+                    fp.write(json.dumps(record) + "\n")
+                fp.flush()
+                os.fsync(fp.fileno())
+            os.replace(tmp_file, self.journal_filepath)
+            self._replay()
+    #~ def compact()
+
+    def destroy(self):
+        with self.thread_lock:
+            for fn in (self.journal_filepath, self.lock_filepath):
+                if os.path.isfile(fn):
+                    os.remove(fn)
+            self._reset_state()
+    #~ def destroy()
+#~ class WorkUnitsCheckpoint
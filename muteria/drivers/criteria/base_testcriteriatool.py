@@ -29,6 +29,7 @@ import muteria.common.mix as common_mix
 from muteria.drivers.checkpoint_handler import CheckPointHandler
 from muteria.drivers.criteria import TestCriteria
 from muteria.drivers import DriversUtils
+import muteria.controller.logging_setup as logging_setup
 
 ERROR_HANDLER = common_mix.ErrorHandler
 
@@ -177,17 +178,19 @@ class BaseCriteriaTool(abc.ABC):
                 os.mkdir(result_dir_tmp, mode=0o777)
 
                 # run testcase
+                exec_env_vars = self._get_test_execution_environment_vars(\
+                                                    cg_criteria, cg_env_vars)
                 test_verdict = self.meta_test_generation_obj.execute_testcase(\
                                             testcase, \
                                             exe_path_map=cg_exe_path_map, \
-                                            env_vars=cg_env_vars,\
+                                            env_vars=exec_env_vars,\
                                             use_recorded_timeout_times=\
                                                                 timeout_times)
                 
                 # Collect temporary data into result_dir_tmp
                 self._collect_temporary_coverage_data(\
                                                 cg_criteria, test_verdict, \
-                                                cg_env_vars, result_dir_tmp, \
+                                                exec_env_vars, result_dir_tmp, \
                                                 testcase)
 
                 # extract coverage
@@ -283,6 +286,9 @@ class BaseCriteriaTool(abc.ABC):
                                                 os.path.isfile(outlog_datfile):
                     os.remove(outlog_datfile)
 
+                criterion_to_executionoutput[criterion].set_fingerprint_mode(\
+                                    self.meta_test_generation_obj\
+                                        .get_outlog_fingerprint_mode_name())
                 criterion_to_executionoutput[criterion].add_data(\
                                     criterion2metaoutlog_per_test[criterion], \
                                     serialize=True)
@@ -299,12 +305,17 @@ class BaseCriteriaTool(abc.ABC):
                                     checkpoint_handler=None, \
                                     cp_calling_func_name=None, \
                                     cp_calling_done_task_id=None, \
-                                    cp_calling_tool=None):
+                                    cp_calling_tool=None, \
+                                    executioncost=None):
         '''
-        Note: Here the temporary matrix is used as checkpoint 
-                (with frequency the 'serialize_period' parameter). 
-            The checkpointer is mainly used for the execution time
-            (TODO: support parallelism: per test outdata)
+        Note: Here the criteria elements are the work units of the
+                checkpoint, each executed element is recorded (see
+                muteria.drivers.checkpoint_handler.WorkUnitsCheckpoint).
+            The checkpointer is also used for the execution time
+                (with frequency the 'serialize_period' parameter).
+            When executioncost (ExecutionCostData) is not None, the 
+                resource usage cost of each test execution on each element
+                is recorded into it.
         '''
         # FIXME: Support parallelism, then remove the code
         # bellow:
@@ -317,20 +328,47 @@ class BaseCriteriaTool(abc.ABC):
             ERROR_HANDLER.assert_true(cp_calling_func_name is not None)
             ERROR_HANDLER.assert_true(cp_calling_done_task_id is not None)
             ERROR_HANDLER.assert_true(cp_calling_tool is not None)
-            cp_data = checkpoint_handler.get_optional_payload()
-            if cp_data is None:
-                cp_data = [{}, {}]
+            work_units = checkpoint_handler.get_work_units(\
+                                                    cp_calling_func_name, \
+                                                    cp_calling_done_task_id, \
+                                                    cp_calling_tool)
+            work_units.reclaim_expired()
         else:
-            cp_data = [{}, {}]
-
+            work_units = None
+
+        # matrix rows, execution outputs and execution costs of the 
+        # executed elements
+        cp_data = [{}, {}, {}]
+        def _load_completed(element, payload):
+            cp_data[0][element] = payload[0]
+            if payload[1] is not None:
+                cp_data[1][element] = payload[1]
+            # The payloads of older checkpoints have no cost
+            if len(payload) > 2 and payload[2] is not None:
+                cp_data[2][element] = payload[2]
+        #~ def _load_completed()
+        if work_units is not None:
+            for element, payload in work_units.get_done().items():
+                _load_completed(element, payload)
+
+        # (The resource limit verdicts are first so that their value is 
+        # reversed as a failure when it is the active default value)
         failverdict_to_val_map = {
+                    limit_verdict: matrix.getResourceLimitCellVal(limit_index) \
+                        for limit_index, limit_verdict in enumerate(\
+                        common_mix.GlobalConstants.RESOURCE_LIMIT_TEST_VERDICTS)
+        }
+        failverdict_to_val_map.update({
                     common_mix.GlobalConstants.FAIL_TEST_VERDICT: \
                                             matrix.getActiveCellDefaultVal(),
                     common_mix.GlobalConstants.PASS_TEST_VERDICT: \
                                             matrix.getInactiveCellVal(), 
                     common_mix.GlobalConstants.UNCERTAIN_TEST_VERDICT: \
                                             matrix.getUncertainCellDefaultVal()
-        }
+        })
+
+        val_to_failverdict_map = {v: k for k, v in \
+                                            failverdict_to_val_map.items()}
 
         assert serialize_period >= 1, \
                             "Serialize period must be an integer in [1,inf["
@@ -342,14 +380,87 @@ class BaseCriteriaTool(abc.ABC):
             criteria_element_list = self.get_criterion_info_object(criterion).\
                                                             get_elements_list()
 
+        # Only execute one element per trivial compiler equivalence class
+        criteria_element_list, fan_out_map = \
+                            self._get_tce_executed_elements(criterion, \
+                                                        criteria_element_list)
+
         ERROR_HANDLER.assert_true(prioritization_module is not None, 
                                         "prioritization module must be passed")
             
         timeout_times = \
                     self.config.SEPARATED_TEST_EXECUTION_EXTRA_TIMEOUT_TIMES
 
+        def _execute_element(element, pos):
+            logging.debug("# Executing {} element {} ({}/{}) ...".format( \
+                                criterion.get_str(), \
+                                DriversUtils.make_meta_element(element, \
+                                    self.config.get_tool_config_alias()), \
+                                pos, num_elems))
+
+            # execute element with the given testcases
+            element_executable_path = \
+                            self._get_criterion_element_executable_path(\
+                                                        criterion, element)
+            execution_environment_vars = \
+                            self._get_criterion_element_environment_vars(\
+                                                        criterion, element)
+            # run optimizer with all tests of targeting the test objective
+            may_cov_tests = prioritization_module\
+                                    .get_test_execution_optimizer(element)\
+                                    .select_tests(100, is_proportion=True)
+
+            cannot_cov_tests = set(testcases) - set(may_cov_tests)
+                
+            exec_costs_by_tests = \
+                                None if executioncost is None else {}
+            with logging_setup.log_context(\
+                                tool=self.config.get_tool_config_alias(), \
+                                element=\
+                                DriversUtils.make_meta_element(element, \
+                                    self.config.get_tool_config_alias())):
+                fail_verdicts, exec_outs_by_tests = \
+                                self.meta_test_generation_obj.runtests(\
+                                    meta_testcases=may_cov_tests, \
+                                    exe_path_map=element_executable_path, \
+                                    env_vars=execution_environment_vars, \
+                                    stop_on_failure=\
+                                            cover_criteria_elements_once, \
+                                    use_recorded_timeout_times=\
+                                                        timeout_times, \
+                                    with_output_summary=(executionoutput \
+                                                            is not None), \
+                                    parallel_test_count=None, \
+                                    restart_checkpointer=True, \
+                                    execution_costs=exec_costs_by_tests)
+            prioritization_module.feedback(element, fail_verdicts)
+
+            fail_verdicts.update({\
+                        v: common_mix.GlobalConstants.PASS_TEST_VERDICT \
+                                            for v in cannot_cov_tests})
+            # put in row format for matrix
+            matrix_row_key = element
+            matrix_row_values = \
+                            {tc:failverdict_to_val_map[fail_verdicts[tc]] \
+                                                for tc in fail_verdicts}
+            cp_data[0][matrix_row_key] = matrix_row_values
+
+            if executionoutput is not None:
+                cp_data[1][element] = exec_outs_by_tests
+            if executioncost is not None:
+                cp_data[2][element] = exec_costs_by_tests
+
+            # @Checkpointing: record the element
+            if work_units is not None:
+                work_units.complete(element, [matrix_row_values, \
+                                            cp_data[1].get(element, None),\
+                                            cp_data[2].get(element, None)])
+        #~ def _execute_element()
+
         # in case the test list is empty, do nothing
         if len(testcases) > 0:
+            self._setup_separated_execution(criterion)
+
             # main loop for elements execution
             num_elems = len(criteria_element_list)
             pos = -1 + len(completed_elems)
@@ -360,68 +471,56 @@ class BaseCriteriaTool(abc.ABC):
                 #pos += 1 # Done bellow in the case where it was not completed
                 element = prioritization_module.get_next_test_objective()
 
+                # @Checkpointing: claim the element. It was executed by
+                # another worker when it cannot be claimed
+                if element not in completed_elems and work_units is not None:
+                    while not work_units.claim(element):
+                        completed, payload = work_units.wait_for(element)
+                        if completed:
+                            _load_completed(element, payload)
+                            completed_elems.add(element)
+                            break
+
                 # @Checkpointing: check if already executed
                 if element in completed_elems:
+                    # replay the feedback of the execution
+                    prioritization_module.feedback(element, \
+                                    {tc: val_to_failverdict_map[val] \
+                                        for tc, val in \
+                                            cp_data[0][element].items()})
                     continue
                 else:
                     pos += 1
 
-                logging.debug("# Executing {} element {} ({}/{}) ...".format( \
-                                    criterion.get_str(), \
-                                    DriversUtils.make_meta_element(element, \
-                                        self.config.get_tool_config_alias()), \
-                                    pos, num_elems))
-
-                # execute element with the given testcases
-                element_executable_path = \
-                                self._get_criterion_element_executable_path(\
-                                                            criterion, element)
-                execution_environment_vars = \
-                                self._get_criterion_element_environment_vars(\
-                                                            criterion, element)
-                # run optimizer with all tests of targeting the test objective
-                may_cov_tests = prioritization_module\
-                                        .get_test_execution_optimizer(element)\
-                                        .select_tests(100, is_proportion=True)
-
-                cannot_cov_tests = set(testcases) - set(may_cov_tests)
-                
-                fail_verdicts, exec_outs_by_tests = \
-                                    self.meta_test_generation_obj.runtests(\
-                                        meta_testcases=may_cov_tests, \
-                                        exe_path_map=element_executable_path, \
-                                        env_vars=execution_environment_vars, \
-                                        stop_on_failure=\
-                                                cover_criteria_elements_once, \
-                                        use_recorded_timeout_times=\
-                                                            timeout_times, \
-                                        with_output_summary=(executionoutput \
-                                                                is not None), \
-                                        parallel_test_count=None, \
-                                        restart_checkpointer=True)
-                prioritization_module.feedback(element, fail_verdicts)
-
-                fail_verdicts.update({\
-                            v: common_mix.GlobalConstants.PASS_TEST_VERDICT \
-                                                for v in cannot_cov_tests})
-                # put in row format for matrix
-                matrix_row_key = element
-                matrix_row_values = \
-                                {tc:failverdict_to_val_map[fail_verdicts[tc]] \
-                                                    for tc in fail_verdicts}
-                serialize_on = (pos % serialize_period == 0)
-                cp_data[0][matrix_row_key] = matrix_row_values
+                # @Checkpointing: the claim is released when the execution
+                # fails
+                try:
+                    _execute_element(element, pos)
+                except BaseException:
+                    if work_units is not None:
+                        work_units.release(element)
+                    raise
 
-                if executionoutput is not None:
-                    cp_data[1][element] = exec_outs_by_tests
+                serialize_on = (pos % serialize_period == 0)
 
                 # @Checkpointing: for time
                 if serialize_on and checkpoint_handler is not None:
                     checkpoint_handler.do_checkpoint( \
                                             func_name=cp_calling_func_name, \
                                             taskid=cp_calling_done_task_id, \
-                                            tool=cp_calling_tool, \
-                                            opt_payload=cp_data)
+                                            tool=cp_calling_tool)
+
+            self._teardown_separated_execution(criterion)
+
+        # Fan out the results of the executed elements to the other members
+        # of their trivial compiler equivalence class
+        for member, executed in list(fan_out_map.items()):
+            if executed in cp_data[0]:
+                cp_data[0][member] = cp_data[0][executed]
+                if executed in cp_data[1]:
+                    cp_data[1][member] = cp_data[1][executed]
+                if executed in cp_data[2]:
+                    cp_data[2][member] = cp_data[2][executed]
 
         # Write the execution data into the matrix
         for matrix_row_key, matrix_row_values in list(cp_data[0].items()):
@@ -434,12 +533,53 @@ class BaseCriteriaTool(abc.ABC):
 
         # Write the execution output data
         if executionoutput is not None:
+            executionoutput.set_fingerprint_mode(self.meta_test_generation_obj\
+                                        .get_outlog_fingerprint_mode_name())
             if len(cp_data[1]) > 0:
                 executionoutput.add_data(cp_data[1], serialize=True)
             else:
                 executionoutput.serialize()
+
+        # Write the execution cost data
+        if executioncost is not None:
+            executioncost.add_data(cp_data[2], override_existing=True, \
+                                                                serialize=True)
     #~ def _runtest_separate_criterion_program()
 
+    def _get_tce_executed_elements(self, criterion, criteria_element_list):
+        """ Use the trivial compiler equivalence classes recorded in the
+            criterion info object to only execute, for each class, its first
+            element in criteria_element_list.
+            :return: pair of the list of elements to execute and the dict
+                    of each non executed element to the executed element of
+                    its class
+        """
+        classes = self.get_criterion_info_object(criterion)\
+                                                    .get_equivalence_classes()
+        if len(classes) == 0:
+            return criteria_element_list, {}
+        elem_to_rep = {}
+        for rep, members in classes.items():
+            for elem in [rep] + members:
+                elem_to_rep[elem] = rep
+        rep_to_executed = {}
+        executed_elements = []
+        fan_out_map = {}
+        for elem in criteria_element_list:
+            rep = elem_to_rep.get(elem, elem)
+            if rep in rep_to_executed:
+                fan_out_map[elem] = rep_to_executed[rep]
+            else:
+                rep_to_executed[rep] = elem
+                executed_elements.append(elem)
+        if len(fan_out_map) > 0:
+            logging.debug("# TCE: {} of the {} {} elements are not executed"\
+                                " (duplicates)".format(len(fan_out_map), \
+                                        len(criteria_element_list), \
+                                                        criterion.get_str()))
+        return executed_elements, fan_out_map
+    #~ def _get_tce_executed_elements()
+
     def runtests_criteria_coverage (self, testcases, \
                                     criteria_element_list_by_criteria, \
                                     criterion_to_matrix, \
@@ -447,9 +587,13 @@ class BaseCriteriaTool(abc.ABC):
                                     re_instrument_code=True, \
                                     cover_criteria_elements_once=False, \
                                     prioritization_module_by_criteria=None, \
-                                    test_parallel_count=1):
+                                    test_parallel_count=1, \
+                                    criterion_to_executioncost=None):
         """
             (TODO: support parallelism: per test outdata)
+            The execution costs (criterion_to_executioncost) are only
+            collected for the separately instrumented criteria, since the
+            elements of a meta instrumented program are executed together.
         """
         # FIXME: Support parallelism, then remove the code
         # bellow:
@@ -569,7 +713,11 @@ class BaseCriteriaTool(abc.ABC):
                                 checkpoint_handler=checkpoint_handler, \
                                 cp_calling_func_name=cp_func_name, \
                                 cp_calling_done_task_id=(cp_task_id - 1), \
-                                cp_calling_tool=criterion.get_str())
+                                cp_calling_tool=criterion.get_str(), \
+                                executioncost=(None \
+                                        if criterion_to_executioncost is None \
+                                    else criterion_to_executioncost.get(\
+                                                        criterion, None)))
 
                 # @Checkpoint: checkpoint
                 checkpoint_handler.do_checkpoint(func_name=cp_func_name, \
@@ -623,17 +771,17 @@ class BaseCriteriaTool(abc.ABC):
                                 code_builds_factory_override=None, \
                                 parallel_count=1):
         '''
-            (TODO: support parallelism: per test outdata)
+            :param parallel_count: maximum number of concurrent jobs that
+                    the tool may use for the instrumentation (e.g. mutants
+                    compilation). Tools without parallel support ignore it.
         '''
 
         logging.debug("# Instrumenting code with {} ...".format(\
                                         self.config.get_tool_config_alias()))
 
-        # FIXME: Support parallelism, then remove the code
-        # bellow:
-        ERROR_HANDLER.assert_true(parallel_count <= 1, \
-                "FIXME: Must first implement support for parallel mutatio")
-        #~ FXIMEnd
+        ERROR_HANDLER.assert_true(parallel_count > 0, \
+                    "invalid parallel count: {}".format(parallel_count), \
+                                                                    __file__)
 
         # @Checkpoint: create a checkpoint handler (for time)
         checkpoint_handler = CheckPointHandler(self.get_checkpointer())
@@ -760,6 +908,32 @@ class BaseCriteriaTool(abc.ABC):
         print ("!!! Must be implemented in child class !!!")
     #~ def _get_criterion_element_environment_vars()
 
+    def _setup_separated_execution(self, criterion):
+        ''' Called before the execution of the elements of the separated
+            criterion (e.g. to start an execution server). 
+            Does nothing by default
+        '''
+        pass
+    #~ def _setup_separated_execution()
+
+    def _teardown_separated_execution(self, criterion):
+        ''' Called after the execution of the elements of the separated
+            criterion. Does nothing by default
+        '''
+        pass
+    #~ def _teardown_separated_execution()
+
+    def _get_test_execution_environment_vars(self, criteria_name_list, \
+                                                                env_vars):
+        ''' Environment variables of a single test execution of the meta
+            criteria program, given the environment variables of the
+            criteria (see _get_criteria_environment_vars). They are also
+            passed to _collect_temporary_coverage_data.
+            Returns env_vars by default
+        '''
+        return env_vars
+    #~ def _get_test_execution_environment_vars()
+
     @abc.abstractmethod
     def _get_criteria_environment_vars(self, result_dir_tmp, enabled_criteria):
         '''
@@ -7,13 +7,18 @@ import muteria.common.fs as common_fs
 import muteria.common.mix as common_mix
 
 from muteria.drivers.criteria import TestCriteria
+from muteria.drivers.criteria.tce import TrivialCompilerEquivalence
 
 ERROR_HANDLER = common_mix.ErrorHandler
 
+TCE_CLASSES_KEY = TrivialCompilerEquivalence.CLASSES_KEY
+TCE_EQUIVALENT_KEY = TrivialCompilerEquivalence.EQUIVALENT_KEY
+
 class CriterionElementInfoObject(object):
     DATA_KEY = "DATA"
     SUMMARY_KEY = "SUMMARY"
     CUSTOM_KEY = "CUSTOM"
+    TCE_KEY = "TCE"
     def __init__(self):
         self.data = {
             self.DATA_KEY: {},
@@ -92,6 +97,43 @@ class CriterionElementInfoObject(object):
     def get_custom(self):
         return self.data[self.CUSTOM_KEY]
     #~ def get_custom():
+
+    def set_equivalence_classes(self, tce_data):
+        """ Record the trivial compiler equivalence classes of the elements
+            (see muteria.drivers.criteria.tce), restricted to the elements
+            present in this
+        """
+        classes = {}
+        for rep, members in tce_data[TCE_CLASSES_KEY].items():
+            members = [m for m in [rep] + members if self.has_element(m)]
+            if len(members) > 1:
+                classes[members[0]] = members[1:]
+        equivalent = [e for e in tce_data[TCE_EQUIVALENT_KEY] \
+                                                    if self.has_element(e)]
+        if self.data[self.CUSTOM_KEY] is None:
+            self.data[self.CUSTOM_KEY] = {}
+        self.data[self.CUSTOM_KEY][self.TCE_KEY] = {
+            TCE_CLASSES_KEY: classes,
+            TCE_EQUIVALENT_KEY: equivalent,
+        }
+    #~ def set_equivalence_classes()
+
+    def get_equivalence_classes(self):
+        """ :return: dict representative -> list of the other members of
+                    its class (empty if no class was recorded)
+        """
+        if self.data[self.CUSTOM_KEY] is None or \
+                            self.TCE_KEY not in self.data[self.CUSTOM_KEY]:
+            return {}
+        return self.data[self.CUSTOM_KEY][self.TCE_KEY][TCE_CLASSES_KEY]
+    #~ def get_equivalence_classes()
+
+    def get_likely_equivalent_elements(self):
+        if self.data[self.CUSTOM_KEY] is None or \
+                            self.TCE_KEY not in self.data[self.CUSTOM_KEY]:
+            return []
+        return self.data[self.CUSTOM_KEY][self.TCE_KEY][TCE_EQUIVALENT_KEY]
+    #~ def get_likely_equivalent_elements()
 #~ class CriterionElementInfoObject(object):
 
 class MutantsInfoObject(CriterionElementInfoObject):
@@ -0,0 +1,221 @@
+""" Criteria elements (e.g. mutants) selection.
+
+    The selection techniques are:
+    - RANDOM: simple random sampling.
+    - STRATIFIED_BY_OPERATOR, STRATIFIED_BY_FUNCTION, STRATIFIED_BY_FILE:
+            stratified random sampling, with strata the mutation operators,
+            functions or source files of the elements. The sample size of
+            each stratum is proportional to the stratum size, and every
+            stratum has at least one element when the sample size permits.
+    - OPERATOR_BASED: only the elements of the given operators (mutant
+            types), randomly sampled.
+    - DOMINANCE_PRUNING: pruning of the redundant elements using an
+            existing matrix: the elements with the same killing tests as
+            another element, and the elements subsumed by another element
+            (killed by all the tests that kill it) are removed. The elements
+            without killing tests or not in the matrix are kept.
+
+    The selection is reproducible: the random generator is seeded with the
+    selector's seed, and the selected elements are ordered so that every
+    prefix of the selection is itself a (stratified) random sample, which
+    allows incremental sampling (see the INCREMENTAL_SAMPLING criteria
+    optimizer).
+"""
+
+from __future__ import print_function
+
+import os
+import random
+import logging
+
+import muteria.common.mix as common_mix
+import muteria.common.matrices as common_matrices
+
+ERROR_HANDLER = common_mix.ErrorHandler
+
+class CriteriaElementSelectionTechniques(common_mix.EnumAutoName):
+    RANDOM = "random"
+    STRATIFIED_BY_OPERATOR = "stratified_by_operator"
+    STRATIFIED_BY_FUNCTION = "stratified_by_function"
+    STRATIFIED_BY_FILE = "stratified_by_file"
+    OPERATOR_BASED = "operator_based"
+    DOMINANCE_PRUNING = "dominance_pruning"
+#~ class CriteriaElementSelectionTechniques
+
+class CriteriaElementSelector(object):
+    """ Select the criteria elements using a technique of
+        CriteriaElementSelectionTechniques.
+        :param seed: seed of the random generator. A random seed is
+                    chosen when None (see get_seed)
+        :param operators: list of the operators (mutant types) kept by the
+                    OPERATOR_BASED technique
+    """
+    # legacy name of the random selection
+    DUMMY_RANDOM = 'DummyRandom'
+
+    def __init__(self, seed=None, operators=None):
+        if seed is None:
+            seed = random.SystemRandom().randrange(2**32)
+        self.seed = seed
+        self.operators = operators
+    #~ def __init__()
+
+    def get_seed(self):
+        return self.seed
+    #~ def get_seed()
+
+    @classmethod
+    def get_technique(cls, technique):
+        """ :return: the CriteriaElementSelectionTechniques of technique
+                (the technique or its name), or None if technique is not a
+                technique
+        """
+        if isinstance(technique, CriteriaElementSelectionTechniques):
+            return technique
+        if technique == cls.DUMMY_RANDOM:
+            return CriteriaElementSelectionTechniques.RANDOM
+        if isinstance(technique, str) and CriteriaElementSelectionTechniques\
+                                                .has_element_named(technique):
+            return CriteriaElementSelectionTechniques[technique]
+        return None
+    #~ def get_technique()
+
+    def select(self, technique, element_list, sel_count, info_obj=None, \
+                                        matrix_file=None, rng_salt=None):
+        """ Select at most sel_count elements of element_list
+            :param technique: CriteriaElementSelectionTechniques or its name
+            :param info_obj: criterion info object of the elements (for
+                        the stratified and operator based techniques)
+            :param matrix_file: matrix of the elements (for the dominance
+                        pruning)
+            :param rng_salt: string combined with the seed (to have
+                        different samples for different criteria)
+            :return: list of the selected elements
+        """
+        tech = self.get_technique(technique)
+        ERROR_HANDLER.assert_true(tech is not None, \
+                "invalid criteria element selection technique: {}".format(\
+                                                        technique), __file__)
+        ERROR_HANDLER.assert_true(sel_count > 0, \
+                                "selection number must be positive", __file__)
+        rng = random.Random("{}:{}".format(self.seed, rng_salt))
+        # sorted for reproducibility
+        elements = sorted(set(element_list))
+
+        if tech == CriteriaElementSelectionTechniques.OPERATOR_BASED:
+            ERROR_HANDLER.assert_true(self.operators is not None, \
+                        "operators must be specified for the operator "
+                                                "based selection", __file__)
+            ops = set(self.operators)
+            elements = [e for e in elements \
+                                if self._get_stratum(tech, e, info_obj) in ops]
+        elif tech == CriteriaElementSelectionTechniques.DOMINANCE_PRUNING:
+            elements = self.prune_redundant(elements, matrix_file)
+
+        if tech in (CriteriaElementSelectionTechniques.STRATIFIED_BY_OPERATOR,
+                    CriteriaElementSelectionTechniques.STRATIFIED_BY_FUNCTION,
+                    CriteriaElementSelectionTechniques.STRATIFIED_BY_FILE):
+            strata = {}
+            for e in elements:
+                strata.setdefault(\
+                        self._get_stratum(tech, e, info_obj), []).append(e)
+            return self.stratified_sample(strata, sel_count, rng)
+        return rng.sample(elements, min(sel_count, len(elements)))
+    #~ def select()
+
+    @staticmethod
+    def _get_stratum(technique, element, info_obj):
+        if info_obj is None or not info_obj.has_element(element):
+            return None
+        data = info_obj.get_element_data(element)
+        if technique in (CriteriaElementSelectionTechniques.OPERATOR_BASED, \
+                    CriteriaElementSelectionTechniques.STRATIFIED_BY_OPERATOR):
+            return data.get('mutant_type', None)
+        if technique == CriteriaElementSelectionTechniques\
+                                                    .STRATIFIED_BY_FUNCTION:
+            return data.get('mutant_function_name', None)
+        # by file
+        srclocs = data.get('mutant_srclocs', None)
+        if isinstance(srclocs, (list, tuple)):
+            srclocs = srclocs[0] if len(srclocs) > 0 else None
+        if not srclocs:
+            return None
+        return str(srclocs).split(':')[0]
+    #~ def _get_stratum()
+
+    @staticmethod
+    def stratified_sample(strata, sel_count, rng):
+        """ Stratified random sample with proportional allocation.
+            :param strata: dict of stratum and its list of elements
+            :return: the list of selected elements, interleaved so that
+                    every prefix is approximately stratified
+        """
+        keys = sorted(strata, key=str)
+        total = sum(len(strata[k]) for k in keys)
+        sel_count = min(sel_count, total)
+        if sel_count == 0:
+            return []
+
+        # proportional allocation (largest remainder)
+        exact = {k: sel_count * len(strata[k]) / float(total) for k in keys}
+        alloc = {k: int(exact[k]) for k in keys}
+        left = sel_count - sum(alloc.values())
+        by_frac = sorted(keys, key=lambda k: \
+                                    (-(exact[k] - int(exact[k])), str(k)))
+        for k in by_frac[:left]:
+            alloc[k] += 1
+
+        # every stratum has one element if possible (taken from the
+        # largest allocations)
+        if sel_count >= len(keys):
+            for k in keys:
+                if alloc[k] == 0:
+                    donor = max(keys, key=lambda d: (alloc[d], str(d)))
+                    alloc[donor] -= 1
+                    alloc[k] += 1
+
+        # sample and interleave (systematic positions within [0, 1))
+        keyed = []
+        for k in keys:
+            sample = rng.sample(strata[k], alloc[k])
+            offset = rng.random()
+            for i, e in enumerate(sample):
+                keyed.append(((i + offset) / alloc[k], e))
+        keyed.sort(key=lambda x: (x[0], x[1]))
+        return [e for _, e in keyed]
+    #~ def stratified_sample()
+
+    @staticmethod
+    def prune_redundant(element_list, matrix_file):
+        """ Remove the duplicate and subsumed elements, according to the
+            killing tests in the matrix
+        """
+        if matrix_file is None or not os.path.isfile(matrix_file):
+            logging.warning("No matrix for the dominance pruning, "
+                                                        "nothing pruned")
+            return list(element_list)
+        view = common_matrices.ExecutionMatrix(filename=matrix_file)\
+                                                                .get_view()
+        col_bit = {c: 1 << i for i, c in enumerate(view.get_col_names())}
+        kills = {}
+        for elem, tests in view.active_columns_of_rows().items():
+            mask = 0
+            for t in tests:
+                mask |= col_bit[t]
+            kills[elem] = mask
+
+        # unique non empty kill sets and their first element
+        representative = {}
+        for e in element_list:
+            if kills.get(e, 0) != 0 and kills[e] not in representative:
+                representative[kills[e]] = e
+
+        # minimal kill sets (subsuming elements)
+        minimal = []
+        for mask in sorted(representative, key=lambda m: bin(m).count('1')):
+            if not any((m & mask) == m for m in minimal):
+                minimal.append(mask)
+        kept = {representative[m] for m in minimal}
+        return [e for e in element_list if kills.get(e, 0) == 0 or e in kept]
+    #~ def prune_redundant()
+#~ class CriteriaElementSelector
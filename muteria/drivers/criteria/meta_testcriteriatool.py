@@ -19,6 +19,9 @@ import sys
 import glob
 import logging
 import shutil
+import threading
+
+import joblib
 
 import muteria.common.fs as common_fs
 import muteria.common.matrices as common_matrices
@@ -26,6 +29,7 @@ import muteria.common.mix as common_mix
 
 from muteria.drivers import ToolsModulesLoader
 from muteria.drivers import DriversUtils
+import muteria.controller.logging_setup as logging_setup
 
 from muteria.drivers.checkpoint_handler import CheckPointHandler
 
@@ -89,7 +93,8 @@ class MetaCriteriaTool(object):
     def __init__(self, language, meta_test_generation_obj, \
                         criteria_working_dir, \
                         code_builds_factory, \
-                        tools_config_by_criterion_dict):
+                        tools_config_by_criterion_dict, \
+                        merge_memory_ceiling_mb=None):
         # Set Constants
         self.modules_dict = ToolsModulesLoader.get_tools_modules(\
                                             ToolsModulesLoader.CRITERIA_TOOLS)
@@ -100,6 +105,8 @@ class MetaCriteriaTool(object):
         self.criteria_working_dir = criteria_working_dir
         self.code_builds_factory = code_builds_factory
         self.tools_config_by_criterion_dict = tools_config_by_criterion_dict
+        # Memory ceiling (MB) of the merge of the tools' matrices
+        self.merge_memory_ceiling_mb = merge_memory_ceiling_mb
         
         # Verify Direct Arguments Variables
         ERROR_HANDLER.assert_true(self.criteria_working_dir is not None, \
@@ -258,7 +265,8 @@ class MetaCriteriaTool(object):
                                     parallel_count=1, \
                                     parallel_criteria_test_scheduler=None,\
                                     restart_checkpointer=False, \
-                                    finish_destroy_checkpointer=True):
+                                    finish_destroy_checkpointer=True, \
+                                    criterion_to_executioncost=None):
         ''' 
         Executes the instrumented executable code with testscases and
         returns the different code coverage matrices.
@@ -269,6 +277,10 @@ class MetaCriteriaTool(object):
                         where to store coverage>. 
         :param criterion_to_executionoutput: dict of <criterion, execoutput 
                         file where to store coverage>. 
+        :param criterion_to_executioncost: dict of <criterion, file where 
+                        to store the execution costs (resource usage) of 
+                        the tests on the criterion elements>. Only the
+                        separately instrumented criteria have costs.
         
         :param criteria_element_list_by_criteria: dictionary representing the
                         list of criteria elements (stmts, branches, mutants)
@@ -386,9 +398,11 @@ class MetaCriteriaTool(object):
 
         crit2tool2matrixfile = {cv: {} for cv in criterion_to_matrix}
         crit2tool2outhashfile = {cv: {} for cv in criterion_to_executionoutput}
+        crit2tool2costfile = {cv: {} for cv in criterion_to_matrix}
         for ctoolalias in tool2criteria:
             _criteria2matrix = {}
             _criteria2outhash = {}
+            _criteria2cost = {}
             for criterion in tool2criteria[ctoolalias]:
                 _criteria2matrix[criterion] = os.path.join(matrices_dir_tmp, \
                                                 criterion.get_field_value() 
@@ -404,9 +418,21 @@ class MetaCriteriaTool(object):
                                                 criterion.get_field_value() 
                                                         + '-' 
                                                         + ctoolalias 
-                                                        + '.outloghash.json')
+                                                        + '.outloghash.mutolog')
+                if criterion_to_executioncost is None or \
+                        criterion_to_executioncost.get(criterion) is None:
+                    _criteria2cost[criterion] = None
+                else:
+                    _criteria2cost[criterion] = \
+                                            os.path.join(matrices_dir_tmp, \
+                                                criterion.get_field_value() 
+                                                        + '-' 
+                                                        + ctoolalias 
+                                                        + '.cost.json')
                 crit2tool2matrixfile[criterion][ctoolalias] = \
                                                     _criteria2matrix[criterion]
+                crit2tool2costfile[criterion][ctoolalias] = \
+                                                    _criteria2cost[criterion]
                 crit2tool2outhashfile[criterion][ctoolalias] = \
                                                 _criteria2outhash[criterion]
 
@@ -424,6 +450,10 @@ class MetaCriteriaTool(object):
                         _criteria2outhash[criterion] = \
                                         common_matrices.OutputLogData( \
                                         filename=_criteria2outhash[criterion])
+                    if _criteria2cost[criterion] is not None:
+                        _criteria2cost[criterion] = \
+                                        common_matrices.ExecutionCostData( \
+                                        filename=_criteria2cost[criterion])
                 # Actual execution
                 ctool = self.criteria_configured_tools[ctoolalias][\
                                                             self.TOOL_OBJ_KEY]
@@ -437,7 +467,8 @@ class MetaCriteriaTool(object):
                                 cover_criteria_elements_once=\
                                                 cover_criteria_elements_once, \
                                 prioritization_module_by_criteria=\
-                                            prioritization_module_by_criteria)
+                                            prioritization_module_by_criteria,\
+                                criterion_to_executioncost=_criteria2cost)
 
                 # Checkpointing
                 checkpoint_handler.do_checkpoint( \
@@ -445,75 +476,63 @@ class MetaCriteriaTool(object):
                                         taskid=cp_task_id, \
                                         tool=ctoolalias)
 
-        # Aggregate the matrices and out hashes
-        ## Create reult matrices and out hashes
-        result_matrices = {}
-        result_outloghashes = {}
-        for criterion in criterion_to_matrix:
-            result_matrices[criterion] = common_matrices.ExecutionMatrix( \
-                                filename=criterion_to_matrix[criterion], \
-                                non_key_col_list=testcases)
-            if criterion_to_executionoutput[criterion] is None:
-                result_outloghashes[criterion] = None
-            else:
-                result_outloghashes[criterion] = \
-                            common_matrices.OutputLogData(filename=\
-                                    criterion_to_executionoutput[criterion])
-                ERROR_HANDLER.assert_true(\
-                            crit2tool2outhashfile[criterion] is not None,
-                            "Bug: log enabled but hidden from tool", __file__)
-        ## Actual aggregate
+        # Aggregate the matrices and out hashes, streaming the tools' data
+        # (memory bounded). Existing data in the result files are kept
         logging.debug("saving results ...")
-        for criterion in result_matrices:
-            result_matrix = result_matrices[criterion]
-            result_outloghash = result_outloghashes[criterion]
-            for mtoolalias in crit2tool2matrixfile[criterion]:
-                tool_matrix = common_matrices.ExecutionMatrix(\
-                        filename=crit2tool2matrixfile[criterion][mtoolalias])
-
-                # Check columns
-                ERROR_HANDLER.assert_true(tool_matrix.get_key_colname() == \
-                                            result_matrix.get_key_colname(), \
-                                    "mismatch on key column name", __file__)
-                ERROR_HANDLER.assert_true( \
-                                set(tool_matrix.get_nonkey_colname_list()) == \
-                                set(result_matrix.get_nonkey_colname_list()), \
-                                "mismatch on non key column names", __file__)
-
-                # bring in the data
-                key2nonkeydict = tool_matrix.to_pandas_df().\
-                        set_index(tool_matrix.get_key_colname(), drop=True).\
-                                                to_dict(orient="index")
-                
-                for c_key in key2nonkeydict:
-                    meta_c_key = DriversUtils.make_meta_element(\
-                                                        str(c_key), mtoolalias)
-                    result_matrix.add_row_by_key(meta_c_key, 
-                                                        key2nonkeydict[c_key], 
-                                                        serialize=False)
-
-                # out log hash
-                if crit2tool2outhashfile[criterion] is not None:
-                    tool_outloghash = common_matrices.OutputLogData(\
-                            filename=\
-                                crit2tool2outhashfile[criterion][mtoolalias])
-                    for objective, objective_data in \
-                                tool_outloghash.get_zip_objective_and_data():
-                        meta_objective = DriversUtils.make_meta_element(\
-                                                    str(objective), mtoolalias)
-                        result_outloghash.add_data(
-                                            {meta_objective: objective_data}, \
-                                            serialize=False)
-
+        merger = common_matrices.MatricesStreamMerger(\
+                                memory_ceiling_mb=self.merge_memory_ceiling_mb)
+        for criterion in criterion_to_matrix:
             # @Checkpoint: Check whether already executed
             if checkpoint_handler.is_to_execute( \
                                         func_name=cp_func_name, \
                                         taskid=cp_task_id + 1,
                                         tool=criterion.get_str()):
-                # Serialized the computed matrix
-                result_matrix.serialize()
-                if result_outloghash is not None:
-                    result_outloghash.serialize()
+                result_matrix_file = criterion_to_matrix[criterion]
+                matrix_sources = []
+                if os.path.isfile(result_matrix_file):
+                    matrix_sources.append((result_matrix_file, None))
+                result_outloghash_file = \
+                                    criterion_to_executionoutput[criterion]
+                outlog_sources = []
+                if result_outloghash_file is not None:
+                    ERROR_HANDLER.assert_true(\
+                            crit2tool2outhashfile[criterion] is not None,
+                            "Bug: log enabled but hidden from tool", __file__)
+                    if os.path.isfile(result_outloghash_file):
+                        outlog_sources.append((result_outloghash_file, None))
+                for mtoolalias in crit2tool2matrixfile[criterion]:
+                    key_transform = lambda k, t=mtoolalias: \
+                                    DriversUtils.make_meta_element(str(k), t)
+                    matrix_sources.append((\
+                                crit2tool2matrixfile[criterion][mtoolalias], \
+                                                            key_transform))
+                    if result_outloghash_file is not None:
+                        outlog_sources.append((\
+                                crit2tool2outhashfile[criterion][mtoolalias], \
+                                                            key_transform))
+
+                merger.merge_matrices(matrix_sources, result_matrix_file, \
+                                                non_key_col_list=testcases)
+                if result_outloghash_file is not None:
+                    merger.merge_outlogs(outlog_sources, \
+                                                        result_outloghash_file)
+                if criterion_to_executioncost is not None and \
+                        criterion_to_executioncost.get(criterion) is not None:
+                    result_cost = common_matrices.ExecutionCostData(\
+                                filename=criterion_to_executioncost[criterion])
+                    for mtoolalias, costfile in \
+                                    crit2tool2costfile[criterion].items():
+                        # No cost file for the meta instrumented criteria
+                        if not os.path.isfile(costfile):
+                            continue
+                        key_transform = lambda k, t=mtoolalias: \
+                                    DriversUtils.make_meta_element(str(k), t)
+                        result_cost.update_with_other(\
+                                common_matrices.ExecutionCostData(\
+                                                        filename=costfile), \
+                                key_transform=key_transform, \
+                                override_existing=True)
+                    result_cost.serialize()
             # @Checkpoint: Checkpointing
             checkpoint_handler.do_checkpoint( \
                                     func_name=cp_func_name, \
@@ -570,12 +589,6 @@ class MetaCriteriaTool(object):
     
         :rtype:
         """
-        # FIXME: Support parallelism, then remove the code
-        # bellow:
-        ERROR_HANDLER.assert_true(parallel_count <= 1, \
-                "FIXME: Must first implement support for parallel")
-        #~ FXIMEnd
-
         # Check arguments Validity
         ERROR_HANDLER.assert_true(parallel_count > 0, \
                     "invalid parallel  execution count: {}. {}".format( \
@@ -604,31 +617,49 @@ class MetaCriteriaTool(object):
 
         tool2criteria = self._get_tool2criteria(criteria_enabled_list)
 
-        for ctoolalias in tool2criteria:
-            # @Checkpoint: Check whether already executed
-            if checkpoint_handler.is_to_execute( \
-                                        func_name=cp_func_name, \
-                                        taskid=cp_task_id, \
-                                        tool=ctoolalias):
-                # Actual execution
-                ctool = self.criteria_configured_tools[ctoolalias][\
-                                                            self.TOOL_OBJ_KEY]
-                ctool.instrument_code(\
-                                enabled_criteria=tool2criteria[ctoolalias],\
-                                exe_path_map=exe_path_map)
-                # ensure repo is set back
-                self.code_builds_factory.set_repo_to_build_default()
-
+        to_execute = [ctoolalias for ctoolalias in tool2criteria \
+                                if checkpoint_handler.is_to_execute( \
+                                                    func_name=cp_func_name, \
+                                                    taskid=cp_task_id, \
+                                                    tool=ctoolalias)]
+
+        # The tools are instrumented concurrently when parallel_count > 1
+        # (their builds in the repository take turns, see CodeBuildsFactory)
+        # and share the parallel_count jobs
+        tools_parallel_count = max(1, min(parallel_count, len(to_execute)))
+        per_tool_parallel_count = max(1, parallel_count // tools_parallel_count)
+        checkpoint_lock = threading.Lock()
+
+        def _instrument_with_tool(ctoolalias):
+            # Actual execution
+            ctool = self.criteria_configured_tools[ctoolalias][\
+                                                        self.TOOL_OBJ_KEY]
+            ctool.instrument_code(\
+                            enabled_criteria=tool2criteria[ctoolalias],\
+                            exe_path_map=exe_path_map, \
+                            parallel_count=per_tool_parallel_count)
+            # ensure repo is set back
+            self.code_builds_factory.set_repo_to_build_default()
+
+            with checkpoint_lock:
                 # @Checkpoint: Checkpointing
                 checkpoint_handler.do_checkpoint( \
                                         func_name=cp_func_name, \
                                         taskid=cp_task_id, \
                                         tool=ctoolalias)
 
-        # Invalidate any existing mutant info so it can be recomputed
-        self._invalidate_criteria_info(
+                # Invalidate any existing mutant info so it can be 
+                # recomputed
+                self._invalidate_criteria_info(
                                 enabled_criteria=tool2criteria[ctoolalias])
-                                
+        #~ def _instrument_with_tool()
+
+        # Bound here, the calls may be dispatched from other threads
+        _instrument_with_tool = \
+                        logging_setup.bind_log_context(_instrument_with_tool)
+        joblib.Parallel(n_jobs=tools_parallel_count, require='sharedmem')\
+                            (joblib.delayed(_instrument_with_tool)(ctoolalias) \
+                                                for ctoolalias in to_execute)
 
         # @Checkpoint: Finished
         detailed_exectime = {}
@@ -674,8 +705,9 @@ class MetaCriteriaTool(object):
         if criterion not in CriteriaToInfoObject:
             return None
             
-        return CriteriaToInfoObject[criterion]().load_from_file(\
-                                    self.get_criterion_info_file(criterion))
+        info_obj = CriteriaToInfoObject[criterion]()
+        info_obj.load_from_file(self.get_criterion_info_file(criterion))
+        return info_obj
     #~ def def get_criterion_info_object()
 
     def get_criterion_info_file(self, criterion):
@@ -0,0 +1,124 @@
+""" Trivial Compiler Equivalence (TCE) of the separately instrumented
+    criteria elements (e.g. the strong mutation mutants).
+
+    The executable of each element is normalized (the symbols, debug
+    information, comments and build-id are stripped, as they do not affect
+    the semantic) and hashed:
+    - The elements with the same digest form an equivalence class: they are
+        duplicates and only one of them (the representative) needs to be
+        executed, its results being fanned out to the other members.
+    - The elements with the same digest as the original program are likely
+        equivalent (they also form a class).
+
+    When the strip program is not available, or fails (e.g. the file is
+    not an object file), the raw content of the file is hashed.
+"""
+
+from __future__ import print_function
+
+import os
+import shutil
+import hashlib
+import tempfile
+import threading
+
+import muteria.common.fs as common_fs
+import muteria.common.mix as common_mix
+
+from muteria.drivers import DriversUtils
+
+ERROR_HANDLER = common_mix.ErrorHandler
+
+class TrivialCompilerEquivalence(object):
+    """ Compute the equivalence classes of the elements' executables.
+        The elements may be added concurrently (add_element is thread safe).
+        :param original_exe: executable of the original program, compiled
+                    the same way as the elements' executables. The likely
+                    equivalent elements are not computed when None
+    """
+    CLASSES_KEY = "classes"
+    EQUIVALENT_KEY = "equivalent"
+
+    STRIP_PROG = 'strip'
+    STRIPPED_SECTIONS = ('.comment', '.note.gnu.build-id')
+
+    def __init__(self, original_exe=None):
+        self.strip_prog = shutil.which(self.STRIP_PROG)
+        self.digests = {}
+        self.lock = threading.Lock()
+        self.original_digest = None
+        if original_exe is not None:
+            self.original_digest = self.get_digest(original_exe)
+    #~ def __init__()
+
+    def get_digest(self, exe_path):
+        """ Hash of the normalized executable
+        """
+        ERROR_HANDLER.assert_true(os.path.isfile(exe_path), \
+                            "missing executable: {}".format(exe_path), __file__)
+        data = None
+        if self.strip_prog is not None:
+            tmp_dir = tempfile.mkdtemp(suffix='.tce')
+            tmp_file = os.path.join(tmp_dir, os.path.basename(exe_path))
+            try:
+                args = ['--strip-all']
+                for section in self.STRIPPED_SECTIONS:
+                    args.append('--remove-section=' + section)
+                ret, _, _ = DriversUtils.execute_and_get_retcode_out_err(\
+                                                self.strip_prog, args_list=\
+                                            args + ['-o', tmp_file, exe_path])
+                if ret == 0:
+                    with open(tmp_file, 'rb') as fp:
+                        data = fp.read()
+            finally:
+                shutil.rmtree(tmp_dir)
+        if data is None:
+            with open(exe_path, 'rb') as fp:
+                data = fp.read()
+        return hashlib.blake2b(data).hexdigest()
+    #~ def get_digest()
+
+    def add_element(self, element, exe_path):
+        digest = self.get_digest(exe_path)
+        with self.lock:
+            ERROR_HANDLER.assert_true(element not in self.digests, \
+                        "element added twice: {}".format(element), __file__)
+            self.digests[element] = digest
+    #~ def add_element()
+
+    def get_equivalence_classes(self):
+        """ :return: dict with, as CLASSES_KEY, the classes (with more than
+                    one element) as a dict representative -> list of the
+                    other members, and as EQUIVALENT_KEY, the list of the
+                    likely equivalent elements
+        """
+        by_digest = {}
+        with self.lock:
+            for element in sorted(self.digests, key=lambda x: (len(x), x)):
+                by_digest.setdefault(self.digests[element], []).append(element)
+        classes = {}
+        for members in by_digest.values():
+            if len(members) > 1:
+                classes[members[0]] = members[1:]
+        equivalent = by_digest.get(self.original_digest, [])
+        return {
+            self.CLASSES_KEY: classes,
+            self.EQUIVALENT_KEY: list(equivalent),
+        }
+    #~ def get_equivalence_classes()
+
+    def dump(self, file_path):
+        common_fs.dumpJSON(self.get_equivalence_classes(), file_path, \
+                                                                pretty=True)
+    #~ def dump()
+
+    @staticmethod
+    def load(file_path):
+        """ :return: the equivalence classes written with dump, None if the
+                    file does not exist
+        """
+        if not os.path.isfile(file_path):
+            return None
+        return common_fs.loadJSON(file_path)
+    #~ def load()
+#~ class TrivialCompilerEquivalence
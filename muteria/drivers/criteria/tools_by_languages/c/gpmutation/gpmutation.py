@@ -19,6 +19,7 @@ from muteria.drivers.criteria.base_testcriteriatool import BaseCriteriaTool
 from muteria.drivers.criteria import TestCriteria
 from muteria.drivers import DriversUtils
 from muteria.drivers.criteria.criteria_info import MutantsInfoObject
+from muteria.drivers.criteria.tce import TrivialCompilerEquivalence
 
 ERROR_HANDLER = common_mix.ErrorHandler
 
@@ -38,6 +39,8 @@ class CriteriaToolGPMutation(BaseCriteriaTool):
         self.separate_muts_dir = os.path.join(self.gpmutation_out, \
                                                 self.separate_muts_folder_name)
         self.archive_separated = True
+        # Trivial compiler equivalence classes of the separated mutants
+        self.tce_file = os.path.join(self.gpmutation_out, 'tce_classes.json')
     #~ def __init__()
 
     def _get_default_params(self):
@@ -129,6 +132,9 @@ class CriteriaToolGPMutation(BaseCriteriaTool):
                 minf_obj.add_element(mid, mutant_type=info['Type'], \
                                         mutant_locs=info['SrcLoc'], \
                                         mutant_function_name=info['FuncName'])
+            tce_data = TrivialCompilerEquivalence.load(self.tce_file)
+            if tce_data is not None:
+                minf_obj.set_equivalence_classes(tce_data)
             self.mutant_info_object = minf_obj
             return minf_obj
     #~ def get_criterion_info_object()
@@ -168,7 +174,11 @@ class CriteriaToolGPMutation(BaseCriteriaTool):
                                         element_id, os.path.basename(map_key)))
         # If archiving
         if self.archive_separated:
-            archive_path = common_fs.TarGz.get_archive_filename_of(\
+            archive_path = common_fs.IndexedArchive.get_archive_filename_of(\
+                                                        self.separate_muts_dir)
+            if not os.path.isfile(archive_path):
+                # Archive of a former run
+                archive_path = common_fs.TarGz.get_archive_filename_of(\
                                                         self.separate_muts_dir)
             ERROR_HANDLER.assert_true(os.path.isfile(archive_path), \
                                     "Archived separated mutant file missing",\
@@ -177,8 +187,8 @@ class CriteriaToolGPMutation(BaseCriteriaTool):
                 shutil.rmtree(self.separate_muts_dir)
             # Extract the selected
             for arch_name in rel_names:
-                err_msg = common_fs.TarGz.extractFromArchive(archive_path, \
-                                                                    arch_name)
+                err_msg = common_fs.IndexedArchive.extractFromArchive(\
+                                                    archive_path, arch_name)
                 ERROR_HANDLER.assert_true(err_msg is None, \
                             "failed to extract, err: "+str(err_msg), __file__)
         return mut_code
@@ -312,10 +322,27 @@ class CriteriaToolGPMutation(BaseCriteriaTool):
             for exe in exes:
                 f.write(exe+'\n')
 
+        # Trivial compiler equivalence of the mutants. The built program is
+        # only used as original when available
+        if self.config.SEPARATED_CRITERIA_TRIVIAL_COMPILER_EQUIVALENCE:
+            original_exe = code_builds_factory.repository_manager\
+                                                    .repo_abs_path(exes[0])
+            if not os.path.isfile(original_exe):
+                original_exe = None
+            tce = TrivialCompilerEquivalence(original_exe=original_exe)
+            for mid in os.listdir(self.separate_muts_dir):
+                mut_exe = os.path.join(self.separate_muts_dir, mid, \
+                                                    os.path.basename(exes[0]))
+                if os.path.isfile(mut_exe):
+                    tce.add_element(mid, mut_exe)
+            tce.dump(self.tce_file)
+
         # Archive separated if on
         if self.archive_separated:
-            err_msg = common_fs.TarGz.compressDir(self.separate_muts_dir, \
-                                                    remove_in_directory=True)
+            err_msg = common_fs.IndexedArchive.compressDir(\
+                            self.separate_muts_dir, remove_in_directory=True, \
+                            codec=self.meta_test_generation_obj\
+                                                        .get_archive_codec())
             ERROR_HANDLER.assert_true(err_msg is None,\
                                 "Compression failed: "+str(err_msg), __file__)
     #~ def _do_instrument_code()
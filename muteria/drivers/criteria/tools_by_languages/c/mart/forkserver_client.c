@@ -0,0 +1,211 @@
+/*
+ * Client of the meta-mutant fork server (schemata_runtime.c), placed in the
+ * repository as the program under test (see schemata.py).
+ *
+ * The execution (standard file descriptors, working directory, arguments
+ * and environment, including MUTERIA_MUTANT_ID) is sent to the server
+ * listening on MUTERIA_FORKSERVER_SOCKET, and the client terminates as the
+ * execution did. The resource usage of the execution, which is not a
+ * descendant of the client, is reported on the file descriptor
+ * MUTERIA_RESOURCE_USAGE_REPORT_FD when set (see
+ * muteria.drivers.DriversUtils.execute_and_get_retcode_out_err).
+ * When the server is not available, or replies so, the meta-mutant
+ * MUTERIA_SCHEMATA_EXE is executed directly.
+ */
+
+#define _GNU_SOURCE
+#include <errno.h>
+#include <limits.h>
+#include <signal.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <unistd.h>
+#include <sys/socket.h>
+#include <sys/un.h>
+#include <sys/wait.h>
+
+#include "forkserver_protocol.h"
+
+#define SOCKET_ENV_VAR "MUTERIA_FORKSERVER_SOCKET"
+#define SCHEMATA_EXE_ENV_VAR "MUTERIA_SCHEMATA_EXE"
+#define RUSAGE_REPORT_FD_ENV_VAR "MUTERIA_RESOURCE_USAGE_REPORT_FD"
+
+extern char **environ;
+
+/* File descriptor where to report the resource usage, -1 if none */
+static int rusage_report_fd = -1;
+
+/* Take the report fd out of the environment, which is given to the
+ * execution */
+static void take_rusage_report_fd(void) {
+    const char *fd = getenv(RUSAGE_REPORT_FD_ENV_VAR);
+    if (fd != NULL && *fd != '\0')
+        rusage_report_fd = atoi(fd);
+    unsetenv(RUSAGE_REPORT_FD_ENV_VAR);
+}
+
+static void report_rusage(const struct forkserver_reply *reply) {
+    if (rusage_report_fd < 0)
+        return;
+    dprintf(rusage_report_fd, "%.6f %.6f %lld %lld %lld\n",
+                    reply->utime_us / 1e6, reply->stime_us / 1e6,
+                    (long long) reply->maxrss_kb, (long long) reply->inblock,
+                    (long long) reply->oublock);
+    close(rusage_report_fd);
+    rusage_report_fd = -1;
+}
+
+static int exec_directly(char **argv) {
+    const char *exe = getenv(SCHEMATA_EXE_ENV_VAR);
+    /* the execution is a descendant, its usage is the client's */
+    if (rusage_report_fd >= 0) {
+        close(rusage_report_fd);
+        rusage_report_fd = -1;
+    }
+    if (exe == NULL || *exe == '\0') {
+        fprintf(stderr, "muteria forkserver client: %s is not set\n",
+                                                        SCHEMATA_EXE_ENV_VAR);
+        return 127;
+    }
+    execv(exe, argv);
+    fprintf(stderr, "muteria forkserver client: cannot execute %s: %s\n",
+                                                        exe, strerror(errno));
+    return 127;
+}
+
+static int connect_server(const char *path) {
+    struct sockaddr_un addr;
+    int fd;
+
+    if (strlen(path) >= sizeof(addr.sun_path))
+        return -1;
+    fd = socket(AF_UNIX, SOCK_STREAM, 0);
+    if (fd < 0)
+        return -1;
+    memset(&addr, 0, sizeof(addr));
+    addr.sun_family = AF_UNIX;
+    strcpy(addr.sun_path, path);
+    if (connect(fd, (struct sockaddr *) &addr, sizeof(addr)) != 0) {
+        close(fd);
+        return -1;
+    }
+    return fd;
+}
+
+static int append(char **buf, size_t *len, size_t *cap, const char *s) {
+    size_t n = strlen(s) + 1;
+    if (*len + n > *cap) {
+        size_t new_cap = (*cap + n) * 2;
+        char *tmp = realloc(*buf, new_cap);
+        if (tmp == NULL)
+            return -1;
+        *buf = tmp;
+        *cap = new_cap;
+    }
+    memcpy(*buf + *len, s, n);
+    *len += n;
+    return 0;
+}
+
+static int send_request(int conn, int argc, char **argv) {
+    char cwd[PATH_MAX], num[32];
+    char *payload = NULL;
+    size_t len = 0, cap = 0, sent;
+    uint32_t size;
+    int fds[3] = {0, 1, 2};
+    char control[CMSG_SPACE(sizeof(fds))];
+    struct iovec iov;
+    struct msghdr msg;
+    struct cmsghdr *cmsg;
+    int i;
+
+    if (getcwd(cwd, sizeof(cwd)) == NULL)
+        return -1;
+    snprintf(num, sizeof(num), "%d", argc);
+    if (append(&payload, &len, &cap, cwd) != 0
+                            || append(&payload, &len, &cap, num) != 0)
+        return -1;
+    for (i = 0; i < argc; i++) {
+        if (append(&payload, &len, &cap, argv[i]) != 0)
+            return -1;
+    }
+    for (i = 0; environ[i] != NULL; i++) {
+        if (append(&payload, &len, &cap, environ[i]) != 0)
+            return -1;
+    }
+
+    /* header with the fds */
+    size = (uint32_t) len;
+    iov.iov_base = &size;
+    iov.iov_len = sizeof(size);
+    memset(&msg, 0, sizeof(msg));
+    msg.msg_iov = &iov;
+    msg.msg_iovlen = 1;
+    msg.msg_control = control;
+    msg.msg_controllen = sizeof(control);
+    cmsg = CMSG_FIRSTHDR(&msg);
+    cmsg->cmsg_level = SOL_SOCKET;
+    cmsg->cmsg_type = SCM_RIGHTS;
+    cmsg->cmsg_len = CMSG_LEN(sizeof(fds));
+    memcpy(CMSG_DATA(cmsg), fds, sizeof(fds));
+    if (sendmsg(conn, &msg, MSG_NOSIGNAL) != (ssize_t) sizeof(size))
+        return -1;
+
+    sent = 0;
+    while (sent < len) {
+        ssize_t n = send(conn, payload + sent, len - sent, MSG_NOSIGNAL);
+        if (n < 0 && errno == EINTR)
+            continue;
+        if (n <= 0)
+            return -1;
+        sent += (size_t) n;
+    }
+    free(payload);
+    return 0;
+}
+
+int main(int argc, char **argv) {
+    const char *path = getenv(SOCKET_ENV_VAR);
+    int conn = -1;
+    int32_t status;
+    struct forkserver_reply reply;
+    size_t got = 0;
+
+    take_rusage_report_fd();
+    if (path != NULL && *path != '\0')
+        conn = connect_server(path);
+    if (conn < 0)
+        return exec_directly(argv);
+
+    if (send_request(conn, argc, argv) != 0) {
+        fprintf(stderr, "muteria forkserver client: request failed\n");
+        return 127;
+    }
+    while (got < sizeof(reply)) {
+        ssize_t n = recv(conn, ((char *) &reply) + got,
+                                                    sizeof(reply) - got, 0);
+        if (n < 0 && errno == EINTR)
+            continue;
+        if (n <= 0) {
+            fprintf(stderr, "muteria forkserver client: no reply\n");
+            return 127;
+        }
+        got += (size_t) n;
+    }
+    close(conn);
+    if (reply.kind == FORKSERVER_REPLY_EXECUTE_DIRECTLY)
+        return exec_directly(argv);
+    report_rusage(&reply);
+    status = reply.status;
+
+    if (WIFEXITED(status))
+        return WEXITSTATUS(status);
+    if (WIFSIGNALED(status)) {
+        signal(WTERMSIG(status), SIG_DFL);
+        raise(WTERMSIG(status));
+        return 128 + WTERMSIG(status);
+    }
+    return 127;
+}
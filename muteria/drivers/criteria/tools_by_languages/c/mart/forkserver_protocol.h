@@ -0,0 +1,29 @@
+/*
+ * Reply of the meta-mutant fork server (schemata_runtime.c) to its client
+ * (forkserver_client.c), once per connection.
+ */
+
+#ifndef MUTERIA_FORKSERVER_PROTOCOL_H
+#define MUTERIA_FORKSERVER_PROTOCOL_H
+
+#include <stdint.h>
+
+/* The execution was forked from the server, its wait status and resource
+ * usage are set */
+#define FORKSERVER_REPLY_EXECUTED 0
+/* The execution must not be forked from the server (e.g. the mutant is
+ * reached by the constructors): the client executes the meta-mutant */
+#define FORKSERVER_REPLY_EXECUTE_DIRECTLY 1
+
+struct forkserver_reply {
+    int32_t kind;
+    int32_t status;
+    /* resource usage of the execution (see getrusage) */
+    int64_t utime_us;
+    int64_t stime_us;
+    int64_t maxrss_kb;
+    int64_t inblock;
+    int64_t oublock;
+};
+
+#endif /* MUTERIA_FORKSERVER_PROTOCOL_H */
@@ -7,8 +7,11 @@ import re
 import shutil
 import shlex
 import logging
+import threading
 import subprocess
 
+import joblib
+
 import muteria.common.mix as common_mix
 import muteria.common.fs as common_fs
 
@@ -19,10 +22,21 @@ from muteria.drivers.criteria.base_testcriteriatool import BaseCriteriaTool
 from muteria.drivers.criteria import TestCriteria
 from muteria.drivers import DriversUtils
 from muteria.drivers.criteria.criteria_info import MutantsInfoObject
+from muteria.drivers.criteria.tce import TrivialCompilerEquivalence
+from muteria.drivers.criteria.tools_by_languages.c.mart.schemata import \
+                                        build_schemata_executable, \
+                                        build_forkserver_client, \
+                                        MetaMutantForkServer, MUTANT_ID_ENV_VAR
 
 ERROR_HANDLER = common_mix.ErrorHandler
 
 class CriteriaToolMart(BaseCriteriaTool):
+    # Option of mart to write the separated mutants as bitcode only (no
+    # native compilation by mart). Used when mart's help lists it, the
+    # mutants are then compiled in parallel (see
+    # _compile_and_store_separated_mutants)
+    MART_NO_COMPILATION_OPTION = '-no-compilation'
+
     def __init__(self, *args, **kwargs):
         BaseCriteriaTool.__init__(self, *args, **kwargs)
         self.instrumentation_details = os.path.join(\
@@ -38,6 +52,14 @@ class CriteriaToolMart(BaseCriteriaTool):
         self.separate_muts_dir = os.path.join(self.mart_out, \
                                                 self.separate_muts_folder_name)
         self.archive_separated = True
+        # Trivial compiler equivalence classes of the separated mutants
+        self.tce_file = os.path.join(self.mart_out, 'tce_classes.json')
+        # Strong mutation executed with the meta-mutant (schemata)
+        self.schemata_dir = os.path.join(self.mutant_data, 'schemata')
+        self.schemata_exe = os.path.join(self.schemata_dir, 'meta_mutant')
+        self.forkserver_client_exe = os.path.join(self.schemata_dir, \
+                                                        'forkserver_client')
+        self.forkserver = None
     #~ def __init__()
 
     def _get_default_params(self):
@@ -75,6 +97,16 @@ class CriteriaToolMart(BaseCriteriaTool):
         return True
     #~ def installed()
 
+    @staticmethod
+    def _mart_has_option(prog, option):
+        """ Check, from its help output, that mart supports option
+        """
+        ret, out, _ = DriversUtils.execute_and_get_retcode_out_err(prog, \
+                                args_list=['-help'], merge_err_to_out=True)
+        return re.search(r'^\s*' + re.escape(option) + r'(\s|=|$)', out, \
+                                                    re.MULTILINE) is not None
+    #~ def _mart_has_option()
+
     @classmethod
     def _get_meta_instrumentation_criteria(cls):
         """ Criteria where all elements are instrumented in same file
@@ -136,6 +168,9 @@ class CriteriaToolMart(BaseCriteriaTool):
                                         mutant_locs=info['SrcLoc'], \
                                         mutant_function_name=info['FuncName'],\
                                         IRPosInFunc=info['IRPosInFunc'])
+            tce_data = TrivialCompilerEquivalence.load(self.tce_file)
+            if tce_data is not None:
+                minf_obj.set_equivalence_classes(tce_data)
             self.mutant_info_object = minf_obj
             return minf_obj
     #~ def get_criterion_info_object()
@@ -153,11 +188,25 @@ class CriteriaToolMart(BaseCriteriaTool):
             return self.single_exe_filename.copy()
     #~ def _get_single_exe_filename()
 
+    def _uses_schemata(self):
+        """ The mutants are executed with the meta-mutant when it was
+            built during the instrumentation
+        """
+        return os.path.isfile(self.schemata_exe)
+    #~ def _uses_schemata()
+
     def _get_criterion_element_executable_path(self, criterion, element_id):
 #        self.sm_separate_exes = 
         ERROR_HANDLER.assert_true(self.get_criterion_info_object(criterion).\
                                             has_element(element_id),\
                         "Inexistant mutant id: "+element_id, __file__)
+
+        if self._uses_schemata():
+            if self.forkserver is not None:
+                exe = self.forkserver.get_executable()
+            else:
+                exe = self.schemata_exe
+            return {k: exe for k in self._get_single_exe_filename(criterion)}
         
         rel_names = []
         mut_code = {}
@@ -167,30 +216,65 @@ class CriteriaToolMart(BaseCriteriaTool):
                                                                 element_id, v))
         # If archiving
         if self.archive_separated:
-            archive_path = common_fs.TarGz.get_archive_filename_of(\
-                                                        self.separate_muts_dir)
-            ERROR_HANDLER.assert_true(os.path.isfile(archive_path), \
-                                    "Archived separated mutant file missing",\
-                                    __file__)
+            archive_path = self._get_separated_mutants_archive()
             if os.path.isdir(self.separate_muts_dir):
                 shutil.rmtree(self.separate_muts_dir)
             # Extract the selected
             for arch_name in rel_names:
-                err_msg = common_fs.TarGz.extractFromArchive(archive_path, \
-                                                                    arch_name)
+                err_msg = common_fs.IndexedArchive.extractFromArchive(\
+                                                    archive_path, arch_name)
                 ERROR_HANDLER.assert_true(err_msg is None, \
                             "failed to extract, err: "+str(err_msg), __file__)
         return mut_code
     #~ def _get_criterion_element_executable_path()
 
+    def _get_separated_mutants_archive(self):
+        """ Get the archive storing the separated mutants. A tar.gz archive
+            (former store format) is migrated to an indexed archive
+        """
+        archive_path = common_fs.IndexedArchive.get_archive_filename_of(\
+                                                        self.separate_muts_dir)
+        if not os.path.isfile(archive_path):
+            targz_path = common_fs.TarGz.get_archive_filename_of(\
+                                                        self.separate_muts_dir)
+            ERROR_HANDLER.assert_true(os.path.isfile(targz_path), \
+                                    "Archived separated mutant file missing",\
+                                    __file__)
+            common_fs.IndexedArchive.migrateFromTarGz(targz_path, \
+                                    out_archive_pathname=archive_path, \
+                                    codec=self.meta_test_generation_obj\
+                                                        .get_archive_codec())
+        return archive_path
+    #~ def _get_separated_mutants_archive()
+
     def _get_criterion_element_environment_vars(self, criterion, element_id):
         '''
             return: python dictionary with environment variable as key
                      and their values as value (all strings)
         '''
+        if self._uses_schemata():
+            if self.forkserver is not None:
+                return self.forkserver.get_environment_vars(element_id)
+            return {MUTANT_ID_ENV_VAR: str(element_id)}
         return None
     #~ def _get_criterion_element_environment_vars()
 
+    def _setup_separated_execution(self, criterion):
+        if self._uses_schemata() and MetaMutantForkServer.is_supported() \
+                        and os.path.isfile(self.forkserver_client_exe):
+            self.forkserver = MetaMutantForkServer(self.schemata_exe, \
+                                                    self.forkserver_client_exe)
+            if not self.forkserver.start():
+                logging.warning("The meta-mutant fork server failed to "
+                                "start, the meta-mutant is executed directly")
+    #~ def _setup_separated_execution()
+
+    def _teardown_separated_execution(self, criterion):
+        if self.forkserver is not None:
+            self.forkserver.stop()
+            self.forkserver = None
+    #~ def _teardown_separated_execution()
+
     def _get_criteria_environment_vars(self, result_dir_tmp, enabled_criteria):
         '''
         return: python dictionary with environment variable as key
@@ -325,7 +409,10 @@ class CriteriaToolMart(BaseCriteriaTool):
 
         # mart params
         bool_param, k_v_params = self._get_default_params()
-        if TestCriteria.STRONG_MUTATION in enabled_criteria:
+        use_schemata = (TestCriteria.STRONG_MUTATION in enabled_criteria and \
+                    self.config.SEPARATED_CRITERIA_SCHEMATA_EXECUTION)
+        if TestCriteria.STRONG_MUTATION in enabled_criteria \
+                                                    and not use_schemata:
             bool_param['-write-mutants'] = True
         else:
             self.archive_separated = False
@@ -381,6 +468,19 @@ class CriteriaToolMart(BaseCriteriaTool):
         for k,v in list(k_v_params.items()):
             if v is not None:
                 args += [k,v]
+        # The separated mutants are compiled in parallel, after mart
+        mart_compiles_mutants = True
+        if '-write-mutants' in args and \
+                        self.MART_NO_COMPILATION_OPTION not in pre_args + \
+                                                                post_args and \
+                self._mart_has_option(prog, self.MART_NO_COMPILATION_OPTION):
+            args.append(self.MART_NO_COMPILATION_OPTION)
+            mart_compiles_mutants = False
+        elif '-write-mutants' in args:
+            logging.debug("# mart compiles the separated mutants (option {}"
+                            " unsupported)".format(\
+                                            self.MART_NO_COMPILATION_OPTION))
+        keep_mutants_bc = ('-keep-mutants-bc' in args + pre_args + post_args)
         args.extend(pre_args)
         args.append(bitcode_file)
         args.extend(post_args)
@@ -398,11 +498,8 @@ class CriteriaToolMart(BaseCriteriaTool):
 
         
         # Execute Mart
-        cwd = os.getcwd()
-        os.chdir(self.mutant_data)
         ret, out, err = DriversUtils.execute_and_get_retcode_out_err(\
-                                                        prog, args_list=args)
-        os.chdir(cwd)
+                                prog, args_list=args, cwd=self.mutant_data)
 
         if (ret != 0):
             logging.error(out)
@@ -428,14 +525,100 @@ class CriteriaToolMart(BaseCriteriaTool):
                 store_obj[crit_str][k] = exe_file+'.MetaMu'
         common_fs.dumpJSON(store_obj, self.instrumentation_details)
 
-        # Archive separated if on
-        if self.archive_separated:
-            err_msg = common_fs.TarGz.compressDir(self.separate_muts_dir, \
-                                                    remove_in_directory=True)
-            ERROR_HANDLER.assert_true(err_msg is None,\
-                                "Compression failed: "+str(err_msg), __file__)
+        if use_schemata:
+            # The mutants are executed with the meta-mutant, selected
+            # through an environment variable, and a fork server
+            os.mkdir(self.schemata_dir)
+            meta_mu_bc = os.path.join(self.mart_out, \
+                        store_obj[TestCriteria.STRONG_MUTATION.get_str()]\
+                                    [list(rel_path_map)[0]] + '.bc')
+            build_schemata_executable([meta_mu_bc], self.schemata_exe, \
+                                        linking_flags=extra_linking_flags)
+            build_forkserver_client(self.forkserver_client_exe)
+        # Compile the separated mutants left as bitcode and archive them
+        elif TestCriteria.STRONG_MUTATION in enabled_criteria:
+            exe_file = os.path.basename(list(rel_path_map.values())[0])
+            tce = None
+            if self.config.SEPARATED_CRITERIA_TRIVIAL_COMPILER_EQUIVALENCE:
+                # The original is compiled as the mutants (checked above)
+                tce = TrivialCompilerEquivalence(\
+                                        original_exe=bitcode_file+'.native')
+            self._compile_and_store_separated_mutants(exe_file, \
+                                    extra_linking_flags, parallel_count, \
+                                    tce=tce, keep_bitcode=\
+                                    (mart_compiles_mutants or keep_mutants_bc))
+            if tce is not None:
+                tce.dump(self.tce_file)
     #~ def _do_instrument_code()
 
+    def _compile_and_store_separated_mutants(self, exe_file, \
+                                        linking_flags, parallel_count=1, \
+                                        tce=None, keep_bitcode=True):
+        """ Compile into native code the separated mutants written only as
+            bitcode (<mutant dir>/<exe_file>.bc without <exe_file>), with
+            parallel_count concurrent compilations. All the mutants are
+            written as bitcode when mart does not compile them (see
+            MART_NO_COMPILATION_OPTION). The compiled bitcode is removed
+            unless keep_bitcode.
+            When archiving, each mutant is added to the store (indexed
+            archive) as soon as it is ready, and its directory removed.
+            When tce (TrivialCompilerEquivalence) is passed, each mutant's
+            executable is added to it before being stored.
+        """
+        if not os.path.isdir(self.separate_muts_dir):
+            return
+        mutant_ids = sorted(os.listdir(self.separate_muts_dir))
+
+        writer = None
+        if self.archive_separated:
+            writer = common_fs.IndexedArchive.Writer(\
+                                common_fs.IndexedArchive.get_archive_filename_of(\
+                                                    self.separate_muts_dir), \
+                                codec=self.meta_test_generation_obj\
+                                                        .get_archive_codec())
+        store_lock = threading.Lock()
+        failures = []
+
+        def _process_mutant(mid):
+            mut_dir = os.path.join(self.separate_muts_dir, mid)
+            mut_exe = os.path.join(mut_dir, exe_file)
+            if not os.path.isfile(mut_exe) and os.path.isfile(mut_exe+'.bc'):
+                ret, out, _ = DriversUtils.execute_and_get_retcode_out_err(\
+                                'clang', linking_flags.split() + \
+                                                [mut_exe+'.bc', '-o', mut_exe])
+                if ret != 0:
+                    with store_lock:
+                        failures.append((mid, out))
+                    return
+                if not keep_bitcode:
+                    os.remove(mut_exe+'.bc')
+            if tce is not None:
+                tce.add_element(mid, mut_exe)
+            if writer is not None:
+                # The writer is thread safe (compresses outside its lock)
+                writer.add(mut_dir, '/'.join(\
+                                    [self.separate_muts_folder_name, mid]))
+                shutil.rmtree(mut_dir)
+        #~ def _process_mutant()
+
+        try:
+            joblib.Parallel(n_jobs=max(1, parallel_count), \
+                                                    require='sharedmem')\
+                    (joblib.delayed(_process_mutant)(mid) \
+                                                    for mid in mutant_ids)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if len(failures) > 0:
+            logging.error(failures[0][1])
+            ERROR_HANDLER.error_exit("Compilation of {} {} {}".format(\
+                            len(failures), "separated mutants failed, e.g.", \
+                                                    failures[0][0]), __file__)
+        if writer is not None:
+            shutil.rmtree(self.separate_muts_dir)
+    #~ def _compile_and_store_separated_mutants()
+
     ## Extra functions for mart
     def get_test_gen_metamutant_bc(self):
         ERROR_HANDLER.assert_true(os.path.isfile(self.instrumentation_details), \
@@ -0,0 +1,150 @@
+
+from __future__ import print_function
+
+import os
+import time
+import atexit
+import shutil
+import signal
+import socket
+import tempfile
+import subprocess
+
+import muteria.common.mix as common_mix
+
+from muteria.drivers import DriversUtils
+
+ERROR_HANDLER = common_mix.ErrorHandler
+
+# Link flag making the C runtime call the schemata runtime's entry point
+# (__wrap_main), which calls the program's main once fully initialized
+SCHEMATA_LINK_FLAGS = ['-Wl,--wrap=main']
+
+# Environment variables read by schemata_runtime.c and forkserver_client.c
+MUTANT_ID_ENV_VAR = "MUTERIA_MUTANT_ID"
+FORKSERVER_LISTEN_ENV_VAR = "MUTERIA_FORKSERVER_LISTEN"
+FORKSERVER_SOCKET_ENV_VAR = "MUTERIA_FORKSERVER_SOCKET"
+SCHEMATA_EXE_ENV_VAR = "MUTERIA_SCHEMATA_EXE"
+
+_THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+SCHEMATA_RUNTIME_SOURCE = os.path.join(_THIS_DIR, 'schemata_runtime.c')
+FORKSERVER_CLIENT_SOURCE = os.path.join(_THIS_DIR, 'forkserver_client.c')
+
+def _compile(compiler, args_list, out_exe):
+    ret, out, _ = DriversUtils.execute_and_get_retcode_out_err(compiler, \
+                                        args_list=args_list+['-o', out_exe])
+    if ret != 0:
+        ERROR_HANDLER.error_exit("Compilation of {} failed: {}".format(\
+                                                    out_exe, out), __file__)
+#~ def _compile()
+
+def build_schemata_executable(meta_mutant_files, out_exe, linking_flags="", \
+                                                            compiler='clang'):
+    """ Compile the meta-mutant (bitcode or source files) with the schemata
+        runtime into a native executable where the executed mutant is
+        selected through the environment variable MUTANT_ID_ENV_VAR.
+    """
+    _compile(compiler, list(meta_mutant_files) + [SCHEMATA_RUNTIME_SOURCE] \
+                        + linking_flags.split() + SCHEMATA_LINK_FLAGS, out_exe)
+#~ def build_schemata_executable()
+
+def build_forkserver_client(out_exe, compiler='clang'):
+    _compile(compiler, ['-O2', FORKSERVER_CLIENT_SOURCE], out_exe)
+#~ def build_forkserver_client()
+
+class MetaMutantForkServer(object):
+    """ Fork server of a schemata executable (see schemata_runtime.c).
+        The program under test is replaced by the fork server client
+        (see forkserver_client.c) and each execution, with the mutant
+        selected through the environment (see get_environment_vars), is
+        forked from the initialized server instead of executing the
+        program.
+        The forked execution joins the sandbox (cgroup and rlimits) of the
+        client, and its resource usage is reported by the client (see
+        DriversUtils.RESOURCE_USAGE_REPORT_FD_ENV_VAR).
+        The constructors run once, in the server, with the original
+        program: the mutants whose mutation points are reached by the
+        constructors are executed directly by the client.
+    """
+    START_TIMEOUT = 10 # in seconds
+
+    @staticmethod
+    def is_supported():
+        return hasattr(socket, 'AF_UNIX') and hasattr(os, 'fork')
+    #~ def is_supported()
+
+    def __init__(self, schemata_exe, client_exe):
+        self.schemata_exe = os.path.abspath(schemata_exe)
+        self.client_exe = os.path.abspath(client_exe)
+        self.proc = None
+        self.channel_dir = None
+        self.address = None
+    #~ def __init__()
+
+    def start(self):
+        """ Start the server.
+            :return: True if the server is ready, False otherwise (then
+                    the executions use the schemata executable directly)
+        """
+        ERROR_HANDLER.assert_true(self.proc is None, \
+                                    "fork server already started", __file__)
+        # The unix socket path length is limited, use a short temporary dir
+        self.channel_dir = tempfile.mkdtemp(prefix='muteria-mfs-')
+        self.address = os.path.join(self.channel_dir, 'server')
+        tmp_env = os.environ.copy()
+        tmp_env[FORKSERVER_LISTEN_ENV_VAR] = self.address
+        tmp_env.pop(MUTANT_ID_ENV_VAR, None)
+        self.proc = subprocess.Popen([self.schemata_exe], env=tmp_env, \
+                                    cwd=self.channel_dir, \
+                                    stdin=subprocess.DEVNULL, \
+                                    stdout=subprocess.DEVNULL, \
+                                    stderr=subprocess.DEVNULL, \
+                                    start_new_session=True)
+        atexit.register(self.stop)
+        deadline = time.time() + self.START_TIMEOUT
+        while not os.path.exists(self.address):
+            if self.proc.poll() is not None or time.time() > deadline:
+                self.stop()
+                return False
+            time.sleep(0.005)
+        return True
+    #~ def start()
+
+    def is_running(self):
+        return self.proc is not None and self.proc.poll() is None
+    #~ def is_running()
+
+    def get_executable(self):
+        """ :return: the executable to use as the program under test
+        """
+        if self.is_running():
+            return self.client_exe
+        return self.schemata_exe
+    #~ def get_executable()
+
+    def get_environment_vars(self, mutant_id):
+        """ :return: the environment variables of an execution of mutant_id
+                    (0 for the original program) with get_executable()
+        """
+        env_vars = {MUTANT_ID_ENV_VAR: str(mutant_id), \
+                    SCHEMATA_EXE_ENV_VAR: self.schemata_exe}
+        if self.is_running():
+            env_vars[FORKSERVER_SOCKET_ENV_VAR] = self.address
+        return env_vars
+    #~ def get_environment_vars()
+
+    def stop(self):
+        if self.proc is not None:
+            # The server session includes the connection handlers
+            try:
+                os.killpg(self.proc.pid, signal.SIGKILL)
+            except OSError:
+                pass
+            self.proc.wait()
+            self.proc = None
+            atexit.unregister(self.stop)
+        if self.channel_dir is not None:
+            shutil.rmtree(self.channel_dir, ignore_errors=True)
+            self.channel_dir = None
+    #~ def stop()
+#~ class MetaMutantForkServer
@@ -0,0 +1,439 @@
+/*
+ * Runtime linked with the Mart meta-mutant (mutant schemata) for its native
+ * execution by Muteria (see schemata.py).
+ *
+ * - The executed mutant is selected through the environment variable
+ *   MUTERIA_MUTANT_ID (unset or 0: original program).
+ * - When MUTERIA_FORKSERVER_LISTEN is set to a unix socket path, the process
+ *   becomes a fork server once initialized, when main is called (after all
+ *   the constructors, whatever their order). The executable is linked with
+ *   '-Wl,--wrap=main' so that the C runtime calls __wrap_main, which calls
+ *   the program's main (__real_main). Each connection of a client
+ *   (forkserver_client.c) carries the standard file descriptors, working
+ *   directory, arguments and environment of an execution, run by a child
+ *   forked from the initialized process. The wait status and the resource
+ *   usage of the execution are sent back to the client (see
+ *   forkserver_protocol.h). The execution is killed if the client goes
+ *   away (e.g. test timeout).
+ * - The forked execution is sandboxed like the client (see
+ *   muteria/drivers/sandbox.py): it joins the cgroup of the client and
+ *   takes its resource limits. The memory pages shared with the server
+ *   are accounted to the server's cgroup.
+ * - The constructors run once in the server, with the original program
+ *   (mutant 0). The mutants whose mutation points are reached during the
+ *   constructors (reported by the calls of
+ *   klee_semu_GenMu_Mutant_ID_Selector_Func before main) would not be
+ *   executed by forking from the initialized state: the server replies to
+ *   their clients to execute the meta-mutant directly.
+ */
+
+#define _GNU_SOURCE
+#include <errno.h>
+#include <poll.h>
+#include <signal.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <fcntl.h>
+#include <limits.h>
+#include <unistd.h>
+#include <sys/resource.h>
+#include <sys/socket.h>
+#include <sys/time.h>
+#include <sys/un.h>
+#include <sys/wait.h>
+
+#include "forkserver_protocol.h"
+
+#define MUTANT_ID_ENV_VAR "MUTERIA_MUTANT_ID"
+#define LISTEN_ENV_VAR "MUTERIA_FORKSERVER_LISTEN"
+/* Same as muteria.drivers.sandbox.ExecutionSandbox.CGROUP_ROOT */
+#define CGROUP_ROOT "/sys/fs/cgroup"
+#define MAX_CONSTRUCTOR_RANGES 1024
+
+/* Mutant ids ranges of the mutation points reached before main (by the
+ * constructors). All the mutants are considered reached on overflow */
+static struct {
+    unsigned from_id;
+    unsigned to_id;
+} constructor_ranges[MAX_CONSTRUCTOR_RANGES];
+static int n_constructor_ranges = 0;
+static int constructor_ranges_overflow = 0;
+static int main_called = 0;
+
+/* Mart meta-mutant selector interface. Weak, the definitions of the
+ * meta-mutant module take precedence. */
+unsigned klee_semu_GenMu_Mutant_ID_Selector __attribute__((weak)) = 0;
+
+void __attribute__((weak))
+klee_semu_GenMu_Mutant_ID_Selector_Func(unsigned from_id, unsigned to_id) {
+    if (main_called)
+        return;
+    if (n_constructor_ranges > 0
+            && constructor_ranges[n_constructor_ranges - 1].from_id == from_id
+            && constructor_ranges[n_constructor_ranges - 1].to_id == to_id)
+        return;
+    if (n_constructor_ranges == MAX_CONSTRUCTOR_RANGES) {
+        constructor_ranges_overflow = 1;
+        return;
+    }
+    constructor_ranges[n_constructor_ranges].from_id = from_id;
+    constructor_ranges[n_constructor_ranges].to_id = to_id;
+    n_constructor_ranges++;
+}
+
+void __attribute__((weak))
+klee_semu_GenMu_Post_Mutation_Point_Func(unsigned from_id, unsigned to_id) {
+    (void) from_id;
+    (void) to_id;
+}
+
+extern int __real_main(int argc, char **argv, char **envp);
+extern char **environ;
+
+static int sigchld_pipe[2] = {-1, -1};
+
+static unsigned parse_mutant_id(const char *mid) {
+    if (mid == NULL || *mid == '\0')
+        return 0;
+    return (unsigned) strtoul(mid, NULL, 10);
+}
+
+static void select_mutant(void) {
+    klee_semu_GenMu_Mutant_ID_Selector =
+                                    parse_mutant_id(getenv(MUTANT_ID_ENV_VAR));
+}
+
+static int reached_by_constructors(unsigned mutant_id) {
+    int i;
+    if (mutant_id == 0)
+        return 0;
+    if (constructor_ranges_overflow)
+        return 1;
+    for (i = 0; i < n_constructor_ranges; i++) {
+        if (constructor_ranges[i].from_id <= mutant_id
+                                && mutant_id <= constructor_ranges[i].to_id)
+            return 1;
+    }
+    return 0;
+}
+
+/* Move the calling process into the cgroup (v2) of the process pid, if
+ * different from its own. Return 0 on success */
+static int join_cgroup_of(pid_t pid) {
+    char path[PATH_MAX], own[PATH_MAX], other[PATH_MAX], line[PATH_MAX];
+    FILE *f;
+    int i, fd, ok;
+    char *cgroups[2] = {own, other};
+    pid_t pids[2] = {0, pid};
+
+    for (i = 0; i < 2; i++) {
+        if (pids[i] == 0)
+            snprintf(path, sizeof(path), "/proc/self/cgroup");
+        else
+            snprintf(path, sizeof(path), "/proc/%d/cgroup", (int) pids[i]);
+        cgroups[i][0] = '\0';
+        f = fopen(path, "r");
+        if (f == NULL)
+            return -1;
+        while (fgets(line, sizeof(line), f) != NULL) {
+            if (strncmp(line, "0::", 3) == 0) {
+                line[strcspn(line, "\n")] = '\0';
+                snprintf(cgroups[i], PATH_MAX, "%s", line + 3);
+            }
+        }
+        fclose(f);
+    }
+    /* no cgroup v2, or same cgroup (not sandboxed with cgroups) */
+    if (other[0] == '\0' || strcmp(own, other) == 0)
+        return 0;
+    if (snprintf(path, sizeof(path), "%s%s/cgroup.procs", CGROUP_ROOT,
+                                            other) >= (int) sizeof(path))
+        return -1;
+    fd = open(path, O_WRONLY);
+    if (fd < 0)
+        return -1;
+    snprintf(line, sizeof(line), "%d\n", (int) getpid());
+    ok = write(fd, line, strlen(line)) == (ssize_t) strlen(line);
+    close(fd);
+    return ok ? 0 : -1;
+}
+
+/* Apply the sandbox of the process pid (the client) to the calling
+ * process: cgroup and resource limits. Return 0 on success */
+static int join_sandbox_of(pid_t pid) {
+    static const int resources[] = {RLIMIT_AS, RLIMIT_NPROC, RLIMIT_CPU,
+                                                                RLIMIT_FSIZE};
+    struct rlimit rl, own;
+    size_t i;
+
+    if (join_cgroup_of(pid) != 0)
+        return -1;
+    for (i = 0; i < sizeof(resources) / sizeof(resources[0]); i++) {
+        if (prlimit(pid, resources[i], NULL, &rl) != 0
+                                || getrlimit(resources[i], &own) != 0)
+            return -1;
+        if ((rl.rlim_cur != own.rlim_cur || rl.rlim_max != own.rlim_max)
+                                        && setrlimit(resources[i], &rl) != 0)
+            return -1;
+    }
+    return 0;
+}
+
+static int64_t timeval_us(struct timeval tv) {
+    return (int64_t) tv.tv_sec * 1000000 + (int64_t) tv.tv_usec;
+}
+
+static int read_full(int fd, char *buf, size_t size) {
+    while (size > 0) {
+        ssize_t n = read(fd, buf, size);
+        if (n < 0 && errno == EINTR)
+            continue;
+        if (n <= 0)
+            return -1;
+        buf += n;
+        size -= (size_t) n;
+    }
+    return 0;
+}
+
+/* Receive the request header (payload size) and the 3 standard fds */
+static int recv_header(int conn, uint32_t *size, int fds[3]) {
+    char control[CMSG_SPACE(3 * sizeof(int))];
+    struct iovec iov = {size, sizeof(*size)};
+    struct msghdr msg;
+    struct cmsghdr *cmsg;
+    ssize_t n;
+
+    memset(&msg, 0, sizeof(msg));
+    msg.msg_iov = &iov;
+    msg.msg_iovlen = 1;
+    msg.msg_control = control;
+    msg.msg_controllen = sizeof(control);
+    do {
+        n = recvmsg(conn, &msg, 0);
+    } while (n < 0 && errno == EINTR);
+    if (n != (ssize_t) sizeof(*size))
+        return -1;
+    cmsg = CMSG_FIRSTHDR(&msg);
+    if (cmsg == NULL || cmsg->cmsg_level != SOL_SOCKET
+            || cmsg->cmsg_type != SCM_RIGHTS
+            || cmsg->cmsg_len != CMSG_LEN(3 * sizeof(int)))
+        return -1;
+    memcpy(fds, CMSG_DATA(cmsg), 3 * sizeof(int));
+    return 0;
+}
+
+static void on_sigchld(int sig) {
+    int saved_errno = errno;
+    (void) sig;
+    if (write(sigchld_pipe[1], "c", 1) < 0) {
+        /* the pipe is full, a notification is already pending */
+    }
+    errno = saved_errno;
+}
+
+/* Payload: cwd, argc (decimal), argv strings, then environment strings,
+ * each NUL terminated. Runs in a process forked for the connection. */
+static void handle_connection(int conn) {
+    uint32_t size;
+    int fds[3];
+    char *payload, *p, *end, *cwd;
+    char **argv, **envp;
+    const char *mutant_id = NULL;
+    int argc, envc, i, status;
+    struct forkserver_reply reply;
+    struct ucred cred;
+    socklen_t cred_len = sizeof(cred);
+    struct rusage ru;
+    pid_t pid;
+    struct sigaction sa;
+    struct pollfd pfds[2];
+
+    if (recv_header(conn, &size, fds) != 0)
+        _exit(1);
+    payload = malloc((size_t) size + 1);
+    if (payload == NULL || read_full(conn, payload, size) != 0)
+        _exit(1);
+    payload[size] = '\0';
+    end = payload + size;
+
+    cwd = payload;
+    p = cwd + strlen(cwd) + 1;
+    if (p >= end)
+        _exit(1);
+    argc = atoi(p);
+    p += strlen(p) + 1;
+    argv = calloc((size_t) argc + 1, sizeof(char *));
+    if (argv == NULL)
+        _exit(1);
+    for (i = 0; i < argc && p < end; i++) {
+        argv[i] = p;
+        p += strlen(p) + 1;
+    }
+    if (i != argc)
+        _exit(1);
+    envc = 0;
+    for (char *q = p; q < end; q += strlen(q) + 1)
+        envc++;
+    envp = calloc((size_t) envc + 1, sizeof(char *));
+    if (envp == NULL)
+        _exit(1);
+    for (i = 0; i < envc; i++) {
+        envp[i] = p;
+        if (strncmp(p, MUTANT_ID_ENV_VAR "=", sizeof(MUTANT_ID_ENV_VAR)) == 0)
+            mutant_id = p + sizeof(MUTANT_ID_ENV_VAR);
+        p += strlen(p) + 1;
+    }
+
+    memset(&reply, 0, sizeof(reply));
+    if (reached_by_constructors(parse_mutant_id(mutant_id))) {
+        reply.kind = FORKSERVER_REPLY_EXECUTE_DIRECTLY;
+        send(conn, &reply, sizeof(reply), MSG_NOSIGNAL);
+        _exit(0);
+    }
+    if (getsockopt(conn, SOL_SOCKET, SO_PEERCRED, &cred, &cred_len) != 0)
+        _exit(1);
+
+    if (pipe(sigchld_pipe) != 0)
+        _exit(1);
+    fcntl(sigchld_pipe[1], F_SETFL, O_NONBLOCK);
+    memset(&sa, 0, sizeof(sa));
+    sa.sa_handler = on_sigchld;
+    sa.sa_flags = SA_RESTART | SA_NOCLDSTOP;
+    sigemptyset(&sa.sa_mask);
+    sigaction(SIGCHLD, &sa, NULL);
+
+    fflush(NULL);
+    pid = fork();
+    if (pid < 0)
+        _exit(1);
+    if (pid == 0) {
+        /* The execution, from the initialized state */
+        signal(SIGCHLD, SIG_DFL);
+        close(sigchld_pipe[0]);
+        close(sigchld_pipe[1]);
+        close(conn);
+        for (i = 0; i < 3; i++) {
+            if (fds[i] != i)
+                dup2(fds[i], i);
+        }
+        for (i = 0; i < 3; i++) {
+            if (fds[i] > 2)
+                close(fds[i]);
+        }
+        if (join_sandbox_of(cred.pid) != 0) {
+            fprintf(stderr, "muteria fork server: cannot apply the sandbox"
+                                        " of the client: %s\n", strerror(errno));
+            _exit(126);
+        }
+        if (chdir(cwd) != 0)
+            _exit(127);
+        environ = envp;
+        select_mutant();
+        exit(__real_main(argc, argv, environ));
+    }
+    for (i = 0; i < 3; i++)
+        close(fds[i]);
+
+    /* Wait for the execution, kill it if the client goes away */
+    pfds[0].fd = sigchld_pipe[0];
+    pfds[0].events = POLLIN;
+    pfds[1].fd = conn;
+    pfds[1].events = POLLIN;
+    for (;;) {
+        pid_t r = wait4(pid, &status, WNOHANG, &ru);
+        if (r == pid)
+            break;
+        if (r < 0 && errno != EINTR)
+            _exit(1);
+        pfds[0].revents = pfds[1].revents = 0;
+        if (poll(pfds, 2, -1) < 0)
+            continue;
+        if (pfds[0].revents & POLLIN) {
+            char buf[64];
+            if (read(sigchld_pipe[0], buf, sizeof(buf)) < 0) {
+                /* spurious wake up */
+            }
+        }
+        if (pfds[1].revents & (POLLIN | POLLHUP | POLLERR)) {
+            char c;
+            if (recv(conn, &c, 1, MSG_DONTWAIT) <= 0) {
+                kill(pid, SIGKILL);
+                waitpid(pid, &status, 0);
+                _exit(1);
+            }
+        }
+    }
+    reply.kind = FORKSERVER_REPLY_EXECUTED;
+    reply.status = (int32_t) status;
+    reply.utime_us = timeval_us(ru.ru_utime);
+    reply.stime_us = timeval_us(ru.ru_stime);
+    reply.maxrss_kb = (int64_t) ru.ru_maxrss;
+    reply.inblock = (int64_t) ru.ru_inblock;
+    reply.oublock = (int64_t) ru.ru_oublock;
+    send(conn, &reply, sizeof(reply), MSG_NOSIGNAL);
+    _exit(0);
+}
+
+static void serve(const char *path) {
+    struct sockaddr_un addr;
+    char tmp_path[sizeof(addr.sun_path)];
+    int lfd, conn;
+    pid_t handler;
+
+    /* Bound to a temporary name, renamed once listening (the clients
+     * connect to a ready server or fall back to a direct execution) */
+    if (strlen(path) + 5 > sizeof(addr.sun_path))
+        _exit(1);
+    snprintf(tmp_path, sizeof(tmp_path), "%s.tmp", path);
+    lfd = socket(AF_UNIX, SOCK_STREAM, 0);
+    if (lfd < 0)
+        _exit(1);
+    memset(&addr, 0, sizeof(addr));
+    addr.sun_family = AF_UNIX;
+    strcpy(addr.sun_path, tmp_path);
+    unlink(tmp_path);
+    if (bind(lfd, (struct sockaddr *) &addr, sizeof(addr)) != 0
+            || listen(lfd, 64) != 0 || rename(tmp_path, path) != 0)
+        _exit(1);
+
+    for (;;) {
+        /* reap the finished connection handlers */
+        while (waitpid(-1, NULL, WNOHANG) > 0)
+            ;
+        conn = accept(lfd, NULL, NULL);
+        if (conn < 0) {
+            if (errno == EINTR || errno == ECONNABORTED)
+                continue;
+            _exit(1);
+        }
+        fflush(NULL);
+        handler = fork();
+        if (handler == 0) {
+            close(lfd);
+            handle_connection(conn);
+        }
+        close(conn);
+    }
+}
+
+/* Before the program's constructors, that may execute mutated code */
+__attribute__((constructor(101)))
+static void muteria_schemata_init(void) {
+    select_mutant();
+}
+
+int __wrap_main(int argc, char **argv, char **envp) {
+    const char *listen_path = getenv(LISTEN_ENV_VAR);
+    main_called = 1;
+    if (listen_path != NULL && *listen_path != '\0') {
+        char *path = strdup(listen_path);
+        if (path == NULL)
+            _exit(1);
+        unsetenv(LISTEN_ENV_VAR);
+        serve(path);
+    }
+    return __real_main(argc, argv, envp);
+}
@@ -0,0 +1,227 @@
+
+from __future__ import print_function
+
+import os
+import json
+import shutil
+import socket
+import hashlib
+import tempfile
+import threading
+import itertools
+
+import muteria.common.mix as common_mix
+import muteria.common.fs as common_fs
+
+try:
+    import coverage
+    import coverage.parser
+except ImportError:
+    pass
+
+ERROR_HANDLER = common_mix.ErrorHandler
+
+# Environment variable giving the collector channel to the measured programs
+COVERAGE_CHANNEL_ENV_VAR = "MUTERIA_COVERAGE_PY_CHANNEL"
+# Environment variable giving the token of the test execution, with which
+# the data sent are tagged
+COVERAGE_TOKEN_ENV_VAR = "MUTERIA_COVERAGE_PY_TOKEN"
+
+# Preloaded (usercustomize) in the measured python programs.
+# When the collector channel is set, the coverage data are kept in memory
+# and sent to the collector at exit, tagged with the execution token (the
+# collector acknowledges once the data is stored). The send failures are
+# ignored silently (nothing is written into the test output).
+# Otherwise, coverage.py writes its data files.
+PRELOAD_SOURCE = """
+import os
+import coverage
+
+def _muteria_start_coverage():
+    channel = os.environ.get({env_var!r})
+    if channel is None:
+        coverage.process_startup()
+        return
+    import json
+    import atexit
+    import socket
+    cov = coverage.Coverage(data_file=None, \\
+                        config_file=os.environ['COVERAGE_PROCESS_START'])
+    cov.start()
+    token = os.environ.get({token_env_var!r})
+    def _send():
+        try:
+            cov.stop()
+            data = cov.get_data()
+            has_arcs = data.has_arcs()
+            files = {{}}
+            for fn in data.measured_files():
+                files[fn] = [data.lines(fn) or [], \\
+                                (data.arcs(fn) or []) if has_arcs else []]
+            payload = {{"token": token, "files": files}}
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(channel)
+                sock.sendall(json.dumps(payload).encode('utf-8'))
+                sock.shutdown(socket.SHUT_WR)
+                sock.recv(1)
+            finally:
+                sock.close()
+        except Exception:
+            pass
+    atexit.register(_send)
+
+_muteria_start_coverage()
+""".format(env_var=COVERAGE_CHANNEL_ENV_VAR, \
+                                        token_env_var=COVERAGE_TOKEN_ENV_VAR)
+
+class StaticAnalysisCache(object):
+    """ Persistent cache of the executable lines and arcs of python source
+        files (computed with coverage.py's PythonParser), keyed by the
+        file content hash (and coverage.py version). The cache survives
+        the process restarts and the re-instrumentations.
+    """
+    def __init__(self, cache_file):
+        self.cache_file = cache_file
+        self.cache = {}
+        self.changed = False
+        if os.path.isfile(self.cache_file):
+            try:
+                self.cache = common_fs.loadJSON(self.cache_file)
+            except ValueError:
+                # corrupted cache, recomputed
+                self.cache = {}
+    #~ def __init__()
+
+    def get(self, filename):
+        """ :return: pair of the set of executable lines and the set of
+                    executable arcs (tuples) of filename
+        """
+        with open(filename, 'rb') as f:
+            content = f.read()
+        key = "{}:{}".format(coverage.__version__, \
+                                        hashlib.sha256(content).hexdigest())
+        if key not in self.cache:
+            pser = coverage.parser.PythonParser(\
+                        text=content.decode('utf-8', 'replace'), \
+                                                            filename=filename)
+            pser.parse_source()
+            self.cache[key] = [sorted(pser.statements), \
+                                        [list(a) for a in sorted(pser.arcs())]]
+            self.changed = True
+        lines, arcs = self.cache[key]
+        return set(lines), set(tuple(a) for a in arcs)
+    #~ def get()
+
+    def save(self):
+        if self.changed:
+            common_fs.dumpJSON(self.cache, self.cache_file)
+            self.changed = False
+    #~ def save()
+#~ class StaticAnalysisCache
+
+class CoverageDataCollector(object):
+    """ Receive the coverage data (lines and arcs per measured file) sent by
+        the measured programs at exit, through a unix socket, instead of
+        writing, combining and erasing coverage.py data files.
+        Each test execution gets a token (new_token), passed to the
+        measured programs through the environment, with which they tag
+        their data. The data of all the processes of an execution are
+        merged until pop_data is called with its token. The data with an
+        unknown or already popped token (e.g. sent by a process that 
+        outlived its test) are dropped.
+    """
+    @staticmethod
+    def is_supported():
+        return hasattr(socket, 'AF_UNIX')
+    #~ def is_supported()
+
+    def __init__(self):
+        # The unix socket path length is limited, use a short temporary dir
+        self.channel_dir = tempfile.mkdtemp(prefix='muteria-covpy-')
+        self.address = os.path.join(self.channel_dir, 'channel')
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.address)
+        self.server.listen(64)
+        self.lock = threading.Lock()
+        # token -> data of the execution
+        self.data = {}
+        self.token_counter = itertools.count()
+        self.closed = False
+        self.thread = threading.Thread(target=self._serve)
+        self.thread.daemon = True
+        self.thread.start()
+    #~ def __init__()
+
+    def get_address(self):
+        return self.address
+    #~ def get_address()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                # closed
+                break
+            try:
+                chunks = []
+                while True:
+                    chunk = conn.recv(1 << 16)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                self._add(json.loads(b''.join(chunks).decode('utf-8')))
+                conn.sendall(b'1')
+            except (OSError, ValueError):
+                pass
+            finally:
+                conn.close()
+    #~ def _serve()
+
+    def _add(self, payload):
+        with self.lock:
+            data = self.data.get(payload.get("token", None), None)
+            if data is None:
+                return
+            for filename, (lines, arcs) in payload["files"].items():
+                try:
+                    f_lines, f_arcs = data[filename]
+                except KeyError:
+                    f_lines, f_arcs = set(), set()
+                    data[filename] = (f_lines, f_arcs)
+                f_lines.update(lines)
+                f_arcs.update(tuple(a) for a in arcs)
+    #~ def _add()
+
+    def new_token(self):
+        """ :return: the token (string) of a new test execution
+        """
+        with self.lock:
+            token = "{}-{}".format(os.getpid(), next(self.token_counter))
+            self.data[token] = {}
+        return token
+    #~ def new_token()
+
+    def pop_data(self, token):
+        """ :return: dict with measured file as key and pair of the sets of
+                    covered lines and arcs as value, of the execution with
+                    the token. The later data of the token are dropped.
+        """
+        with self.lock:
+            return self.data.pop(token, {})
+    #~ def pop_data()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.server.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.server.close()
+        self.thread.join(5)
+        shutil.rmtree(self.channel_dir, ignore_errors=True)
+    #~ def close()
+#~ class CoverageDataCollector
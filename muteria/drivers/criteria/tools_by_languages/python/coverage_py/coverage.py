@@ -6,6 +6,7 @@ import sys
 import re
 import shutil
 import glob
+import atexit
 import logging
 import configparser
 
@@ -18,6 +19,10 @@ from muteria.repositoryandcode.callback_object import DefaultCallbackObject
 from muteria.drivers.criteria.base_testcriteriatool import BaseCriteriaTool
 from muteria.drivers.criteria import TestCriteria
 from muteria.drivers import DriversUtils
+from muteria.drivers.criteria.tools_by_languages.python.coverage_py.collector\
+                import StaticAnalysisCache, CoverageDataCollector, \
+                                COVERAGE_CHANNEL_ENV_VAR, \
+                                COVERAGE_TOKEN_ENV_VAR, PRELOAD_SOURCE
 
 try:
     import coverage
@@ -41,11 +46,31 @@ class CriteriaToolCoveragePy(BaseCriteriaTool):
                                                                 '.configrc')
         self.raw_data_file = os.path.join(self.instrumented_code_storage_dir,\
                                                                     '.rawdata')
+        # Kept in the working dir to survive the re-instrumentations
+        self.static_analysis_cache_file = os.path.join(\
+                        self.criteria_working_dir, 'static_analysis_cache.json')
         # clean any possible raw data file
         for file_ in glob.glob(self.raw_data_file+"*"):
             os.remove(file_)
+
+        self.data_collector = None
+        # coverage of the tests, by result_dir_tmp, between the
+        # collection and the extraction
+        self.tmp_coverage_data = {}
     #~ def __init__()
 
+    def _get_data_collector(self):
+        """ Start the coverage data collector at first use
+            :return: the collector, or None if not supported (the coverage 
+                    data files are used)
+        """
+        if self.data_collector is None and \
+                                        CoverageDataCollector.is_supported():
+            self.data_collector = CoverageDataCollector()
+            atexit.register(self.data_collector.close)
+        return self.data_collector
+    #~ def _get_data_collector()
+
     @classmethod
     def installed(cls, custom_binary_dir=None):
         """ Check that the tool is installed
@@ -119,13 +144,30 @@ class CriteriaToolCoveragePy(BaseCriteriaTool):
         if 'PYTHONPATH' is os.environ:
             python_path += ":"+os.environ['PYTHONPATH']
 
-        return {criterion: {
+        env_vars = {
                     #"PYTHONUSERBASE": self.preload_dir,
                     "PYTHONPATH": python_path, 
                     "COVERAGE_PROCESS_START": self.config_file,
-                } for criterion in enabled_criteria}
+                }
+        data_collector = self._get_data_collector()
+        if data_collector is not None:
+            env_vars[COVERAGE_CHANNEL_ENV_VAR] = data_collector.get_address()
+
+        return {criterion: dict(env_vars) for criterion in enabled_criteria}
     #~ def _get_criteria_environment_vars()
 
+    def _get_test_execution_environment_vars(self, criteria_name_list, \
+                                                                env_vars):
+        ''' The data sent to the collector are tagged with a token of the
+            test execution
+        '''
+        if env_vars is None or COVERAGE_CHANNEL_ENV_VAR not in env_vars:
+            return env_vars
+        env_vars = dict(env_vars)
+        env_vars[COVERAGE_TOKEN_ENV_VAR] = self.data_collector.new_token()
+        return env_vars
+    #~ def _get_test_execution_environment_vars()
+
     class PathAliases(object):
         def __init__(self, data_files, exe_rel_files, inst_top_dir, \
                                                         top_out_dir, repo_dir):
@@ -162,52 +204,83 @@ class CriteriaToolCoveragePy(BaseCriteriaTool):
             return self.alias_map[in_dat_file]
     #~ PathAliases
 
+    def _get_measured_data_from_data_files(self):
+        """ Combine and erase the coverage.py data files
+            :return: dict with measured file as key and pair of the sets of
+                    covered lines and arcs as value
+        """
+        cov_obj = coverage.Coverage(config_file=self.config_file)
+        cov_obj.combine()
+        tmp_dat_obj = cov_obj.get_data()
+        measured = {}
+        for fn in tmp_dat_obj.measured_files():
+            measured[fn] = (set(tmp_dat_obj.lines(fn) or []), \
+                                        set(tmp_dat_obj.arcs(fn) or []))
+        cov_obj.erase()
+        # clean any possible raw data file
+        for file_ in glob.glob(self.raw_data_file+"*"):
+            os.remove(file_)
+        return measured
+    #~ def _get_measured_data_from_data_files()
+
+    def _load_executables_static_analysis(self):
+        obj = common_fs.loadJSON(self.instrumentation_details)
+        self.exes_abs = []
+        self.exes_rel = []
+        for rp, ap in list(obj.items()):
+            self.exes_rel.append(rp)
+            self.exes_abs.append(ap)
+        self.exes_rel, self.exes_abs = zip(*sorted(\
+                                        zip(self.exes_rel, self.exes_abs),\
+                                        key=lambda x: x.count(os.path.sep)\
+                                        ))
+        
+        # get executables stmt and branches
+        cache = StaticAnalysisCache(self.static_analysis_cache_file)
+        self.executable_lines = {}
+        self.executable_arcs = {}
+        for fn in self.exes_abs:
+            self.executable_lines[fn], self.executable_arcs[fn] = \
+                                                                cache.get(fn)
+        cache.save()
+    #~ def _load_executables_static_analysis()
+
     def _collect_temporary_coverage_data(self, criteria_name_list, \
                                                 test_execution_verdict, \
                                                 used_environment_vars, \
                                                 result_dir_tmp, \
                                                 testcase):
-        ''' extract coverage data into json file in result_dir_tmp
+        ''' extract coverage data of the test (kept in memory until 
+            _extract_coverage_data_of_a_test)
         '''
-        cov_obj = coverage.Coverage(config_file=self.config_file)
-        cov_obj.combine()
-        tmp_dat_obj = cov_obj.get_data()
+        if used_environment_vars is not None and \
+                        COVERAGE_TOKEN_ENV_VAR in used_environment_vars:
+            measured = self.data_collector.pop_data(\
+                                used_environment_vars[COVERAGE_TOKEN_ENV_VAR])
+        else:
+            measured = self._get_measured_data_from_data_files()
         
-        in_dat_files = tmp_dat_obj.measured_files()
+        in_dat_files = list(measured)
 
         # Get file map
         try :
             self.exes_rel
         except AttributeError:
-            obj = common_fs.loadJSON(self.instrumentation_details)
-            self.exes_abs = []
-            self.exes_rel = []
-            for rp, ap in list(obj.items()):
-                self.exes_rel.append(rp)
-                self.exes_abs.append(ap)
-            self.exes_rel, self.exes_abs = zip(*sorted(\
-                                            zip(self.exes_rel, self.exes_abs),\
-                                            key=lambda x: x.count(os.path.sep)\
-                                            ))
-            
-            # get executables stmt and branches
-            self.executable_lines = {}
-            self.executable_arcs = {}
-            for fn in self.exes_abs:
-                pser = coverage.parser.PythonParser(filename=fn)
-                pser.parse_source() 
-                self.executable_lines[fn] = pser.statements
-                self.executable_arcs[fn] = pser.arcs() 
-
-
-        dat_obj = coverage.CoverageData()
+            self._load_executables_static_analysis()
+
+        covered_lines = {fn: set() for fn in self.exes_abs}
+        covered_arcs = {fn: set() for fn in self.exes_abs}
         if len(in_dat_files) > 0:
             file_map = self.PathAliases(in_dat_files, self.exes_rel, \
                                     self.used_srcs_dir, \
                                     self._get_latest_top_output_dir(), \
                                     self.code_builds_factory.\
                                         repository_manager.repo_abs_path(''))
-            dat_obj.update(tmp_dat_obj, aliases=file_map)
+            for dfile, (lines, arcs) in measured.items():
+                fn = file_map.map(dfile)
+                if fn in covered_lines:
+                    covered_lines[fn] |= lines
+                    covered_arcs[fn] |= arcs
 
         # Get the coverages
         res = {c: {} for c in criteria_name_list}
@@ -215,38 +288,25 @@ class CriteriaToolCoveragePy(BaseCriteriaTool):
             for rel_fn, abs_fn in zip(self.exes_rel, self.exes_abs):
                 res[TestCriteria.STATEMENT_COVERAGE][rel_fn] = \
                                 {ln: 0 for ln in self.executable_lines[abs_fn]}
-                ln_list = dat_obj.lines(abs_fn)
-                if ln_list is not None:
-                    res[TestCriteria.STATEMENT_COVERAGE][rel_fn].\
-                                            update({ln:1 for ln in ln_list})
+                res[TestCriteria.STATEMENT_COVERAGE][rel_fn].\
+                                update({ln:1 for ln in covered_lines[abs_fn]})
         if TestCriteria.BRANCH_COVERAGE in criteria_name_list:
             for rel_fn, abs_fn in zip(self.exes_rel, self.exes_abs):
                 res[TestCriteria.BRANCH_COVERAGE][rel_fn] = \
                             {str(an): 0 for an in self.executable_arcs[abs_fn]}
-                an_list = dat_obj.arcs(abs_fn)
-                if an_list is not None:
-                    res[TestCriteria.BRANCH_COVERAGE][rel_fn].\
-                                        update({str(an):1 for an in an_list})
-
-        # save the temporary coverage
-        res_str = {v.get_str():res[v] for v in res}
-        common_fs.dumpJSON(res_str, os.path.join(result_dir_tmp,\
-                                                    self.cov_data_filename))
+                res[TestCriteria.BRANCH_COVERAGE][rel_fn].\
+                            update({str(an):1 for an in covered_arcs[abs_fn]})
 
-        cov_obj.erase()
-        # clean any possible raw data file
-        for file_ in glob.glob(self.raw_data_file+"*"):
-            os.remove(file_)
+        # keep the temporary coverage
+        self.tmp_coverage_data[result_dir_tmp] = res
     #~ def _collect_temporary_coverage_data()
 
     def _extract_coverage_data_of_a_test(self, enabled_criteria, \
                                     test_execution_verdict, result_dir_tmp):
-        ''' read json files and extract data
+        ''' get the data kept by _collect_temporary_coverage_data
             return: the dict of criteria with covering count
         '''
-        in_file = os.path.join(result_dir_tmp, self.cov_data_filename)
-        cov_dat_obj = common_fs.loadJSON(in_file)
-        cov_dat_obj = {TestCriteria[v]: cov_dat_obj[v] for v in cov_dat_obj}
+        cov_dat_obj = self.tmp_coverage_data.pop(result_dir_tmp)
 
         ERROR_HANDLER.assert_true(set(cov_dat_obj) == set(enabled_criteria), \
                                     "mismatching criteria enabled", __file__)
@@ -261,9 +321,6 @@ class CriteriaToolCoveragePy(BaseCriteriaTool):
                                                             str(id_), filename)
                         res[c][ident] = cov
 
-        # delete cov file
-        os.remove(in_file)
-
         return res
     #~ def _extract_coverage_data_of_a_test()
 
@@ -305,7 +362,7 @@ class CriteriaToolCoveragePy(BaseCriteriaTool):
 
         # Create config and preload
         with open(self.preload_file, "w") as f:
-            f.write("import coverage\ncoverage.process_startup()\n")
+            f.write(PRELOAD_SOURCE)
         
         concurrencies = ['thread', 'multiprocessing', 'gevent', 'greenlet', \
                                                                 'eventlet']
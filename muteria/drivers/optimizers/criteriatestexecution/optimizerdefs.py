@@ -31,6 +31,13 @@ class CriteriaOptimizers(common_mix.EnumAutoName):
     OPTIMIZED_FROM_JSON = importlib.import_module(".fromjson", \
                                         package=crit_opt.__name__
                                     ).CriteriaTestExecutionOptimizer
+    PRIORITIZED = importlib.import_module(".prioritized", \
+                                        package=crit_opt.__name__
+                                    ).CriteriaTestExecutionOptimizer
+    INCREMENTAL_SAMPLING = importlib.import_module(\
+                                        ".incremental_sampling", \
+                                        package=crit_opt.__name__
+                                    ).CriteriaTestExecutionOptimizer
 
     def get_optimizer(self):
         return self.get_field_value()
@@ -52,10 +59,14 @@ def check_is_right_optimizer(criterion, optimizer):
         CriteriaOptimizers.NO_OPTIMIZATION,
         CriteriaOptimizers.OPTIMIZED_FROM_DICT,
         CriteriaOptimizers.OPTIMIZED_FROM_JSON,
+        CriteriaOptimizers.PRIORITIZED,
+        CriteriaOptimizers.INCREMENTAL_SAMPLING,
     ]
     # Check
+    if optimizer in generic:
+        return True
     if criterion in dat:
-        if optimizer in dat[criterion] or optimizer in generic:
+        if optimizer in dat[criterion]:
             return True
     return False
 #~ def check_right_optimizer()
\ No newline at end of file
@@ -0,0 +1,129 @@
+#
+# [LICENCE]
+#
+""" Incremental sampling criteria test execution optimizer class
+
+    The test objectives (e.g. mutants) are executed in the given order
+    (a random sample, see muteria.drivers.criteria.element_selection, where
+    every prefix is a random sample) until the confidence interval of the
+    score (proportion of covered/killed test objectives) reaches the target
+    width. The interval is the Wilson score interval with finite population
+    correction.
+"""
+
+from __future__ import print_function
+import os
+import sys
+import copy
+import math
+import logging
+import statistics
+
+import muteria.common.mix as common_mix
+
+from muteria.drivers.optimizers.criteriatestexecution.\
+                                base_criteria_test_execution_optimizer \
+                                    import BaseCriteriaTestExecutionOptimizer
+
+from muteria.drivers.optimizers.testexecution.tools.default \
+                                                import TestExecutionOptimizer
+
+ERROR_HANDLER = common_mix.ErrorHandler
+
+class CriteriaTestExecutionOptimizer(BaseCriteriaTestExecutionOptimizer):
+    # Minimum number of executed test objectives before stopping
+    MIN_SAMPLE_SIZE = 30
+
+    def __init__(self, config, explorer, criterion, ci_width=None, \
+                                                            confidence=None):
+        BaseCriteriaTestExecutionOptimizer.__init__(self, config, explorer, \
+                                                                    criterion)
+        if ci_width is None and config is not None:
+            ci_width = config.CRITERIA_ELEM_SAMPLING_CI_WIDTH.get_val()
+        if confidence is None and config is not None:
+            confidence = \
+                        config.CRITERIA_ELEM_SAMPLING_CI_CONFIDENCE.get_val()
+        ERROR_HANDLER.assert_true(ci_width is not None and ci_width > 0, \
+                            "invalid confidence interval width", __file__)
+        ERROR_HANDLER.assert_true(confidence is not None \
+                                        and 0 < confidence < 1, \
+                                    "invalid confidence level", __file__)
+        self.ci_width = ci_width
+        self.z_score = statistics.NormalDist().inv_cdf((1 + confidence) / 2.0)
+        self.n_executed = 0
+        self.n_covered = 0
+    #~ def __init__()
+
+    def get_confidence_interval(self):
+        """ :return: pair of the lower and upper bounds of the confidence
+                    interval of the score, None if nothing executed
+        """
+        n = self.n_executed
+        if n == 0:
+            return None
+        pop = len(self.test_objective_ordered_list)
+        p = self.n_covered / float(n)
+        z2 = self.z_score ** 2
+        center = (p + z2 / (2.0 * n)) / (1 + z2 / n)
+        half = self.z_score * math.sqrt(p * (1 - p) / n \
+                                        + z2 / (4.0 * n * n)) / (1 + z2 / n)
+        if pop > 1:
+            half *= math.sqrt(max(0.0, (pop - n) / float(pop - 1)))
+        return max(0.0, center - half), min(1.0, center + half)
+    #~ def get_confidence_interval()
+
+    def has_next_test_objective (self):
+        if not BaseCriteriaTestExecutionOptimizer.has_next_test_objective(\
+                                                                        self):
+            return False
+        if self.n_executed >= self.MIN_SAMPLE_SIZE:
+            low, high = self.get_confidence_interval()
+            if high - low <= self.ci_width:
+                logging.info("# Sampling of {} stopped after {}/{} test "
+                            "objectives (score in [{:.3f}, {:.3f}])".format(\
+                                self.criterion.get_str(), self.n_executed, \
+                                len(self.test_objective_ordered_list), \
+                                                                low, high))
+                return False
+        return True
+    #~ def has_next_test_objective()
+
+    def feedback (self, test_objective, test_to_verdict, **kwargs):
+        self.n_executed += 1
+        verdicts = set(test_to_verdict.values())
+        if common_mix.GlobalConstants.FAIL_TEST_VERDICT in verdicts or \
+                not verdicts.isdisjoint(\
+                    common_mix.GlobalConstants.RESOURCE_LIMIT_TEST_VERDICTS):
+            self.n_covered += 1
+    #~ def feedback()
+
+    #######################################################################
+    ##################### Methods implemented ############################
+    #######################################################################
+
+    @classmethod
+    def installed(cls, custom_binary_dir=None):
+        """ Check that the tool is installed
+            :return: bool reprenting whether the tool is installed or not
+                    (executable accessible on the path)
+                    - True: the tool is installed and works
+                    - False: the tool is not installed or do not work
+        """
+        return True
+    #~ def installed()
+
+    def reset (self, toolalias, test_objective_list, test_list, **kwargs):
+        """ Reset the optimizer
+        """
+        self.test_objective_ordered_list = copy.deepcopy(test_objective_list)
+        self.pointer = 0
+        self.n_executed = 0
+        self.n_covered = 0
+        self.test_objective_to_test_execution_optimizer = {
+            to: TestExecutionOptimizer(self.config, self.explorer) \
+            for to in self.test_objective_ordered_list
+        }
+        for to, teo in self.test_objective_to_test_execution_optimizer.items():
+            teo.reset(None, test_list, disable_reset=True)
+    #~ def reset()
+#~ class CriteriaTestExecutionOptimizer
@@ -0,0 +1,122 @@
+#
+# [LICENCE]
+#
+""" Prioritized criteria test execution optimizer class
+
+    The tests of every test objective are ordered with the test
+    prioritization engine, the tests that covered the test objective in the
+    previous executions (results matrix of the criterion) first.
+"""
+
+from __future__ import print_function
+import os
+import sys
+import copy
+import logging
+
+import muteria.common.mix as common_mix
+import muteria.common.matrices as common_matrices
+
+import muteria.controller.explorer as outdir_struct
+from muteria.drivers import DriversUtils
+import muteria.drivers.criteria as criteria_pkg
+
+from muteria.drivers.optimizers.criteriatestexecution.\
+                                base_criteria_test_execution_optimizer \
+                                    import BaseCriteriaTestExecutionOptimizer
+
+from muteria.drivers.optimizers.testexecution.tools.default \
+                                                import TestExecutionOptimizer
+from muteria.drivers.optimizers.testexecution.prioritization import \
+                                                    PrioritizationData, \
+                                                    TestPrioritizationEngine
+
+ERROR_HANDLER = common_mix.ErrorHandler
+
+class CriteriaTestExecutionOptimizer(BaseCriteriaTestExecutionOptimizer):
+
+    def __init__(self, config, explorer, criterion, strategies=None, \
+                                                            changed_code=None):
+        BaseCriteriaTestExecutionOptimizer.__init__(self, config, explorer, \
+                                                                    criterion)
+        if strategies is None and config is not None:
+            strategies = config.TESTCASES_PRIORITIZATION.get_val()
+        if changed_code is None and config is not None:
+            changed_code = \
+                    config.TESTCASES_PRIORITIZATION_CHANGED_CODE.get_val()
+        self.engine = TestPrioritizationEngine(strategies)
+        self.changed_code = changed_code
+    #~ def __init__()
+
+    #######################################################################
+    ##################### Methods implemented ############################
+    #######################################################################
+
+    @classmethod
+    def installed(cls, custom_binary_dir=None):
+        """ Check that the tool is installed
+            :return: bool reprenting whether the tool is installed or not
+                    (executable accessible on the path)
+                    - True: the tool is installed and works
+                    - False: the tool is not installed or do not work
+        """
+        return True
+    #~ def installed()
+
+    def reset (self, toolalias, test_objective_list, test_list, **kwargs):
+        """ Reset the optimizer
+        """
+        data = PrioritizationData.from_explorer(self.explorer, \
+                            current_criteria=self._get_previous_criteria(), \
+                                                changed_code=self.changed_code)
+        ordered_tests = self.engine.prioritize(test_list, data)
+
+        covering_tests = self._get_previously_covering_tests()
+
+        self.test_objective_ordered_list = copy.deepcopy(test_objective_list)
+        self.pointer = 0
+        self.test_objective_to_test_execution_optimizer = {
+            to: TestExecutionOptimizer(self.config, self.explorer) \
+            for to in self.test_objective_ordered_list
+        }
+        for to, teo in self.test_objective_to_test_execution_optimizer.items():
+            meta_to = DriversUtils.make_meta_element(to, toolalias)
+            to_covering = covering_tests.get(meta_to, None)
+            if to_covering:
+                to_covering = set(to_covering)
+                to_tests = [t for t in ordered_tests if t in to_covering] + \
+                            [t for t in ordered_tests if t not in to_covering]
+            else:
+                to_tests = ordered_tests
+            teo.reset(None, to_tests, disable_reset=True)
+    #~ def reset()
+
+    ##### Private methods #####
+
+    def _get_previous_criteria(self):
+        """ :return: the criteria executed before this criterion, whose
+                    temporary matrices are complete
+        """
+        sequence = None
+        if self.config is not None:
+            sequence = self.config.CRITERIA_SEQUENCE.get_val()
+        if sequence is None:
+            sequence = criteria_pkg.CRITERIA_SEQUENCE
+        previous = []
+        for crit_group in sequence:
+            if self.criterion in crit_group:
+                return previous
+            previous += list(crit_group)
+        # Not in the sequence, no ordering
+        return []
+    #~ def _get_previous_criteria()
+
+    def _get_previously_covering_tests(self):
+        key = outdir_struct.CRITERIA_MATRIX[self.criterion]
+        if not self.explorer.file_exists(key):
+            return {}
+        matrix = common_matrices.ExecutionMatrix(\
+                                filename=self.explorer.get_file_pathname(key))
+        return matrix.get_view().active_columns_of_rows()
+    #~ def _get_previously_covering_tests()
+#~ class CriteriaTestExecutionOptimizer
@@ -12,6 +12,10 @@ class TestOptimizers(common_mix.EnumAutoName):
     NO_OPTIMIZATION = importlib.import_module(".default", \
                                                 package=test_opt.__name__
                                             ).TestExecutionOptimizer
+    # Coverage, history, cost and diff impact based prioritization
+    PRIORITIZED = importlib.import_module(".prioritized", \
+                                                package=test_opt.__name__
+                                            ).TestExecutionOptimizer
 
     def get_optimizer(self):
         return self.get_field_value()
@@ -0,0 +1,296 @@
+#
+# [LICENCE]
+#
+""" Test prioritization engine.
+
+    The tests are ordered greedily: at each step, the test with the highest
+    score is selected, where the score of a test is the weighted sum of the
+    benefits of the enabled strategies, divided by its normalized execution
+    cost when the execution cost strategy is enabled:
+
+    - ADDITIONAL_COVERAGE: number of criteria elements (statements,
+                        mutants, ...) covered by the test and not yet
+                        covered by the selected tests (additional greedy).
+    - HISTORICAL_FAILURE: number of past failures and mutants kills of the
+                        test.
+    - DIFF_IMPACT: number of changed statements covered by the test and not
+                        yet covered by the selected tests.
+    - EXECUTION_COST: recorded execution time of the test (the weight is
+                        the exponent of the cost).
+
+    When none of the remaining tests covers an additional element, the
+    covered elements are reset (as in the additional greedy algorithm).
+    The benefits are read from the existing execution matrices
+    (see PrioritizationData).
+"""
+
+from __future__ import print_function
+import os
+import re
+import heapq
+
+import muteria.common.mix as common_mix
+import muteria.common.matrices as common_matrices
+
+import muteria.controller.explorer as outdir_struct
+from muteria.drivers import DriversUtils
+from muteria.drivers.criteria import TestCriteria
+
+ERROR_HANDLER = common_mix.ErrorHandler
+
+class PrioritizationStrategies(common_mix.EnumAutoName):
+    ADDITIONAL_COVERAGE = "additional_coverage"
+    HISTORICAL_FAILURE = "historical_failure"
+    EXECUTION_COST = "execution_cost"
+    DIFF_IMPACT = "diff_impact"
+#~ class PrioritizationStrategies
+
+DEFAULT_STRATEGIES = {
+    PrioritizationStrategies.ADDITIONAL_COVERAGE: 1.0,
+    PrioritizationStrategies.HISTORICAL_FAILURE: 1.0,
+    PrioritizationStrategies.EXECUTION_COST: 1.0,
+}
+
+# Criteria whose matrices give the tests coverage
+COVERAGE_CRITERIA = [
+    TestCriteria.STATEMENT_COVERAGE,
+    TestCriteria.BRANCH_COVERAGE,
+    TestCriteria.FUNCTION_COVERAGE,
+    TestCriteria.MUTANT_COVERAGE,
+    TestCriteria.WEAK_MUTATION,
+]
+
+# Criteria whose matrices give the tests kills
+KILL_CRITERIA = [
+    TestCriteria.STRONG_MUTATION,
+]
+
+class PrioritizationData(object):
+    """ Data used by the strategies, for each (meta) test:
+        the covered elements, the covered changed statements, the number
+        of past failures and kills and the execution time.
+    """
+    STATEMENT_ELEM_REGEX = re.compile(r'^(.+):(\d+)$')
+
+    def __init__(self):
+        self.coverage = {}
+        self.impact = {}
+        self.history = {}
+        self.cost = {}
+        self._elem_ids = {}
+    #~ def __init__()
+
+    def _get_elem_id(self, elem):
+        if elem not in self._elem_ids:
+            self._elem_ids[elem] = len(self._elem_ids)
+        return self._elem_ids[elem]
+    #~ def _get_elem_id()
+
+    @staticmethod
+    def _get_view(matrix_file):
+        return common_matrices.ExecutionMatrix(filename=matrix_file).get_view()
+    #~ def _get_view()
+
+    def add_coverage_matrix(self, matrix_file):
+        view = self._get_view(matrix_file)
+        for test, elems in view.active_rows_of_columns().items():
+            self.coverage.setdefault(test, set()).update(\
+                                        self._get_elem_id(e) for e in elems)
+    #~ def add_coverage_matrix()
+
+    def add_history_matrix(self, matrix_file):
+        """ Count the failures (pass fail matrix) or kills (strong mutation
+            matrix) of each test
+        """
+        view = self._get_view(matrix_file)
+        counts = view.count_active_per_col()
+        for test, count in zip(view.get_col_names(), counts):
+            self.history[test] = self.history.get(test, 0) + int(count)
+    #~ def add_history_matrix()
+
+    def add_impact_matrix(self, matrix_file, changed_code):
+        """ :param matrix_file: statement coverage matrix file
+            :param changed_code: dict of changed source file and the list
+                        of changed lines (None for all the lines)
+        """
+        view = self._get_view(matrix_file)
+        impacted = set()
+        for meta_elem in view.get_row_keys():
+            _, elem = DriversUtils.reverse_meta_element(meta_elem)
+            match = self.STATEMENT_ELEM_REGEX.match(elem)
+            if match is None:
+                continue
+            src, line = match.group(1), int(match.group(2))
+            for c_src, c_lines in changed_code.items():
+                c_src = os.path.normpath(c_src)
+                if src == c_src or src.endswith(os.sep + c_src):
+                    if c_lines is None or line in c_lines:
+                        impacted.add(meta_elem)
+                    break
+        rows_mask = view.get_rows_mask(list(impacted))
+        for test, elems in view.active_rows_of_columns(rows_mask).items():
+            if len(elems) > 0:
+                self.impact.setdefault(test, set()).update(\
+                                        self._get_elem_id(e) for e in elems)
+    #~ def add_impact_matrix()
+
+    def add_execution_times(self, test_to_time):
+        self.cost.update(test_to_time)
+    #~ def add_execution_times()
+
+    @classmethod
+    def from_explorer(cls, explorer, current_criteria=None, \
+                                                        changed_code=None):
+        """ Load the data from the matrices of the output directory.
+            The results matrices (merged results of the previous
+            executions) are used, as well as the temporary matrices of the
+            ongoing execution for the criteria in current_criteria
+            (criteria already executed)
+
+            :param explorer: explorer of the output directory
+            :param current_criteria: criteria whose temporary matrices are
+                        complete
+            :param changed_code: dict of changed source file and the list
+                        of changed lines, for the diff impact
+        """
+        if current_criteria is None:
+            current_criteria = []
+        data = cls()
+
+        def _existing(key_list):
+            return [explorer.get_file_pathname(k) for k in key_list \
+                                                if explorer.file_exists(k)]
+        #~ def _existing()
+
+        for criterion in COVERAGE_CRITERIA + KILL_CRITERIA:
+            keys = [outdir_struct.CRITERIA_MATRIX[criterion]]
+            if criterion in current_criteria:
+                keys.append(outdir_struct.TMP_CRITERIA_MATRIX[criterion])
+            for mat_file in _existing(keys):
+                if criterion in KILL_CRITERIA:
+                    data.add_history_matrix(mat_file)
+                else:
+                    data.add_coverage_matrix(mat_file)
+                if criterion == TestCriteria.STATEMENT_COVERAGE \
+                                                and changed_code is not None:
+                    data.add_impact_matrix(mat_file, changed_code)
+        for mat_file in _existing([outdir_struct.TEST_PASS_FAIL_MATRIX]):
+            data.add_history_matrix(mat_file)
+        return data
+    #~ def from_explorer()
+#~ class PrioritizationData
+
+class TestPrioritizationEngine(object):
+    """ Order the tests according to the strategies (see module doc)
+        :param strategies: dict of PrioritizationStrategies and their
+                    weight (DEFAULT_STRATEGIES when None)
+    """
+    def __init__(self, strategies=None):
+        if strategies is None:
+            strategies = DEFAULT_STRATEGIES
+        self.weights = {}
+        for strategy, weight in strategies.items():
+            if not isinstance(strategy, PrioritizationStrategies):
+                ERROR_HANDLER.assert_true(\
+                        PrioritizationStrategies.has_element_named(strategy),\
+                        "invalid prioritization strategy: {}".format(\
+                                                        strategy), __file__)
+                strategy = PrioritizationStrategies[strategy]
+            ERROR_HANDLER.assert_true(weight >= 0, \
+                        "negative weight for strategy {}".format(\
+                                                strategy.get_str()), __file__)
+            self.weights[strategy] = float(weight)
+    #~ def __init__()
+
+    def prioritize(self, test_list, data):
+        """ :return: the list of tests of test_list, ordered
+        """
+        tests = list(test_list)
+        if len(tests) <= 1:
+            return tests
+
+        cov_w = self.weights.get(PrioritizationStrategies.ADDITIONAL_COVERAGE,\
+                                                                            0)
+        imp_w = self.weights.get(PrioritizationStrategies.DIFF_IMPACT, 0)
+        hist_w = self.weights.get(PrioritizationStrategies.HISTORICAL_FAILURE,\
+                                                                            0)
+        cost_w = self.weights.get(PrioritizationStrategies.EXECUTION_COST, 0)
+
+        empty = frozenset()
+        cov = {t: data.coverage.get(t, empty) if cov_w > 0 else empty \
+                                                                for t in tests}
+        imp = {t: data.impact.get(t, empty) if imp_w > 0 else empty \
+                                                                for t in tests}
+        max_cov = max(len(c) for c in cov.values()) or 1
+        max_imp = max(len(i) for i in imp.values()) or 1
+        max_hist = max(data.history.get(t, 0) for t in tests) or 1
+
+        static_score = {t: hist_w * data.history.get(t, 0) / max_hist \
+                                                                for t in tests}
+
+        # Normalized costs, tests without recorded time have the mean cost
+        known_costs = [data.cost[t] for t in tests if t in data.cost]
+        mean_cost = sum(known_costs) / len(known_costs) \
+                                            if len(known_costs) > 0 else 1.0
+        mean_cost = max(mean_cost, 1e-6)
+        cost_div = {}
+        for t in tests:
+            norm_cost = max(data.cost.get(t, mean_cost), 1e-6) / mean_cost
+            cost_div[t] = norm_cost ** cost_w
+
+        def score(t, covered, impacted):
+            res = static_score[t]
+            if len(cov[t]) > 0:
+                res += cov_w * len(cov[t] - covered) / max_cov
+            if len(imp[t]) > 0:
+                res += imp_w * len(imp[t] - impacted) / max_imp
+            return res / cost_div[t]
+        #~ def score()
+
+        def reachable(remaining, elems_of):
+            res = set()
+            for t in remaining:
+                res |= elems_of[t]
+            return res
+        #~ def reachable()
+
+        remaining = set(tests)
+        covered, impacted = set(), set()
+        reach_cov = reachable(remaining, cov)
+        reach_imp = reachable(remaining, imp)
+
+        # Lazy greedy: the scores only decrease until the covered elements
+        # are reset, the heap values are upper bounds
+        def make_heap():
+            heap = [(-score(t, covered, impacted), cost_div[t], pos, t) \
+                            for pos, t in enumerate(tests) if t in remaining]
+            heapq.heapify(heap)
+            return heap
+        #~ def make_heap()
+
+        heap = make_heap()
+        ordered = []
+        while len(heap) > 0:
+            _, c_div, pos, t = heapq.heappop(heap)
+            fresh = (-score(t, covered, impacted), c_div, pos, t)
+            if len(heap) > 0 and fresh > heap[0]:
+                heapq.heappush(heap, fresh)
+                continue
+            ordered.append(t)
+            remaining.discard(t)
+            covered |= cov[t]
+            impacted |= imp[t]
+            reset = False
+            if len(reach_cov) > 0 and len(covered) >= len(reach_cov):
+                covered = set()
+                reach_cov = reachable(remaining, cov)
+                reset = True
+            if len(reach_imp) > 0 and len(impacted) >= len(reach_imp):
+                impacted = set()
+                reach_imp = reachable(remaining, imp)
+                reset = True
+            if reset:
+                heap = make_heap()
+        return ordered
+    #~ def prioritize()
+#~ class TestPrioritizationEngine
@@ -0,0 +1,92 @@
+#
+# [LICENCE]
+#
+""" Prioritized test execution optimizer class
+    (see muteria.drivers.optimizers.testexecution.prioritization)
+"""
+
+from __future__ import print_function
+import os
+import sys
+import logging
+
+import muteria.common.mix as common_mix
+
+from muteria.drivers import DriversUtils
+from muteria.drivers.optimizers.testexecution.base_test_execution_optimizer \
+                                            import BaseTestExecutionOptimizer
+from muteria.drivers.optimizers.testexecution.prioritization import \
+                                                    PrioritizationData, \
+                                                    TestPrioritizationEngine
+
+ERROR_HANDLER = common_mix.ErrorHandler
+
+class TestExecutionOptimizer(BaseTestExecutionOptimizer):
+    """ Order the tests with the prioritization engine.
+        :param strategies: dict of prioritization strategy and weight.
+                    Default to the configuration's TESTCASES_PRIORITIZATION
+        :param changed_code: changed code for the diff impact strategy.
+                    Default to the configuration's
+                    TESTCASES_PRIORITIZATION_CHANGED_CODE
+    """
+
+    def __init__(self, config, explorer, strategies=None, \
+                                                changed_code=None, **kwargs):
+        BaseTestExecutionOptimizer.__init__(self, config, explorer, **kwargs)
+        if strategies is None and config is not None:
+            strategies = config.TESTCASES_PRIORITIZATION.get_val()
+        if changed_code is None and config is not None:
+            changed_code = \
+                    config.TESTCASES_PRIORITIZATION_CHANGED_CODE.get_val()
+        self.engine = TestPrioritizationEngine(strategies)
+        self.changed_code = changed_code
+    #~ def __init__()
+
+    #######################################################################
+    ##################### Methods implemented ############################
+    #######################################################################
+
+    @classmethod
+    def installed(cls, custom_binary_dir=None):
+        """ Check that the tool is installed
+            :return: bool reprenting whether the tool is installed or not
+                    (executable accessible on the path)
+                    - True: the tool is installed and works
+                    - False: the tool is not installed or do not work
+        """
+        return True
+    #~ def installed()
+
+    def reset (self, toolalias, test_list, disable_reset=False, \
+                        test_execution_times=None, prioritization_data=None, \
+                                                                    **kwargs):
+        """ Reset the optimizer
+            :param toolalias: alias of the test tool of the tests in
+                    test_list, None if the tests are meta tests
+            :param test_execution_times: dict of meta test and execution
+                    time
+            :param prioritization_data: PrioritizationData object to use
+                    instead of loading the data from the explorer
+        """
+        ERROR_HANDLER.assert_true(not self.reset_disabled, "reset is disabled")
+        if prioritization_data is None:
+            prioritization_data = PrioritizationData.from_explorer(\
+                        self.explorer, changed_code=self.changed_code)
+        if test_execution_times is not None:
+            prioritization_data.add_execution_times(test_execution_times)
+
+        if toolalias is None:
+            self.test_ordered_list = self.engine.prioritize(test_list, \
+                                                        prioritization_data)
+        else:
+            meta2test = {DriversUtils.make_meta_element(t, toolalias): t \
+                                                            for t in test_list}
+            self.test_ordered_list = [meta2test[mt] for mt in \
+                                    self.engine.prioritize(meta2test.keys(), \
+                                                        prioritization_data)]
+        self.pointer = 0
+
+        if disable_reset and not self.reset_disabled:
+            self.reset_disabled = True
+    #~ def reset()
+#~ class TestExecutionOptimizer
@@ -0,0 +1,385 @@
+""" Sandbox of the test executions (tests and criteria elements such as
+    mutants), limiting the resources that an execution can use so that a
+    runaway execution does not take down the whole analysis.
+
+    Each execution gets:
+    - its own cgroup (v2) with the memory, pids and CPU quotas, when the
+        cgroup v2 hierarchy is available and delegated to this process.
+        Otherwise, the limits are set with rlimits (fallback), which are
+        per process (the memory limit is on the address space, the pids
+        limit is per user and the CPU quota becomes a CPU time limit
+        relative to the timeout). With rlimits, the memory and pids
+        violations make the allocations and forks fail in the program,
+        they are not distinguished from the program's own failures.
+    - a private temporary directory (TMPDIR, TMP and TEMP) with a disk
+        quota: the total size of the directory is checked after the
+        execution, and the size of each file written by the program
+        (anywhere, not only in the directory) is limited to the quota with
+        RLIMIT_FSIZE, which stops a runaway writer during the execution.
+        The directory is removed after the execution.
+
+    The violated limit of an execution is classified deterministically
+    from the kernel's accounting (cgroup events or the terminating signal),
+    see ResourceLimit.
+
+    The program is executed through an exec wrapper (see
+    SandboxedExecution.wrap_command) that attaches its process to the
+    cgroup and sets the rlimits before executing the program, so that no
+    Python code runs in the child process between fork and exec (unsafe
+    with threads).
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import math
+import time
+import signal
+import resource
+import shutil
+import logging
+import tempfile
+import threading
+import itertools
+
+import muteria.common.mix as common_mix
+
+ERROR_HANDLER = common_mix.ErrorHandler
+
+class ResourceLimit(common_mix.EnumAutoName):
+    """ Resource limits that an execution can violate, in the order of
+        precedence when several are violated
+    """
+    MEMORY = "memory"
+    PIDS = "pids"
+    CPU = "cpu"
+    DISK = "disk"
+
+    def get_test_verdict(self):
+        """ :return: the test verdict of the executions violating the limit
+                    (see common.mix.GlobalConstants)
+        """
+        return common_mix.GlobalConstants.RESOURCE_LIMIT_TEST_VERDICTS[\
+                                                list(ResourceLimit).index(self)]
+    #~ def get_test_verdict()
+#~ class ResourceLimit
+
+class ExecutionSandbox(object):
+    """ Resource limits of the executions. A limit is not set when None.
+        :param memory_mb: maximum memory (MB)
+        :param max_pids: maximum number of processes (and threads)
+        :param cpu_quota: maximum CPU usage, as a number of CPUs (e.g. 0.5)
+        :param disk_mb: maximum size (MB) of the private temporary
+                    directory, and of each file written by the execution
+        :param use_cgroups: use the cgroups (v2) when available
+        :param tmp_root: directory where to create the private temporary
+                    directories (system default if None)
+    """
+    CGROUP_ROOT = '/sys/fs/cgroup'
+    CPU_PERIOD_US = 100000
+    TMP_ENV_VARS = ('TMPDIR', 'TMP', 'TEMP')
+    # Exec wrappers (see SandboxedExecution.wrap_command). The Python
+    # interpreter sets the rlimits when prlimit (util-linux) is unavailable
+    SHELL = '/bin/sh'
+    PRLIMIT = shutil.which('prlimit')
+
+    def __init__(self, memory_mb=None, max_pids=None, cpu_quota=None, \
+                            disk_mb=None, use_cgroups=True, tmp_root=None):
+        for name, val in (('memory_mb', memory_mb), ('max_pids', max_pids), \
+                            ('cpu_quota', cpu_quota), ('disk_mb', disk_mb)):
+            ERROR_HANDLER.assert_true(val is None or val > 0, \
+                        "invalid sandbox {}: {}".format(name, val), __file__)
+        self.memory_mb = memory_mb
+        self.max_pids = max_pids
+        self.cpu_quota = cpu_quota
+        self.disk_mb = disk_mb
+        self.tmp_root = tmp_root
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+        self.cgroup_base = None
+        if use_cgroups and self.has_limits():
+            self.cgroup_base = self._setup_cgroup_base()
+    #~ def __init__()
+
+    def has_limits(self):
+        return any(v is not None for v in (self.memory_mb, self.max_pids, \
+                                            self.cpu_quota, self.disk_mb))
+    #~ def has_limits()
+
+    def uses_cgroups(self):
+        return self.cgroup_base is not None
+    #~ def uses_cgroups()
+
+    def _get_cgroup_controllers(self):
+        controllers = []
+        if self.memory_mb is not None:
+            controllers.append('memory')
+        if self.max_pids is not None:
+            controllers.append('pids')
+        if self.cpu_quota is not None:
+            controllers.append('cpu')
+        return controllers
+    #~ def _get_cgroup_controllers()
+
+    def _setup_cgroup_base(self):
+        """ Create, under the cgroup of this process, the cgroup containing
+            the executions' cgroups, with the needed controllers enabled.
+            :return: the cgroup directory, None if the cgroups v2 cannot be
+                    used (not available or not delegated)
+        """
+        if not os.path.isfile(os.path.join(self.CGROUP_ROOT, \
+                                                        'cgroup.controllers')):
+            logging.debug("# sandbox: cgroup v2 unavailable, using rlimits")
+            return None
+        own_cgroup = None
+        with open('/proc/self/cgroup') as f:
+            for line in f:
+                if line.startswith('0::'):
+                    own_cgroup = line.strip()[len('0::'):]
+        if own_cgroup is None:
+            return None
+        base = os.path.join(self.CGROUP_ROOT, own_cgroup.lstrip('/'), \
+                                    'muteria-sandbox-{}'.format(os.getpid()))
+        try:
+            if not os.path.isdir(base):
+                os.mkdir(base)
+            controllers = self._get_cgroup_controllers()
+            if len(controllers) > 0:
+                with open(os.path.join(base, 'cgroup.subtree_control'), \
+                                                                    'w') as f:
+                    f.write(' '.join(['+' + c for c in controllers]))
+        except OSError as e:
+            logging.warning("# sandbox: cannot use the cgroups ({}), using"
+                                                " rlimits".format(str(e)))
+            if os.path.isdir(base):
+                try:
+                    os.rmdir(base)
+                except OSError:
+                    pass
+            return None
+        return base
+    #~ def _setup_cgroup_base()
+
+    def start_execution(self, timeout=None):
+        """ Prepare the sandbox of an execution (see SandboxedExecution)
+        """
+        with self.lock:
+            exec_id = next(self.counter)
+        return SandboxedExecution(self, exec_id, timeout)
+    #~ def start_execution()
+
+    def destroy(self):
+        """ Remove the cgroup containing the executions' cgroups
+        """
+        if self.cgroup_base is not None and os.path.isdir(self.cgroup_base):
+            try:
+                os.rmdir(self.cgroup_base)
+            except OSError as e:
+                logging.warning("# sandbox: cannot remove {}: {}".format(\
+                                                    self.cgroup_base, str(e)))
+    #~ def destroy()
+#~ class ExecutionSandbox
+
+class SandboxedExecution(object):
+    """ Sandbox of a single execution.
+        Use get_env for the environment of the execution, wrap_command for
+        the command to execute, and finish once the child terminated.
+    """
+    # Names of the rlimits for prlimit
+    PRLIMIT_OPTIONS = {
+        resource.RLIMIT_AS: 'as',
+        resource.RLIMIT_NPROC: 'nproc',
+        resource.RLIMIT_CPU: 'cpu',
+        resource.RLIMIT_FSIZE: 'fsize',
+    }
+    # Attach the wrapper's process (replaced by the program) to the cgroup
+    # whose cgroup.procs is $0, then execute the program ($@)
+    CGROUP_WRAPPER_SCRIPT = 'echo $$ > "$0" || exit 126; exec "$@"'
+    # Set the rlimits ('<resource>:<soft>:<hard>,...' in argv[1]), then
+    # execute the program (argv[2:])
+    RLIMIT_WRAPPER_CODE = "import os, sys, resource\n" \
+                "for l in sys.argv[1].split(','):\n" \
+                "    r, s, h = [int(v) for v in l.split(':')]\n" \
+                "    resource.setrlimit(r, (s, h))\n" \
+                "os.execvp(sys.argv[2], sys.argv[2:])\n"
+
+    def __init__(self, sandbox, exec_id, timeout):
+        self.sandbox = sandbox
+        self.timeout = timeout
+        self.tmp_dir = tempfile.mkdtemp(prefix='muteria-sandbox-', \
+                                                        dir=sandbox.tmp_root)
+        self.cgroup = None
+        if sandbox.uses_cgroups():
+            self.cgroup = os.path.join(sandbox.cgroup_base, \
+                                                'exec-{}'.format(exec_id))
+            os.mkdir(self.cgroup)
+            if sandbox.memory_mb is not None:
+                self._write_cgroup_file('memory.max', \
+                                        str(int(sandbox.memory_mb * 1024**2)))
+                # The swap would hide the memory violations
+                if os.path.isfile(os.path.join(self.cgroup, \
+                                                        'memory.swap.max')):
+                    self._write_cgroup_file('memory.swap.max', '0')
+            if sandbox.max_pids is not None:
+                self._write_cgroup_file('pids.max', str(sandbox.max_pids))
+            if sandbox.cpu_quota is not None:
+                self._write_cgroup_file('cpu.max', '{} {}'.format(\
+                    int(sandbox.cpu_quota * sandbox.CPU_PERIOD_US), \
+                                                    sandbox.CPU_PERIOD_US))
+        self.cgroup_procs = None if self.cgroup is None else \
+                                    os.path.join(self.cgroup, 'cgroup.procs')
+    #~ def __init__()
+
+    def _write_cgroup_file(self, filename, value):
+        with open(os.path.join(self.cgroup, filename), 'w') as f:
+            f.write(value)
+    #~ def _write_cgroup_file()
+
+    def _read_cgroup_events(self, filename):
+        events = {}
+        path = os.path.join(self.cgroup, filename)
+        if os.path.isfile(path):
+            with open(path) as f:
+                for line in f:
+                    key, val = line.split()
+                    events[key] = int(val)
+        return events
+    #~ def _read_cgroup_events()
+
+    def get_env(self, env):
+        """ :return: copy of the environment env with the temporary
+                    directory set to the private directory
+        """
+        env = dict(env)
+        for var in self.sandbox.TMP_ENV_VARS:
+            env[var] = self.tmp_dir
+        return env
+    #~ def get_env()
+
+    def get_rlimits(self):
+        """ :return: list of the rlimits (resource, soft, hard) of the
+                    execution
+        """
+        sandbox = self.sandbox
+        rlimits = []
+        if self.cgroup_procs is None:
+            if sandbox.memory_mb is not None:
+                limit = int(sandbox.memory_mb * 1024**2)
+                rlimits.append((resource.RLIMIT_AS, limit, limit))
+            if sandbox.max_pids is not None:
+                rlimits.append((resource.RLIMIT_NPROC, sandbox.max_pids, \
+                                                        sandbox.max_pids))
+            if sandbox.cpu_quota is not None and self.timeout is not None:
+                # SIGXCPU at the soft limit
+                limit = max(1, int(math.ceil(sandbox.cpu_quota * \
+                                                            self.timeout)))
+                rlimits.append((resource.RLIMIT_CPU, limit, limit + 1))
+        if sandbox.disk_mb is not None:
+            limit = int(sandbox.disk_mb * 1024**2)
+            rlimits.append((resource.RLIMIT_FSIZE, limit, limit))
+        return rlimits
+    #~ def get_rlimits()
+
+    def wrap_command(self, args):
+        """ :param args: the command (list) of the execution
+            :return: the command executing args through the exec wrappers
+                    that attach the process to the cgroup and set the
+                    rlimits (the process id is kept)
+        """
+        rlimits = self.get_rlimits()
+        if len(rlimits) > 0:
+            if self.sandbox.PRLIMIT is not None:
+                args = [self.sandbox.PRLIMIT] + \
+                            ['--{}={}:{}'.format(\
+                                    self.PRLIMIT_OPTIONS[r], soft, hard) \
+                                for r, soft, hard in rlimits] + ['--'] + args
+            else:
+                args = [sys.executable, '-S', '-c', self.RLIMIT_WRAPPER_CODE, \
+                            ','.join(['{}:{}:{}'.format(r, soft, hard) \
+                                    for r, soft, hard in rlimits])] + args
+        if self.cgroup_procs is not None:
+            args = [self.sandbox.SHELL, '-c', self.CGROUP_WRAPPER_SCRIPT, \
+                                                    self.cgroup_procs] + args
+        return args
+    #~ def wrap_command()
+
+    def _get_tmp_dir_size(self):
+        size = 0
+        for root, _, files in os.walk(self.tmp_dir):
+            for f in files:
+                path = os.path.join(root, f)
+                if not os.path.islink(path):
+                    try:
+                        size += os.path.getsize(path)
+                    except OSError:
+                        pass
+        return size
+    #~ def _get_tmp_dir_size()
+
+    def finish(self, retcode, timedout=False):
+        """ Classify the violated resource limit (if any), kill the
+            remaining processes of the cgroup and clean the sandbox.
+            With the cgroups, the CPU quota throttles the execution instead
+            of stopping it: the CPU limit is violated when the execution 
+            was throttled and timed out.
+            :param retcode: return code of the execution
+            :param timedout: whether the execution was stopped at its
+                    timeout
+            :return: the violated ResourceLimit, None if no limit was
+                    violated
+        """
+        sandbox = self.sandbox
+        violated = set()
+        if self.cgroup is not None:
+            if self._read_cgroup_events('memory.events').get('oom_kill', 0) \
+                                                                        > 0:
+                violated.add(ResourceLimit.MEMORY)
+            if self._read_cgroup_events('pids.events').get('max', 0) > 0:
+                violated.add(ResourceLimit.PIDS)
+            if sandbox.cpu_quota is not None and timedout and \
+                    self._read_cgroup_events('cpu.stat')\
+                                            .get('nr_throttled', 0) > 0:
+                violated.add(ResourceLimit.CPU)
+        elif sandbox.cpu_quota is not None and self.timeout is not None \
+                                        and retcode == -signal.SIGXCPU.value:
+            violated.add(ResourceLimit.CPU)
+        if sandbox.disk_mb is not None:
+            # The writes beyond the file size limit fail (EFBIG) when the
+            # program ignores SIGXFSZ, the quota is then reached
+            if retcode == -signal.SIGXFSZ.value or \
+                    self._get_tmp_dir_size() >= sandbox.disk_mb * 1024**2:
+                violated.add(ResourceLimit.DISK)
+
+        self._cleanup()
+
+        for limit in ResourceLimit:
+            if limit in violated:
+                return limit
+        return None
+    #~ def finish()
+
+    def _cleanup(self):
+        if self.cgroup is not None:
+            if os.path.isfile(os.path.join(self.cgroup, 'cgroup.kill')):
+                self._write_cgroup_file('cgroup.kill', '1')
+            else:
+                with open(self.cgroup_procs) as f:
+                    for pid in f.read().split():
+                        try:
+                            os.kill(int(pid), signal.SIGKILL)
+                        except ProcessLookupError:
+                            pass
+            # The killed processes may take some time to leave the cgroup
+            for _ in range(100):
+                try:
+                    os.rmdir(self.cgroup)
+                    break
+                except OSError:
+                    time.sleep(0.01)
+            else:
+                logging.warning("# sandbox: cannot remove the cgroup "
+                                                            + self.cgroup)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+    #~ def _cleanup()
+#~ class SandboxedExecution
@@ -1,3 +1,7 @@
+import hashlib
+import logging
+import threading
+
 import muteria.common.mix as common_mix
 import muteria.common.fs as common_fs
 
@@ -15,4 +19,245 @@ class TestToolType(common_mix.EnumAutoName):
 TEST_TOOL_TYPES_SCHEDULING = [
     (TestToolType.USE_ONLY_CODE,), 
     (TestToolType.USE_CODE_AND_TESTS,),
-]
\ No newline at end of file
+]
+
+class OutlogFingerprintMode(common_mix.EnumAutoName):
+    """ Function used to fingerprint the (cleaned) test execution outputs.
+        The fingerprints are only compared for equality.
+        SHA512 gives a hex string, the other modes give an integer.
+    """
+    SHA512 = "sha512"
+    BLAKE2B_64 = "blake2b_64"
+    BLAKE2B_128 = "blake2b_128"
+    XXHASH_64 = "xxhash_64"  # requires the xxhash package
+
+    def compute(self, data):
+        """ Compute the fingerprint of data (bytes)
+
+            Example:
+            >>> OutlogFingerprintMode.BLAKE2B_64.compute(b'abc')
+            15617099051652453721
+        """
+        hash_obj = self.new_hash_object()
+        hash_obj.update(data)
+        return self.get_hash_object_fingerprint(hash_obj)
+    #~ def compute()
+
+    def new_hash_object(self):
+        """ :return: the incremental hash object (with method update) of
+                    the mode (see get_hash_object_fingerprint)
+        """
+        if self == OutlogFingerprintMode.SHA512:
+            return hashlib.sha512()
+        if self == OutlogFingerprintMode.BLAKE2B_64:
+            return hashlib.blake2b(digest_size=8)
+        if self == OutlogFingerprintMode.BLAKE2B_128:
+            return hashlib.blake2b(digest_size=16)
+        if self == OutlogFingerprintMode.XXHASH_64:
+            try:
+                import xxhash
+            except ImportError:
+                ERROR_HANDLER.error_exit("The fingerprint mode {} requires "
+                                    "the package xxhash".format(self.get_str()),\
+                                                                    __file__)
+            return xxhash.xxh64()
+        ERROR_HANDLER.error_exit("(BUG) unhandled fingerprint mode {}".format(\
+                                                    self.get_str()), __file__)
+    #~ def new_hash_object()
+
+    def get_hash_object_fingerprint(self, hash_obj):
+        """ :return: the fingerprint of the data given to the hash object
+        """
+        if self == OutlogFingerprintMode.SHA512:
+            return hash_obj.hexdigest()
+        if self == OutlogFingerprintMode.XXHASH_64:
+            return hash_obj.intdigest()
+        return int.from_bytes(hash_obj.digest(), 'big')
+    #~ def get_hash_object_fingerprint()
+#~ class OutlogFingerprintMode
+
+class _KeptOutput(object):
+    """ Output of a fingerprint seen by an OutlogFingerprinter: the output
+        (raw), or its SHA-512 digest when the output is not kept
+    """
+    __slots__ = ('raw', 'sha512')
+
+    def __init__(self, raw=None, sha512=None):
+        self.raw = raw
+        self.sha512 = sha512
+    #~ def __init__()
+
+    def get_sha512(self):
+        if self.sha512 is None:
+            self.sha512 = hashlib.sha512(self.raw).digest()
+        return self.sha512
+    #~ def get_sha512()
+#~ class _KeptOutput
+
+class OutlogFingerprinter(object):
+    """ Fingerprint the test outputs with the given mode.
+        With collision_check, the first output of each fingerprint is kept
+        and the later outputs with the same fingerprint are compared with
+        it, so that only the fingerprint is computed for a new output and
+        a repeated output is only compared. The outputs are kept up to
+        KEPT_OUTPUTS_MAX_BYTES in total, then the SHA-512 digest of the
+        new outputs is kept (64 bytes per output), and the SHA-512 of the
+        repeated outputs is computed to compare them.
+        The outputs that collide get their SHA-512 hex digest as 
+        fingerprint, which never equals an integer fingerprint.
+        The check covers the outputs fingerprinted by this object (in the
+        current process), the collisions between the outputs of different
+        processes or runs are not detected.
+    """
+    # Mode name of the outputs that are not hashed
+    NO_FINGERPRINT_MODE = "none"
+    # Maximum total size of the kept outputs (bytes)
+    KEPT_OUTPUTS_MAX_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, mode=OutlogFingerprintMode.SHA512, \
+                                                        collision_check=False):
+        ERROR_HANDLER.assert_true(isinstance(mode, OutlogFingerprintMode), \
+                            "invalid fingerprint mode {}".format(mode), __file__)
+        self.mode = mode
+        self.collision_check = collision_check and \
+                                        mode != OutlogFingerprintMode.SHA512
+        # fingerprint -> _KeptOutput
+        self.fingerprint2kept = {}
+        self.kept_bytes = 0
+        self.collisions_count = 0
+        self.lock = threading.Lock()
+    #~ def __init__()
+
+    def get_mode_name(self, hash_outlog=True):
+        """ :return: the name of the fingerprint mode of the outputs, as
+                    stored in the output log data (see 
+                    OutputLogData.set_fingerprint_mode)
+        """
+        if not hash_outlog:
+            return self.NO_FINGERPRINT_MODE
+        return self.mode.get_str()
+    #~ def get_mode_name()
+
+    def new_stream(self):
+        """ :return: OutlogFingerprintStream to fingerprint an output given
+                    by chunks
+        """
+        return OutlogFingerprintStream(self)
+    #~ def new_stream()
+
+    def _check_collision(self, fingerprint, raw=None, sha512_obj=None):
+        """ :param raw: the output (bytes), or None when only its SHA-512
+                    hash object (sha512_obj) is available
+            :return: fingerprint, or the output's SHA-512 hex digest on
+                    collision
+        """
+        def _get_sha512_obj():
+            return hashlib.sha512(raw) if sha512_obj is None else sha512_obj
+        with self.lock:
+            kept = self.fingerprint2kept.get(fingerprint, None)
+            if kept is None and raw is not None and \
+                    self.kept_bytes + len(raw) <= self.KEPT_OUTPUTS_MAX_BYTES:
+                # First output of the fingerprint, kept
+                self.fingerprint2kept[fingerprint] = _KeptOutput(raw=raw)
+                self.kept_bytes += len(raw)
+                return fingerprint
+        if kept is None:
+            new_kept = _KeptOutput(sha512=_get_sha512_obj().digest())
+            with self.lock:
+                kept = self.fingerprint2kept.setdefault(fingerprint, new_kept)
+            if kept is new_kept:
+                return fingerprint
+        # Repeated fingerprint, compare the outputs
+        if raw is not None and kept.raw is not None:
+            same = (raw == kept.raw)
+        else:
+            same = (_get_sha512_obj().digest() == kept.get_sha512())
+        if same:
+            return fingerprint
+        with self.lock:
+            self.collisions_count += 1
+        logging.warning("Output fingerprint collision ({}): using SHA-512"\
+                                            .format(self.mode.get_str()))
+        return _get_sha512_obj().hexdigest()
+    #~ def _check_collision()
+
+    def get_fingerprint(self, data):
+        """ Get the fingerprint of data (bytes)
+
+            Example:
+            >>> fp = OutlogFingerprinter(OutlogFingerprintMode.BLAKE2B_64, 
+            ...                                         collision_check=True)
+            >>> fp.get_fingerprint(b'abc') == fp.get_fingerprint(b'abc')
+            True
+        """
+        fingerprint = self.mode.compute(data)
+        if not self.collision_check:
+            return fingerprint
+        return self._check_collision(fingerprint, raw=bytes(data))
+    #~ def get_fingerprint()
+#~ class OutlogFingerprinter
+
+class OutlogFingerprintStream(object):
+    """ Fingerprint of an output given by chunks (see 
+        OutlogFingerprinter.new_stream). The fingerprint equals the
+        fingerprinter's get_fingerprint of the whole output, and the length
+        is the number of characters of the (UTF-8) output.
+        With the collision check, the chunks are kept to be compared (see
+        OutlogFingerprinter) up to the maximum size of the kept outputs,
+        after which the SHA-512 of the output is computed instead.
+
+        Example:
+        >>> fp = OutlogFingerprinter(OutlogFingerprintMode.BLAKE2B_64)
+        >>> stream = fp.new_stream()
+        >>> stream.update(b'a'); stream.update(b'bc')
+        >>> stream.get_fingerprint() == fp.get_fingerprint(b'abc')
+        True
+    """
+    # The UTF-8 bytes that do not start a character
+    UTF8_CONTINUATION_BYTES = bytes(range(0x80, 0xc0))
+
+    def __init__(self, fingerprinter):
+        self.fingerprinter = fingerprinter
+        self.hash_obj = fingerprinter.mode.new_hash_object()
+        self.length = 0
+        # chunks of the output while it is kept, then its SHA-512
+        self.chunks = None
+        self.chunks_len = 0
+        self.sha512_obj = None
+        if fingerprinter.collision_check:
+            self.chunks = []
+    #~ def __init__()
+
+    def update(self, data):
+        self.hash_obj.update(data)
+        self.length += len(data.translate(None, \
+                                            self.UTF8_CONTINUATION_BYTES))
+        if self.chunks is not None:
+            self.chunks_len += len(data)
+            if self.chunks_len <= self.fingerprinter.KEPT_OUTPUTS_MAX_BYTES:
+                self.chunks.append(bytes(data))
+                return
+            self.sha512_obj = hashlib.sha512()
+            for chunk in self.chunks:
+                self.sha512_obj.update(chunk)
+            self.chunks = None
+        if self.sha512_obj is not None:
+            self.sha512_obj.update(data)
+    #~ def update()
+
+    def get_length(self):
+        return self.length
+    #~ def get_length()
+
+    def get_fingerprint(self):
+        fingerprint = self.fingerprinter.mode.get_hash_object_fingerprint(\
+                                                                self.hash_obj)
+        if self.chunks is not None:
+            return self.fingerprinter._check_collision(fingerprint, \
+                                                raw=b"".join(self.chunks))
+        if self.sha512_obj is not None:
+            return self.fingerprinter._check_collision(fingerprint, \
+                                                sha512_obj=self.sha512_obj)
+        return fingerprint
+    #~ def get_fingerprint()
+#~ class OutlogFingerprintStream
@@ -37,7 +37,6 @@ import glob
 import shutil
 import logging
 import abc
-import hashlib
 import time
 import multiprocessing
 import joblib
@@ -49,6 +48,9 @@ import muteria.common.mix as common_mix
 import muteria.common.fs as common_fs
 
 from muteria.drivers import DriversUtils
+from muteria.drivers.sandbox import ExecutionSandbox
+import muteria.controller.logging_setup as logging_setup
+from muteria.drivers.testgeneration import OutlogFingerprinter
 
 from muteria.drivers.checkpoint_handler import CheckPointHandler
 from muteria.repositoryandcode.callback_object import DefaultCallbackObject
@@ -81,8 +83,13 @@ class BaseTestcaseTool(abc.ABC):
         ## Generate the tests into this folder (to be created by user)
         self.tests_storage_dir = os.path.join(
                         self.tests_working_dir, "tests_files")
-        self.tests_storage_dir_archive = os.path.join(
-                        self.tests_working_dir, "tests_files.tar.gz")
+        self.tests_storage_dir_archive = \
+                        common_fs.IndexedArchive.get_archive_filename_of(\
+                                                        self.tests_storage_dir)
+        # Archive of the former runs (read only)
+        self.tests_storage_dir_targz_archive = \
+                        common_fs.TarGz.get_archive_filename_of(\
+                                                        self.tests_storage_dir)
         self.custom_binary_dir = None
         if self.config.tool_user_custom is not None:
             self.custom_binary_dir = \
@@ -99,6 +106,10 @@ class BaseTestcaseTool(abc.ABC):
         self.test_execution_time_storage_file = os.path.join(\
                         self.tests_working_dir, "test_to_execution_time.json")
         self.shared_loc = multiprocessing.RLock()
+        # Used when there is no parent meta tool
+        self.outlog_fingerprinter = None
+        # Created at the first test execution (see _get_sandbox)
+        self.sandbox = None
 
         # Make Initialization Computation
         ## Create dirs
@@ -111,6 +122,10 @@ class BaseTestcaseTool(abc.ABC):
 
         # decompress potential test storage archive
         if self.compress_test_storage_dir:
+            if not os.path.isfile(self.tests_storage_dir_archive) and \
+                        os.path.isfile(self.tests_storage_dir_targz_archive):
+                self.tests_storage_dir_archive = \
+                                        self.tests_storage_dir_targz_archive
             if os.path.isfile(self.tests_storage_dir_archive):
                 if os.path.isdir(self.tests_storage_dir):
                     try:
@@ -118,7 +133,8 @@ class BaseTestcaseTool(abc.ABC):
                     except PermissionError:
                         self._dir_chmod777(self.tests_storage_dir)
                         shutil.rmtree(self.tests_storage_dir)
-                common_fs.TarGz.decompressDir(self.tests_storage_dir_archive)
+                common_fs.IndexedArchive.decompressDir(\
+                                                self.tests_storage_dir_archive)
     #~ def __init__()
 
     def __del__(self):
@@ -176,7 +192,7 @@ class BaseTestcaseTool(abc.ABC):
                                 use_recorded_timeout_times=None, \
                                 recalculate_execution_times=False, \
                                 with_output_summary=True, hash_outlog=True, \
-                                parallel_count=1):
+                                parallel_count=1, execution_costs=None):
         return self._runtests(testcases=testcases, exe_path_map=exe_path_map, \
                                 env_vars=env_vars, \
                                 stop_on_failure=stop_on_failure, \
@@ -187,7 +203,8 @@ class BaseTestcaseTool(abc.ABC):
                                                 recalculate_execution_times, \
                                 with_output_summary=with_output_summary, \
                                 hash_outlog=hash_outlog, \
-                                parallel_count=parallel_count)
+                                parallel_count=parallel_count, \
+                                execution_costs=execution_costs)
     #~ def runtests()
                             
     class RepoRuntestsCallbackObject(DefaultCallbackObject):
@@ -236,7 +253,7 @@ class BaseTestcaseTool(abc.ABC):
                                 use_recorded_timeout_times=None, \
                                 recalculate_execution_times=False, \
                                 with_output_summary=True, hash_outlog=True, \
-                                parallel_count=1, \
+                                parallel_count=1, execution_costs=None, \
                                 copy_exe_to_repo=True):
         callback_func = self._runtests
         cb_obj = self.RepoRuntestsCallbackObject()
@@ -254,6 +271,7 @@ class BaseTestcaseTool(abc.ABC):
                                     "with_output_summary":with_output_summary,\
                                     "hash_outlog":hash_outlog, \
                                     "parallel_count": parallel_count,
+                                    "execution_costs": execution_costs,
                                 }, copy_exe_to_repo))
         repo_mgr = self.code_builds_factory.repository_manager
         _, exec_verdicts = repo_mgr.custom_read_access(cb_obj)
@@ -300,7 +318,9 @@ class BaseTestcaseTool(abc.ABC):
         self._set_env_vars(env_vars)
 
         start_time = time.time()
-        fail_verdict, execoutlog_hash = \
+        with logging_setup.log_context(tool=self.get_toolalias(), \
+                                                                test=testcase):
+            fail_verdict, execoutlog_hash = \
                         self._oracle_execute_a_test(testcase, exe_path_map, \
                                             env_vars, timeout=timeout, \
                                     with_output_summary=with_output_summary, \
@@ -315,6 +335,7 @@ class BaseTestcaseTool(abc.ABC):
         self._restore_env_vars()
         self._restore_default_executable(exe_path_map, env_vars, \
                                             collect_output=with_output_summary)
+        self._destroy_sandbox()
 
         return fail_verdict, execoutlog_hash
     #~ def _execute_testcase()
@@ -324,7 +345,7 @@ class BaseTestcaseTool(abc.ABC):
                                 use_recorded_timeout_times=None, \
                                 recalculate_execution_times=False, \
                                 with_output_summary=True, hash_outlog=True, \
-                                parallel_count=1):
+                                parallel_count=1, execution_costs=None):
         '''
         Execute the list of test cases with the given executable and 
         say, for each test case, whether it failed.
@@ -338,6 +359,10 @@ class BaseTestcaseTool(abc.ABC):
                         executing each test ({<variable>: <value>})
         :param stop_on_failure: decide whether to stop the test execution once
                         a test fails
+        :param execution_costs: dict updated, when not None, with the 
+                        resource usage cost of each executed test
+                        ({<test case name>: <cost dict>}, see
+                        common.matrices.ExecutionCostData)
         :returns: plitair of:
                 - dict of testcase and their failed verdict.
                  {<test case name>: <True if failed, False if passed, 
@@ -386,17 +411,49 @@ class BaseTestcaseTool(abc.ABC):
         test_outlog_hash = {} 
         processbar = tqdm.tqdm(testcases, leave=False, dynamic_ncols=True) 
 
+        # @Checkpoint: the tests are work units, the completed tests of an
+        # interrupted execution are not re-executed
+        work_units = checkpoint_handler.get_work_units("runtests")
+        work_units.reclaim_expired()
+        testcases_set = set(testcases)
+        for testcase, payload in work_units.get_done().items():
+            if testcase in testcases_set:
+                test_failed_verdicts[testcase] = payload[0]
+                test_outlog_hash[testcase] = payload[1]
+                # The payloads of older checkpoints have no cost
+                if execution_costs is not None and len(payload) > 2 \
+                                                and payload[2] is not None:
+                    execution_costs[testcase] = payload[2]
+
         # Parallel stuffs
         def test_exec_iteration(testcase):
+            with self.shared_loc:
+                if testcase in test_failed_verdicts:
+                    return test_failed_verdicts[testcase]
+            while not work_units.claim(testcase):
+                # claimed by another worker
+                completed, payload = work_units.wait_for(testcase)
+                if completed:
+                    with self.shared_loc:
+                        test_failed_verdicts[testcase] = payload[0]
+                        test_outlog_hash[testcase] = payload[1]
+                        if execution_costs is not None and \
+                                len(payload) > 2 and payload[2] is not None:
+                            execution_costs[testcase] = payload[2]
+                    return payload[0]
             processbar.set_description("Running Test {} (x{})".format(\
                                                   testcase, parallel_count))
             start_time = time.time()
-            test_failed, execoutlog_hash = \
+            execution_cost = None if execution_costs is None else {}
+            with logging_setup.log_context(tool=self.get_toolalias(), \
+                                                                test=testcase):
+                test_failed, execoutlog_hash = \
                         self._oracle_execute_a_test(testcase, exe_path_map, \
                                         env_vars, \
                                         timeout=per_test_timeout[testcase], \
                                     with_output_summary=with_output_summary, \
-                                        hash_outlog=hash_outlog)
+                                        hash_outlog=hash_outlog, \
+                                        execution_cost=execution_cost)
             
             #if testcase.endswith('.ktest'):  # DBG - fix hang
             #    logging.debug("KTEST {} is done".format(testcase))
@@ -410,12 +467,20 @@ class BaseTestcaseTool(abc.ABC):
 
                 test_failed_verdicts[testcase] = test_failed
                 test_outlog_hash[testcase] = execoutlog_hash
+                if execution_costs is not None:
+                    execution_costs[testcase] = execution_cost
+            work_units.complete(testcase, [test_failed, execoutlog_hash, \
+                                                            execution_cost])
             return test_failed
         #~ def test_exec_iteration()
 
         if self.can_run_tests_in_parallel() and parallel_count is not None \
                                                     and parallel_count > 1:
             parallel_count = min(len(testcases), parallel_count)
+            # The workers log in the context of this thread (bound here, the
+            # calls may be dispatched from other threads)
+            test_exec_iteration = \
+                            logging_setup.bind_log_context(test_exec_iteration)
             joblib.Parallel(n_jobs=parallel_count, require='sharedmem')\
                             (joblib.delayed(test_exec_iteration)(testcase) \
                                                 for testcase in processbar)
@@ -435,6 +500,7 @@ class BaseTestcaseTool(abc.ABC):
         self._restore_env_vars()
         self._restore_default_executable(exe_path_map, env_vars, \
                                             collect_output=with_output_summary)
+        self._destroy_sandbox()
 
         if stop_on_failure:
             # Make sure the non executed test has the uncertain value (None)
@@ -458,25 +524,99 @@ class BaseTestcaseTool(abc.ABC):
         return test_failed_verdicts, test_outlog_hash
     #~ def _runtests()
 
+    def _get_outlog_fingerprinter(self):
+        """ The fingerprinter is shared by the tools of the meta tool
+        """
+        if self.parent_meta_tool is not None:
+            return self.parent_meta_tool.get_outlog_fingerprinter()
+        if self.outlog_fingerprinter is None:
+            self.outlog_fingerprinter = OutlogFingerprinter()
+        return self.outlog_fingerprinter
+    #~ def _get_outlog_fingerprinter()
+
+    def _get_archive_codec(self):
+        """ Codec of the archives written (the best available if None)
+        """
+        if self.parent_meta_tool is not None:
+            return self.parent_meta_tool.get_archive_codec()
+        return None
+    #~ def _get_archive_codec()
+
+    def _get_sandbox(self):
+        """ The sandbox of the test executions, None if no resource limit
+            is configured
+        """
+        if self.sandbox is None:
+            with self.shared_loc:
+                if self.sandbox is None:
+                    config = self.config
+                    self.sandbox = ExecutionSandbox(\
+                            memory_mb=config.TEST_EXECUTION_MEMORY_LIMIT_MB, \
+                            max_pids=config.TEST_EXECUTION_MAX_PIDS, \
+                            cpu_quota=config.TEST_EXECUTION_CPU_QUOTA, \
+                            disk_mb=config.TEST_EXECUTION_DISK_QUOTA_MB, \
+                            use_cgroups=\
+                                    config.TEST_EXECUTION_SANDBOX_USE_CGROUPS)
+        if not self.sandbox.has_limits():
+            return None
+        return self.sandbox
+    #~ def _get_sandbox()
+
+    def _destroy_sandbox(self):
+        """ Remove the sandbox's cgroup, once the executions are done
+        """
+        with self.shared_loc:
+            if self.sandbox is not None:
+                self.sandbox.destroy()
+                self.sandbox = None
+    #~ def _destroy_sandbox()
+
     def _oracle_execute_a_test (self, testcase, exe_path_map, env_vars, \
                                         callback_object=None, timeout=None,
-                                with_output_summary=True, hash_outlog=True):
+                                with_output_summary=True, hash_outlog=True, \
+                                execution_cost=None):
         """ Execute a test and use the specified oracles to check
             Also collect the output
 
             :param hash_outlog: (bool) Choose to hash or not at runtime 
                                 (flakiness check)
+            :param execution_cost: dict updated, when not None, with the 
+                                resource usage of the processes executed
+                                by the test (see 
+                                common.matrices.ExecutionCostData). The
+                                wall time is that of the whole test.
         """
 
         if timeout is None:
             timeout = self.config.ONE_TEST_EXECUTION_TIMEOUT
         
         #logging.debug(str(timeout))
-        verdict, output_err = self._execute_a_test(\
+        # The output is fingerprinted while it is read when it is not
+        # cleaned by a custom function
+        stream_fingerprinter = None
+        if with_output_summary and hash_outlog and \
+                            not self.code_builds_factory.repository_manager\
+                                        .has_test_exec_output_cleaner_func():
+            stream_fingerprinter = self._get_outlog_fingerprinter()
+
+        with DriversUtils.collect_resource_usage() as usage, \
+                DriversUtils.sandboxed_execution(self._get_sandbox()) \
+                                                            as violations:
+            start_time = time.monotonic()
+            verdict, output_err = self._execute_a_test(\
                                             testcase,exe_path_map, env_vars,\
                                             callback_object=callback_object, \
                                             timeout=timeout, \
-                                            collect_output=with_output_summary)
+                                            collect_output=with_output_summary,\
+                                outlog_fingerprinter=stream_fingerprinter)
+            usage[common_matrices.ExecutionCostData.WALL_TIME] = \
+                                                time.monotonic() - start_time
+        if execution_cost is not None:
+            execution_cost.update(usage)
+        if len(violations) > 0:
+            logging.debug("# Test {} violated the {} limit".format(testcase, \
+                                                    violations[0].get_str()))
+            verdict = violations[0].get_test_verdict()
         if with_output_summary:
             retcode, outlog, timedout = output_err
             # case where the log exeeded the max alowed ytes size
@@ -492,14 +632,16 @@ class BaseTestcaseTool(abc.ABC):
                 out_len = len(outlog)
                 if hash_outlog:
                     outlog = outlog.encode('utf-8', 'backslashreplace')
-                    out_hash_val = hashlib.sha512(outlog).hexdigest()
+                    out_hash_val = self._get_outlog_fingerprinter()\
+                                                    .get_fingerprint(outlog)
                 else:
                     out_hash_val = outlog
+            if type(out_hash_val) == str:
+                out_hash_val = sys.intern(out_hash_val)
 
             outlog_summary = {
                 common_matrices.OutputLogData.OUTLOG_LEN: out_len,
-                common_matrices.OutputLogData.OUTLOG_HASH: \
-                                                    sys.intern(out_hash_val),
+                common_matrices.OutputLogData.OUTLOG_HASH: out_hash_val,
                 common_matrices.OutputLogData.RETURN_CODE: retcode,
                 common_matrices.OutputLogData.TIMEDOUT: timedout,
             }
@@ -534,8 +676,13 @@ class BaseTestcaseTool(abc.ABC):
         # the default test storage dir
         if self.compress_test_storage_dir \
                                 and not os.path.isdir(self.tests_storage_dir):
-            if os.path.isfile(self.tests_storage_dir_archive):
-                os.remove(self.tests_storage_dir_archive)
+            for archive in (self.tests_storage_dir_archive, \
+                                    self.tests_storage_dir_targz_archive):
+                if os.path.isfile(archive):
+                    os.remove(archive)
+            self.tests_storage_dir_archive = \
+                        common_fs.IndexedArchive.get_archive_filename_of(\
+                                                        self.tests_storage_dir)
 
         os.mkdir(outputdir)
         self._do_generate_tests (exe_path_map, \
@@ -547,9 +694,10 @@ class BaseTestcaseTool(abc.ABC):
         # Compress test storage dir?
         if self.compress_test_storage_dir:
             if os.path.isdir(self.tests_storage_dir):
-                common_fs.TarGz.compressDir(self.tests_storage_dir, \
+                common_fs.IndexedArchive.compressDir(self.tests_storage_dir, \
                                             self.tests_storage_dir_archive, \
-                                            remove_in_directory=False)
+                                            remove_in_directory=False, \
+                                            codec=self._get_archive_codec())
 
         # @Checkpoint: Finished (for time)
         checkpoint_handler.set_finished(None)
@@ -609,6 +757,15 @@ class BaseTestcaseTool(abc.ABC):
     def can_run_tests_in_parallel(self):
         return False
     #~ def can_run_tests_in_parallel()
+
+    def can_generate_tests_concurrently(self):
+        """ Whether the test generation can run concurrently with the
+            generation of other tools (in other threads). Must be False
+            when the generation changes process wide state (environment
+            variables, current working directory).
+        """
+        return True
+    #~ def can_generate_tests_concurrently()
     
     def get_test_format_class (self):
         """ Can be useful for test fdupes
@@ -657,9 +814,14 @@ class BaseTestcaseTool(abc.ABC):
 
     @abc.abstractmethod
     def _execute_a_test (self, testcase, exe_path_map, env_vars, \
-                    callback_object=None, timeout=None, collect_output=None):
+                    callback_object=None, timeout=None, collect_output=None, \
+                                                    outlog_fingerprinter=None):
         """ Execute a test given that the executables have been set 
             properly
+            :param outlog_fingerprinter: OutlogFingerprinter, set when the
+                    output can be fingerprinted while it is read. The
+                    collected output may then be the pair of its length
+                    and fingerprint
         """
     #~ def _execute_a_test()
 
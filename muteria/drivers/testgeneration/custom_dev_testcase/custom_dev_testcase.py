@@ -75,7 +75,7 @@ class CustomTestcases(BaseTestcaseTool):
                                 use_recorded_timeout_times=None, \
                                 recalculate_execution_times=False, \
                                 with_output_summary=True, hash_outlog=True, \
-                                parallel_count=1):
+                                parallel_count=1, execution_costs=None):
         """ Override runtests
         """
         return self._in_repo_runtests(testcases=testcases, \
@@ -90,6 +90,7 @@ class CustomTestcases(BaseTestcaseTool):
                                 with_output_summary=with_output_summary, \
                                 hash_outlog=hash_outlog, \
                                 parallel_count=parallel_count, \
+                                execution_costs=execution_costs, \
                                 copy_exe_to_repo=(self.wrapper_obj is None))
     #~ def runtests()
 
@@ -132,7 +133,7 @@ class CustomTestcases(BaseTestcaseTool):
 
     def _execute_a_test (self, testcase, exe_path_map, env_vars, \
                                 callback_object=None, timeout=None, \
-                                                    collect_output=None):
+                                collect_output=None, outlog_fingerprinter=None):
         """ Execute a test given that the executables have been set 
             properly
         """
@@ -29,11 +29,15 @@ import muteria.common.mix as common_mix
 
 from muteria.drivers import ToolsModulesLoader
 from muteria.drivers import DriversUtils
+import muteria.controller.logging_setup as logging_setup
 
 from muteria.drivers.checkpoint_handler import CheckPointHandler
 
 from muteria.drivers.testgeneration.testcases_info import TestcasesInfoObject
 from muteria.drivers.testgeneration import TestToolType
+from muteria.drivers.testgeneration import OutlogFingerprinter
+from muteria.drivers.testgeneration.testgen_scheduler import \
+                            TestGenerationScheduler, TestGenerationTask
 
 from muteria.drivers.testgeneration.custom_dev_testcase.custom_dev_testcase \
                                                         import CustomTestcases
@@ -100,7 +104,8 @@ class MetaTestcaseTool(object):
 
     def __init__(self, language, tests_working_dir, code_builds_factory,
                                 test_tool_config_list, head_explorer, 
-                                hash_outlog=True):
+                                hash_outlog=True, outlog_fingerprinter=None,
+                                archive_codec=None):
 
         """ Initialize a meta testcase tool object.
         :type language:
@@ -115,6 +120,14 @@ class MetaTestcaseTool(object):
         :type test_tool_config_list:
         :param test_tool_config_list:
 
+        :type outlog_fingerprinter: OutlogFingerprinter
+        :param outlog_fingerprinter: fingerprinter of the test outputs
+                        used by all the tools (SHA512 mode if None)
+
+        :type archive_codec: common_fs.ArchiveCodec
+        :param archive_codec: codec of the archives written by the tools 
+                        and the criteria tools (the best available if None)
+
         :raises:
 
         :rtype:
@@ -130,10 +143,14 @@ class MetaTestcaseTool(object):
         self.test_tool_config_list = test_tool_config_list
         self.head_explorer = head_explorer
         self.hash_outlog = hash_outlog
+        self.outlog_fingerprinter = outlog_fingerprinter
+        self.archive_codec = archive_codec
 
         # Verify Direct Arguments Variables
         ERROR_HANDLER.assert_true(self.tests_working_dir is not None, \
                                     "Must specify tests_working_dir", __file__)
+        if self.outlog_fingerprinter is None:
+            self.outlog_fingerprinter = OutlogFingerprinter()
         ERROR_HANDLER.assert_true(len(self.test_tool_config_list) == \
                                 len(set([c.get_tool_config_alias() for c in \
                                             self.test_tool_config_list])), \
@@ -232,6 +249,21 @@ class MetaTestcaseTool(object):
         return testcase_tool
     #~ def _create_testcase_tool()
 
+    def get_outlog_fingerprinter(self):
+        return self.outlog_fingerprinter
+    #~ def get_outlog_fingerprinter()
+
+    def get_archive_codec(self):
+        return self.archive_codec
+    #~ def get_archive_codec()
+
+    def get_outlog_fingerprint_mode_name(self):
+        """ :return: the fingerprint mode name of the output hashes of the
+                    executions with the default hash_outlog
+        """
+        return self.outlog_fingerprinter.get_mode_name(self.hash_outlog)
+    #~ def get_outlog_fingerprint_mode_name()
+
     def check_tools_installed(self):
         non_installed = []
         for toolalias, tool_obj in self.testcases_configured_tools.items():
@@ -268,7 +300,8 @@ class MetaTestcaseTool(object):
         
         if os.path.isdir(os.path.dirname(self.duplicated_tests_info_file)):
             common_fs.dumpJSON(self.tests_duplicates_map, \
-                                self.duplicated_tests_info_file, pretty=True)
+                                self.duplicated_tests_info_file, pretty=True, \
+                                atomic=True)
     #~ def _update_tests_duplicates_map()
 
     def get_devtest_toolalias(self):
@@ -347,13 +380,15 @@ class MetaTestcaseTool(object):
                         recalculate_execution_times=False, \
                         fault_test_execution_matrix_file=None, \
                         fault_test_execution_execoutput_file=None, \
+                        fault_test_execution_cost_file=None, \
                         with_output_summary=True, \
                         hash_outlog=None, \
                         test_prioritization_module=None, \
                         parallel_test_count=1, \
                         parallel_test_scheduler=None, \
                         restart_checkpointer=False,
-                        finish_destroy_checkpointer=True):
+                        finish_destroy_checkpointer=True, \
+                        execution_costs=None):
         '''
         Execute the list of test cases with the given executable and 
         say, for each test case, whether it failed
@@ -369,12 +404,16 @@ class MetaTestcaseTool(object):
                         to store the tests' pass fail execution data
         :param fault_test_execution_execoutput_file: Optional output log file 
                         to store the tests' execution actual output (hashed)
+        :param fault_test_execution_cost_file: Optional file to store the
+                        tests' execution resource usage cost 
+                        (see common.matrices.ExecutionCostData)
         :param with_output_summary: decide whether to return outlog hash 
         :type hash_outlog: bool
         :hash_outlog: decide whether to hash the outlog or not
         :param test_prioritization_module: Specify the test prioritization
-                        module. 
-                        (TODO: Implement support)
+                        module (test execution optimizer). The tests are
+                        executed in its order (tool by tool, the tools
+                        in the order of their first test).
         :param parallel_test_count: Specify the number of parallel test
                         Execution. must be an integer >= 1 or None.
                         When None, the max possible value is used.
@@ -392,6 +431,10 @@ class MetaTestcaseTool(object):
                         destroy the checkpointer when done or not
                         Useful is caller has a checkpointer to update. 
 
+        :param execution_costs: dict updated, when not None, with the 
+                        resource usage cost of each test 
+                        ({<test case name>: <cost dict>})
+
         :returns: dict of testcase and their failed verdict.
                  {<test case name>: <True if failed, False if passed,
                     UNCERTAIN_TEST_VERDICT if uncertain>}
@@ -403,11 +446,7 @@ class MetaTestcaseTool(object):
                                             "Must specify testcases", __file__)
 
         # FIXME: Make sure that the support are implemented for 
-        # parallelism and test prioritization. Remove the code bellow 
-        # once supported:
-        ERROR_HANDLER.assert_true(test_prioritization_module is None, \
-                        "Must implement test prioritization support here", \
-                                                                    __file__)
+        # parallelism. Remove the code bellow once supported:
         ERROR_HANDLER.assert_true(parallel_test_scheduler is None, \
                     "Must implement parallel tests execution support here", \
                                                                     __file__)
@@ -446,28 +485,55 @@ class MetaTestcaseTool(object):
                         " can be returned. Check the results of the", \
                         "finished execution"), call_location=__file__)
 
-        # @Checkpoint: Get the saved payload (data kapt for each tool)
-        # pair list of testfailed verdict and execution output
-        meta_test_failedverdicts_outlog = \
-                                    checkpoint_handler.get_optional_payload()
-        if meta_test_failedverdicts_outlog is None:
-            meta_test_failedverdicts_outlog = [{}, {}]
+        # @Checkpoint: the tools are work units. Get the saved data of the
+        # completed tools: pair list of testfailed verdict and execution 
+        # output
+        work_units = checkpoint_handler.get_work_units(cp_func_name, \
+                                                                    cp_task_id)
+        work_units.reclaim_expired()
+        # (The payloads of older checkpoints have no cost)
+        collect_costs = execution_costs is not None or \
+                                    fault_test_execution_cost_file is not None
+        meta_test_failedverdicts_outlog = [{}, {}]
+        meta_test_costs = {}
+        for tool_failedverdicts_outlog in work_units.get_done().values():
+            for i in (0, 1):
+                meta_test_failedverdicts_outlog[i].update(\
+                                                tool_failedverdicts_outlog[i])
+            if len(tool_failedverdicts_outlog) > 2:
+                meta_test_costs.update(tool_failedverdicts_outlog[2])
 
         # Make sure the tests are unique
         ERROR_HANDLER.assert_true(len(meta_testcases) == \
                                                 len(set(meta_testcases)), \
                                         "not all tests are unique", __file__)
 
-        # For fdupes
+        # Test prioritization
+        if test_prioritization_module is not None:
+            test_prioritization_module.reset(None, meta_testcases, \
+                        test_execution_times=\
+                                self.get_recorded_test_execution_times())
+            meta_testcases = test_prioritization_module.select_tests(100, \
+                                                        is_proportion=True)
+
+        # For fdupes (keeping the tests order)
         if len(self.tests_duplicates_map) > 0:
             meta_testcases_backup = meta_testcases
-            meta_testcases = set(meta_testcases)
-            dups_remove_meta_testcases = meta_testcases & \
+            meta_testcases_set = set(meta_testcases)
+            dups_remove_meta_testcases = meta_testcases_set & \
                                                 set(self.tests_duplicates_map)
             dup_toadd_test = {self.tests_duplicates_map[v] for v in \
-                                dups_remove_meta_testcases} - meta_testcases
-            meta_testcases = (meta_testcases - dups_remove_meta_testcases) \
-                                                            | dup_toadd_test
+                            dups_remove_meta_testcases} - meta_testcases_set
+            meta_testcases = []
+            for mtest in meta_testcases_backup:
+                if mtest in dups_remove_meta_testcases:
+                    mtest = self.tests_duplicates_map[mtest]
+                    if mtest not in dup_toadd_test \
+                                            or mtest in meta_testcases_set:
+                        continue
+                    # add the duplicate's representative only once
+                    meta_testcases_set.add(mtest)
+                meta_testcases.append(mtest)
 
         testcases_by_tool = {}
         for meta_testcase in meta_testcases:
@@ -480,9 +546,7 @@ class MetaTestcaseTool(object):
         candidate_aliases = []
         for tpos, ttoolalias in enumerate(testcases_by_tool.keys()):
             # @Checkpoint: Check whether already executed
-            if not checkpoint_handler.is_to_execute(func_name=cp_func_name, \
-                                                taskid=cp_task_id, \
-                                                tool=ttoolalias):
+            if work_units.is_done(ttoolalias):
                 continue
             candidate_aliases.append(ttoolalias)
 
@@ -572,13 +636,35 @@ class MetaTestcaseTool(object):
             ERROR_HANDLER.error_exit("Invalid parallel startegy")
 
 
+        def _get_found_failure_and_error(tool_failedverdicts_outlog):
+            verdicts = set(tool_failedverdicts_outlog[0].values())
+            return (common_mix.GlobalConstants.FAIL_TEST_VERDICT in verdicts \
+                or not verdicts.isdisjoint(\
+                    common_mix.GlobalConstants.RESOURCE_LIMIT_TEST_VERDICTS), \
+                common_mix.GlobalConstants.TEST_EXECUTION_ERROR in verdicts)
+        #~ def _get_found_failure_and_error()
+
         def tool_parallel_test_exec(ttoolalias):
+            # @Checkpoint: claim the tool
+            while not work_units.claim(ttoolalias):
+                # claimed by another worker
+                completed, tool_failedverdicts_outlog = \
+                                            work_units.wait_for(ttoolalias)
+                if completed:
+                    with shared_loc:
+                        for i in (0, 1):
+                            meta_test_failedverdicts_outlog[i].update(\
+                                                tool_failedverdicts_outlog[i])
+                        if len(tool_failedverdicts_outlog) > 2:
+                            meta_test_costs.update(\
+                                                tool_failedverdicts_outlog[2])
+                    return _get_found_failure_and_error(\
+                                                    tool_failedverdicts_outlog)
+
             # Actual execution
-            found_a_failure = False
-            # Whether the execution was unsuccessful
-            test_error = False
             ttool = \
                 self.testcases_configured_tools[ttoolalias][self.TOOL_OBJ_KEY]
+            test_costs = {} if collect_costs else None
             test_failed_verdicts, test_execoutput = ttool.runtests( \
                                 testcases_by_tool[ttoolalias], \
                                 exe_path_map, env_vars, \
@@ -592,34 +678,35 @@ class MetaTestcaseTool(object):
                                             with_output_summary, \
                                 hash_outlog=hash_outlog, \
                                 parallel_count=\
-                                    parallel_test_count_by_tool[ttoolalias])
-            with shared_loc:
-                for testcase in test_failed_verdicts:
-                    meta_testcase = DriversUtils.make_meta_element(\
+                                    parallel_test_count_by_tool[ttoolalias], \
+                                execution_costs=test_costs)
+            tool_failedverdicts_outlog = [{}, {}, {}]
+            for testcase in test_failed_verdicts:
+                meta_testcase = DriversUtils.make_meta_element(\
                                                         testcase, ttoolalias)
-                    meta_test_failedverdicts_outlog[0][meta_testcase] = \
+                tool_failedverdicts_outlog[0][meta_testcase] = \
                                                 test_failed_verdicts[testcase]
-                    meta_test_failedverdicts_outlog[1][meta_testcase] = \
+                tool_failedverdicts_outlog[1][meta_testcase] = \
                                                     test_execoutput[testcase]
-                    if not found_a_failure \
-                                and test_failed_verdicts[testcase] == \
-                                common_mix.GlobalConstants.FAIL_TEST_VERDICT:
-                        found_a_failure = True
-                    if not test_error \
-                                and test_failed_verdicts[testcase] == \
-                            common_mix.GlobalConstants.TEST_EXECUTION_ERROR:
-                        test_error = True
-
-                # @Checkpoint: Chekpointing
-                checkpoint_handler.do_checkpoint(func_name=cp_func_name, \
-                                taskid=cp_task_id, \
-                                tool=ttoolalias, \
-                                opt_payload=meta_test_failedverdicts_outlog)
-            return found_a_failure, test_error
+                if collect_costs and testcase in test_costs:
+                    tool_failedverdicts_outlog[2][meta_testcase] = \
+                                                        test_costs[testcase]
+            with shared_loc:
+                for i in (0, 1):
+                    meta_test_failedverdicts_outlog[i].update(\
+                                                tool_failedverdicts_outlog[i])
+                meta_test_costs.update(tool_failedverdicts_outlog[2])
+
+            # @Checkpoint: Chekpointing
+            work_units.complete(ttoolalias, tool_failedverdicts_outlog)
+            return _get_found_failure_and_error(tool_failedverdicts_outlog)
         #~ def tool_parallel_test_exec()
 
         if len(cand_alias_joblib) > 0:
             parallel_count_ = min(len(cand_alias_joblib), parallel_test_count)
+            # Bound here, the calls may be dispatched from other threads
+            tool_parallel_test_exec = \
+                        logging_setup.bind_log_context(tool_parallel_test_exec)
             joblib.Parallel(n_jobs=parallel_count_, require='sharedmem')\
                     (joblib.delayed(tool_parallel_test_exec)(ttoolalias) \
                         for ttoolalias in cand_alias_joblib)
@@ -629,12 +716,8 @@ class MetaTestcaseTool(object):
                                         tool_parallel_test_exec(ttoolalias)
                 if stop_on_failure and found_a_failure:
                     # @Checkpoint: Chekpointing for remaining tools
-                    for rem_tool in list(testcases_by_tool.keys())[tpos+1:]:
-                        checkpoint_handler.do_checkpoint(\
-                                func_name=cp_func_name, \
-                                taskid=cp_task_id, \
-                                tool=rem_tool, \
-                                opt_payload=meta_test_failedverdicts_outlog)
+                    for rem_tool in cand_alias_for[tpos+1:]:
+                        work_units.complete(rem_tool, [{}, {}, {}])
                     break
                                         
         if stop_on_failure:
@@ -671,6 +754,12 @@ class MetaTestcaseTool(object):
                 for mtest in dup_toadd_test:
                     # remove from results
                     del meta_test_failedverdicts_outlog[i][mtest]
+            for mtest in dups_remove_meta_testcases:
+                if self.tests_duplicates_map[mtest] in meta_test_costs:
+                    meta_test_costs[mtest] = copy.deepcopy(meta_test_costs[\
+                                            self.tests_duplicates_map[mtest]])
+            for mtest in dup_toadd_test:
+                meta_test_costs.pop(mtest, None)
 
         if fault_test_execution_matrix_file is not None:
             # Load or Create the matrix 
@@ -688,6 +777,10 @@ class MetaTestcaseTool(object):
                 common_mix.GlobalConstants.UNCERTAIN_TEST_VERDICT: \
                     fault_test_execution_matrix.getUncertainCellDefaultVal(),
             }
+            for limit_index, limit_verdict in enumerate(\
+                    common_mix.GlobalConstants.RESOURCE_LIMIT_TEST_VERDICTS):
+                failverdict2val[limit_verdict] = fault_test_execution_matrix\
+                                        .getResourceLimitCellVal(limit_index)
             cells_dict = {}
             for meta_testcase in meta_test_failedverdicts_outlog[0]:
                 cells_dict[meta_testcase] = failverdict2val[\
@@ -703,11 +796,22 @@ class MetaTestcaseTool(object):
             ERROR_HANDLER.assert_true(\
                             fault_test_execution_execoutput.is_empty(), \
                                         "outlog data must be empty", __file__)
+            fault_test_execution_execoutput.set_fingerprint_mode(\
+                    self.outlog_fingerprinter.get_mode_name(hash_outlog))
             fault_test_execution_execoutput.add_data(\
                                     {self.PROGRAM_EXECOUTPUT_KEY: \
                                          meta_test_failedverdicts_outlog[1]}, \
                                                                 serialize=True)
 
+        if fault_test_execution_cost_file is not None:
+            fault_test_execution_cost = common_matrices.ExecutionCostData(\
+                                        filename=fault_test_execution_cost_file)
+            fault_test_execution_cost.add_data(\
+                            {self.PROGRAM_EXECOUTPUT_KEY: meta_test_costs}, \
+                                    override_existing=True, serialize=True)
+
+        if execution_costs is not None:
+            execution_costs.update(meta_test_costs)
 
         # @Checkpoint: Finished
         detailed_exectime = {}
@@ -741,12 +845,27 @@ class MetaTestcaseTool(object):
         return candidate_tools_aliases
     #~ def get_candidate_tools_aliases()
 
+    def get_recorded_test_execution_times(self):
+        """ :return: dict of meta test and its recorded execution time
+                    (in seconds)
+        """
+        res = {}
+        for ttoolalias in self.testcases_configured_tools:
+            tt = self.testcases_configured_tools[ttoolalias][self.TOOL_OBJ_KEY]
+            for test, exec_time in tt.test_execution_time.items():
+                res[DriversUtils.make_meta_element(test, ttoolalias)] = \
+                                                                    exec_time
+        return res
+    #~ def get_recorded_test_execution_times()
+
     def generate_tests (self, meta_criteria_tool_obj=None, \
                                 exe_path_map=None, \
                                 test_tool_type_list=None, \
                                 max_time=None, \
                                 test_generation_guidance_obj=None, \
                                 parallel_testgen_count=1, \
+                                testgen_memory_budget_mb=None, \
+                                testgen_time_slice=None, \
                                 restart_checkpointer=False, \
                                 finish_destroy_checkpointer=True):
         """ This method should be used to generate the tests and must 
@@ -767,8 +886,17 @@ class MetaTestcaseTool(object):
         :type \test_generation_guidance_obj:
         :param \test_generation_guidance_obj:
     
-        :type \parallel_testgen_count:
-        :param \parallel_testgen_count:
+        :type \parallel_testgen_count: int
+        :param \parallel_testgen_count: maximum number of tools generating
+                        tests concurrently (see TestGenerationScheduler)
+
+        :type \testgen_memory_budget_mb: int
+        :param \testgen_memory_budget_mb: memory budget of the concurrent
+                        generations, in MB, compared with the tools' 
+                        TEST_GENERATION_MEMORY_ESTIMATE_MB (None: unbounded)
+
+        :type \testgen_time_slice: float
+        :param \testgen_time_slice: maximum generation time of each tool
 
         :type restart_checkointer: bool
         :param restart_checkointer: Decide whether to discard checkpoint
@@ -787,8 +915,6 @@ class MetaTestcaseTool(object):
         # bellow:
         ERROR_HANDLER.assert_true(test_generation_guidance_obj is None, \
                 "FIXME: Must first implement support for test gen guidance")
-        ERROR_HANDLER.assert_true(parallel_testgen_count <= 1, \
-                "FIXME: Must first implement support for parallel test gen")
         #~ FXIMEnd
 
         # Check arguments Validity
@@ -822,6 +948,7 @@ class MetaTestcaseTool(object):
             return
 
         # Generate
+        tasks = []
         for ttoolalias in candidate_tools_aliases:
             ttool = self.testcases_configured_tools[ttoolalias]\
                                                             [self.TOOL_OBJ_KEY]
@@ -837,16 +964,28 @@ class MetaTestcaseTool(object):
             if checkpoint_handler.is_to_execute(func_name=cp_func_name, \
                                                 taskid=cp_task_id, \
                                                 tool=ttoolalias):
-
-                # Actual Execution
-                ttool.generate_tests(exe_path_map, \
+                # Each tool generates in its own working dir. A tool
+                # interrupted before its checkpoint is generated anew
+                def _generate(max_time, ttool=ttool):
+                    ttool.generate_tests(exe_path_map, \
                             meta_criteria_tool_obj=meta_criteria_tool_obj, \
                             max_time=max_time)
-
-                # @Checkpoint: Checkpointing
-                checkpoint_handler.do_checkpoint(func_name=cp_func_name, \
+                tasks.append(TestGenerationTask(ttoolalias, _generate, \
+                            memory_estimate_mb=ttool.config.\
+                                        TEST_GENERATION_MEMORY_ESTIMATE_MB, \
+                            exclusive=\
+                                (not ttool.can_generate_tests_concurrently())))
+
+        # Actual Execution
+        def _checkpoint_tool(task):
+            # @Checkpoint: Checkpointing (in this thread, as tools finish)
+            checkpoint_handler.do_checkpoint(func_name=cp_func_name, \
                                                 taskid=cp_task_id, \
-                                                tool=ttoolalias)
+                                                tool=task.name)
+        scheduler = TestGenerationScheduler(cpu_budget=parallel_testgen_count,\
+                                    memory_budget_mb=testgen_memory_budget_mb,\
+                                    time_slice=testgen_time_slice)
+        scheduler.run(tasks, max_time=max_time, on_task_done=_checkpoint_tool)
 
         # Invalidate any existing testcase info so it can be recomputed
         self._invalidate_testcase_info()
@@ -898,7 +1037,8 @@ class MetaTestcaseTool(object):
         ## commented because many stages for test generation
         #if self._testcase_info_is_invalidated(): 
         self._compute_testcases_info(candidate_tool_aliases).write_to_file(\
-                                    self._unchecked_get_testcase_info_file())
+                                    self._unchecked_get_testcase_info_file(), \
+                                    atomic=True)
         return self._unchecked_get_testcase_info_file()
     #~ def get_testcase_info_file()
 
@@ -974,7 +1114,7 @@ class MetaTestcaseTool(object):
         os.mkdir(self.flakiness_workdir)
 
         outlog_files = [os.path.join(self.flakiness_workdir, \
-                            str(of)+'-out.json') for of in range(repeat_count)]
+                            str(of)+'-out.mutolog') for of in range(repeat_count)]
         matrix_files = [os.path.join(self.flakiness_workdir, \
                             str(of)+'-mat.csv') for of in range(repeat_count)]
         
@@ -0,0 +1,212 @@
+""" Streaming filter of the test execution outputs noise.
+
+    The output is cleaned line by line: the lines matching a drop regex are
+    removed and the lines matching a rewrite regex are replaced. All the
+    regexes are compiled into a single matcher applied on blocks of
+    complete lines, so that the output can be cleaned as it is read from
+    the pipe, in bounded memory, and the Python code only runs for the
+    rewritten lines.
+
+    The line ends '\\r\\n' and '\\r' are normalized to '\\n'. The result is
+    the same as removing the final '\\n' of the whole output, splitting it
+    into lines ('\\n', '\\r\\n' or '\\r' ended), filtering the lines and
+    joining them with '\\n' (with a final '\\n' when the output ended with
+    '\\n'). Thus, a final empty line is removed when the output ends with
+    '\\n\\n' but kept when it ends with '\\r\\n\\r\\n', and an output
+    ending with '\\r' has no final line end.
+    The regexes must not match across line ends.
+"""
+
+from __future__ import print_function
+
+import re
+import codecs
+
+import muteria.common.mix as common_mix
+
+ERROR_HANDLER = common_mix.ErrorHandler
+
+class OutputNoiseFilter(object):
+    """ Clean the output fed by chunks (bytes).
+        :param drop_regexes: list of regexes (str pattern or compiled) of
+                    the lines to remove
+        :param rewrite_regexes: list of pairs of regex and function. A line
+                    matching the regex is replaced by the function's return
+                    value on the line (str, without the line end). They
+                    have priority over drop_regexes.
+        :param sink: function called with the chunks (bytes) of the
+                    cleaned output. The cleaned output is kept (see
+                    get_output) when None
+
+        Example:
+        >>> f = OutputNoiseFilter(['^NOTE: '], [('^STATUS', str.lower)])
+        >>> f.feed(b'a\\nNOTE: x\\nSTAT'); f.feed(b'US 1\\nb\\n'); f.finish()
+        >>> f.get_output()
+        'a\\nstatus 1\\nb\\n'
+    """
+    DROP_GROUP = 'muteria_drop'
+    REWRITE_GROUP = 'muteria_rewrite{}'
+
+    def __init__(self, drop_regexes, rewrite_regexes=None, sink=None):
+        if rewrite_regexes is None:
+            rewrite_regexes = []
+        self.rewrite_funcs = {}
+        alternatives = []
+        for pos, (regex, func) in enumerate(rewrite_regexes):
+            group = self.REWRITE_GROUP.format(pos)
+            self.rewrite_funcs[group] = func
+            alternatives.append("(?P<{}>[^\\n]*?(?:{}))".format(group, \
+                                                    self._get_pattern(regex)))
+        drop_patterns = [self._get_pattern(r) for r in drop_regexes]
+        if len(drop_patterns) > 0:
+            alternatives.append("(?P<{}>[^\\n]*?(?:{}))".format(\
+                        self.DROP_GROUP, "|".join("(?:{})".format(p) \
+                                                    for p in drop_patterns)))
+        if len(alternatives) > 0:
+            self.matcher = re.compile(("^(?:{})[^\\n]*\\n".format(\
+                                "|".join(alternatives))).encode('utf-8'), \
+                                                                re.MULTILINE)
+        else:
+            self.matcher = None
+
+        self.sink = sink
+        self.kept = None
+        if self.sink is None:
+            self.kept = []
+            self.sink = self.kept.append
+
+        self.decoder = codecs.getincrementaldecoder('utf-8')(\
+                                                        'backslashreplace')
+        # incomplete last line
+        self.partial = b''
+        # cleaned last line (with its line end), not yet given to sink
+        self.held = None
+        self.emitted_any = False
+        self.last_line_empty = False
+        # last 2 bytes of the output before the line ends normalization
+        self.raw_end = b''
+        self.finished = False
+    #~ def __init__()
+
+    @staticmethod
+    def _get_pattern(regex):
+        if hasattr(regex, 'pattern'):
+            regex = regex.pattern
+        if isinstance(regex, bytes):
+            regex = regex.decode('utf-8')
+        return regex
+    #~ def _get_pattern()
+
+    def _replace(self, match):
+        group = match.lastgroup
+        if group == self.DROP_GROUP:
+            return b''
+        line = match.group(0)[:-1].decode('utf-8', 'backslashreplace')
+        return self.rewrite_funcs[group](line).encode('utf-8', \
+                                                    'backslashreplace') + b'\n'
+    #~ def _replace()
+
+    def _emit(self, data):
+        if len(data) > 0:
+            self.sink(data)
+            self.emitted_any = True
+    #~ def _emit()
+
+    def _process_lines(self, block):
+        """ Clean a block of complete lines
+        """
+        self.last_line_empty = (block == b'\n' or block.endswith(b'\n\n'))
+        if self.matcher is not None:
+            block = self.matcher.sub(self._replace, block)
+        if len(block) == 0:
+            return
+        last_start = block.rfind(b'\n', 0, len(block) - 1) + 1
+        if self.held is not None:
+            self._emit(self.held)
+        self._emit(block[:last_start])
+        self.held = block[last_start:]
+    #~ def _process_lines()
+
+    def feed(self, chunk):
+        """ Clean a chunk of the output
+        """
+        ERROR_HANDLER.assert_true(not self.finished, \
+                                        "feed called after finish", __file__)
+        text = self.decoder.decode(chunk)
+        if len(text) == 0:
+            return
+        data = text.encode('utf-8', 'backslashreplace')
+        self.raw_end = (self.raw_end + data)[-2:]
+        data = self.partial + data
+        # a '\r' may be followed by a '\n' in the next chunk
+        if data.endswith(b'\r'):
+            self.partial = b'\r'
+            data = data[:-1]
+        else:
+            self.partial = b''
+        data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+        end = data.rfind(b'\n') + 1
+        if end > 0:
+            self._process_lines(data[:end])
+        if end < len(data):
+            self.partial = data[end:] + self.partial
+    #~ def feed()
+
+    def finish(self):
+        """ Clean the rest of the output. To call after the last feed
+        """
+        ERROR_HANDLER.assert_true(not self.finished, \
+                                        "finish called twice", __file__)
+        self.finished = True
+        flushed = self.decoder.decode(b'', final=True).encode('utf-8', \
+                                                        'backslashreplace')
+        self.raw_end = (self.raw_end + flushed)[-2:]
+        tail = self.partial + flushed
+        self.partial = b''
+        tail = tail.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+        if len(tail) > 0 and not tail.endswith(b'\n'):
+            # last line without line end
+            held = self.held
+            self.held = None
+            self._process_lines(tail + b'\n')
+            if self.held is None:
+                # last line removed
+                if held is not None:
+                    self._emit(held[:-1])
+            else:
+                if held is not None:
+                    self._emit(held)
+                self._emit(self.held[:-1])
+            self.held = None
+            return
+        if len(tail) > 0:
+            self._process_lines(tail)
+        if not self.raw_end.endswith(b'\n'):
+            # ends with '\r' or no line, no final line end
+            if self.held is not None:
+                self._emit(self.held[:-1])
+                self.held = None
+            return
+        if self.held is not None:
+            # with a final '\n' (not '\r\n'), the final empty line is not
+            # a line
+            if self.last_line_empty and self.held == b'\n' and \
+                                        not self.raw_end.endswith(b'\r\n'):
+                self.held = None
+            else:
+                self._emit(self.held)
+                self.held = None
+        if not self.emitted_any:
+            self._emit(b'\n')
+    #~ def finish()
+
+    def get_output(self):
+        """ :return: the cleaned output (str) when there is no sink
+        """
+        ERROR_HANDLER.assert_true(self.kept is not None, \
+                            "the cleaned output is given to the sink", __file__)
+        ERROR_HANDLER.assert_true(self.finished, \
+                                    "get_output called before finish", __file__)
+        return b''.join(self.kept).decode('utf-8', 'backslashreplace')
+    #~ def get_output()
+#~ class OutputNoiseFilter
@@ -7,14 +7,63 @@ import shutil
 import imp
 import logging
 import filecmp
+import tempfile
+import threading
+import atexit
 from distutils.spawn import find_executable
 
 import muteria.common.mix as common_mix
 
 from muteria.drivers import DriversUtils
+from muteria.drivers.testgeneration.output_filter import OutputNoiseFilter
 
 ERROR_HANDLER = common_mix.ErrorHandler
 
+class _ReplayStatus(object):
+    """ Parse the exit status lines of klee-replay output (see
+        KTestTestFormat._get_output_noise_filter)
+    """
+    def __init__(self, status_regex, timedout_retcode):
+        self.status_regex = status_regex
+        self.timedout_retcode = timedout_retcode
+        # If not None, must be an integer
+        self.exit_status = None
+        self.found_exit_status = False
+        self.timedout = False
+    #~ def __init__()
+
+    def rewrite_status_line(self, line):
+        ERROR_HANDLER.assert_true(not self.found_exit_status,
+                                "Exit status found multiple times in output", \
+                                                                      __file__)
+        self.found_exit_status = True
+        line = self.status_regex.sub("\\g<2>", line)
+        ls = line.split()
+        if ls[-2] == 'ABNORMAL':
+            try:
+                self.exit_status = int(ls[-1])
+            except ValueError:
+                ERROR_HANDLER.error_exit(\
+                                    "Invalid exit status {}".format(ls[-1]), \
+                                                                 __file__)
+        elif ls[-1] == 'OUT' and ls[-2] == 'TIMED':
+            # Case where klee-replay call to gdb fails to attach process
+            self.timedout = True
+            # klee-replay may pu another exit status
+            self.found_exit_status = False
+        return "@MUTERIA.KLEE-REPLAY: "+line
+    #~ def rewrite_status_line()
+
+    def get_retcode_exit_status(self, retcode):
+        """ :return: pair of the return code (the timeout return code when
+                    klee-replay timed out) and the exit status
+        """
+        if self.timedout and retcode == 0:
+            retcode = self.timedout_retcode
+        return retcode, self.exit_status
+    #~ def get_retcode_exit_status()
+#~ class _ReplayStatus
+
 class KTestTestFormat(object):
     
     @classmethod
@@ -66,37 +115,95 @@ class KTestTestFormat(object):
         return prog, args
     #~ def _get_replay_prog_args()
 
+    # Cache of the replay tool help output, by (path, modification time)
+    _replay_tool_help_cache = {}
+    _replay_tool_help_cache_lock = threading.Lock()
+
+    @classmethod
+    def _get_replay_tool_regexes(cls, prog, clean_everything=True):
+        """ Get the output parsing regexes to use with the replay tool prog.
+            The capabilities of the replay tool are detected (running 
+            '<prog> --help') only once per binary, identified by its 
+            path and modification time.
+        """
+        prog_path = prog if os.path.isfile(prog) else find_executable(prog)
+        if prog_path is None:
+            key = (prog, None)
+        else:
+            key = (os.path.realpath(prog_path), \
+                                            os.stat(prog_path).st_mtime_ns)
+        with cls._replay_tool_help_cache_lock:
+            out = cls._replay_tool_help_cache.get(key, None)
+        if out is None:
+            retcode, out, err = DriversUtils.execute_and_get_retcode_out_err(\
+                                prog=prog, args_list=['--help'], \
+                                merge_err_to_out=True)
+            with cls._replay_tool_help_cache_lock:
+                cls._replay_tool_help_cache[key] = out
+        return cls._get_regexes(out, clean_everything=clean_everything)
+    #~ def _get_replay_tool_regexes()
+
     @classmethod
     def execute_test(cls, executable_file, test_file, env_vars, stdin=None, \
                                         must_exist_dir_list=None, \
                                         timeout=None, collected_output=None, \
-                                        custom_replay_tool_binary_dir=None):
-
+                                        custom_replay_tool_binary_dir=None, \
+                                        exec_dir_pool=None, \
+                                        outlog_fingerprinter=None):
+        """ Replay the test file on the executable.
+            The execution happens in a directory from exec_dir_pool 
+            (the process wide pool when None).
+            :param outlog_fingerprinter: OutlogFingerprinter. When set, the
+                    cleaned output is fingerprinted as it is read and the
+                    collected output is the pair of its length and
+                    fingerprint
+        """
         prog, args = cls._get_replay_prog_args(executable_file, test_file, \
                                                 custom_replay_tool_binary_dir)
 
+        # XXX Get the parsing regexes to use
+        clean_regex, status_regex = cls._get_replay_tool_regexes(prog, \
+                                                        clean_everything=True)
+
+        if exec_dir_pool is None:
+            exec_dir_pool = ExecDirPool.get_default()
+
+        return cls._replay_with_pool(prog, args, exec_dir_pool, env_vars, \
+                                    stdin, must_exist_dir_list, timeout, \
+                                    collected_output, clean_regex, \
+                                    status_regex, outlog_fingerprinter)
+    #~ def execute_test()
+
+    @classmethod
+    def _replay_with_pool(cls, prog, args, exec_dir_pool, env_vars, stdin, \
+                                    must_exist_dir_list, timeout, \
+                                    collected_output, clean_regex, \
+                                    status_regex, outlog_fingerprinter):
         # klee-replay may create files or dir. in KLEE version with LLVM-3.4,
         # those are created in a temporary dir set as <cwd>.temps
         # XXX XXX. make sure each test has its own
-        test_work_dir = test_file+".execdir"
-        klee_replay_temps = test_work_dir + '.temps'
-        for d in (test_work_dir, klee_replay_temps):
-            if os.path.isdir(d):
-                try:
-                    shutil.rmtree(d)
-                except PermissionError:
-                    cls._dir_chmod777(d)
-                    shutil.rmtree(d)
-                
-        if not os.path.isdir(test_work_dir):
-            os.mkdir(test_work_dir)
-            
-        if must_exist_dir_list is not None:
-            for d in must_exist_dir_list:
-                td = os.path.join(test_work_dir, d)
-                if not os.path.isdir(td):
-                    os.makedirs(td)
+        test_work_dir = exec_dir_pool.acquire()
+        try:
+            if must_exist_dir_list is not None:
+                for d in must_exist_dir_list:
+                    td = os.path.join(test_work_dir, d)
+                    if not os.path.isdir(td):
+                        os.makedirs(td)
+
+            verdict = cls._replay_in_dir(prog, args, test_work_dir, env_vars,\
+                                        stdin, timeout, collected_output, \
+                                        clean_regex, status_regex, \
+                                outlog_fingerprinter=outlog_fingerprinter)
+        finally:
+            exec_dir_pool.release(test_work_dir)
+
+        return verdict
+    #~ def _replay_with_pool()
 
+    @classmethod
+    def _replay_in_dir(cls, prog, args, test_work_dir, env_vars, stdin, \
+                                    timeout, collected_output, clean_regex, \
+                                    status_regex, outlog_fingerprinter=None):
         # XXX Execution setup
         tmp_env = os.environ.copy()
         if env_vars is not None:
@@ -115,33 +222,39 @@ class KTestTestFormat(object):
             # DBG
             logging.warning("@KTEST: calling ktest execution without timeout.")
 
-        # XXX Get the parsing regexes to use
-        retcode, out, err = DriversUtils.execute_and_get_retcode_out_err(\
-                                prog=prog, args_list=['--help'], \
-                                merge_err_to_out=True)
-        clean_regex, status_regex = cls._get_regexes(out, \
-                                                        clean_everything=True)
-        
         # XXX Execute the ktest
-        #logging.debug("DBG: test_work_dir is {}. its content is {}".format(
-        #                    test_work_dir, list(os.listdir(test_work_dir))))
-        #if collected_output is not None:
         
         # XXX: Use stdbuf to line buffer the stderr to avoid mixing or 
         # err between klee-replay and the executd prog
         use_stdbuf = True
         if use_stdbuf:
             args = ["--output=L", "--error=L", prog] + args
-            prog = "stdbuf"
+            prog = cls.stdbuf
             # TODO: check that stdbuf is installed
             
-        retcode, out, err = DriversUtils.execute_and_get_retcode_out_err(\
+        # The output is cleaned as it is read
+        fp_stream = None
+        if collected_output is None:
+            sink = lambda data: None
+        elif outlog_fingerprinter is not None:
+            fp_stream = outlog_fingerprinter.new_stream()
+            sink = fp_stream.update
+        else:
+            sink = None
+        noise_filter, replay_status = cls._get_output_noise_filter(\
+                                        clean_regex, status_regex, sink=sink)
+        retcode, _, _ = DriversUtils.execute_and_get_retcode_out_err(\
                                 prog=prog, args_list=args, env=tmp_env, \
                                 stdin=stdin, \
                                 timeout=timeout, timeout_grace_period=5, \
-                                merge_err_to_out=True, cwd=test_work_dir)
-        retcode, out, exit_status = cls._remove_output_noise(retcode, out, \
-                                                  clean_regex, status_regex)
+                                merge_err_to_out=True, cwd=test_work_dir, \
+                                out_consumer=noise_filter.feed)
+        noise_filter.finish()
+        retcode, exit_status = replay_status.get_retcode_exit_status(retcode)
+        if fp_stream is not None:
+            out = (fp_stream.get_length(), fp_stream.get_fingerprint())
+        elif collected_output is not None:
+            out = noise_filter.get_output()
         # In klee-replay, when exit_status here is not None, retcode is 0
         # When there is an issue, like timeout, exit_status is None and
         # retcode has the ode of the issue 
@@ -151,28 +264,6 @@ class KTestTestFormat(object):
             collected_output.extend((exit_status, out, \
                                      (retcode in timeout_return_codes or \
                             retcode in DriversUtils.EXEC_TIMED_OUT_RET_CODE)))
-        #else:
-        #    retcode, out, err = DriversUtils.execute_and_get_retcode_out_err(\
-        #                        prog=prog, args_list=args, env=tmp_env, \
-        #                        timeout=timeout, timeout_grace_period=5, \
-        #                                        out_on=False, err_on=False, \
-        #                                        cwd=test_work_dir)
-
-        # XXX: Go back to previous CWD
-        for d in (test_work_dir, klee_replay_temps):
-            if os.path.isdir(d):
-                try:
-                    shutil.rmtree(d)
-                except PermissionError:
-                    cls._dir_chmod777(d)
-                    shutil.rmtree(d)
-                
-        #if must_exist_dir_list is not None:
-        #    try:
-        #        shutil.rmtree(test_work_dir)
-        #    except PermissionError:
-        #        cls._dir_chmod777(test_work_dir)
-        #        shutil.rmtree(test_work_dir)
 
         if retcode in timeout_return_codes + \
                                     DriversUtils.EXEC_SEGFAULT_OUT_RET_CODE:
@@ -181,7 +272,7 @@ class KTestTestFormat(object):
             verdict = common_mix.GlobalConstants.PASS_TEST_VERDICT
 
         return verdict
-    #~ def execute_test()
+    #~ def _replay_in_dir()
 
     @staticmethod
     def _dir_chmod777(dirpath):
@@ -308,49 +399,26 @@ class KTestTestFormat(object):
     #~ def _get_regexes()
         
     @classmethod
-    def _remove_output_noise(cls, retcode, out, clean_regex, status_regex):
-        res = []
-        
-        if len(out) > 0 and out[-1] == '\n':
-            out = out[:-1]
-            last_char = "\n" 
-        else:
-            last_char = ""
-
-        # If not None, must be an integer
-        exit_status = None
+    def _get_output_noise_filter(cls, clean_regex, status_regex, sink=None):
+        """ :return: pair of the OutputNoiseFilter of the replay output and
+                    the _ReplayStatus to get the exit status after the
+                    output is cleaned
+        """
+        replay_status = _ReplayStatus(status_regex, cls.timedout_retcodes[0])
+        rewrite_regexes = [(status_regex, replay_status.rewrite_status_line)]
+        noise_filter = OutputNoiseFilter([clean_regex], \
+                                rewrite_regexes=rewrite_regexes, sink=sink)
+        return noise_filter, replay_status
+    #~ def _get_output_noise_filter()
 
-        found_exit_status = False
-        for line in out.encode('utf-8', 'backslashreplace').splitlines():
-            line = line.decode('utf-8', 'backslashreplace')
-            if status_regex.search(line) is not None:
-                ERROR_HANDLER.assert_true(not found_exit_status,
-                                "Exit status found multiple times in output", \
-                                                                      __file__)
-                found_exit_status = True
-                line = status_regex.sub("\g<2>", line)
-                ls = line.split()
-                if ls[-2] == 'ABNORMAL':
-                    try:
-                        exit_status = int(ls[-1])
-                    except ValueError:
-                        ERROR_HANDLER.error_exit(\
-                                    "Invalid exit status {}".format(ls[-1]), \
-                                                                 __file__)
-                elif ls[-1] == 'OUT' and ls[-2] == 'TIMED':
-                    # Case where klee-replay call to gdb fails to attach process
-                    if retcode == 0:
-                        retcode = cls.timedout_retcodes[0]
-                    # klee-replay may pu another exit status
-                    found_exit_status = False
-                res.append("@MUTERIA.KLEE-REPLAY: "+line)
-            elif clean_regex.search(line) is None:
-                # None is matched
-                res.append(line)
-
-        res = '\n'.join(res) + last_char
-
-        return retcode, res, exit_status
+    @classmethod
+    def _remove_output_noise(cls, retcode, out, clean_regex, status_regex):
+        noise_filter, replay_status = cls._get_output_noise_filter(\
+                                                    clean_regex, status_regex)
+        noise_filter.feed(out.encode('utf-8', 'backslashreplace'))
+        noise_filter.finish()
+        retcode, exit_status = replay_status.get_retcode_exit_status(retcode)
+        return retcode, noise_filter.get_output(), exit_status
     #~ def _remove_output_noise()
 
     ktest_extension = '.ktest'
@@ -521,3 +589,143 @@ class KTestTestFormat(object):
         return kepttest2duptest_map, test2keptdup
     #~ def cross_folder_fdupes()
 #~ class KTestTestFormat
+
+class ExecDirPool(object):
+    """ Pool of reusable test execution directories (with their '.temps'
+        sibling used by some klee-replay versions).
+        A released directory is emptied (cheap when the test created
+        nothing) and given again by a later acquire, instead of creating
+        and removing a directory for each test execution.
+    """
+    _default_pool = None
+    _default_pool_lock = threading.Lock()
+
+    @classmethod
+    def get_default(cls):
+        """ Get the process wide pool (removed at exit)
+        """
+        with cls._default_pool_lock:
+            if cls._default_pool is None:
+                cls._default_pool = cls()
+                atexit.register(cls._default_pool.cleanup)
+            return cls._default_pool
+    #~ def get_default()
+
+    def __init__(self, root_dir=None):
+        """ :param root_dir: directory where the execution directories are
+                    created. A temporary directory when None.
+        """
+        self.root_dir = root_dir
+        self.free_dirs = []
+        self.created_count = 0
+        self.lock = threading.Lock()
+    #~ def __init__()
+
+    def acquire(self):
+        with self.lock:
+            if len(self.free_dirs) > 0:
+                exec_dir = self.free_dirs.pop()
+            else:
+                if self.root_dir is None:
+                    self.root_dir = tempfile.mkdtemp(\
+                                            prefix="muteria-ktest-execdirs-")
+                exec_dir = os.path.join(self.root_dir, \
+                                        "execdir_{}".format(self.created_count))
+                self.created_count += 1
+        if not os.path.isdir(exec_dir):
+            os.makedirs(exec_dir)
+        return exec_dir
+    #~ def acquire()
+
+    @staticmethod
+    def _rmtree(d):
+        try:
+            shutil.rmtree(d)
+        except PermissionError:
+            KTestTestFormat._dir_chmod777(d)
+            shutil.rmtree(d)
+    #~ def _rmtree()
+
+    def release(self, exec_dir):
+        temps_dir = exec_dir + '.temps'
+        if os.path.isdir(temps_dir):
+            self._rmtree(temps_dir)
+        for name in os.listdir(exec_dir):
+            path = os.path.join(exec_dir, name)
+            if os.path.isdir(path) and not os.path.islink(path):
+                self._rmtree(path)
+            else:
+                os.remove(path)
+        with self.lock:
+            self.free_dirs.append(exec_dir)
+    #~ def release()
+
+    def cleanup(self):
+        """ Remove all the execution directories
+        """
+        with self.lock:
+            if self.root_dir is not None and os.path.isdir(self.root_dir):
+                self._rmtree(self.root_dir)
+            self.free_dirs = []
+    #~ def cleanup()
+#~ class ExecDirPool
+
+class KTestReplaySession(object):
+    """ Replay session of a batch of ktests against a single executable
+        (e.g. the tests of one test execution of the klee driver).
+        The replay tool and its capabilities are resolved once for the
+        session, and the execution directories are pooled for the session
+        (removed on close).
+        klee-replay replays a single ktest per process: each replay is a
+        separate process, executed and supervised (timeout, sandbox, 
+        resource usage) by DriversUtils, so that the verdict and the
+        execution cost of each test are recorded by the caller.
+
+        Example:
+            with KTestReplaySession(exe) as session:
+                for ktest in ktests:
+                    verdict = session.replay(ktest, None, timeout=10)
+    """
+    def __init__(self, executable_file, custom_replay_tool_binary_dir=None, \
+                                                    exec_dir_pool_root=None):
+        """ :param exec_dir_pool_root: directory of the execution 
+                    directories of the session (a temporary directory when
+                    None)
+        """
+        self.executable_file = executable_file
+        self.prog, _ = KTestTestFormat._get_replay_prog_args(\
+                                    executable_file, None, \
+                                    custom_replay_tool_binary_dir)
+        self.clean_regex, self.status_regex = \
+                    KTestTestFormat._get_replay_tool_regexes(self.prog, \
+                                                        clean_everything=True)
+        self.exec_dir_pool = ExecDirPool(root_dir=exec_dir_pool_root)
+    #~ def __init__()
+
+    def __enter__(self):
+        return self
+    #~ def __enter__()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    #~ def __exit__()
+
+    def close(self):
+        self.exec_dir_pool.cleanup()
+    #~ def close()
+
+    def replay(self, test_file, env_vars, stdin=None, \
+                                must_exist_dir_list=None, timeout=None, \
+                                collected_output=None, \
+                                outlog_fingerprinter=None):
+        """ Replay the test file on the session's executable (see
+            KTestTestFormat.execute_test)
+        """
+        return KTestTestFormat._replay_with_pool(self.prog, \
+                                [self.executable_file, test_file], \
+                                self.exec_dir_pool, env_vars, stdin, \
+                                must_exist_dir_list, timeout, \
+                                collected_output, self.clean_regex, \
+                                self.status_regex, outlog_fingerprinter)
+    #~ def replay()
+#~ class KTestReplaySession
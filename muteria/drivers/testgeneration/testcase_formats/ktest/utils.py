@@ -1,5 +1,6 @@
 import os
 import sys
+import json
 import imp
 from distutils.spawn import find_executable
 import logging
@@ -105,9 +106,13 @@ class ConvertCollectKtestsSeeds:
     tar_gz = ".tar.gz"
     test2semudirMapFile = "test2semudirMapFile.json"
 
-    def __init__(self, custom_binary_dir=None):
+    def __init__(self, custom_binary_dir=None, archive_codec=None):
+        """ :param archive_codec: codec of the archives written (see 
+                    common_fs.IndexedArchive.Writer)
+        """
         self.ktest_tool = Misc.import_ktest_tool(\
                                         custom_binary_dir=custom_binary_dir)
+        self.archive_codec = archive_codec
     #~ def __init__ ()
 
     def generate_seeds_from_various_ktests (self, dest_dir, \
@@ -123,7 +128,8 @@ class ConvertCollectKtestsSeeds:
         ERROR_HANDLER.assert_true(not os.path.isdir(dest_dir), \
                                         "dest dir already exists", __file__)
         ERROR_HANDLER.assert_true(not (compress_dest and \
-                                        os.path.isfile(dest_dir+self.tar_gz)),\
+                                os.path.isfile(common_fs.IndexedArchive.\
+                                        get_archive_filename_of(dest_dir))),\
                                 "dest dir compressed already exists", __file__)
         
         if klee_ktest_is_sym_args:
@@ -144,24 +150,16 @@ class ConvertCollectKtestsSeeds:
 
         # decompress shadow_zesti ktest dir if compressed
         if src_old_shadow_zesti_ktest_dir is not None and \
-                        src_old_shadow_zesti_ktest_dir.endswith(self.tar_gz):
-            # decompress
-            tmp_ar = src_old_shadow_zesti_ktest_dir
-            src_old_shadow_zesti_ktest_dir = \
-                            src_old_shadow_zesti_ktest_dir[:-len(self.tar_gz)]
-            common_fs.TarGz.decompressDir(tmp_ar, \
-                            os.path.dirname(src_old_shadow_zesti_ktest_dir), \
-                                                    remove_in_archive=False)
+                        self.is_compressed_ktests_dir(\
+                                            src_old_shadow_zesti_ktest_dir):
+            src_old_shadow_zesti_ktest_dir = self._decompress_into(\
+                                    src_old_shadow_zesti_ktest_dir, tmpdir)
 
         # decompress new_klee ktest dir if compressed
         if src_new_klee_ktest_dir is not None and \
-                                src_new_klee_ktest_dir.endswith(self.tar_gz):
-            # decompress
-            tmp_ar = src_new_klee_ktest_dir
-            src_new_klee_ktest_dir = src_new_klee_ktest_dir[:-len(self.tar_gz)]
-            common_fs.TarGz.decompressDir(tmp_ar, \
-                                    os.path.dirname(src_new_klee_ktest_dir), \
-                                                    remove_in_archive=False)
+                        self.is_compressed_ktests_dir(src_new_klee_ktest_dir):
+            src_new_klee_ktest_dir = self._decompress_into(\
+                                            src_new_klee_ktest_dir, tmpdir)
 
         # Get test to zesti dir map (from the src_old... dir) TODO
         test2zestidirMap = {}
@@ -199,14 +197,13 @@ class ConvertCollectKtestsSeeds:
         # get new klee stuffs
         if src_new_klee_ktest_dir is not None:
             new_klee_test_list = []
-            cwd = os.getcwd()
-            os.chdir(src_new_klee_ktest_dir)
-            for root, _, files in os.walk('.'):
+            for root, _, files in os.walk(src_new_klee_ktest_dir):
                 for f in files:
-                    tc = os.path.normpath(os.path.join(root, f))
+                    tc = os.path.normpath(os.path.relpath(\
+                                            os.path.join(root, f), \
+                                            src_new_klee_ktest_dir))
                     if tc.endswith(KTestTestFormat.ktest_extension):
                         new_klee_test_list.append(tc)
-            os.chdir(cwd)
             klee_sym_args_param, kleeKTContains = \
                                     self._loadAndGetSymArgsFromKleeKTests (\
                                                     new_klee_test_list, \
@@ -234,32 +231,37 @@ class ConvertCollectKtestsSeeds:
         # delete tmpdir
         shutil.rmtree(tmpdir)
 
-        # Fdupes the seedDir.
-        cmd_ret, out, _ = DriversUtils.execute_and_get_retcode_out_err(\
-                                        prog='fdupes',
-                                        args_list=['-r', '-d', '-N', dest_dir],
-                            out_on=True, err_on=True, merge_err_to_out=True)
-        if cmd_ret != 0:
-            ERROR_HANDLER.error_exit ("fdupes failed on SeedDir:\n{}".format(\
-                                                                out), __file__)
+        # Remove the duplicate files of the seedDir (as fdupes)
+        common_fs.remove_duplicate_files(dest_dir)
 
         # compress destdir
         if compress_dest:
-            common_fs.TarGz.compressDir(dest_dir, remove_in_directory=True)
+            common_fs.IndexedArchive.compressDir(dest_dir, \
+                                                remove_in_directory=True, \
+                                                codec=self.archive_codec)
     #~ def generate_seeds_from_various_ktests()
 
     def get_ktests_sym_args(self, ktests_dir, compressed=True):
-        """ get sym args, if not there, create from ktests
+        """ get sym args, if not there, create from ktests.
+            When compressed, only the dat file is read from the archive
+            (a tar.gz archive is migrated once to an indexed archive)
         """
         if compressed:
-            tmp_ar = ktests_dir
-            ktests_dir = ktests_dir[:-len(self.tar_gz)]
-            ERROR_HANDLER.assert_true(not os.path.isdir(ktests_dir), \
-                    "make sure the uncompressed dir is abscent ({})".format(\
-                                                        ktests_dir), __file__)
-            common_fs.TarGz.decompressDir(tmp_ar, \
-                                                os.path.dirname(ktests_dir), \
-                                                    remove_in_archive=False)
+            archive = common_fs.IndexedArchive.get_archive_migrating_targz(\
+                                    ktests_dir, codec=self.archive_codec)
+            ERROR_HANDLER.assert_true(\
+                        common_fs.IndexedArchive.is_archive_file(archive), \
+                        "ktests archive {} is missing".format(ktests_dir), \
+                                                                    __file__)
+            datmember = "/".join([self._get_archived_dir_name(ktests_dir), \
+                                                    self.test2semudirMapFile])
+            ERROR_HANDLER.assert_true(datmember in \
+                        common_fs.IndexedArchive.list_members(archive), \
+                    "datfile {} is missing".format(self.test2semudirMapFile), \
+                                                                    __file__)
+            dat = json.loads(common_fs.IndexedArchive.read_member(archive, \
+                                                    datmember).decode('utf-8'))
+            return dat[0]
 
         ERROR_HANDLER.assert_true(os.path.isdir(ktests_dir), \
                         "ktests dir {} is issing".format(ktests_dir), __file__)
@@ -271,16 +273,42 @@ class ConvertCollectKtestsSeeds:
         
         dat = common_fs.loadJSON(datfile)
 
-        if compressed:
-            shutil.rmtree(ktests_dir)
-
         return dat[0]
     #~ def get_ktests_sym_args()
 
+    @classmethod
+    def is_compressed_ktests_dir(cls, ktests_dir):
+        return ktests_dir.endswith(cls.tar_gz) or \
+                ktests_dir.endswith(common_fs.IndexedArchive.archive_ext)
+    #~ def is_compressed_ktests_dir()
+
     ##################################
     ########### PRIVATE ##############
     ##################################
 
+    @classmethod
+    def _get_archived_dir_name(cls, archive):
+        """ Name of the directory compressed in archive
+        """
+        for ext in (cls.tar_gz, common_fs.IndexedArchive.archive_ext):
+            if archive.endswith(ext):
+                return os.path.basename(archive[:-len(ext)])
+        ERROR_HANDLER.error_exit("Invalid ktests archive {}".format(archive),\
+                                                                    __file__)
+    #~ def _get_archived_dir_name()
+
+    def _decompress_into(self, archive, out_dir):
+        """ Decompress the ktests archive (tar.gz or indexed) into out_dir
+            :return: the decompressed directory
+        """
+        archive = common_fs.IndexedArchive.get_archive_migrating_targz(\
+                                            archive, codec=self.archive_codec)
+        err_msg = common_fs.IndexedArchive.decompressDir(archive, out_dir, \
+                                                    remove_in_archive=False)
+        ERROR_HANDLER.assert_true(err_msg is None, err_msg, __file__)
+        return os.path.join(out_dir, self._get_archived_dir_name(archive))
+    #~ def _decompress_into()
+
     @staticmethod
     def _stripRootTest2Dir (rootdir, test2dir):
         res = {}
@@ -1,11 +1,204 @@
 import os
 import sys
+import json
+import atexit
+import logging
+import threading
+import subprocess
+
 from muteria.common.mix import GlobalConstants
 from muteria.drivers import DriversUtils
 
+# Coverage measurement (coverage.py) starts at the interpreter startup. With
+# a worker, the import of the test modules in the template would be
+# measured for a later test. Such executions use a fresh interpreter.
+_WORKER_POOL_INCOMPATIBLE_ENV_VARS = ('COVERAGE_PROCESS_START',)
+
+class PythonUnittestWorkerPool(object):
+    """ Pool of long-lived python interpreters (templates) running python
+        unittest tests. A template imports the test modules once and forks
+        a child, that starts from the warmed-up state, for each test
+        (see unittest_worker.py).
+        The templates are specific to the repository root dir and the
+        environment variables. A template whose loaded repository modules
+        changed on disk (e.g. a mutant was written) is replaced.
+    """
+    WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)),\
+                                                        'unittest_worker.py')
+
+    # Extra time given to a template to reply after the test timeout
+    REPLY_GRACE_PERIOD = 30
+
+    _default_pool = None
+    _default_pool_lock = threading.Lock()
+
+    @classmethod
+    def get_default(cls):
+        """ Get the process wide pool (shut down at exit)
+        """
+        with cls._default_pool_lock:
+            if cls._default_pool is None:
+                cls._default_pool = cls()
+                atexit.register(cls._default_pool.shutdown)
+            return cls._default_pool
+    #~ def get_default()
+
+    @staticmethod
+    def is_supported(env_vars=None):
+        if not hasattr(os, 'fork'):
+            return False
+        for e in _WORKER_POOL_INCOMPATIBLE_ENV_VARS:
+            if e in os.environ or (env_vars is not None and e in env_vars):
+                return False
+        return True
+    #~ def is_supported()
+
+    def __init__(self, max_idle_workers=4):
+        """ :param max_idle_workers: maximum number of idle templates kept
+                    (the least recently used are stopped)
+        """
+        self.max_idle_workers = max_idle_workers
+        # list of (key, process), the most recently used last
+        self.idle_workers = []
+        self.lock = threading.Lock()
+    #~ def __init__()
+
+    @staticmethod
+    def _get_key(repo_root_dir, env_vars):
+        return (os.path.abspath(repo_root_dir), \
+                    tuple(sorted((env_vars or {}).items())))
+    #~ def _get_key()
+
+    def _start_worker(self, key):
+        repo_root_dir, env_items = key
+        tmp_env = os.environ.copy()
+        tmp_env.update(dict(env_items))
+        return subprocess.Popen([sys.executable, '-c', \
+                        "import runpy; runpy.run_path({}, run_name='__main__')"\
+                                            .format(repr(self.WORKER_SCRIPT))], \
+                            cwd=repo_root_dir, env=tmp_env, \
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, \
+                            stderr=subprocess.DEVNULL)
+    #~ def _start_worker()
+
+    @staticmethod
+    def _stop_worker(proc):
+        try:
+            proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+    #~ def _stop_worker()
+
+    def _acquire(self, key):
+        with self.lock:
+            for pos in range(len(self.idle_workers) - 1, -1, -1):
+                if self.idle_workers[pos][0] == key:
+                    proc = self.idle_workers.pop(pos)[1]
+                    if proc.poll() is None:
+                        return proc
+                    self._stop_worker(proc)
+        return self._start_worker(key)
+    #~ def _acquire()
+
+    def _release(self, key, proc):
+        with self.lock:
+            self.idle_workers.append((key, proc))
+            excess = self.idle_workers[:-self.max_idle_workers] \
+                                    if self.max_idle_workers > 0 \
+                                    else list(self.idle_workers)
+            del self.idle_workers[:len(excess)]
+        for _, old_proc in excess:
+            self._stop_worker(old_proc)
+    #~ def _release()
+
+    def _request(self, proc, test_name, timeout):
+        """ :return: the reply dict, or None if the worker died or did not
+                    reply in time
+        """
+        reply = [None]
+        def _read_reply():
+            try:
+                proc.stdin.write((json.dumps({"test": test_name, \
+                            "timeout": timeout}) + '\n').encode('utf-8'))
+                proc.stdin.flush()
+                line = proc.stdout.readline()
+                if line:
+                    reply[0] = json.loads(line.decode('utf-8'))
+            except (OSError, ValueError):
+                pass
+        reader = threading.Thread(target=_read_reply)
+        reader.daemon = True
+        reader.start()
+        reader.join(None if timeout is None \
+                                    else timeout + self.REPLY_GRACE_PERIOD)
+        if reader.is_alive():
+            proc.kill()
+            reader.join()
+        return reply[0]
+    #~ def _request()
+
+    def run_test(self, test_name, repo_root_dir, env_vars=None, \
+                                                                timeout=None):
+        """ Run the test in a worker.
+            :return: tuple (retcode, output (stdout and stderr merged),
+                            timedout)
+            :raises OSError: if the test could not be run by a worker
+        """
+        key = self._get_key(repo_root_dir, env_vars)
+        # A stale worker is replaced once
+        for _ in range(2):
+            proc = self._acquire(key)
+            reply = self._request(proc, test_name, timeout)
+            if reply is None:
+                self._stop_worker(proc)
+                raise OSError("python unittest worker failed running test "+\
+                                                                    test_name)
+            if reply.get("stale", False):
+                self._stop_worker(proc)
+                continue
+            self._release(key, proc)
+            return reply["retcode"], reply["out"], reply["timedout"]
+        raise OSError("python unittest worker is stale after restart")
+    #~ def run_test()
+
+    def shutdown(self):
+        with self.lock:
+            workers = self.idle_workers
+            self.idle_workers = []
+        for _, proc in workers:
+            self._stop_worker(proc)
+    #~ def shutdown()
+#~ class PythonUnittestWorkerPool
+
+def _run_in_subprocess(test_name, env_vars, timeout):
+    tmp_env = os.environ.copy()
+    if env_vars is not None:
+        tmp_env.update(env_vars)
+    args_list = ['-m', 'unittest', test_name, '-v']
+    retcode, out, _ = DriversUtils.execute_and_get_retcode_out_err(\
+                            prog=sys.executable, args_list=args_list, \
+                            env=tmp_env, timeout=timeout, merge_err_to_out=True)
+    return retcode, out, retcode in DriversUtils.EXEC_TIMED_OUT_RET_CODE
+#~ def _run_in_subprocess()
+
 def python_unittest_runner(test_name, repo_root_dir, exe_path_map, env_vars, \
-                                            timeout, collected_output=None):
-    # TODO: use exe_path_map 
+                                            timeout, collected_output=None, \
+                                            use_worker_pool=True):
+    """ Run the python unittest test_name (test file or dotted name) from
+        repo_root_dir.
+        When use_worker_pool is True (and supported), the test is run by a
+        long-lived worker of the default PythonUnittestWorkerPool instead
+        of a fresh interpreter.
+        :param collected_output: list, when not None, to which the return
+                    code, the output and whether it timed out are appended
+    """
+    # TODO: use exe_path_map
 
     def parse_test(s):
         return s.split('...')[0].replace(':','/').replace(' ','')
@@ -14,22 +207,31 @@ def python_unittest_runner(test_name, repo_root_dir, exe_path_map, env_vars, \
     os.chdir(repo_root_dir)
 
     try:
-        args_list = ['-m', 'unittest', test_name, '-v']
-
-        if collected_output is None:
-            retcode, stdout, _ = DriversUtils.execute_and_get_retcode_out_err(\
-                                prog=sys.executable, args_list=args_list, \
-                                        timeout=timeout, merge_err_to_out=True)
-            stdout = stdout.splitlines()
+        if use_worker_pool and PythonUnittestWorkerPool.is_supported(env_vars):
+            try:
+                retcode, out, timedout = \
+                            PythonUnittestWorkerPool.get_default().run_test(\
+                                            test_name, repo_root_dir, \
+                                            env_vars=env_vars, timeout=timeout)
+            except OSError as e:
+                logging.warning("python unittest worker failed ({}), "
+                                    "using a new interpreter".format(str(e)))
+                retcode, out, timedout = \
+                                _run_in_subprocess(test_name, env_vars, timeout)
         else:
-            # collected_output is a list ([retcode, out_err_log])
-            # TODO: use wrapper? or parse out for particular codes... 
-            assert False, "TO BE Implemented"
+            retcode, out, timedout = \
+                                _run_in_subprocess(test_name, env_vars, timeout)
+        stdout = out.splitlines()
+        if collected_output is not None:
+            # same as system_test_runner: [retcode, out_err_log, timedout]
+            collected_output.append(retcode)
+            collected_output.append(out)
+            collected_output.append(timedout)
     except:
         # ERROR
         os.chdir(cwd)
         return GlobalConstants.TEST_EXECUTION_ERROR
-    
+
     # Parse the result
     subtests_verdicts = {}
     hasfail = False
@@ -44,4 +246,4 @@ def python_unittest_runner(test_name, repo_root_dir, exe_path_map, env_vars, \
     os.chdir(cwd)
     return GlobalConstants.FAIL_TEST_VERDICT if hasfail else \
                                             GlobalConstants.PASS_TEST_VERDICT
-#~ def python_unittest_runner()
\ No newline at end of file
+#~ def python_unittest_runner()
@@ -0,0 +1,240 @@
+""" Long-lived python unittest worker (template process).
+
+This script is run by PythonUnittestWorkerPool in a fresh interpreter, with
+the repository root as working directory (and first entry of sys.path, as
+with 'python -m unittest'). It only uses the standard library.
+
+The requests are read from stdin and the replies written to the original
+stdout, one JSON object per line.
+Request: {"test": <test name>, "timeout": <seconds or null>}
+Reply: {"retcode": <int>, "out": <str>, "timedout": <bool>}
+    or {"stale": true} when the content of a module of the repository 
+    loaded by the template changed on disk (the template then exits and 
+    must be replaced). The content is compared (hash) since the files 
+    copied into the repository keep their original modification time.
+
+Each test is run in a child forked from the template, so that the test
+modules are imported once (in the template) and each test starts from
+the same, clean, module state. The child output (stdout and stderr, merged)
+is captured in a temporary file.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import json
+import time
+import select
+import signal
+import shutil
+import hashlib
+import tempfile
+import unittest
+import importlib.util
+
+def _test_name_to_module_and_name(test_name):
+    """ Convert a test file path (as accepted by 'python -m unittest') into
+        a dotted name. Return the module to warm and the name to load.
+        The module of a dotted name (e.g. pkg.test_mod.Class.test) is its
+        longest importable prefix (the parent packages are imported).
+    """
+    if os.path.isfile(test_name) and test_name.lower().endswith('.py'):
+        rel_path = os.path.normpath(os.path.relpath(test_name))
+        name = rel_path[:-3].replace('\\', '.').replace('/', '.')
+        return name, name
+    parts = test_name.split('.')
+    for end in range(len(parts), 0, -1):
+        prefix = '.'.join(parts[:end])
+        try:
+            if importlib.util.find_spec(prefix) is not None:
+                return prefix, test_name
+        except Exception:
+            # not a module, or a parent failed to import
+            pass
+    return parts[0], test_name
+#~ def _test_name_to_module_and_name()
+
+class _Template(object):
+    def __init__(self, proto_in, proto_out):
+        self.proto_in = proto_in
+        self.proto_out = proto_out
+        self.root_dir = os.path.abspath(os.getcwd())
+        self.warmed_modules = set()
+        # module file -> (stat key, content digest) when loaded
+        self.modules_sigs = {}
+    #~ def __init__()
+
+    @staticmethod
+    def _get_stat_key(mod_file):
+        """ The change time is also updated when the modification time is
+            restored, the stat key of a rewritten file thus changes
+        """
+        try:
+            st = os.stat(mod_file)
+        except OSError:
+            return None
+        return (st.st_size, st.st_mtime_ns, st.st_ctime_ns, st.st_ino)
+    #~ def _get_stat_key()
+
+    @staticmethod
+    def _get_digest(mod_file):
+        try:
+            with open(mod_file, 'rb') as f:
+                return hashlib.sha1(f.read()).hexdigest()
+        except OSError:
+            return None
+    #~ def _get_digest()
+
+    def _update_repo_modules_sigs(self):
+        for mod in list(sys.modules.values()):
+            mod_file = getattr(mod, '__file__', None)
+            if mod_file is None:
+                continue
+            mod_file = os.path.abspath(mod_file)
+            if not mod_file.startswith(self.root_dir + os.sep) or \
+                                                mod_file in self.modules_sigs:
+                continue
+            self.modules_sigs[mod_file] = (self._get_stat_key(mod_file), \
+                                                    self._get_digest(mod_file))
+    #~ def _update_repo_modules_sigs()
+
+    def is_stale(self):
+        """ The content is only hashed when the stat key changed
+        """
+        for mod_file, (stat_key, digest) in list(self.modules_sigs.items()):
+            new_stat_key = self._get_stat_key(mod_file)
+            if new_stat_key == stat_key:
+                continue
+            if self._get_digest(mod_file) != digest:
+                return True
+            self.modules_sigs[mod_file] = (new_stat_key, digest)
+        return False
+    #~ def is_stale()
+
+    def warm(self, module_name):
+        """ Import the test module in the template (once). An import
+            failure is left to the test child, that reports it.
+        """
+        if module_name in self.warmed_modules:
+            return
+        self.warmed_modules.add(module_name)
+        try:
+            __import__(module_name)
+        except BaseException:
+            pass
+        self._update_repo_modules_sigs()
+    #~ def warm()
+
+    @staticmethod
+    def _child_run(test_name, out_fd, res_w):
+        os.setpgid(0, 0)
+        os.dup2(out_fd, 1)
+        os.dup2(out_fd, 2)
+        success = False
+        try:
+            suite = unittest.defaultTestLoader.loadTestsFromName(test_name)
+            stream = sys.stderr
+            result = unittest.TextTestRunner(stream=stream, \
+                                                    verbosity=2).run(suite)
+            success = result.wasSuccessful()
+        except SystemExit as e:
+            success = (e.code in (None, 0))
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+            except BaseException:
+                pass
+            os.write(res_w, b'1' if success else b'0')
+            os._exit(0 if success else 1)
+    #~ def _child_run()
+
+    def run_test(self, test_name, timeout):
+        module_name, load_name = _test_name_to_module_and_name(test_name)
+        self.warm(module_name)
+
+        out_file = tempfile.TemporaryFile()
+        res_r, res_w = os.pipe()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            os.close(res_r)
+            self._child_run(load_name, out_file.fileno(), res_w)
+        os.close(res_w)
+
+        # The pipe is closed (EOF) when the child exits
+        timedout = False
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            wait_time = None if deadline is None \
+                                        else max(0, deadline - time.time())
+            ready, _, _ = select.select([res_r], [], [], wait_time)
+            if len(ready) == 0:
+                timedout = True
+                try:
+                    os.killpg(pid, signal.SIGKILL)
+                except OSError:
+                    os.kill(pid, signal.SIGKILL)
+                break
+            if os.read(res_r, 1) == b'':
+                break
+        os.close(res_r)
+        _, status = os.waitpid(pid, 0)
+        if os.WIFSIGNALED(status):
+            retcode = -os.WTERMSIG(status)
+        else:
+            retcode = os.WEXITSTATUS(status)
+
+        out_file.seek(0)
+        out = out_file.read().decode('UTF-8', 'backslashreplace')
+        out_file.close()
+        return {"retcode": retcode, "out": out, "timedout": timedout}
+    #~ def run_test()
+
+    def serve(self):
+        for line in self.proto_in:
+            line = line.strip()
+            if not line:
+                continue
+            req = json.loads(line)
+            if self.is_stale():
+                self._reply({"stale": True})
+                break
+            self._reply(self.run_test(req["test"], req.get("timeout")))
+    #~ def serve()
+
+    def _reply(self, obj):
+        self.proto_out.write((json.dumps(obj) + '\n').encode('utf-8'))
+        self.proto_out.flush()
+    #~ def _reply()
+#~ class _Template
+
+def main():
+    # Like 'python -m unittest', the working directory is searched first
+    if sys.path[0] != '':
+        sys.path.insert(0, '')
+    # Keep the protocol channel away from the output of the imported
+    # test modules
+    proto_out = os.fdopen(os.dup(1), 'wb')
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+    # The byte code cached in the repository is validated with the source
+    # modification time, that the copied files keep: compile the sources
+    # (the byte code is read from an empty prefix and not written)
+    sys.dont_write_bytecode = True
+    pycache_dir = tempfile.mkdtemp(prefix='muteria-unittest-worker-')
+    sys.pycache_prefix = pycache_dir
+    try:
+        _Template(sys.stdin, proto_out).serve()
+    finally:
+        shutil.rmtree(pycache_dir, ignore_errors=True)
+#~ def main()
+
+if __name__ == '__main__':
+    main()
@@ -24,8 +24,8 @@ class TestcasesInfoObject(object):
         self.data = common_fs.loadJSON(file_path)
     #~ def load_from_file()
 
-    def write_to_file(self, file_path):
-        common_fs.dumpJSON(self.data, file_path, pretty=True)
+    def write_to_file(self, file_path, atomic=False):
+        common_fs.dumpJSON(self.data, file_path, pretty=True, atomic=atomic)
     #~ def write_to_file()
 
     def add_test (self, test_name, **kwargs):
@@ -0,0 +1,159 @@
+
+from __future__ import print_function
+
+import sys
+import time
+import queue
+import logging
+import threading
+
+import muteria.common.mix as common_mix
+
+ERROR_HANDLER = common_mix.ErrorHandler
+
+class TestGenerationTask(object):
+    """ A unit of test generation (the generation of one tool).
+        :param name: unique name of the task (the tool alias)
+        :param func: function called with the keyword argument max_time
+        :param memory_estimate_mb: estimated peak memory used by the task
+                    (None when unknown, then considered negligible)
+        :param exclusive: the task changes process wide state (environment
+                    variables, working dir) and must run alone
+    """
+    def __init__(self, name, func, memory_estimate_mb=None, exclusive=False):
+        self.name = name
+        self.func = func
+        self.memory_estimate_mb = memory_estimate_mb
+        self.exclusive = exclusive
+        self.start_time = None
+        self.end_time = None
+    #~ def __init__()
+
+    def get_duration(self):
+        if self.start_time is None or self.end_time is None:
+            return None
+        return self.end_time - self.start_time
+    #~ def get_duration()
+#~ class TestGenerationTask
+
+class TestGenerationScheduler(object):
+    """ Run test generation tasks concurrently (each in a thread; the tools
+        do the work in subprocesses) within a global budget:
+        - cpu_budget: maximum number of tasks running at the same time,
+        - memory_budget_mb: maximum sum of the memory estimates of the
+            running tasks (a task exceeding the budget alone is run alone),
+        - time_slice: maximum generation time given to each task.
+        The tasks are admitted in order, a task that does not fit in the
+        remaining budget lets the following ones go first.
+    """
+    def __init__(self, cpu_budget=1, memory_budget_mb=None, time_slice=None):
+        ERROR_HANDLER.assert_true(cpu_budget > 0, \
+                    "invalid test generation cpu budget: {}".format(\
+                                                    cpu_budget), __file__)
+        ERROR_HANDLER.assert_true(memory_budget_mb is None \
+                                        or memory_budget_mb > 0, \
+                    "invalid test generation memory budget: {}".format(\
+                                                memory_budget_mb), __file__)
+        ERROR_HANDLER.assert_true(time_slice is None or time_slice > 0, \
+                    "invalid test generation time slice: {}".format(\
+                                                    time_slice), __file__)
+        self.cpu_budget = cpu_budget
+        self.memory_budget_mb = memory_budget_mb
+        self.time_slice = time_slice
+    #~ def __init__()
+
+    def get_task_max_time(self, max_time):
+        """ :return: the generation time given to a task, given the
+                    maximum time requested by the caller (None: unbounded)
+        """
+        if self.time_slice is None:
+            return max_time
+        if max_time is None:
+            return self.time_slice
+        return min(max_time, self.time_slice)
+    #~ def get_task_max_time()
+
+    def _is_admissible(self, task, running):
+        if len(running) == 0:
+            return True
+        if len(running) >= self.cpu_budget:
+            return False
+        if task.exclusive or any(t.exclusive for t in running):
+            return False
+        if self.memory_budget_mb is not None:
+            used = sum(t.memory_estimate_mb or 0 for t in running)
+            if used + (task.memory_estimate_mb or 0) > self.memory_budget_mb:
+                return False
+        return True
+    #~ def _is_admissible()
+
+    @staticmethod
+    def _run_task(task, task_max_time, done_queue):
+        error = None
+        task.start_time = time.time()
+        try:
+            task.func(max_time=task_max_time)
+        except BaseException:
+            # includes the SystemExit of ERROR_HANDLER.error_exit
+            error = sys.exc_info()[1]
+        task.end_time = time.time()
+        done_queue.put((task, error))
+    #~ def _run_task()
+
+    def run(self, tasks, max_time=None, on_task_done=None):
+        """ Run the tasks and wait for them.
+            :param tasks: list of TestGenerationTask
+            :param max_time: maximum generation time requested by the caller
+            :param on_task_done: function called, in the calling thread, with
+                        each successfully finished task (e.g. checkpointing)
+            :raises: the error of the first failing task, once the running
+                        tasks finished (no other task is started after a
+                        failure)
+        """
+        ERROR_HANDLER.assert_true(len(set(t.name for t in tasks)) == \
+                                    len(tasks), "task names must be unique",\
+                                                                    __file__)
+        task_max_time = self.get_task_max_time(max_time)
+        pending = list(tasks)
+        running = []
+        done_queue = queue.Queue()
+        failure = None
+        while len(pending) > 0 or len(running) > 0:
+            while failure is None:
+                admitted = None
+                for task in pending:
+                    if self._is_admissible(task, running):
+                        admitted = task
+                        break
+                if admitted is None:
+                    break
+                if self.memory_budget_mb is not None and \
+                            (admitted.memory_estimate_mb or 0) > \
+                                                        self.memory_budget_mb:
+                    logging.warning("test generation task {} {}".format(\
+                                admitted.name, "exceeds the memory budget "
+                                                        "and is run alone"))
+                pending.remove(admitted)
+                running.append(admitted)
+                thread = threading.Thread(target=self._run_task, \
+                                args=(admitted, task_max_time, done_queue))
+                thread.daemon = True
+                thread.start()
+
+            if len(running) == 0:
+                # failure with remaining pending tasks
+                break
+
+            task, error = done_queue.get()
+            running.remove(task)
+            if error is not None:
+                if failure is None:
+                    failure = error
+                continue
+            if on_task_done is not None:
+                on_task_done(task)
+
+        if failure is not None:
+            raise failure
+    #~ def run()
+#~ class TestGenerationScheduler
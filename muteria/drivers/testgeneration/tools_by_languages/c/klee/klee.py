@@ -15,7 +15,7 @@ from muteria.drivers.testgeneration.base_testcasetool import BaseTestcaseTool
 from muteria.drivers.testgeneration.testcases_info import TestcasesInfoObject
 from muteria.drivers import DriversUtils
 from muteria.drivers.testgeneration.testcase_formats.ktest.ktest \
-                                                        import KTestTestFormat
+                                import KTestTestFormat, KTestReplaySession
 from muteria.drivers.testgeneration.testcase_formats.ktest.utils \
                                          import ConvertCollectKtestsSeeds, Misc
 from muteria.drivers.testgeneration.tools_by_languages.c.klee.driver_config \
@@ -66,6 +66,8 @@ class TestcasesToolKlee(BaseTestcaseTool):
 
         # mapping between exes, to have a local copy for execution
         self.repo_exe_to_local_to_remote = {}
+        # replay session of each local exe, during a test execution
+        self.local_exe_to_replay_session = {}
 
         self.keptktest2dupktests = os.path.join(self.tests_working_dir, \
                                                 'kept_to_dup_ktests_map.json')
@@ -148,10 +150,11 @@ class TestcasesToolKlee(BaseTestcaseTool):
         seed_dir = self.get_value_in_arglist(cfg_args, self.SEED_DIR_ARG_NAME)
         if seed_dir is not None:
             cv = ConvertCollectKtestsSeeds(\
-                                    custom_binary_dir=self.custom_binary_dir)
+                                    custom_binary_dir=self.custom_binary_dir, \
+                                    archive_codec=self._get_archive_codec())
             grouped_klee_sym_args = cv.get_ktests_sym_args(seed_dir, \
-                                        compressed=seed_dir.endswith(\
-                                            ConvertCollectKtestsSeeds.tar_gz))
+                                        compressed=cv.is_compressed_ktests_dir(\
+                                                                    seed_dir))
             self._validate_passed_sym_args(grouped_klee_sym_args)
             klee_sym_args = []
             for tup in grouped_klee_sym_args:
@@ -331,16 +334,16 @@ class TestcasesToolKlee(BaseTestcaseTool):
             return self.testcase_info_object
         except AttributeError:
             tc_info_obj = TestcasesInfoObject()
-            cwd = os.getcwd()
-            os.chdir(self.tests_storage_dir)
-            for root, _, files in os.walk('.'):
+            # No chdir (the tools may generate concurrently)
+            for root, _, files in os.walk(self.tests_storage_dir):
                 for f in files:
-                    tc = os.path.normpath(os.path.join(root, f))
+                    tc = os.path.normpath(os.path.relpath(\
+                                            os.path.join(root, f), \
+                                            self.tests_storage_dir))
                     if tc.endswith(KTestTestFormat.ktest_extension):
                         gen_time = self._get_generation_time_of_test(tc, \
                                                      self.tests_storage_dir)
                         tc_info_obj.add_test(tc, generation_time=gen_time)
-            os.chdir(cwd)
             self.testcase_info_object = tc_info_obj
             return self.testcase_info_object
     #~ def get_testcase_info_object()
@@ -367,13 +370,36 @@ class TestcasesToolKlee(BaseTestcaseTool):
         """ Restore back the default executable (if needed).
             Useful for test execution that require the executable
             at a specific location.
+            The replay sessions of the test execution are closed.
         """
         #self.code_builds_factory.restore_repository_files(exe_path_map)
-        pass
+        with self.shared_loc:
+            sessions = list(self.local_exe_to_replay_session.values())
+            self.local_exe_to_replay_session = {}
+        for session in sessions:
+            session.close()
     #~ def _restore_default_executable()
 
+    def _get_replay_session(self, local_exe):
+        """ Get the replay session of the local exe, in which the tests
+            of the current test execution are replayed
+        """
+        with self.shared_loc:
+            session = self.local_exe_to_replay_session.get(local_exe, None)
+            if session is None:
+                session = KTestReplaySession(local_exe, \
+                        custom_replay_tool_binary_dir=self.custom_binary_dir, \
+                        exec_dir_pool_root=os.path.join(\
+                                    self.klee_used_tmp_build_dir, \
+                                    'replay_execdirs_{}'.format(\
+                                    len(self.local_exe_to_replay_session))))
+                self.local_exe_to_replay_session[local_exe] = session
+        return session
+    #~ def _get_replay_session()
+
     def _execute_a_test (self, testcase, exe_path_map, env_vars, \
-                    callback_object=None, timeout=None, collect_output=False):
+                    callback_object=None, timeout=None, collect_output=False, \
+                                                    outlog_fingerprinter=None):
         """ Execute a test given that the executables have been set 
             properly
         """
@@ -439,14 +465,14 @@ class TestcasesToolKlee(BaseTestcaseTool):
         else:
             must_exist_dirs = None
         
-        verdict = KTestTestFormat.execute_test(local_exe, \
+        verdict = self._get_replay_session(local_exe).replay(\
                         os.path.join(self.tests_storage_dir, testcase), \
                         env_vars=env_vars, \
                         stdin=stdin, \
                         must_exist_dir_list=must_exist_dirs, \
                         timeout=timeout, \
                         collected_output=collected_output, \
-                        custom_replay_tool_binary_dir=self.custom_binary_dir)
+                        outlog_fingerprinter=outlog_fingerprinter)
         
         if stdin is not None:
             stdin.close()
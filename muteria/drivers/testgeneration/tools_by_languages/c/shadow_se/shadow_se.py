@@ -379,4 +379,9 @@ class TestcasesToolShadowSE(TestcasesToolKlee):
 
         os.environ['PATH'] = env_path_bak
     #~ def _do_generate_tests ()
+
+    def can_generate_tests_concurrently(self):
+        # The generation changes the PATH environment variable
+        return False
+    #~ def can_generate_tests_concurrently()
 #~ class TestcasesToolShadowSE
@@ -7,6 +7,7 @@ import sys
 import os
 import logging
 import shutil
+import threading
 
 import muteria.common.mix as common_mix
 import muteria.common.fs as common_fs
@@ -40,6 +41,9 @@ class CodeBuildsFactory(object):
         self.repository_manager = repository_manager
         self.workdir = workdir
         self.src_dest_fmt_to_handling_obj = {}
+        # The builds happen in the repository, the tools instrumenting
+        # concurrently take turns
+        self.build_lock = threading.RLock()
 
         self.code_conversion_tracker_file = None
         self.stored_files_mapping = None
@@ -114,24 +118,25 @@ class CodeBuildsFactory(object):
                     "dest_fmt {} not supported yet for src_fmt {}.".format( \
                                                 dest_fmt, src_fmt), __file__)
         
-        # call handler
-        handler = self.src_dest_fmt_to_handling_obj[src_fmt][dest_fmt]
+        with self.build_lock:
+            # call handler
+            handler = self.src_dest_fmt_to_handling_obj[src_fmt][dest_fmt]
 
-        # track code conversion
-        if self.repository_manager.should_build():
-            with open(self.code_conversion_tracker_file, 'w') as f:
-                f.write('converting code...')
+            # track code conversion
+            if self.repository_manager.should_build():
+                with open(self.code_conversion_tracker_file, 'w') as f:
+                    f.write('converting code...')
 
-        pre_ret, ret, post_ret = handler.convert_code(src_fmt, dest_fmt, \
-                            src_dest_files_paths_map, \
-                            repository_manager=self.repository_manager, \
-                            **kwargs)
+            pre_ret, ret, post_ret = handler.convert_code(src_fmt, dest_fmt, \
+                                src_dest_files_paths_map, \
+                                repository_manager=self.repository_manager, \
+                                **kwargs)
 
-        # untrack code conversion
-        if self.repository_manager.should_build():
-            os.remove(self.code_conversion_tracker_file)
+            # untrack code conversion
+            if self.repository_manager.should_build():
+                os.remove(self.code_conversion_tracker_file)
 
-        return pre_ret, ret, post_ret
+            return pre_ret, ret, post_ret
     #~ def transform_src_into_dest ()
     
     def override_registration (self, src_fmt, dest_fmt, handling_obj):
@@ -170,6 +175,11 @@ class CodeBuildsFactory(object):
     #~ class CopyCallbackObject
 
     def set_repo_to_build_default(self, also_copy_to_map={}):
+        with self.build_lock:
+            self._set_repo_to_build_default(also_copy_to_map=also_copy_to_map)
+    #~ def set_repo_to_build_default(self)
+
+    def _set_repo_to_build_default(self, also_copy_to_map):
         if self.repository_manager.should_build():
             files_backed = False
             if self.stored_files_mapping is not None and \
@@ -250,5 +260,5 @@ class CodeBuildsFactory(object):
                 # XXX: Also already copied
         else:
             ERROR_HANDLER.error_exit("TODO: implement baking relevant files")
-    #~ def set_repo_to_build_default(self)
+    #~ def _set_repo_to_build_default(self)
 #~ class CodeBuildsFactory()
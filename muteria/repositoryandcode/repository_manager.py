@@ -88,6 +88,7 @@ class RepositoryManager(object):
         if self.dev_test_program_wrapper is not None:
             self.dev_test_program_wrapper = self.dev_test_program_wrapper(self)
         self.test_exec_output_cleaner_func = test_exec_output_cleaner_func
+        self.has_output_cleaner = (test_exec_output_cleaner_func is not None)
         if self.test_exec_output_cleaner_func is None:
             self.test_exec_output_cleaner_func = lambda x: x
 
@@ -141,6 +142,13 @@ class RepositoryManager(object):
         return self.test_exec_output_cleaner_func 
     #~ def get_test_exec_output_cleaner_func()
 
+    def has_test_exec_output_cleaner_func (self):
+        """ :return: whether a custom test execution output cleaner
+                    function is set
+        """
+        return self.has_output_cleaner
+    #~ def has_test_exec_output_cleaner_func()
+
     def should_build(self):
         return (self.code_builder_func is not None)
     #~ def should_build()
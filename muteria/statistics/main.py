@@ -18,8 +18,8 @@ import muteria.controller.explorer as fd_structure
 ERROR_HANDLER = common_mix.ErrorHandler
 
 def get_subsuming_elements(matrix_file):
-    mat = common_matrices.ExecutionMatrix(filename=matrix_file)
-    elem_to_tests = mat.query_active_columns_of_rows()
+    mat_view = common_matrices.ExecutionMatrix(filename=matrix_file).get_view()
+    elem_to_tests = mat_view.active_columns_of_rows()
     equiv, subs_clusters = stats_algo.getSubsumingMutants(\
                                         elem_to_tests, clustered=True)
     return equiv, subs_clusters
@@ -40,7 +40,8 @@ class StatsComputer(object):
 
     @staticmethod
     def merge_lexecoutput_into_right(lexecoutput_file, rexecoutput_file):
-        if not os.path.isfile(rexecoutput_file):
+        if common_matrices.OutputLogData.get_existing_store_file(\
+                                                rexecoutput_file) is None:
             shutil.copy2(lexecoutput_file, rexecoutput_file)
         else:
             lexecoutput = common_matrices.OutputLogData(\
@@ -62,15 +63,16 @@ class StatsComputer(object):
             if explorer.file_exists(fd_structure.CRITERIA_MATRIX[c]):
                 mat_file = explorer.get_existing_file_pathname(\
                                             fd_structure.CRITERIA_MATRIX[c])
-                mat = common_matrices.ExecutionMatrix(filename=mat_file)
-                row2collist = mat.query_active_columns_of_rows()
-                cov = len([k for k,v in row2collist.items() if len(v) > 0])
-                tot = len(row2collist)
+                # Load the matrix once and reduce its compact view
+                mat_view = common_matrices.ExecutionMatrix(\
+                                                filename=mat_file).get_view()
+                cov = int(mat_view.rows_with_active().sum())
+                tot = len(mat_view.get_row_keys())
                 coverages[c.get_str()] = 'n.a.' if tot == 0 else \
                                           '{:.2f}'.format(cov * 100.0 / tot)
                 total_to[c.get_str()] = tot
                 if number_of_testcases is None:
-                    number_of_testcases = len(mat.get_nonkey_colname_list())
+                    number_of_testcases = len(mat_view.get_col_names())
         
         # JSON
         out_json = {}
@@ -81,6 +83,25 @@ class StatsComputer(object):
         for c in coverages:
             out_json['CRITERIA'][c] = {'coverage': coverages[c], 
                                             '# test objectives': total_to[c]}
+
+        # Most expensive tests and criteria elements (execution costs)
+        cost_key = common_matrices.ExecutionCostData.CPU_TIME
+        if explorer.file_exists(fd_structure.PROGRAM_TESTEXECUTION_COST):
+            cost_data = common_matrices.ExecutionCostData(\
+                            filename=explorer.get_existing_file_pathname(\
+                                    fd_structure.PROGRAM_TESTEXECUTION_COST))
+            out_json['MOST EXPENSIVE TESTS (CPU s)'] = \
+                                cost_data.get_most_expensive(cost_key)
+        for c in config.ENABLED_CRITERIA.get_val():
+            if explorer.file_exists(fd_structure.CRITERIA_EXECUTION_COST[c]):
+                cost_data = common_matrices.ExecutionCostData(\
+                            filename=explorer.get_existing_file_pathname(\
+                                    fd_structure.CRITERIA_EXECUTION_COST[c]))
+                if c.get_str() in out_json['CRITERIA']:
+                    out_json['CRITERIA'][c.get_str()]\
+                                    ['most expensive elements (CPU s)'] = \
+                                        cost_data.get_most_expensive(\
+                                                cost_key, by_objective=True)
         common_fs.dumpJSON(out_json, explorer.get_file_pathname(\
                                         fd_structure.STATS_MAIN_FILE_JSON), \
                                      pretty=True)
@@ -1,30 +1,123 @@
+
 from __future__ import print_function
 
 import logging
 
+import numpy as np
+
 import muteria.statistics.algorithms as algorithms
 import muteria.common.matrices as common_matrices
 import muteria.common.mix as common_mix
 
 ERROR_HANDLER = common_mix.ErrorHandler
 
-def _filter_out_tests (all_tests, selected_tests, mutants_to_killing_tests):
-    """ Update mutants_to_killing_tests dict according to selected_tests
+def _load_matrix_view(matrix_file):
+    """ Load the matrix file and return its compact (NumPy) view
+    """
+    return common_matrices.ExecutionMatrix(filename=matrix_file).get_view()
+#~ def _load_matrix_view()
+
+def _get_selected_tests_mask(matrix_view, selected_tests):
+    """ Get the mask of the selected tests in the matrix view
+        (all tests if selected_tests is None)
     """
+    if selected_tests is None:
+        return matrix_view.get_cols_mask()
     ERROR_HANDLER.assert_true(type(selected_tests) in (list, tuple, set)\
                 and len(selected_tests) > 0, \
                 "misformed selected_tests ({})".format(selected_tests), \
                                                                 __file__)
-    selected_tests = set(selected_tests)
-    tests_diff = selected_tests - set(all_tests)
+    tests_diff = set(selected_tests) - set(matrix_view.get_col_names())
     ERROR_HANDLER.assert_true(len(tests_diff) == 0, \
             "Some specified tests are not in the matrix ({})".format(\
                                                 tests_diff), __file__)
-    
-    for mut, killtests in mutants_to_killing_tests.items():
-        mutants_to_killing_tests[mut] = \
-                                    list(set(killtests) & selected_tests)
-#~ def _filter_out_tests()
+    return matrix_view.get_cols_mask(selected_tests)
+#~ def _get_selected_tests_mask()
+
+def _ratio_dict(matrix_view, numerators, denominators, zero_denom_val):
+    """ Compute the per row (mutant) ratio numerators/denominators, using
+        zero_denom_val when the denominator is 0
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = np.where(denominators == 0, zero_denom_val, \
+                                    numerators * 1.0 / denominators)
+    return dict(zip(matrix_view.get_row_keys(), ratios.tolist()))
+#~ def _ratio_dict()
+
+def _get_fault_revealing_tests(expected_program_output_file, \
+                                                        program_output_file):
+    """ Get the set of tests whose program output differs from the
+        expected program output
+    """
+    prog_out = common_matrices.OutputLogData(filename=program_output_file)
+    exp_prog_out = common_matrices.OutputLogData(\
+                                        filename=expected_program_output_file)
+    prog_out.assert_compatible_fingerprint_mode(exp_prog_out)
+    _, prog_out_uniq = list(prog_out.get_zip_objective_and_data())[0]
+    _, exp_prog_out_uniq = list(exp_prog_out.get_zip_objective_and_data())[0]
+
+    if set(prog_out_uniq) != set(exp_prog_out_uniq):
+        logging.warning("Test mismatch between program output and expected!")
+    intersect = set(prog_out_uniq) & set(exp_prog_out_uniq)
+    fault_tests = set()
+    for elem in intersect:
+        ol_equiv = common_matrices.OutputLogData.outlogdata_equiv(\
+                                prog_out_uniq[elem], exp_prog_out_uniq[elem])
+        if not ol_equiv:
+            fault_tests.add(elem)
+    return fault_tests
+#~ def _get_fault_revealing_tests()
+
+def _compute_subsuming(sm_view, tests_mask, clustered):
+    mutants_to_killing_tests = sm_view.active_columns_of_rows(tests_mask)
+    return algorithms.getSubsumingMutants(mutants_to_killing_tests, \
+                                                        clustered=clustered)
+#~ def _compute_subsuming()
+
+def _compute_hard_to_kill(sm_view, tests_mask, threshold, sm_kill_counts):
+    # Mutants killed by no test get the ratio 1 (zero denominator)
+    killratio = _ratio_dict(sm_view, sm_kill_counts, \
+                        np.where(sm_kill_counts == 0, 0, tests_mask.sum()), 1)
+    return killratio, [mut for mut, h in killratio.items() if h <= threshold]
+#~ def _compute_hard_to_kill()
+
+def _compute_hard_to_propagate(sm_view, wm_view, tests_mask, threshold, \
+                                                            sm_kill_counts):
+    ERROR_HANDLER.assert_true(set(sm_view.get_row_keys()) == \
+                        set(wm_view.get_row_keys()), \
+                            "strong and weak mutant killing matrices "
+                            "have different mutants", __file__)
+    ERROR_HANDLER.assert_true(set(sm_view.get_col_names()) == \
+                        set(wm_view.get_col_names()), \
+                            "strong and weak mutant killing matrices "
+                            "have different tests", __file__)
+    # align the weak mutation matrix on the strong mutation matrix
+    wm_active = wm_view.get_active_array(sm_view.get_row_keys(), \
+                                                    sm_view.get_col_names())
+    wm_kill_counts = wm_active[:, tests_mask].sum(axis=1)
+    dualkillratio = _ratio_dict(sm_view, sm_kill_counts, wm_kill_counts, 1)
+    return dualkillratio, \
+                [mut for mut, h in dualkillratio.items() if h <= threshold]
+#~ def _compute_hard_to_propagate()
+
+def _compute_fault_revealing(sm_view, fault_tests, tests_mask, threshold, \
+                                                            sm_kill_counts):
+    # Fault tests not in the matrix are ignored
+    fault_mask = sm_view.get_cols_mask(\
+                            set(fault_tests) & set(sm_view.get_col_names()))
+    fr_kill_counts = sm_view.count_active_per_row(tests_mask & fault_mask)
+    # For equivalent mutants, the division is invalid, the value is -1
+    mutant_to_fr = _ratio_dict(sm_view, fr_kill_counts, sm_kill_counts, -1.0)
+    fault_revealing_set = \
+                    [mut for mut, fr in mutant_to_fr.items() if fr >= threshold]
+    return fault_revealing_set, mutant_to_fr
+#~ def _compute_fault_revealing()
+
+def _check_threshold(threshold):
+    ERROR_HANDLER.assert_true(threshold > 0 and threshold < 1, \
+                            "Invalid threshold, must be in interval (0,1)", \
+                                                                __file__)
+#~ def _check_threshold()
 
 def getSubsumingMutants (mutant_kill_matrix_file, clustered=True, \
                                                         selected_tests=None):
@@ -35,17 +128,9 @@ def getSubsumingMutants (mutant_kill_matrix_file, clustered=True, \
                     contain the mutants that are subsuming each others) or
                     list of all subsuming mutants.
     """
-    # load matrix
-    matrix = common_matrices.ExecutionMatrix(mutant_kill_matrix_file)
-
-    # get mutants_to_killing_tests
-    mutants_to_killing_tests = matrix.query_active_columns_of_rows()
-
-    if selected_tests is not None:
-        _filter_out_tests(matrix.get_nonkey_colname_list(), selected_tests, \
-                                                mutants_to_killing_tests)
-    return algorithms.getSubsumingMutants(mutants_to_killing_tests, \
-                                                        clustered=clustered)
+    sm_view = _load_matrix_view(mutant_kill_matrix_file)
+    tests_mask = _get_selected_tests_mask(sm_view, selected_tests)
+    return _compute_subsuming(sm_view, tests_mask, clustered)
 #~ def getSubsumingMutants ()
 
 def getHardToKillMutants (mutant_kill_matrix_file, threshold=0.025, \
@@ -53,84 +138,27 @@ def getHardToKillMutants (mutant_kill_matrix_file, threshold=0.025, \
     """ Return the pair of kill ratio and list of hard to kill mutant (kill by less than threshold
         proportion of test, 0 < threshold < 1 ).
     """
-
-    # check threshold
-    ERROR_HANDLER.assert_true(threshold > 0 and threshold < 1, \
-                            "Invalid threshold, must be in interval (0,1)", \
-                                                                __file__)
-
-    # load matrix
-    matrix = common_matrices.ExecutionMatrix(mutant_kill_matrix_file)
-
-    # get mutants_to_killing_tests
-    mutants_to_killing_tests = matrix.query_active_columns_of_rows()
-
-    all_tests = matrix.get_nonkey_colname_list()
-    if selected_tests is not None:
-        _filter_out_tests(all_tests, selected_tests, mutants_to_killing_tests)
-        all_tests = selected_tests
-    
-    killratio = {}
-    for mut, killtests in mutants_to_killing_tests.items():
-        if len(killtests) == 0:
-            killratio[mut] = 1
-        else:
-            killratio[mut] = len(killtests) * 1.0 / len(all_tests)
-
-    return killratio, [mut for mut, h in killratio.items() if h <= threshold]
+    _check_threshold(threshold)
+    sm_view = _load_matrix_view(mutant_kill_matrix_file)
+    tests_mask = _get_selected_tests_mask(sm_view, selected_tests)
+    return _compute_hard_to_kill(sm_view, tests_mask, threshold, \
+                                    sm_view.count_active_per_row(tests_mask))
 #~ def getHardToKillMutants ()
 
 def getHardToPropagateMutants (strong_mutant_kill_matrix_file, \
                                 weak_mutant_kill_matrix_file, \
                                 threshold=0.10, \
                                 selected_tests=None):
-    """ Return the pair of propagation ratio and list of hard to propagate mutant 
+    """ Return the pair of propagation ratio and list of hard to propagate mutant
         (strongly killed by less than threshold proportion of test
         that weakly kill them, 0 < threshold < 1 ).
     """
-
-    # check threshold
-    ERROR_HANDLER.assert_true(threshold > 0 and threshold < 1, \
-                            "Invalid threshold, must be in interval (0,1)", \
-                                                                __file__)
-
-    # load matrix
-    sm_matrix = \
-            common_matrices.ExecutionMatrix(strong_mutant_kill_matrix_file)
-    wm_matrix = \
-            common_matrices.ExecutionMatrix(weak_mutant_kill_matrix_file)
-
-    # get mutants_to_killing_tests
-    sm_mutants_to_killing_tests = sm_matrix.query_active_columns_of_rows()
-    wm_mutants_to_killing_tests = wm_matrix.query_active_columns_of_rows()
-
-    all_tests = sm_matrix.get_nonkey_colname_list()
-
-    ERROR_HANDLER.assert_true(set(sm_mutants_to_killing_tests) == \
-                        set(wm_mutants_to_killing_tests), \
-                            "strong and weak mutant killing matrices "
-                            "have different mutants", __file__)
-    ERROR_HANDLER.assert_true(set(all_tests) == \
-                        set(wm_matrix.get_nonkey_colname_list()), \
-                            "strong and weak mutant killing matrices "
-                            "have different tests", __file__)
-
-    if selected_tests is not None:
-        _filter_out_tests(all_tests, selected_tests, \
-                                                sm_mutants_to_killing_tests)
-        _filter_out_tests(all_tests, selected_tests, \
-                                                wm_mutants_to_killing_tests)
-        all_tests = selected_tests
-    
-    dualkillratio = {}
-    for mut, sm_killtests in sm_mutants_to_killing_tests.items():
-        wm_killtests = wm_mutants_to_killing_tests[mut]
-        if len(wm_killtests) == 0:
-            dualkillratio[mut] = 1
-        else:
-            dualkillratio[mut] = len(sm_killtests) * 1.0 / len(wm_killtests)
-
-    return dualkillratio, [mut for mut, h in dualkillratio.items() if h <= threshold]
+    _check_threshold(threshold)
+    sm_view = _load_matrix_view(strong_mutant_kill_matrix_file)
+    wm_view = _load_matrix_view(weak_mutant_kill_matrix_file)
+    tests_mask = _get_selected_tests_mask(sm_view, selected_tests)
+    return _compute_hard_to_propagate(sm_view, wm_view, tests_mask, \
+                    threshold, sm_view.count_active_per_row(tests_mask))
 #~ def getHardToPropagateMutants ()
 
 def getFaultRevealingMutants (strong_mutant_kill_matrix_file, \
@@ -140,62 +168,80 @@ def getFaultRevealingMutants (strong_mutant_kill_matrix_file, \
                                 selected_tests=None):
     """
     This function compute the set of fault revealing mutants.
-    
+
     The inputs are:
-    - mutant kill matrix file, 
+    - mutant kill matrix file,
     - expected program output file, Used to see which test fails
     - obtained program output file, Used to see which test fails
     - threshold, in case a relaxed fault revealing is looked for
     - selected tests, in case part of the tests should be used
-    
+
     :return: A pair is returned, with first element the set of fault revealing
             Mutants, and second element, a dict with key the mutants and values
-            the fault revelation ratio 
+            the fault revelation ratio
             ('# test kill and find fault' divided (/) '# test that kill')
-            For equivalent mutants, the division isinvalid, 
+            For equivalent mutants, the division isinvalid,
             we set the value to -1
     """
-    prog_out = common_matrices.OutputLogData(filename=program_output_file)
-    exp_prog_out = common_matrices.OutputLogData(\
-                                            filename=expected_program_output_file)
-    _, prog_out_uniq = list(prog_out.get_zip_objective_and_data())[0]
-    _, exp_prog_out_uniq = list(exp_prog_out.get_zip_objective_and_data())[0]
-    
-    if set(prog_out_uniq) != set(exp_prog_out_uniq):
-        logging.warning("Test mismatch between program output and expected!")
-    intersect = set(prog_out_uniq) & set(exp_prog_out_uniq)
-    fault_tests = set()
-    for elem in intersect:
-        ol_equiv = common_matrices.OutputLogData.outlogdata_equiv(\
-                                    prog_out_uniq[elem], exp_prog_out_uniq[elem])
-        if not ol_equiv:
-            ERROR_HANDLER.assert_true (elem not in fault_tests, \
-                                                        "duplicate test", __file__)
-            fault_tests.add(elem)
-            
-    # get mutant to killing test dict
-    kill_matrix = common_matrices.ExecutionMatrix(\
-                                          filename=strong_mutant_kill_matrix_file)
-    mut_to_killtests = kill_matrix.query_active_columns_of_rows()
-    
-    # remove unselected tests
-    if selected_tests is not None:
-        selected_tests = set(selected_tests)
-        for mut, tests in mut_to_kiltests.items():
-            mut_to_killtests[mut] = set(tests) & selected_tests
-    
-    mutant_to_fr = {}
-    mut, tests in mut_to_killtests.items():
-        kill_fr = len(tests & fault_tests)
-        kill_all = len(tests)
-        if kill_all > 0: 
-            # Killable
-            mutant_to_fr[mut] = -1.0
-        else:
-            mutant_to_fr[mut] = kill_fr * 1.0 / kill_all
-    
-    fault_revealing_set = \
-                    [mut for mut, fr in mutant_to_fr.items() if fr >= threshold]
-    
-    return fault_revealing_set, mutant_to_fr
+    fault_tests = _get_fault_revealing_tests(expected_program_output_file, \
+                                                        program_output_file)
+    sm_view = _load_matrix_view(strong_mutant_kill_matrix_file)
+    tests_mask = _get_selected_tests_mask(sm_view, selected_tests)
+    return _compute_fault_revealing(sm_view, fault_tests, tests_mask, \
+                    threshold, sm_view.count_active_per_row(tests_mask))
 #~ def getFaultRevealingMutants ()
+
+class MutantQualityIndicators(common_mix.EnumAutoName):
+    SUBSUMING_MUTANTS = "subsuming_mutants"
+    HARD_TO_KILL_MUTANTS = "hard_to_kill_mutants"
+    HARD_TO_PROPAGATE_MUTANTS = "hard_to_propagate_mutants"
+    FAULT_REVEALING_MUTANTS = "fault_revealing_mutants"
+#~ class MutantQualityIndicators
+
+def getAllMutantQualityIndicators (strong_mutant_kill_matrix_file, \
+                                weak_mutant_kill_matrix_file=None, \
+                                expected_program_output_file=None, \
+                                program_output_file=None, \
+                                selected_tests=None, \
+                                clustered=True, \
+                                hard_to_kill_threshold=0.025, \
+                                hard_to_propagate_threshold=0.10, \
+                                fault_revealing_threshold=1.0):
+    """ Compute all the mutant quality indicators in one pass, loading
+        each matrix only once and sharing the kill counts.
+        The indicators that need a missing file (weak mutation matrix or
+        program outputs) are not computed.
+
+        :return: dict with key the MutantQualityIndicators element and value
+                the result of the corresponding get<indicator> function
+                (getSubsumingMutants, getHardToKillMutants, ...)
+    """
+    _check_threshold(hard_to_kill_threshold)
+    _check_threshold(hard_to_propagate_threshold)
+
+    sm_view = _load_matrix_view(strong_mutant_kill_matrix_file)
+    tests_mask = _get_selected_tests_mask(sm_view, selected_tests)
+    sm_kill_counts = sm_view.count_active_per_row(tests_mask)
+
+    res = {}
+    res[MutantQualityIndicators.SUBSUMING_MUTANTS] = \
+                        _compute_subsuming(sm_view, tests_mask, clustered)
+    res[MutantQualityIndicators.HARD_TO_KILL_MUTANTS] = \
+                        _compute_hard_to_kill(sm_view, tests_mask, \
+                                    hard_to_kill_threshold, sm_kill_counts)
+    if weak_mutant_kill_matrix_file is not None:
+        wm_view = _load_matrix_view(weak_mutant_kill_matrix_file)
+        res[MutantQualityIndicators.HARD_TO_PROPAGATE_MUTANTS] = \
+                        _compute_hard_to_propagate(sm_view, wm_view, \
+                                    tests_mask, hard_to_propagate_threshold, \
+                                                            sm_kill_counts)
+    if expected_program_output_file is not None and \
+                                            program_output_file is not None:
+        fault_tests = _get_fault_revealing_tests(\
+                            expected_program_output_file, program_output_file)
+        res[MutantQualityIndicators.FAULT_REVEALING_MUTANTS] = \
+                        _compute_fault_revealing(sm_view, fault_tests, \
+                                    tests_mask, fault_revealing_threshold, \
+                                                            sm_kill_counts)
+    return res
+#~ def getAllMutantQualityIndicators ()
@@ -0,0 +1,548 @@
+
+""" The benchmark cases.
+
+Each benchmark case is a function taking a BenchmarkContext and returning
+a dict with the following keys:
+    - 'workload': dict describing the size of the workload
+    - 'timings': dict {metric name: list of measured times in seconds}
+    - 'throughput': (optional) dict {metric name: number per second}
+
+The cases are registered, in execution order, in BENCHMARK_CASES.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+import shutil
+import hashlib
+import collections
+
+import muteria.common.matrices as common_matrices
+import muteria.common.mix as common_mix
+import muteria.statistics.main as stats_main
+import muteria.statistics.mutant_quality_indicators as stats_mqi
+
+from muteria.drivers import DriversUtils
+from muteria.drivers.testgeneration.testcase_formats.ktest.ktest import \
+                                        KTestTestFormat, KTestReplaySession
+from muteria.drivers.testgeneration.testcase_formats.python_unittest import \
+                                                        python_unittest_runner
+
+import synthetic
+
+ERROR_HANDLER = common_mix.ErrorHandler
+
+# Parameters of the workload for each scale
+SCALES = {
+    'small': {
+        'matrix_rows': 500, 'matrix_cols': 100,
+        'outlog_objectives': 200, 'outlog_tests': 100,
+        'ktest_dirs': 2, 'ktests_per_dir': 100, 'ktest_replays': 50,
+        'project_functions': 5, 'project_tests': 10, 'project_mutants': 10,
+        'unittest_tests': 5,
+        'loop_iterations': 100, 'output_lines': 10,
+    },
+    'medium': {
+        'matrix_rows': 3000, 'matrix_cols': 300,
+        'outlog_objectives': 1000, 'outlog_tests': 300,
+        'ktest_dirs': 3, 'ktests_per_dir': 400, 'ktest_replays': 200,
+        'project_functions': 10, 'project_tests': 30, 'project_mutants': 40,
+        'unittest_tests': 20,
+        'loop_iterations': 1000, 'output_lines': 100,
+    },
+    'large': {
+        'matrix_rows': 20000, 'matrix_cols': 1000,
+        'outlog_objectives': 5000, 'outlog_tests': 1000,
+        'ktest_dirs': 4, 'ktests_per_dir': 2000, 'ktest_replays': 1000,
+        'project_functions': 20, 'project_tests': 100, 'project_mutants': 200,
+        'unittest_tests': 50,
+        'loop_iterations': 10000, 'output_lines': 1000,
+    },
+}
+
+class BenchmarkContext(object):
+    def __init__(self, workdir, scale, seed, repeat):
+        ERROR_HANDLER.assert_true(scale in SCALES, \
+                                "invalid scale {}".format(scale), __file__)
+        ERROR_HANDLER.assert_true(repeat >= 1, "repeat must be >= 1", __file__)
+        self.workdir = workdir
+        self.scale = scale
+        self.params = SCALES[scale]
+        self.seed = seed
+        self.repeat = repeat
+    #~ def __init__()
+
+    def get_case_dir(self, case_name):
+        """ Get a fresh directory for the benchmark case
+        """
+        d = os.path.join(self.workdir, case_name)
+        if os.path.isdir(d):
+            shutil.rmtree(d)
+        os.makedirs(d)
+        return d
+    #~ def get_case_dir()
+#~ class BenchmarkContext
+
+def measure(func, repeat, setup=None):
+    """ Execute func `repeat` times and return the list of elapsed times.
+        setup (if not None) is called before each execution and is not
+        measured. Its return value is passed to func.
+    """
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup is not None else None
+        start = time.perf_counter()
+        if setup is not None:
+            func(arg)
+        else:
+            func()
+        times.append(time.perf_counter() - start)
+    return times
+#~ def measure()
+
+################################################################
+########################## Matrices ############################
+################################################################
+
+def bench_matrix(ctx):
+    """ Load, query and merge an ExecutionMatrix
+    """
+    cdir = ctx.get_case_dir('matrix')
+    p = ctx.params
+    mat_file = os.path.join(cdir, 'matrix.csv')
+    rows, cols = synthetic.generate_matrix_file(mat_file, p['matrix_rows'], \
+                                                    p['matrix_cols'], ctx.seed)
+    # Second matrix for merge: new tests (columns) on the same rows
+    other_file = os.path.join(cdir, 'other_matrix.csv')
+    synthetic.generate_matrix_file(other_file, p['matrix_rows'], \
+                                p['matrix_cols'] // 4, ctx.seed + 1, \
+                                                        col_prefix="newtest")
+    timings = collections.OrderedDict()
+    timings['load'] = measure(\
+            lambda: common_matrices.ExecutionMatrix(filename=mat_file), \
+                                                                    ctx.repeat)
+    mat = common_matrices.ExecutionMatrix(filename=mat_file)
+    timings['query_active_columns_of_rows'] = measure(\
+                        lambda: mat.query_active_columns_of_rows(), ctx.repeat)
+    timings['query_active_rows_of_columns'] = measure(\
+                        lambda: mat.query_active_rows_of_columns(), ctx.repeat)
+    timings['query_uncertain_columns_of_rows'] = measure(\
+                    lambda: mat.query_uncertain_columns_of_rows(), ctx.repeat)
+    timings['serialize'] = measure(lambda: mat.serialize(), ctx.repeat)
+
+    def _setup_merge():
+        return (common_matrices.ExecutionMatrix(filename=other_file), \
+                            common_matrices.ExecutionMatrix(filename=mat_file))
+    def _merge(mats):
+        mats[1].update_with_other_matrix(mats[0], override_existing=True, \
+                                                            allow_missing=True)
+    timings['merge'] = measure(_merge, ctx.repeat, setup=_setup_merge)
+
+    return {
+        'workload': {'rows': len(rows), 'columns': len(cols), \
+                                            'merged_columns': len(cols) // 4},
+        'timings': timings,
+    }
+#~ def bench_matrix()
+
+def bench_outlog(ctx):
+    """ Load, merge and compare OutputLogData
+    """
+    cdir = ctx.get_case_dir('outlog')
+    p = ctx.params
+    objectives = [synthetic.make_mutant_name(i) \
+                                    for i in range(p['outlog_objectives'])]
+    tests = [synthetic.make_test_name(i) for i in range(p['outlog_tests'])]
+    outlog_file = os.path.join(cdir, 'outlog.json')
+    synthetic.generate_outlog_file(outlog_file, objectives, tests, ctx.seed)
+    other_file = os.path.join(cdir, 'other_outlog.json')
+    other_objectives = objectives[:len(objectives)//2] + \
+                        [o+"_new" for o in objectives[len(objectives)//2:]]
+    synthetic.generate_outlog_file(other_file, other_objectives, tests, \
+                                                                ctx.seed + 1)
+    timings = collections.OrderedDict()
+    timings['load'] = measure(\
+            lambda: common_matrices.OutputLogData(filename=outlog_file), \
+                                                                    ctx.repeat)
+    def _setup_merge():
+        return (common_matrices.OutputLogData(filename=other_file), \
+                            common_matrices.OutputLogData(filename=outlog_file))
+    def _merge(outlogs):
+        outlogs[1].update_with_other(outlogs[0], override_existing=True)
+    timings['merge'] = measure(_merge, ctx.repeat, setup=_setup_merge)
+
+    outlog = common_matrices.OutputLogData(filename=outlog_file)
+    timings['serialize'] = measure(lambda: outlog.serialize(), ctx.repeat)
+
+    data = dict(outlog.get_zip_objective_and_data())
+    ref = data[objectives[0]]
+    def _compare():
+        n_diff = 0
+        for o in objectives:
+            for t, t_dat in data[o].items():
+                if not common_matrices.OutputLogData.outlogdata_equiv(\
+                                                                t_dat, ref[t]):
+                    n_diff += 1
+        return n_diff
+    timings['compare_all'] = measure(_compare, ctx.repeat)
+
+    return {
+        'workload': {'objectives': len(objectives), 'tests': len(tests)},
+        'timings': timings,
+    }
+#~ def bench_outlog()
+
+def bench_matrix_cover_when_difference(ctx):
+    """ DriversUtils.update_matrix_to_cover_when_difference (used to
+        compute the strong mutation matrix from the outputs)
+    """
+    cdir = ctx.get_case_dir('cover_when_difference')
+    p = ctx.params
+    n_rows = p['outlog_objectives']
+    n_cols = p['outlog_tests']
+    target_mat = os.path.join(cdir, 'target.csv')
+    vector_mat = os.path.join(cdir, 'vector.csv')
+    rows, cols = synthetic.generate_matrix_file(target_mat, n_rows, n_cols, \
+                                                ctx.seed, active_ratio=0.0, \
+                                                        uncertain_ratio=0.0)
+    synthetic.generate_matrix_file(vector_mat, 1, n_cols, ctx.seed, \
+                                        active_ratio=0.1, uncertain_ratio=0.0,\
+                                                        row_prefix="program")
+    target_out = os.path.join(cdir, 'target.json')
+    vector_out = os.path.join(cdir, 'vector.json')
+    synthetic.generate_outlog_file(target_out, rows, cols, ctx.seed)
+    synthetic.generate_outlog_file(vector_out, ['program_000000'], cols, \
+                                                                    ctx.seed)
+    target_backup = target_mat + '.bak'
+    shutil.copy2(target_mat, target_backup)
+
+    def _setup():
+        shutil.copy2(target_backup, target_mat)
+    def _run(_):
+        DriversUtils.update_matrix_to_cover_when_difference(target_mat, \
+                                        target_out, vector_mat, vector_out)
+    timings = collections.OrderedDict()
+    timings['with_outlog'] = measure(_run, ctx.repeat, setup=_setup)
+
+    def _run_no_outlog(_):
+        DriversUtils.update_matrix_to_cover_when_difference(target_mat, \
+                                                    None, vector_mat, None)
+    timings['without_outlog'] = measure(_run_no_outlog, ctx.repeat, \
+                                                                setup=_setup)
+    return {
+        'workload': {'rows': n_rows, 'columns': n_cols},
+        'timings': timings,
+    }
+#~ def bench_matrix_cover_when_difference()
+
+################################################################
+########################## Statistics ##########################
+################################################################
+
+def bench_stats(ctx):
+    """ Statistics computation from a mutant kill matrix
+    """
+    cdir = ctx.get_case_dir('stats')
+    p = ctx.params
+    mat_file = os.path.join(cdir, 'matrix.csv')
+    # Subsumption is quadratic in the number of mutants, keep it bounded
+    n_rows = min(p['matrix_rows'], 3000)
+    synthetic.generate_matrix_file(mat_file, n_rows, p['matrix_cols'], \
+                                            ctx.seed, active_ratio=0.05)
+    timings = collections.OrderedDict()
+    def _coverage():
+        mat = common_matrices.ExecutionMatrix(filename=mat_file)
+        row2collist = mat.query_active_columns_of_rows()
+        return len([k for k, v in row2collist.items() if len(v) > 0])
+    timings['score'] = measure(_coverage, ctx.repeat)
+    timings['subsuming_mutants'] = measure(\
+                    lambda: stats_main.get_subsuming_elements(mat_file), \
+                                                                    ctx.repeat)
+    wm_file = os.path.join(cdir, 'wm_matrix.csv')
+    synthetic.generate_matrix_file(wm_file, n_rows, p['matrix_cols'], \
+                                            ctx.seed, active_ratio=0.2)
+    timings['mutant_quality_indicators'] = measure(\
+                lambda: stats_mqi.getAllMutantQualityIndicators(mat_file, \
+                            weak_mutant_kill_matrix_file=wm_file), ctx.repeat)
+    return {
+        'workload': {'mutants': n_rows, 'tests': p['matrix_cols']},
+        'timings': timings,
+    }
+#~ def bench_stats()
+
+################################################################
+########################### KTests #############################
+################################################################
+
+def bench_ktest_dedup(ctx):
+    """ Duplicate ktests detection across folders
+    """
+    cdir = ctx.get_case_dir('ktest_dedup')
+    p = ctx.params
+    bin_dir = synthetic.generate_fake_klee_bin_dir(\
+                                            os.path.join(cdir, 'klee_bin'))
+    dirs = synthetic.generate_ktests_dirs(os.path.join(cdir, 'ktests'), \
+                                p['ktest_dirs'], p['ktests_per_dir'], ctx.seed)
+    folder2alias = {d: "tool{}".format(i) for i, d in enumerate(dirs)}
+    res = {}
+    def _run():
+        res['kept'], res['dup'] = KTestTestFormat.cross_folder_fdupes(\
+                                                    bin_dir, dirs, folder2alias)
+    timings = collections.OrderedDict()
+    timings['cross_folder_fdupes'] = measure(_run, ctx.repeat)
+    n_ktests = p['ktest_dirs'] * p['ktests_per_dir']
+    return {
+        'workload': {'ktests': n_ktests, 'duplicates': len(res['dup'])},
+        'timings': timings,
+        'throughput': {'ktests_per_s': n_ktests / min(\
+                                            timings['cross_folder_fdupes'])},
+    }
+#~ def bench_ktest_dedup()
+
+def bench_ktest_replay(ctx):
+    """ Replay of ktests, one at a time and in a replay session
+    """
+    cdir = ctx.get_case_dir('ktest_replay')
+    p = ctx.params
+    bin_dir = synthetic.generate_fake_klee_bin_dir(\
+                                            os.path.join(cdir, 'klee_bin'))
+    ktests_dir = synthetic.generate_ktests_dirs(os.path.join(cdir, 'ktests'), \
+                                    1, p['ktest_replays'], ctx.seed)[0]
+    ktests = sorted(os.path.join(ktests_dir, kt) \
+                                            for kt in os.listdir(ktests_dir))
+    exe = os.path.join(cdir, 'prog')
+    with open(exe, 'w') as f:
+        f.write("#!/bin/sh\necho output\nexit 0\n")
+    os.chmod(exe, 0o755)
+
+    def _execute_test():
+        for kt in ktests:
+            KTestTestFormat.execute_test(exe, kt, None, timeout=10, \
+                                    collected_output=[], \
+                                    custom_replay_tool_binary_dir=bin_dir)
+
+    def _replay_session():
+        with KTestReplaySession(exe, \
+                            custom_replay_tool_binary_dir=bin_dir) as session:
+            for kt in ktests:
+                session.replay(kt, None, timeout=10, collected_output=[])
+
+    timings = collections.OrderedDict()
+    timings['execute_test'] = measure(_execute_test, ctx.repeat)
+    timings['replay_session'] = measure(_replay_session, ctx.repeat)
+    return {
+        'workload': {'ktests': len(ktests)},
+        'timings': timings,
+        'throughput': {'ktests_per_s': len(ktests) / min(\
+                                                    timings['execute_test']),
+                        'session_ktests_per_s': len(ktests) / min(\
+                                                timings['replay_session'])},
+    }
+#~ def bench_ktest_replay()
+
+################################################################
+###################### Tests Execution #########################
+################################################################
+
+def _exec_and_summarize(prog, args, cwd):
+    """ Execute a test and summarize its output the same way the test
+        case tools do (see BaseTestcaseTool._oracle_execute_a_test)
+    """
+    retcode, out, _ = DriversUtils.execute_and_get_retcode_out_err(\
+                                    prog=prog, args_list=args, cwd=cwd, \
+                                                    merge_err_to_out=True)
+    return {
+        common_matrices.OutputLogData.OUTLOG_LEN: len(out),
+        common_matrices.OutputLogData.OUTLOG_HASH: \
+                            hashlib.sha512(out.encode('utf-8')).hexdigest(),
+        common_matrices.OutputLogData.RETURN_CODE: retcode,
+        common_matrices.OutputLogData.TIMEDOUT: False,
+    }
+#~ def _exec_and_summarize()
+
+def _run_mutation_analysis(project, prepare_mutant, get_prog_args, \
+                                                    exec_dir, matrix_file):
+    """ Execute all the tests on the original and each mutant,
+        fill the strong mutation matrix.
+        :return: number of executed tests
+    """
+    test_names = [t for t, _ in project.tests]
+    prepare_mutant(None)
+    orig = {t: _exec_and_summarize(*get_prog_args(args), cwd=exec_dir) \
+                                                    for t, args in project.tests}
+    n_exec = len(project.tests)
+    matrix = common_matrices.ExecutionMatrix(filename=matrix_file, \
+                                                non_key_col_list=test_names)
+    active = matrix.getActiveCellDefaultVal()
+    inactive = matrix.getInactiveCellVal()
+    for mutant in project.mutants:
+        prepare_mutant(mutant)
+        row = {}
+        for t, args in project.tests:
+            dat = _exec_and_summarize(*get_prog_args(args), cwd=exec_dir)
+            row[t] = active if not common_matrices.OutputLogData.\
+                                outlogdata_equiv(dat, orig[t]) else inactive
+            n_exec += 1
+        matrix.add_row_by_key(mutant, row, serialize=False)
+    matrix.serialize()
+    return n_exec
+#~ def _run_mutation_analysis()
+
+def bench_python_mutation(ctx):
+    """ End to end mutation analysis of a synthetic python project
+        (execution of each test on each mutant, and matrix construction)
+    """
+    cdir = ctx.get_case_dir('python_mutation')
+    p = ctx.params
+    project = synthetic.generate_python_project(cdir, p['project_functions'],\
+                            p['project_tests'], p['project_mutants'], \
+                            ctx.seed, loop_iterations=p['loop_iterations'], \
+                                            output_lines=p['output_lines'])
+    exec_dir = os.path.join(cdir, 'exec')
+    matrix_file = os.path.join(cdir, 'SM.csv')
+    orig_src = os.path.join(project.repo_dir, project.source_file)
+
+    def _prepare_mutant(mutant):
+        if os.path.isdir(exec_dir) and mutant is None:
+            shutil.rmtree(exec_dir)
+        if not os.path.isdir(exec_dir):
+            shutil.copytree(project.repo_dir, exec_dir)
+        src = orig_src if mutant is None else \
+                            os.path.join(project.mutants_dir, mutant + '.py')
+        shutil.copy(src, os.path.join(exec_dir, project.source_file))
+    def _get_prog_args(args):
+        return sys.executable, ['main.py'] + args
+
+    res = {}
+    def _run():
+        if os.path.isfile(matrix_file):
+            os.remove(matrix_file)
+        res['n_exec'] = _run_mutation_analysis(project, _prepare_mutant, \
+                                    _get_prog_args, exec_dir, matrix_file)
+    timings = collections.OrderedDict()
+    timings['analysis'] = measure(_run, ctx.repeat)
+    best = min(timings['analysis'])
+    return {
+        'workload': {'mutants': len(project.mutants), \
+                                            'tests': len(project.tests)},
+        'timings': timings,
+        'throughput': {'mutants_per_s': len(project.mutants) / best, \
+                                        'tests_per_s': res['n_exec'] / best},
+    }
+#~ def bench_python_mutation()
+
+def bench_c_mutation(ctx):
+    """ End to end mutation analysis of a synthetic C project
+        (compilation of each mutant, execution of each test on each
+        mutant, and matrix construction)
+    """
+    compiler = shutil.which('gcc') or shutil.which('cc')
+    if compiler is None:
+        return None
+    cdir = ctx.get_case_dir('c_mutation')
+    p = ctx.params
+    project = synthetic.generate_c_project(cdir, p['project_functions'],\
+                            p['project_tests'], p['project_mutants'], \
+                            ctx.seed, loop_iterations=p['loop_iterations'], \
+                                            output_lines=p['output_lines'])
+    bin_dir = os.path.join(cdir, 'bin')
+    os.makedirs(bin_dir)
+    matrix_file = os.path.join(cdir, 'SM.csv')
+
+    def _exe_of(mutant):
+        return os.path.join(bin_dir, 'original' if mutant is None else mutant)
+    def _compile_all():
+        for mutant in [None] + project.mutants:
+            src = os.path.join(project.repo_dir, project.source_file) \
+                            if mutant is None else \
+                            os.path.join(project.mutants_dir, mutant + '.c')
+            retcode, out, _ = DriversUtils.execute_and_get_retcode_out_err(\
+                    prog=compiler, args_list=['-O0', '-o', _exe_of(mutant), \
+                                                                        src])
+            ERROR_HANDLER.assert_true(retcode == 0, \
+                                    "compilation failed: " + str(out), __file__)
+
+    current = {}
+    def _prepare_mutant(mutant):
+        current['exe'] = _exe_of(mutant)
+    def _get_prog_args(args):
+        return current['exe'], args
+
+    res = {}
+    def _run():
+        if os.path.isfile(matrix_file):
+            os.remove(matrix_file)
+        res['n_exec'] = _run_mutation_analysis(project, _prepare_mutant, \
+                                    _get_prog_args, bin_dir, matrix_file)
+    timings = collections.OrderedDict()
+    timings['compilation'] = measure(_compile_all, ctx.repeat)
+    timings['analysis'] = measure(_run, ctx.repeat)
+    best = min(timings['analysis'])
+    return {
+        'workload': {'mutants': len(project.mutants), \
+                                            'tests': len(project.tests)},
+        'timings': timings,
+        'throughput': {'mutants_per_s': len(project.mutants) / best, \
+                        'tests_per_s': res['n_exec'] / best, \
+                        'compiled_mutants_per_s': (len(project.mutants) + 1) \
+                                            / min(timings['compilation'])},
+    }
+#~ def bench_c_mutation()
+
+def bench_python_unittest(ctx):
+    """ Execution of python unittest dev tests through the runner used by
+        the custom dev tests (python_unittest_runner)
+    """
+    cdir = ctx.get_case_dir('python_unittest')
+    p = ctx.params
+    project = synthetic.generate_python_project(cdir, p['project_functions'],\
+                            p['unittest_tests'], 1, ctx.seed, \
+                            loop_iterations=p['loop_iterations'], \
+                                            output_lines=p['output_lines'])
+    test_files = []
+    for t, args in project.tests:
+        fname = t + '.py'
+        with open(os.path.join(project.repo_dir, fname), 'w') as f:
+            f.write("\n".join([
+                "import unittest",
+                "import lib",
+                "class Test(unittest.TestCase):",
+                "    def test_run(self):",
+                "        r = lib.{}({}, {})".format(*args),
+                "        for i in range({}):".format(p['output_lines']),
+                "            print('result', i, r)",
+                "        self.assertEqual(r, r)",
+            ]) + "\n")
+        test_files.append(fname)
+
+    verdicts = {}
+    def _run():
+        for tf in test_files:
+            verdicts[tf] = python_unittest_runner(tf, project.repo_dir, \
+                                                        None, None, None)
+    timings = collections.OrderedDict()
+    timings['run_all'] = measure(_run, ctx.repeat)
+    ERROR_HANDLER.assert_true(set(verdicts.values()) == \
+                            {common_mix.GlobalConstants.PASS_TEST_VERDICT}, \
+                            "synthetic unittests must pass", __file__)
+    return {
+        'workload': {'tests': len(test_files)},
+        'timings': timings,
+        'throughput': {'tests_per_s': len(test_files) / \
+                                                    min(timings['run_all'])},
+    }
+#~ def bench_python_unittest()
+
+BENCHMARK_CASES = collections.OrderedDict([
+    ('matrix', bench_matrix),
+    ('outlog', bench_outlog),
+    ('cover_when_difference', bench_matrix_cover_when_difference),
+    ('stats', bench_stats),
+    ('ktest_dedup', bench_ktest_dedup),
+    ('ktest_replay', bench_ktest_replay),
+    ('python_unittest', bench_python_unittest),
+    ('python_mutation', bench_python_mutation),
+    ('c_mutation', bench_c_mutation),
+])
@@ -0,0 +1,178 @@
+
+""" Run the benchmark suite and store the results as JSON.
+
+Usage:
+    python run.py [--scale small|medium|large] [--repeat N] [--seed S]
+                  [--only CASE [CASE ...]] [--output results.json]
+                  [--compare baseline.json] [--tolerance 0.2]
+
+When --compare is given, each timing (minimum over the repetitions) is
+compared with the baseline and the run fails (exit code 1) if any timing
+regressed by more than the tolerance.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+import shutil
+import platform
+import argparse
+import warnings
+import tempfile
+import subprocess
+import collections
+
+thisdir = os.path.dirname(os.path.abspath(__file__))
+m_root = os.path.dirname(os.path.dirname(thisdir))
+sys.path.insert(0, m_root)
+sys.path.insert(0, thisdir)
+
+import muteria.common.fs as common_fs
+
+import bench_cases
+
+# Keep the benchmark output readable (e.g. pandas deprecations)
+warnings.simplefilter('ignore', FutureWarning)
+
+RESULTS_FORMAT_VERSION = 1
+
+def get_git_revision():
+    try:
+        out = subprocess.check_output(['git', 'rev-parse', 'HEAD'], \
+                                    cwd=m_root, stderr=subprocess.DEVNULL)
+        return out.decode('utf-8').strip()
+    except (subprocess.CalledProcessError, OSError):
+        return None
+#~ def get_git_revision()
+
+def summarize(times):
+    s_times = sorted(times)
+    return collections.OrderedDict([
+        ('min', s_times[0]),
+        ('median', s_times[len(s_times) // 2]),
+        ('mean', sum(s_times) / len(s_times)),
+        ('max', s_times[-1]),
+        ('all', times),
+    ])
+#~ def summarize()
+
+def run_benchmarks(ctx, case_names):
+    results = collections.OrderedDict()
+    for name in case_names:
+        print("# Running benchmark case '{}' ...".format(name))
+        start = time.perf_counter()
+        res = bench_cases.BENCHMARK_CASES[name](ctx)
+        if res is None:
+            print("#   skipped (missing requirement)")
+            continue
+        res['timings'] = collections.OrderedDict(\
+                        (k, summarize(v)) for k, v in res['timings'].items())
+        res['wall_time'] = time.perf_counter() - start
+        results[name] = res
+        for metric, summary in res['timings'].items():
+            print("#   {}: {:.4f}s (min over {})".format(metric, \
+                                            summary['min'], len(summary['all'])))
+        for metric, val in res.get('throughput', {}).items():
+            print("#   {}: {:.2f}".format(metric, val))
+    return results
+#~ def run_benchmarks()
+
+def compare_results(current, baseline, tolerance):
+    """ Compare the min timings of the current results with the baseline.
+        :return: list of regressions (case, metric, baseline, current)
+    """
+    regressions = []
+    for name, res in current['results'].items():
+        if name not in baseline['results']:
+            continue
+        if res['workload'] != baseline['results'][name]['workload']:
+            print("# {}: workload differs from baseline, not compared"\
+                                                                .format(name))
+            continue
+        b_timings = baseline['results'][name]['timings']
+        for metric, summary in res['timings'].items():
+            if metric not in b_timings:
+                continue
+            b_min = b_timings[metric]['min']
+            c_min = summary['min']
+            ratio = c_min / b_min if b_min > 0 else float('inf')
+            print("# {}.{}: baseline {:.4f}s, current {:.4f}s (x{:.2f})"\
+                                .format(name, metric, b_min, c_min, ratio))
+            if ratio > 1.0 + tolerance:
+                regressions.append((name, metric, b_min, c_min))
+    return regressions
+#~ def compare_results()
+
+def main():
+    parser = argparse.ArgumentParser(description="muteria benchmark suite")
+    parser.add_argument('--scale', default='small', \
+                                    choices=list(bench_cases.SCALES.keys()))
+    parser.add_argument('--repeat', type=int, default=3, \
+                                        help="repetitions of each measure")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', nargs='+', default=None, \
+                                choices=list(bench_cases.BENCHMARK_CASES), \
+                                        help="benchmark cases to run")
+    parser.add_argument('--output', default=None, \
+                                        help="JSON file to store the results")
+    parser.add_argument('--compare', default=None, \
+                                    help="baseline JSON results to compare to")
+    parser.add_argument('--tolerance', type=float, default=0.2, \
+                            help="allowed relative slowdown when comparing")
+    parser.add_argument('--workdir', default=None, \
+                    help="directory for generated data (kept if specified)")
+    args = parser.parse_args()
+
+    case_names = args.only if args.only is not None else \
+                                        list(bench_cases.BENCHMARK_CASES)
+
+    if args.workdir is None:
+        workdir = tempfile.mkdtemp(suffix='.muteria.bench.tmp')
+    else:
+        workdir = os.path.abspath(args.workdir)
+        if not os.path.isdir(workdir):
+            os.makedirs(workdir)
+
+    ctx = bench_cases.BenchmarkContext(workdir, args.scale, args.seed, \
+                                                                args.repeat)
+    try:
+        results = run_benchmarks(ctx, case_names)
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir)
+
+    out = collections.OrderedDict([
+        ('format_version', RESULTS_FORMAT_VERSION),
+        ('meta', collections.OrderedDict([
+            ('git_revision', get_git_revision()),
+            ('date', time.strftime("%Y-%m-%dT%H:%M:%S")),
+            ('python', platform.python_version()),
+            ('platform', platform.platform()),
+            ('cpu_count', os.cpu_count()),
+            ('scale', args.scale),
+            ('repeat', args.repeat),
+            ('seed', args.seed),
+        ])),
+        ('results', results),
+    ])
+
+    if args.output is not None:
+        common_fs.dumpJSON(out, args.output, pretty=True)
+        print("# Results written to {}".format(args.output))
+
+    if args.compare is not None:
+        baseline = common_fs.loadJSON(args.compare)
+        regressions = compare_results(out, baseline, args.tolerance)
+        if len(regressions) > 0:
+            print("# REGRESSIONS (tolerance {:.0%}):".format(args.tolerance))
+            for name, metric, b_min, c_min in regressions:
+                print("#   {}.{}: {:.4f}s -> {:.4f}s".format(name, metric, \
+                                                                b_min, c_min))
+            return 1
+    return 0
+#~ def main()
+
+if __name__ == '__main__':
+    sys.exit(main())
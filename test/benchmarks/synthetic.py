@@ -0,0 +1,415 @@
+
+""" Generators of synthetic workloads used by the benchmark suite.
+
+All the generators are deterministic given the seed, so that two runs
+(on two different commits) measure exactly the same workload.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import stat
+import struct
+import random
+import hashlib
+
+import muteria.common.matrices as common_matrices
+import muteria.common.mix as common_mix
+
+ERROR_HANDLER = common_mix.ErrorHandler
+
+# Operators swapped to create the synthetic mutants (original, mutant)
+MUTATION_OPERATORS = [('+', '-'), ('-', '+'), ('*', '+'), ('<', '<='), \
+                                                    ('>', '>='), ('==', '!=')]
+
+def _rng(seed, *salt):
+    return random.Random("{}:{}".format(seed, ":".join(str(s) for s in salt)))
+#~ def _rng()
+
+def make_test_name(i):
+    return "test_{:06d}".format(i)
+#~ def make_test_name()
+
+def make_mutant_name(i):
+    return "mutant_{:06d}".format(i)
+#~ def make_mutant_name()
+
+def make_outlog_hash(rng):
+    return hashlib.sha512(str(rng.random()).encode('utf-8')).hexdigest()
+#~ def make_outlog_hash()
+
+################################################################
+################### Matrices and Output Logs ###################
+################################################################
+
+def generate_matrix_file(filename, n_rows, n_cols, seed, \
+                                    active_ratio=0.3, uncertain_ratio=0.01, \
+                                    row_prefix="mutant", col_prefix=None):
+    """ Write an ExecutionMatrix file with n_rows rows and n_cols columns.
+        The file is written directly (not through pandas) so that the
+        generation time does not depend on the matrix implementation.
+        :return: the pair (list of row keys, list of column names)
+    """
+    rng = _rng(seed, "matrix", filename)
+    rows = ["{}_{:06d}".format(row_prefix, i) for i in range(n_rows)]
+    if col_prefix is None:
+        cols = [make_test_name(j) for j in range(n_cols)]
+    else:
+        cols = ["{}_{:06d}".format(col_prefix, j) for j in range(n_cols)]
+    with open(filename, 'w') as f:
+        f.write(" ".join([common_matrices.DEFAULT_KEY_COLUMN_NAME]+cols)+"\n")
+        for r in rows:
+            vals = []
+            for _ in range(n_cols):
+                x = rng.random()
+                if x < uncertain_ratio:
+                    vals.append('-1')
+                elif x < uncertain_ratio + active_ratio:
+                    vals.append('1')
+                else:
+                    vals.append('0')
+            f.write(" ".join([r] + vals) + "\n")
+    return rows, cols
+#~ def generate_matrix_file()
+
+def generate_outlog_data(objectives, tests, seed, n_distinct_outputs=4, \
+                                                        timedout_ratio=0.01):
+    """ Generate the in memory data of an OutputLogData object.
+        Each test has a small number of distinct outputs, which is what
+        happens in practice (most mutants do not change the output).
+        :return: dict {objective: {test: outlog dict}}
+    """
+    rng = _rng(seed, "outlog")
+    test_outputs = {}
+    for t in tests:
+        test_outputs[t] = [{
+            common_matrices.OutputLogData.OUTLOG_LEN: rng.randint(0, 10000),
+            common_matrices.OutputLogData.OUTLOG_HASH: make_outlog_hash(rng),
+            common_matrices.OutputLogData.RETURN_CODE: rng.choice([0, 0, 1]),
+            common_matrices.OutputLogData.TIMEDOUT: False,
+        } for _ in range(n_distinct_outputs)]
+    data = {}
+    for o in objectives:
+        data[o] = {}
+        for t in tests:
+            # the first output is the original program's output
+            if rng.random() < 0.7:
+                dat = dict(test_outputs[t][0])
+            else:
+                dat = dict(rng.choice(test_outputs[t]))
+            if rng.random() < timedout_ratio:
+                dat[common_matrices.OutputLogData.TIMEDOUT] = True
+            data[o][t] = dat
+    return data
+#~ def generate_outlog_data()
+
+def generate_outlog_file(filename, objectives, tests, seed, **kwargs):
+    data = generate_outlog_data(objectives, tests, seed, **kwargs)
+    outlog = common_matrices.OutputLogData(filename=filename)
+    outlog.add_data(data, check_all=False, serialize=True)
+    return data
+#~ def generate_outlog_file()
+
+################################################################
+######################## KTest files ###########################
+################################################################
+
+# Minimal implementation of KLEE's `ktest-tool` module (only the part used
+# by muteria: KTest.fromfile). It is written in a fake KLEE binary directory
+# so that the ktest dedup can be measured without KLEE installed.
+KTEST_TOOL_SRC = '''#!/usr/bin/env python
+import struct
+
+class KTest:
+    @staticmethod
+    def fromfile(path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if data[:5] != b'KTEST' and data[:5] != b'BOUT\\n':
+            raise Exception('unrecognized file')
+        pos = [5]
+        def read(fmt):
+            v = struct.unpack_from(fmt, data, pos[0])
+            pos[0] += struct.calcsize(fmt)
+            return v
+        def read_str():
+            n, = read('>i')
+            s = data[pos[0]:pos[0]+n]
+            pos[0] += n
+            return s
+        version, = read('>i')
+        args = [read_str().decode('utf-8') for _ in range(read('>i')[0])]
+        symArgvs, symArgvLen = (0, 0)
+        if version >= 2:
+            symArgvs, symArgvLen = read('>ii')
+        objects = []
+        for _ in range(read('>i')[0]):
+            name = read_str()
+            objects.append((name, read_str()))
+        return KTest(version, args, symArgvs, symArgvLen, objects)
+
+    def __init__(self, version, args, symArgvs, symArgvLen, objects):
+        self.version = version
+        self.args = args
+        self.symArgvs = symArgvs
+        self.symArgvLen = symArgvLen
+        self.objects = objects
+'''
+
+def write_ktest_file(filename, args, objects, version=3):
+    """ Write a ktest file in the format of KLEE.
+        :param args: list of str, program arguments (first is the program)
+        :param objects: list of pairs (name bytes, data bytes)
+    """
+    def pack_str(s):
+        if not isinstance(s, bytes):
+            s = s.encode('utf-8')
+        return struct.pack('>i', len(s)) + s
+    buf = [b'KTEST', struct.pack('>i', version), struct.pack('>i', len(args))]
+    buf += [pack_str(a) for a in args]
+    buf.append(struct.pack('>ii', 0, 0))
+    buf.append(struct.pack('>i', len(objects)))
+    for name, dat in objects:
+        buf += [pack_str(name), pack_str(dat)]
+    with open(filename, 'wb') as f:
+        f.write(b''.join(buf))
+#~ def write_ktest_file()
+
+FAKE_KLEE_REPLAY_SRC = """#!/bin/sh
+if [ "$1" = "--help" ]; then
+    echo 'usage: klee-replay [--keep-replay-dir]'
+    exit 1
+fi
+"$1"
+echo "KLEE-REPLAY: NOTE: EXIT STATUS: ABNORMAL $? (0 seconds)"
+exit 0
+"""
+
+def generate_fake_klee_bin_dir(bin_dir):
+    """ Create a directory containing a `ktest-tool` and a `klee-replay`
+        (that runs the executable without arguments and reports its exit
+        status like klee-replay), usable as custom KLEE binary dir.
+    """
+    if not os.path.isdir(bin_dir):
+        os.makedirs(bin_dir)
+    with open(os.path.join(bin_dir, 'ktest-tool'), 'w') as f:
+        f.write(KTEST_TOOL_SRC)
+    replay = os.path.join(bin_dir, 'klee-replay')
+    with open(replay, 'w') as f:
+        f.write(FAKE_KLEE_REPLAY_SRC)
+    for fn in ('ktest-tool', 'klee-replay'):
+        fp = os.path.join(bin_dir, fn)
+        os.chmod(fp, os.stat(fp).st_mode | stat.S_IEXEC)
+    return bin_dir
+#~ def generate_fake_klee_bin_dir()
+
+def generate_ktests_dirs(top_dir, n_dirs, n_ktests_per_dir, seed, \
+                                            dup_ratio=0.3, n_objects=3, \
+                                            object_size=64):
+    """ Generate n_dirs directories of ktests with about dup_ratio of
+        the tests being duplicates of some other test (possibly in other
+        directories).
+        :return: the list of generated directories
+    """
+    rng = _rng(seed, "ktests")
+    dirs = []
+    uniques = []
+    for d in range(n_dirs):
+        kt_dir = os.path.join(top_dir, "klee-out-{}".format(d))
+        os.makedirs(kt_dir)
+        dirs.append(kt_dir)
+        for k in range(n_ktests_per_dir):
+            if len(uniques) > 0 and rng.random() < dup_ratio:
+                args, objects = rng.choice(uniques)
+            else:
+                args = ['prog.bc'] + ['--sym-arg', str(rng.randint(1, 10))]
+                objects = [(('obj{}'.format(o)).encode('utf-8'), \
+                                bytes(rng.getrandbits(8) \
+                                        for _ in range(object_size))) \
+                                                    for o in range(n_objects)]
+                uniques.append((args, objects))
+            write_ktest_file(os.path.join(kt_dir, \
+                                    "test{:06d}.ktest".format(k)), \
+                                                                args, objects)
+    return dirs
+#~ def generate_ktests_dirs()
+
+################################################################
+################## Python and C projects #######################
+################################################################
+
+def _gen_functions(rng, n_functions, loop_iterations, lang):
+    """ Return the list of (function name, list of body lines) where each
+        function computes an integer from two integers.
+        The loop controls the runtime.
+    """
+    funcs = []
+    for i in range(n_functions):
+        op1, _ = rng.choice(MUTATION_OPERATORS[:3])
+        cmp_op, _ = rng.choice(MUTATION_OPERATORS[3:])
+        name = "func_{}".format(i)
+        if lang == 'python':
+            body = [
+                "def {}(a, b):".format(name),
+                "    r = 0",
+                "    for i in range({}):".format(loop_iterations),
+                "        r = (r {} a) % 1000003".format(op1),
+                "    if a {} b:".format(cmp_op),
+                "        return r {} b".format(op1),
+                "    return r",
+            ]
+        else:
+            body = [
+                "long {}(long a, long b) {{".format(name),
+                "    long r = 0;",
+                "    for (long i = 0; i < {}; i++)".format(loop_iterations),
+                "        r = (r {} a) % 1000003;".format(op1),
+                "    if (a {} b)".format(cmp_op),
+                "        return r {} b;".format(op1),
+                "    return r;",
+                "}",
+            ]
+        funcs.append((name, body))
+    return funcs
+#~ def _gen_functions()
+
+def _gen_mutants(rng, source_lines, n_mutants):
+    """ Create mutants of the source by applying a mutation operator
+        on a random line that contains the operator.
+        :return: list of mutants sources (list of lines)
+    """
+    candidates = []
+    for l_num, line in enumerate(source_lines):
+        stripped = line.strip()
+        if stripped.startswith('def ') or stripped.startswith('long ') or \
+                                                        stripped.startswith('for'):
+            continue
+        for orig, repl in MUTATION_OPERATORS:
+            if ' {} '.format(orig) in line:
+                candidates.append((l_num, orig, repl))
+    ERROR_HANDLER.assert_true(len(candidates) > 0, \
+                                        "no mutation candidate", __file__)
+    mutants = []
+    for m in range(n_mutants):
+        l_num, orig, repl = candidates[m % len(candidates)]
+        mut = list(source_lines)
+        mut[l_num] = mut[l_num].replace(' {} '.format(orig), \
+                                                    ' {} '.format(repl), 1)
+        mutants.append(mut)
+    rng.shuffle(mutants)
+    return mutants
+#~ def _gen_mutants()
+
+class SyntheticProject(object):
+    """ A synthetic project with its tests and mutants on disk.
+        - `repo_dir` contains the original program
+        - `mutants_dir` contains a file per mutant, replacing `source_file`
+        - `tests` is a list of (test name, program args list). A test
+            fails on a mutant when its output differs from the original's
+    """
+    def __init__(self, language, repo_dir, source_file, mutants_dir, \
+                                                            tests, mutants):
+        self.language = language
+        self.repo_dir = repo_dir
+        self.source_file = source_file
+        self.mutants_dir = mutants_dir
+        self.tests = tests
+        self.mutants = mutants
+    #~ def __init__()
+#~ class SyntheticProject
+
+def generate_python_project(top_dir, n_functions, n_tests, n_mutants, seed, \
+                                        loop_iterations=100, output_lines=1):
+    """ Generate a python project with a `lib.py` module, a `main.py`
+        program and tests. Each mutant is a modified `lib.py`.
+        :param output_lines: controls the output size of each test
+    """
+    rng = _rng(seed, "python_project")
+    repo_dir = os.path.join(top_dir, "python_repo")
+    mutants_dir = os.path.join(top_dir, "python_mutants")
+    os.makedirs(repo_dir)
+    os.makedirs(mutants_dir)
+
+    funcs = _gen_functions(rng, n_functions, loop_iterations, 'python')
+    lib_lines = []
+    for _, body in funcs:
+        lib_lines += body + [""]
+    with open(os.path.join(repo_dir, "lib.py"), 'w') as f:
+        f.write("\n".join(lib_lines) + "\n")
+    with open(os.path.join(repo_dir, "main.py"), 'w') as f:
+        f.write("\n".join([
+            "import sys",
+            "import lib",
+            "fn, a, b = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])",
+            "res = getattr(lib, fn)(a, b)",
+            "for i in range({}):".format(output_lines),
+            "    print('result', i, res)",
+        ]) + "\n")
+
+    tests = _gen_tests(rng, funcs, n_tests)
+
+    mutants = []
+    for m, mut in enumerate(_gen_mutants(rng, lib_lines, n_mutants)):
+        name = make_mutant_name(m)
+        with open(os.path.join(mutants_dir, name + ".py"), 'w') as f:
+            f.write("\n".join(mut) + "\n")
+        mutants.append(name)
+    return SyntheticProject('python', repo_dir, "lib.py", mutants_dir, \
+                                                                tests, mutants)
+#~ def generate_python_project()
+
+def generate_c_project(top_dir, n_functions, n_tests, n_mutants, seed, \
+                                        loop_iterations=100, output_lines=1):
+    """ Generate a C project with a single `main.c` file.
+        Each mutant is a modified `main.c`.
+    """
+    rng = _rng(seed, "c_project")
+    repo_dir = os.path.join(top_dir, "c_repo")
+    mutants_dir = os.path.join(top_dir, "c_mutants")
+    os.makedirs(repo_dir)
+    os.makedirs(mutants_dir)
+
+    funcs = _gen_functions(rng, n_functions, loop_iterations, 'c')
+    src_lines = ["#include <stdio.h>", "#include <stdlib.h>", \
+                                                    "#include <string.h>", ""]
+    for _, body in funcs:
+        src_lines += body + [""]
+    src_lines += [
+        "int main(int argc, char **argv) {",
+        "    long a, b, res = 0;",
+        "    if (argc != 4) return 2;",
+        "    a = atol(argv[2]); b = atol(argv[3]);",
+    ]
+    for name, _ in funcs:
+        src_lines.append('    if (strcmp(argv[1], "{0}") == 0) '
+                                            'res = {0}(a, b);'.format(name))
+    src_lines += [
+        "    for (int i = 0; i < {}; i++)".format(output_lines),
+        '        printf("result %d %ld\\n", i, res);',
+        "    return 0;",
+        "}",
+    ]
+    with open(os.path.join(repo_dir, "main.c"), 'w') as f:
+        f.write("\n".join(src_lines) + "\n")
+
+    tests = _gen_tests(rng, funcs, n_tests)
+
+    mutants = []
+    for m, mut in enumerate(_gen_mutants(rng, src_lines, n_mutants)):
+        name = make_mutant_name(m)
+        with open(os.path.join(mutants_dir, name + ".c"), 'w') as f:
+            f.write("\n".join(mut) + "\n")
+        mutants.append(name)
+    return SyntheticProject('c', repo_dir, "main.c", mutants_dir, \
+                                                                tests, mutants)
+#~ def generate_c_project()
+
+def _gen_tests(rng, funcs, n_tests):
+    tests = []
+    for t in range(n_tests):
+        name, _ = funcs[t % len(funcs)]
+        tests.append((make_test_name(t), \
+                    [name, str(rng.randint(-50, 50)), str(rng.randint(-50, 50))]))
+    return tests
+#~ def _gen_tests()
@@ -3,6 +3,7 @@ import os, sys
 import shutil
 import tempfile
 import filecmp
+import threading
 import json
 import pandas as pd
 
@@ -45,6 +46,25 @@ class Test_JSON_CSV(unittest.TestCase):
         self.assertEqual(res, exp)
         os.remove(jfilename)
 
+    def test_dumpJSON_atomic_threads(self):
+        jfilename = os.path.join(self._worktmpdir, "jsontmp_atomic.json")
+        def dump(i):
+            for _ in range(20):
+                common_fs.dumpJSON({"x": [i] * 1000}, jfilename, atomic=True)
+        threads = [threading.Thread(target=dump, args=(i,)) \
+                                                            for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # the file is a complete dump, and no temporary file is left
+        res = common_fs.loadJSON(jfilename)
+        self.assertTrue(res["x"] in [[i] * 1000 for i in range(4)])
+        self.assertEqual([f for f in os.listdir(self._worktmpdir) \
+                            if f.startswith("jsontmp_atomic.json")], \
+                                                    ["jsontmp_atomic.json"])
+        os.remove(jfilename)
+
     def test_loadCSV(self):
         cfilename = os.path.join(self._worktmpdir, "csvtmp.csv")
         exp = pd.DataFrame({'x':[1,3], 'y':[2,4]})
@@ -190,6 +210,290 @@ class Test_Compress_Decompress(unittest.TestCase):
             if os.path.isfile(f):
                 os.remove(f)
         
+    def test_indexed_archive(self):
+        archive = os.path.join(self._worktmpdir, "tartmpdir.iar")
+        out_dir = os.path.join(self._worktmpdir, "iar_out")
+        os.mkdir(out_dir)
+
+        res = common_fs.IndexedArchive.compressDir(self.targetd, \
+                                            out_archive_pathname=archive)
+        self.assertEqual(res, None)
+        self.assertTrue(os.path.isdir(self.targetd))
+        self.assertTrue(common_fs.IndexedArchive.is_archive_file(archive))
+        self.assertFalse(common_fs.IndexedArchive.is_archive_file(\
+                                os.path.join(self.targetd, "first1")))
+
+        self.assertEqual(common_fs.IndexedArchive.list_members(archive), \
+                        ['tartmpdir', 'tartmpdir/first1', 'tartmpdir/first2', \
+                            'tartmpdir/secondd', 'tartmpdir/secondd/deepfile'])
+        self.assertEqual(common_fs.IndexedArchive.read_member(archive, \
+                                'tartmpdir/secondd/deepfile'), b"deepfile\n")
+
+        # Append in place (new and replaced members)
+        added = os.path.join(self._worktmpdir, "added")
+        with open(added, 'w') as fp:
+            fp.write("added\n")
+        res = common_fs.IndexedArchive.addToArchive(archive, added, \
+                                        in_archive_name='tartmpdir/added')
+        self.assertEqual(res, None)
+        res = common_fs.IndexedArchive.addToArchive(archive, added, \
+                                        in_archive_name='tartmpdir/first2')
+        self.assertEqual(res, None)
+        self.assertEqual(common_fs.IndexedArchive.read_member(archive, \
+                                                'tartmpdir/first2'), b"added\n")
+        self.assertEqual(common_fs.IndexedArchive.read_member(archive, \
+                                                'tartmpdir/added'), b"added\n")
+
+        res = common_fs.IndexedArchive.extractFromArchive(archive, \
+                        'tartmpdir/secondd', out_location=out_dir, \
+                                                            is_folder=True)
+        self.assertEqual(res, None)
+        self.assertEqual(os.listdir(os.path.join(out_dir, 'tartmpdir')), \
+                                                                ['secondd'])
+        self.assertNotEqual(common_fs.IndexedArchive.extractFromArchive(\
+                                    archive, 'tartmpdir/missing', out_dir), None)
+
+        res = common_fs.IndexedArchive.decompressDir(archive, out_dir)
+        self.assertEqual(res, None)
+        dcmp = filecmp.dircmp(self.targetd, os.path.join(out_dir, 'tartmpdir'))
+        self.assertEqual(dcmp.left_only, [])
+        self.assertEqual(dcmp.right_only, ['added'])
+        self.assertEqual(dcmp.diff_files, ['first2'])
+        self.assertEqual(os.path.getmtime(os.path.join(self.targetd, 'first1')),\
+                    os.path.getmtime(os.path.join(out_dir, 'tartmpdir', 'first1')))
+
+        shutil.rmtree(out_dir)
+        for f in [archive, added]:
+            os.remove(f)
+
+    def test_indexed_archive_writer(self):
+        archive = os.path.join(self._worktmpdir, "written.iar")
+        with common_fs.IndexedArchive.Writer(archive) as writer:
+            writer.add(os.path.join(self.targetd, "first1"), "w/first1")
+            writer.add(os.path.join(self.targetd, "secondd"), "w/secondd")
+        # reopen to append and replace
+        with common_fs.IndexedArchive.Writer(archive) as writer:
+            writer.add(os.path.join(self.targetd, "first2"), "w/first1")
+        self.assertEqual(common_fs.IndexedArchive.list_members(archive), \
+                            ['w/secondd', 'w/secondd/deepfile', 'w/first1'])
+        self.assertEqual(common_fs.IndexedArchive.read_member(archive, \
+                                                    'w/first1'), b"first2\n")
+        os.remove(archive)
+
+    def test_indexed_archive_migrate_targz(self):
+        import tarfile
+        targz = os.path.join(self._worktmpdir, "tartmpdir.tar.gz")
+        with tarfile.open(targz, "w:gz") as tar:
+            tar.add(self.targetd, arcname='tartmpdir')
+        archive = common_fs.IndexedArchive.get_archive_migrating_targz(targz)
+        self.assertEqual(archive, os.path.join(self._worktmpdir, \
+                                                            "tartmpdir.iar"))
+        self.assertTrue(os.path.isfile(targz))
+        self.assertEqual(sorted(common_fs.IndexedArchive.list_members(\
+                                                                    archive)), \
+                        ['tartmpdir', 'tartmpdir/first1', 'tartmpdir/first2', \
+                            'tartmpdir/secondd', 'tartmpdir/secondd/deepfile'])
+        self.assertEqual(common_fs.IndexedArchive.read_member(archive, \
+                                            'tartmpdir/first1'), b"first1\n")
+        # Not migrated again when up to date
+        mtime = os.path.getmtime(archive)
+        self.assertEqual(archive, \
+                common_fs.IndexedArchive.get_archive_migrating_targz(targz))
+        self.assertEqual(mtime, os.path.getmtime(archive))
+        for f in [archive, targz]:
+            os.remove(f)
+
+    def test_indexed_archive_codecs(self):
+        import struct, zlib, tarfile
+        src = os.path.join(self._worktmpdir, "similar")
+        os.mkdir(src)
+        content = b"".join(bytes([i % 251]) * 3 for i in range(2000))
+        for i in range(20):
+            with open(os.path.join(src, "f"+str(i)), 'wb') as fp:
+                fp.write(content + str(i).encode())
+        for codec in common_fs.ArchiveCodec:
+            if not codec.is_available():
+                continue
+            archive = os.path.join(self._worktmpdir, "similar.iar")
+            with common_fs.IndexedArchive.Writer(archive, codec=codec) as w:
+                w.add(src, "similar")
+            with open(archive, 'rb') as fp:
+                index, _ = common_fs.IndexedArchive._read_index(fp)
+            self.assertEqual(index['codec'], codec.get_field_value())
+            # dictionary trained on the similar files
+            self.assertIsNotNone(index['dictionary'])
+            self.assertEqual(common_fs.IndexedArchive.read_member(archive, \
+                            "similar/f7"), content + b"7")
+            # appended members use the archive's codec and dictionary
+            res = common_fs.IndexedArchive.addToArchive(archive, \
+                            os.path.join(src, "f3"), in_archive_name="f3")
+            self.assertEqual(res, None)
+            self.assertEqual(common_fs.IndexedArchive.read_member(archive, \
+                                                    "f3"), content + b"3")
+            # removal in place, compacted when mostly removed data
+            for i in range(12):
+                res = common_fs.IndexedArchive.removeFromArchive(archive, \
+                                                    "similar/f"+str(i))
+                self.assertEqual(res, None)
+            self.assertNotEqual(common_fs.IndexedArchive.removeFromArchive(\
+                                        archive, "similar/f0"), None)
+            self.assertEqual(len(common_fs.IndexedArchive.list_members(\
+                                                            archive)), 10)
+            self.assertEqual(common_fs.IndexedArchive.read_member(archive, \
+                            "similar/f15"), content + b"15")
+            os.remove(archive)
+        shutil.rmtree(src)
+
+        # Archive of the former format (zlib members, no dictionary)
+        archive = os.path.join(self._worktmpdir, "v1.iar")
+        data = zlib.compress(b"v1 data")
+        index = zlib.compress(json.dumps({"m": ["file", 8, len(data), 7, \
+                                            0o100644, 0, None]}).encode())
+        with open(archive, 'wb') as fp:
+            fp.write(b"MUTIARC1" + data + index + struct.pack("<QQ8s", \
+                                8 + len(data), len(index), b"MUTIARC1"))
+        self.assertTrue(common_fs.IndexedArchive.is_archive_file(archive))
+        self.assertEqual(common_fs.IndexedArchive.read_member(archive, "m"), \
+                                                                b"v1 data")
+        with common_fs.IndexedArchive.Writer(archive) as writer:
+            writer.add(os.path.join(self.targetd, "first1"), "n")
+        self.assertEqual(common_fs.IndexedArchive.read_member(archive, "m"), \
+                                                                b"v1 data")
+        self.assertEqual(common_fs.IndexedArchive.read_member(archive, "n"), \
+                                                                b"first1\n")
+        with open(archive, 'rb') as fp:
+            self.assertEqual(fp.read(8), common_fs.IndexedArchive.MAGIC)
+        os.remove(archive)
+
+        # tar.gz outputs are read directly
+        targz = os.path.join(self._worktmpdir, "read.tar.gz")
+        out_dir = os.path.join(self._worktmpdir, "targz_out")
+        os.mkdir(out_dir)
+        with tarfile.open(targz, "w:gz") as tar:
+            tar.add(self.targetd, arcname='tartmpdir')
+        self.assertEqual(common_fs.IndexedArchive.read_member(targz, \
+                                    'tartmpdir/secondd/deepfile'), b"deepfile\n")
+        res = common_fs.IndexedArchive.extractFromArchive(targz, \
+                        'tartmpdir/secondd', out_location=out_dir, \
+                                                            is_folder=True)
+        self.assertEqual(res, None)
+        self.assertEqual(os.listdir(os.path.join(out_dir, 'tartmpdir')), \
+                                                                ['secondd'])
+        shutil.rmtree(out_dir)
+        os.remove(targz)
+
+    def test_indexed_archive_codec_per_writer(self):
+        zlib_archive = os.path.join(self._worktmpdir, "zlib.iar")
+        default_archive = os.path.join(self._worktmpdir, "default.iar")
+        res = common_fs.IndexedArchive.compressDir(self.targetd, \
+                            zlib_archive, codec=common_fs.ArchiveCodec.ZLIB)
+        self.assertEqual(res, None)
+        res = common_fs.IndexedArchive.compressDir(self.targetd, \
+                                                            default_archive)
+        self.assertEqual(res, None)
+        for archive, codec in ((zlib_archive, common_fs.ArchiveCodec.ZLIB), \
+                (default_archive, common_fs.ArchiveCodec.get_best_available())):
+            with open(archive, 'rb') as fp:
+                index, _ = common_fs.IndexedArchive._read_index(fp)
+            self.assertEqual(index['codec'], codec.get_field_value())
+            os.remove(archive)
+
+    def test_indexed_archive_interrupted_modification(self):
+        archive = os.path.join(self._worktmpdir, "interrupted.iar")
+        res = common_fs.IndexedArchive.compressDir(self.targetd, archive)
+        self.assertEqual(res, None)
+        size = os.path.getsize(archive)
+        members = common_fs.IndexedArchive.list_members(archive)
+
+        # Interrupted before the trailer (garbage containing the magic)
+        writer = common_fs.IndexedArchive.Writer(archive)
+        writer.add(os.path.join(self.targetd, "first2"), "new")
+        writer.fp.write(b"partial index" + common_fs.IndexedArchive.MAGIC \
+                                                                + b"tail")
+        writer.fp.close()
+        writer.fp = None
+        self.assertGreater(os.path.getsize(archive), size)
+        # searched by small chunks (a magic across two chunks)
+        chunk_bytes = common_fs.IndexedArchive._SCAN_CHUNK_BYTES
+        common_fs.IndexedArchive._SCAN_CHUNK_BYTES = 5
+        try:
+            self.assertTrue(common_fs.IndexedArchive.is_archive_file(archive))
+            self.assertEqual(common_fs.IndexedArchive.list_members(archive), \
+                                                                    members)
+        finally:
+            common_fs.IndexedArchive._SCAN_CHUNK_BYTES = chunk_bytes
+        self.assertEqual(common_fs.IndexedArchive.read_member(archive, \
+                            'tartmpdir/secondd/deepfile'), b"deepfile\n")
+        # The next modification drops the interrupted one's data
+        res = common_fs.IndexedArchive.addToArchive(archive, \
+                        os.path.join(self.targetd, "first1"), \
+                                                    in_archive_name="new")
+        self.assertEqual(res, None)
+        self.assertEqual(common_fs.IndexedArchive.read_member(archive, \
+                                                        'new'), b"first1\n")
+        with open(archive, 'rb') as fp:
+            self.assertEqual(common_fs.IndexedArchive._find_trailer(fp)[3], \
+                                                    os.path.getsize(archive))
+
+        # Discarded on exception, for an existing or new archive
+        size = os.path.getsize(archive)
+        new_archive = os.path.join(self._worktmpdir, "new.iar")
+        for pathname in (archive, new_archive):
+            with self.assertRaises(RuntimeError):
+                with common_fs.IndexedArchive.Writer(pathname) as writer:
+                    writer.add(os.path.join(self.targetd, "first2"), "other")
+                    raise RuntimeError("interrupted")
+        self.assertEqual(os.path.getsize(archive), size)
+        self.assertNotIn('other', common_fs.IndexedArchive.list_members(\
+                                                                    archive))
+        self.assertFalse(os.path.exists(new_archive))
+        self.assertFalse(os.path.exists(new_archive + '.tmp'))
+        os.remove(archive)
+
+    def test_train_dictionary_without_trainer(self):
+        codec = common_fs.ArchiveCodec.ZLIB
+        samples = [b"a" * 50, b"bc" * 10, b"d" * 5, b"e" * 20, b""]
+        # end of the concatenation from the largest to the smallest
+        self.assertEqual(codec.train_dictionary(samples, 28), \
+                                        b"cbc" + b"e" * 20 + b"d" * 5)
+        self.assertEqual(codec.train_dictionary(samples, 1000), \
+                    b"a" * 50 + b"bc" * 10 + b"e" * 20 + b"d" * 5)
+        self.assertIsNone(codec.train_dictionary([b"", b""], 10))
+
+    def test_indexed_archive_concurrent_writer(self):
+        import threading
+        archive = os.path.join(self._worktmpdir, "concurrent.iar")
+        writer = common_fs.IndexedArchive.Writer(archive)
+        def add(i):
+            writer.add(os.path.join(self.targetd, "secondd"), "d"+str(i))
+        threads = [threading.Thread(target=add, args=(i,)) for i in range(40)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        writer.close()
+        self.assertEqual(len(common_fs.IndexedArchive.list_members(archive)), \
+                                                                            80)
+        for i in range(40):
+            self.assertEqual(common_fs.IndexedArchive.read_member(archive, \
+                                "d{}/deepfile".format(i)), b"deepfile\n")
+        os.remove(archive)
+
+    def test_remove_duplicate_files(self):
+        dup_dir = os.path.join(self._worktmpdir, "dupdir")
+        shutil.copytree(self.targetd, dup_dir)
+        shutil.copy(os.path.join(dup_dir, "first1"), \
+                                    os.path.join(dup_dir, "secondd", "dup1"))
+        shutil.copy(os.path.join(dup_dir, "first1"), \
+                                    os.path.join(dup_dir, "a_dup1"))
+        removed = common_fs.remove_duplicate_files(dup_dir)
+        self.assertEqual(sorted(removed), sorted([\
+                                    os.path.join(dup_dir, "first1"), \
+                                    os.path.join(dup_dir, "secondd", "dup1")]))
+        self.assertTrue(os.path.isfile(os.path.join(dup_dir, "a_dup1")))
+        self.assertTrue(os.path.isfile(os.path.join(dup_dir, "first2")))
+        shutil.rmtree(dup_dir)
+
 def load_tests(loader, tests, ignore):
     """ Doc tests discovery (doctest discovered by unittest)
     """
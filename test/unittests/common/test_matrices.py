@@ -1,8 +1,12 @@
 from __future__ import print_function
 
+import io
 import os
 import sys
+import json
+import struct
 import shutil
+import hashlib
 import unittest
 from unittest.mock import patch
 import doctest
@@ -70,6 +74,472 @@ class Test_Matrices(unittest.TestCase):
 
         # TODO: add scenario with loading error (wrong col list...)
 
+    def test_view(self):
+        cols = ['a', 'b', 'c', 'd']
+        mat = common_matrices.ExecutionMatrix(filename=self.filename,\
+                                                        non_key_col_list=cols)
+        mat.add_row_by_key('k1', [1, 0, -1, 1])
+        mat.add_row_by_key('k2', [0, 0, 0, -1])
+        mat.add_row_by_key('k3', [0, 1, 1, 1])
+        view = mat.get_view()
+
+        self.assertEqual(view.get_row_keys(), ['k1', 'k2', 'k3'])
+        self.assertEqual(view.get_col_names(), cols)
+        self.assertEqual(list(view.count_active_per_row()), [2, 0, 3])
+        self.assertEqual(list(view.count_active_per_col()), [1, 1, 1, 2])
+        self.assertEqual(list(view.rows_with_active()), [True, False, True])
+        self.assertEqual(list(view.rows_with_uncertain()), \
+                                                        [True, True, False])
+
+        self.assertEqual(view.active_columns_of_rows(), \
+                                        mat.query_active_columns_of_rows())
+        self.assertEqual(view.active_rows_of_columns(), \
+                                        mat.query_active_rows_of_columns())
+
+        cols_mask = view.get_cols_mask(['a', 'b'])
+        self.assertEqual(list(view.count_active_per_row(cols_mask)), \
+                                                                    [1, 0, 1])
+        self.assertEqual(view.active_columns_of_rows(cols_mask), \
+                                    {'k1': ['a'], 'k2': [], 'k3': ['b']})
+        rows_mask = view.get_rows_mask(['k2', 'k3'])
+        self.assertEqual(list(view.count_active_per_col(rows_mask)), \
+                                                                [0, 1, 1, 1])
+        self.assertEqual(view.get_active_array(['k3', 'k1'], ['d', 'a'])\
+                                            .tolist(), [[1, 0], [1, 1]])
+
+        # empty matrix
+        empty_view = common_matrices.ExecutionMatrix(\
+                                        non_key_col_list=cols).get_view()
+        self.assertEqual(empty_view.active.shape, (0, len(cols)))
+        self.assertEqual(empty_view.active_columns_of_rows(), {})
+
+class Test_OutputLogData(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._worktmpdir = tempfile.mkdtemp(suffix=TMP_DIR_SUFFIX)
+        cls.filename = os.path.join(cls._worktmpdir, "outlog.tmp.json")
+        cls.other_filename = os.path.join(cls._worktmpdir, "outlog2.tmp.json")
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls._worktmpdir)
+    
+    def setUp(self):
+        for f in (self.filename, self.other_filename):
+            if os.path.isfile(f):
+                os.remove(f)
+
+    @staticmethod
+    def _dat(o_len, o_hash, retcode, timedout=False):
+        return {
+            common_matrices.OutputLogData.OUTLOG_LEN: o_len,
+            common_matrices.OutputLogData.OUTLOG_HASH: o_hash,
+            common_matrices.OutputLogData.RETURN_CODE: retcode,
+            common_matrices.OutputLogData.TIMEDOUT: timedout,
+        }
+
+    def test_serialize(self):
+        data = {
+            'program': {
+                't1': self._dat(10, 'h1', 0),
+                't2': self._dat(3, 'h2', 1, timedout=True),
+                't3': dict(common_matrices.OutputLogData.\
+                                                    UNCERTAIN_TEST_OUTLOGDATA),
+            },
+            'm1': {'t1': self._dat(10, 'h1', 0), 't3': self._dat(0, 7, -9)},
+            'm2': {},
+        }
+        outlog = common_matrices.OutputLogData(filename=self.filename)
+        self.assertTrue(outlog.is_empty())
+        outlog.add_data(data, serialize=True)
+        with open(self.filename, 'rb') as fp:
+            self.assertEqual(\
+                    fp.read(len(common_matrices.OutputLogData.FILE_MAGIC)), \
+                                    common_matrices.OutputLogData.FILE_MAGIC)
+
+        loaded = common_matrices.OutputLogData(filename=self.filename)
+        self.assertEqual(set(loaded.get_objectives()), set(data))
+        # The objectives are loaded lazily
+        self.assertTrue(all(v is None for v in loaded._objectives.values()))
+        self.assertEqual(loaded.get_objective_data('m1'), data['m1'])
+        self.assertIsNone(loaded._objectives['program'])
+        self.assertEqual(loaded.data, data)
+
+        # Serialize with objectives not loaded
+        loaded = common_matrices.OutputLogData(filename=self.filename)
+        loaded.add_data({'m3': {'t2': self._dat(1, 'h3', 2)}}, serialize=True)
+        data['m3'] = {'t2': self._dat(1, 'h3', 2)}
+        loaded = common_matrices.OutputLogData(filename=self.filename)
+        self.assertEqual(dict(loaded.get_zip_objective_and_data()), data)
+
+    def test_legacy_json(self):
+        data = {'program': {'t1': self._dat(10, 'h1', 0), \
+                            't2': self._dat(None, None, None, None)}}
+        with open(self.filename, 'w') as fp:
+            json.dump(data, fp)
+        outlog = common_matrices.OutputLogData(filename=self.filename)
+        self.assertEqual(outlog.data, data)
+        # migrated to the binary format
+        outlog.serialize()
+        outlog = common_matrices.OutputLogData(filename=self.filename)
+        self.assertIsNone(outlog._objectives['program'])
+        self.assertEqual(outlog.data, data)
+
+    def test_binary_tables(self):
+        sha512 = hashlib.sha512(b'x').hexdigest()
+        hashes = [2**64 - 1, 2**127 + 5, 0, -3, sha512, 'AB', '', \
+                                                    'out\u00e9\\x00put']
+        data = {'o{}'.format(i): {'t1': self._dat(i, h, 0), \
+                                  't2': self._dat(1, hashes[0], 1)} \
+                                            for i, h in enumerate(hashes)}
+        outlog = common_matrices.OutputLogData(filename=self.filename)
+        outlog.add_data(data, serialize=True)
+
+        loaded = common_matrices.OutputLogData(filename=self.filename)
+        self.assertEqual(set(loaded.get_objectives()), set(data))
+        # The element and hash tables are not read when opening
+        self.assertIsNotNone(loaded._hashes._encoded_loader)
+        self.assertIsNotNone(loaded._elems._encoded_loader)
+        # Only the accessed hashes are decoded
+        self.assertEqual(loaded.get_objective_data('o4'), data['o4'])
+        undecoded = common_matrices._InternTable._UNDECODED
+        self.assertEqual([h for h in loaded._hashes._values \
+                            if h is not undecoded], [hashes[0], sha512])
+        # The values and their types are kept
+        self.assertEqual(loaded.data, data)
+        self.assertEqual([type(h) for h in loaded._hashes], \
+                                                [type(h) for h in hashes])
+
+        # The integers and digests are stored in binary
+        table = common_matrices._InternTable(hashes[:5])
+        buf = io.BytesIO()
+        self.assertEqual(table.write(buf), 8 + 16 + 8 + 8 + 64)
+        self.assertEqual(len(buf.getvalue()), \
+                    common_matrices._InternTable.get_encoded_size(5, 104))
+
+        # Extending a table read from a file
+        loaded = common_matrices.OutputLogData(filename=self.filename)
+        loaded.add_data({'o1': {'t3': self._dat(1, 'new', 0)}}, \
+                                                                serialize=True)
+        data['o1']['t3'] = self._dat(1, 'new', 0)
+        self.assertEqual(common_matrices.OutputLogData(\
+                                        filename=self.filename).data, data)
+
+    def test_former_binary_format(self):
+        """ Files with the JSON header are loaded and migrated
+        """
+        data = {'o1': {'t1': self._dat(3, 7, 0), \
+                        't2': self._dat(None, None, None, None)}}
+        outlog = common_matrices.OutputLogData()
+        outlog.add_data(data)
+        records = outlog._objectives['o1']
+        header = json.dumps({
+                'dtype': common_matrices.OutputLogData._RECORDS_DTYPE.descr,
+                'elements': list(outlog._elems),
+                'hashes': list(outlog._hashes),
+                'objectives': [['o1', 0, len(records)]],
+                'fingerprint_mode': 'blake2b_64'}).encode('utf-8')
+        with open(self.filename, 'wb') as fp:
+            fp.write(common_matrices.OutputLogData.LEGACY_FILE_MAGIC)
+            fp.write(struct.pack('<Q', len(header)))
+            fp.write(header)
+            fp.write(records.tobytes())
+        outlog = common_matrices.OutputLogData(filename=self.filename)
+        self.assertEqual(outlog.get_fingerprint_mode(), 'blake2b_64')
+        self.assertEqual(outlog.data, data)
+        outlog.serialize()
+        with open(self.filename, 'rb') as fp:
+            self.assertEqual(\
+                    fp.read(len(common_matrices.OutputLogData.FILE_MAGIC)), \
+                                    common_matrices.OutputLogData.FILE_MAGIC)
+        outlog = common_matrices.OutputLogData(filename=self.filename)
+        self.assertEqual(outlog.get_fingerprint_mode(), 'blake2b_64')
+        self.assertEqual(outlog.data, data)
+
+    def test_legacy_file_name(self):
+        data = {'program': {'t1': self._dat(10, 'h1', 0)}}
+        legacy = os.path.join(self._worktmpdir, 'program_output.json')
+        with open(legacy, 'w') as fp:
+            json.dump(data, fp)
+        filename = os.path.join(self._worktmpdir, 'program_output' + \
+                                common_matrices.OutputLogData.FILE_EXTENSION)
+        self.assertEqual(common_matrices.OutputLogData\
+                                .get_existing_store_file(filename), legacy)
+        outlog = common_matrices.OutputLogData(filename=filename)
+        self.assertEqual(outlog.data, data)
+        outlog.serialize()
+        self.assertTrue(os.path.isfile(filename))
+        outlog = common_matrices.OutputLogData(filename=filename)
+        self.assertEqual(outlog.data, data)
+
+    def test_fingerprint_mode(self):
+        outlog = common_matrices.OutputLogData(filename=self.filename)
+        self.assertIsNone(outlog.get_fingerprint_mode())
+        outlog.set_fingerprint_mode('blake2b_64')
+        outlog.add_data({'o1': {'t1': self._dat(1, 'a', 0)}}, serialize=True)
+        outlog = common_matrices.OutputLogData(filename=self.filename)
+        self.assertEqual(outlog.get_fingerprint_mode(), 'blake2b_64')
+        outlog.set_fingerprint_mode('blake2b_64')
+        # unknown mode
+        outlog.set_fingerprint_mode(None)
+
+        other = common_matrices.OutputLogData(filename=self.other_filename)
+        other.set_fingerprint_mode('sha512')
+        other.add_data({'o2': {'t1': self._dat(1, 'b', 0)}}, serialize=True)
+        with patch('muteria.common.mix.ErrorHandler.error_exit', \
+                                            side_effect=RuntimeError) as err:
+            self.assertRaises(RuntimeError, outlog.set_fingerprint_mode, \
+                                                                    'sha512')
+            self.assertRaises(RuntimeError, outlog.update_with_other, other)
+            merger = common_matrices.MatricesStreamMerger()
+            self.assertRaises(RuntimeError, merger.merge_outlogs, \
+                            [(self.filename, None), \
+                                (self.other_filename, None)], \
+                            os.path.join(self._worktmpdir, 'merged.mutolog'))
+        merger.merge_outlogs([(self.filename, None)], \
+                            os.path.join(self._worktmpdir, 'merged.mutolog'))
+        self.assertEqual(common_matrices.OutputLogData(filename=os.path.join(\
+                        self._worktmpdir, 'merged.mutolog'))\
+                                    .get_fingerprint_mode(), 'blake2b_64')
+
+    def test_update_with_other(self):
+        outlog = common_matrices.OutputLogData(filename=self.filename)
+        outlog.add_data({'o1': {'t1': self._dat(1, 'a', 0), \
+                                't2': self._dat(2, 'b', 0)}}, serialize=True)
+        other = common_matrices.OutputLogData(filename=self.other_filename)
+        other.add_data({'o1': {'t2': self._dat(5, 'c', 1), \
+                                't3': self._dat(2, 'b', 0)}, \
+                        'o2': {'t4': self._dat(None, None, None, None)}}, \
+                                                                serialize=True)
+
+        outlog = common_matrices.OutputLogData(filename=self.filename)
+        other = common_matrices.OutputLogData(filename=self.other_filename)
+        with patch('muteria.common.mix.ErrorHandler.error_exit', \
+                                            side_effect=RuntimeError) as err:
+            self.assertRaises(RuntimeError, outlog.update_with_other, other)
+            err.assert_called_once()
+        self.assertEqual(outlog.get_objective_data('o1'), \
+                                    {'t1': self._dat(1, 'a', 0), \
+                                     't2': self._dat(2, 'b', 0)})
+
+        outlog.update_with_other(other, override_existing=True, \
+                                                                serialize=True)
+        expected = {'o1': {'t1': self._dat(1, 'a', 0), \
+                            't2': self._dat(5, 'c', 1), \
+                            't3': self._dat(2, 'b', 0)}, \
+                    'o2': {'t4': self._dat(None, None, None, None)}}
+        self.assertEqual(outlog.data, expected)
+        self.assertEqual(\
+                common_matrices.OutputLogData(filename=self.filename).data, \
+                                                                    expected)
+        # The hashes are deduplicated
+        self.assertEqual(len(outlog._hashes), 3)
+
+class Test_MatricesStreamMerger(unittest.TestCase):
+    def setUp(self):
+        self._worktmpdir = tempfile.mkdtemp(suffix=TMP_DIR_SUFFIX)
+
+    def tearDown(self):
+        shutil.rmtree(self._worktmpdir)
+
+    def _path(self, name):
+        return os.path.join(self._worktmpdir, name)
+
+    def test_merge_matrices(self):
+        cols = ['t1', 't2', 't3']
+        m1 = common_matrices.ExecutionMatrix(filename=self._path('m1.csv'), \
+                                                    non_key_col_list=cols)
+        for pos in range(25):
+            m1.add_row_by_key(str(pos), [pos % 2, 0, -1], serialize=False)
+        m1.serialize()
+        # other column order
+        m2 = common_matrices.ExecutionMatrix(filename=self._path('m2.csv'), \
+                                        non_key_col_list=['t3', 't1', 't2'])
+        m2.add_row_by_key('1', [1, 0, 0])
+        out = common_matrices.ExecutionMatrix(\
+                        filename=self._path('out.csv'), non_key_col_list=cols)
+        out.add_row_by_key('x', [1, 1, 1])
+
+        merger = common_matrices.MatricesStreamMerger(memory_ceiling_mb=0.001)
+        # very small chunks and spills
+        self.assertEqual(merger.get_chunk_rows(len(cols) + 1), 2)
+        merger.merge_matrices([(self._path('out.csv'), None), \
+                            (self._path('m1.csv'), lambda k: 'a:' + k), \
+                            (self._path('m2.csv'), lambda k: 'b:' + k)], \
+                                self._path('out.csv'), non_key_col_list=cols)
+        merged = common_matrices.ExecutionMatrix(filename=self._path('out.csv'))
+        self.assertEqual(merged.get_nonkey_colname_list(), cols)
+        self.assertEqual(list(merged.get_keys()), ['x'] + \
+                            ['a:' + str(p) for p in range(25)] + ['b:1'])
+        self.assertEqual(merged._get_key_values_dict(['a:3', 'b:1']), \
+                                {'a:3': {'t1': 1, 't2': 0, 't3': -1}, \
+                                 'b:1': {'t1': 0, 't2': 0, 't3': 1}})
+        self.assertEqual(sorted(os.listdir(self._worktmpdir)), \
+                                            ['m1.csv', 'm2.csv', 'out.csv'])
+
+        # Merging again (e.g. on resume) gives the same result
+        with open(self._path('out.csv')) as fp:
+            first_merge = fp.read()
+        merger.merge_matrices([(self._path('out.csv'), None), \
+                            (self._path('m1.csv'), lambda k: 'a:' + k), \
+                            (self._path('m2.csv'), lambda k: 'b:' + k)], \
+                                self._path('out.csv'), non_key_col_list=cols)
+        with open(self._path('out.csv')) as fp:
+            self.assertEqual(fp.read(), first_merge)
+
+        # The keys of the other sources must be unique
+        with patch('muteria.common.mix.ErrorHandler.error_exit', \
+                                            side_effect=RuntimeError) as err:
+            self.assertRaises(RuntimeError, merger.merge_matrices, \
+                            [(self._path('m1.csv'), None), \
+                            (self._path('m2.csv'), None)], \
+                                self._path('x.csv'), non_key_col_list=cols)
+            err.assert_called_once()
+        os.remove(self._path('x.csv.merge.tmp'))
+
+        # Empty merge
+        merger.merge_matrices([], self._path('empty.csv'), \
+                                                    non_key_col_list=cols)
+        empty = common_matrices.ExecutionMatrix(\
+                                            filename=self._path('empty.csv'))
+        self.assertTrue(empty.is_empty())
+        self.assertEqual(empty.get_nonkey_colname_list(), cols)
+
+    def test_merge_outlogs(self):
+        dat = Test_OutputLogData._dat
+        o1 = common_matrices.OutputLogData(filename=self._path('o1.bin'))
+        o1.add_data({str(pos): {'t1': dat(pos, 'h' + str(pos % 3), 0), \
+                                't2': dat(1, 'h0', 1, timedout=True)} \
+                                    for pos in range(20)}, serialize=True)
+        # legacy JSON
+        o2_data = {'1': {'t3': dat(None, None, None, None)}}
+        with open(self._path('o2.json'), 'w') as fp:
+            json.dump(o2_data, fp)
+        out = common_matrices.OutputLogData(filename=self._path('out.bin'))
+        out.add_data({'program': {'t1': dat(4, 'hp', 0)}}, serialize=True)
+
+        merger = common_matrices.MatricesStreamMerger(memory_ceiling_mb=0.0001)
+        merger.merge_outlogs([(self._path('out.bin'), None), \
+                            (self._path('o1.bin'), lambda k: 'a:' + k), \
+                            (self._path('o2.json'), lambda k: 'b:' + k), \
+                            (self._path('missing.bin'), None)], \
+                                                        self._path('out.bin'))
+        expected = {'a:' + o: d for o, d in \
+                    common_matrices.OutputLogData(\
+                                    filename=self._path('o1.bin')).data.items()}
+        expected['b:1'] = o2_data['1']
+        expected['program'] = {'t1': dat(4, 'hp', 0)}
+        merged = common_matrices.OutputLogData(filename=self._path('out.bin'))
+        self.assertEqual(merged.data, expected)
+        self.assertEqual(len(merged._hashes), 4)
+        self.assertFalse(os.path.isfile(self._path('out.bin.merge.spill')))
+
+        # Merging again (e.g. on resume) gives the same result
+        merger.merge_outlogs([(self._path('out.bin'), None), \
+                            (self._path('o1.bin'), lambda k: 'a:' + k), \
+                            (self._path('o2.json'), lambda k: 'b:' + k)], \
+                                                        self._path('out.bin'))
+        self.assertEqual(common_matrices.OutputLogData(\
+                            filename=self._path('out.bin')).data, expected)
+
+        # The objectives must be unique
+        with patch('muteria.common.mix.ErrorHandler.error_exit', \
+                                            side_effect=RuntimeError) as err:
+            self.assertRaises(RuntimeError, merger.merge_outlogs, \
+                                    [(self._path('o1.bin'), None), \
+                                     (self._path('o1.bin'), None)], \
+                                                        self._path('x.bin'))
+            err.assert_called_once()
+
+    def test_merge_outlogs_hash_tables(self):
+        """ The hash tables are streamed by chunks from the sources, 
+            without decoding, and only the used hashes are merged
+        """
+        dat = Test_OutputLogData._dat
+        intern_table = common_matrices._InternTable
+        o1 = common_matrices.OutputLogData(filename=self._path('o1.bin'))
+        o1.add_data({str(pos): {'t1': dat(pos, pos % 5, 0), \
+                                't2': dat(1, None, None)} \
+                                    for pos in range(20)}, serialize=True)
+        o2 = common_matrices.OutputLogData(filename=self._path('o2.bin'))
+        o2.add_data({'x': {'t1': dat(1, 3, 0), 't3': dat(2, 7, 0)}}, \
+                                                                serialize=True)
+        out = common_matrices.OutputLogData(filename=self._path('out.bin'))
+        # 'a:0' is replaced by o1's, its hash 100 is dropped
+        out.add_data({'program': {'t1': dat(4, 9, 0)}, \
+                            'a:0': {'t1': dat(4, 100, 0)}}, serialize=True)
+        sources = [(self._path('out.bin'), None), \
+                            (self._path('o1.bin'), lambda k: 'a:' + k), \
+                            (self._path('o2.bin'), lambda k: 'b:' + k)]
+        expected = {'a:' + o: d for o, d in o1.data.items()}
+        expected['b:x'] = o2.data['x']
+        expected['program'] = {'t1': dat(4, 9, 0)}
+
+        decode_value = intern_table.decode_value
+        decoded_kinds = []
+        def _decode_value(kind, data):
+            decoded_kinds.append(kind)
+            return decode_value(kind, data)
+        merger = common_matrices.MatricesStreamMerger(memory_ceiling_mb=0.0001)
+        for _ in range(2):
+            with patch.object(intern_table, 'CHUNK_COUNT', 2), \
+                        patch.object(intern_table, 'decode_value', \
+                                                    side_effect=_decode_value):
+                merger.merge_outlogs(sources, self._path('out.bin'))
+            self.assertNotIn(intern_table.KIND_INT, decoded_kinds)
+            merged = common_matrices.OutputLogData(\
+                                                filename=self._path('out.bin'))
+            self.assertEqual(merged.data, expected)
+            # 9, 0-4 and 3, 7 (not deduplicated across the sources)
+            self.assertEqual(sorted(merged._hashes), [0, 1, 2, 3, 3, 4, 7, 9])
+
+class Test_ExecutionCostData(unittest.TestCase):
+    def setUp(self):
+        self._worktmpdir = tempfile.mkdtemp(suffix=TMP_DIR_SUFFIX)
+
+    def tearDown(self):
+        shutil.rmtree(self._worktmpdir)
+
+    def test_cost_data(self):
+        make = common_matrices.ExecutionCostData.make_cost
+        filename = os.path.join(self._worktmpdir, 'cost.json')
+        cdat = common_matrices.ExecutionCostData(filename=filename)
+        self.assertTrue(cdat.is_empty())
+        cdat.add_data({'1': {'t1': make(1.0, 0.5, 100, 0), \
+                             't2': make(2.0, 1.5, 300, 4)}, \
+                       '2': {'t1': make(0.5, 0.2, 200, 0)}}, serialize=True)
+
+        other = common_matrices.ExecutionCostData()
+        other.add_data({'1': {'t3': make(3.0, None, None, None)}})
+        loaded = common_matrices.ExecutionCostData(filename=filename)
+        loaded.update_with_other(other, key_transform=lambda k: 'x:'+k)
+        self.assertEqual(sorted(loaded.get_objectives()), ['1', '2', 'x:1'])
+
+        cpu = common_matrices.ExecutionCostData.CPU_TIME
+        self.assertEqual(loaded.get_most_expensive(cpu), \
+                                                    [('t2', 1.5), ('t1', 0.7)])
+        self.assertEqual(loaded.get_most_expensive(cpu, count=1, \
+                                            by_objective=True), [('1', 2.0)])
+
+        matfile = os.path.join(self._worktmpdir, 'rss.csv')
+        mat = loaded.get_cost_matrix(common_matrices.ExecutionCostData.MAX_RSS,\
+                                    non_key_col_list=['t1', 't2', 't3'], \
+                                                            filename=matfile)
+        expected = {'1': {'t1': 100, 't2': 300, 't3': -1}, \
+                    '2': {'t1': 200, 't2': -1, 't3': -1}, \
+                    'x:1': {'t1': -1, 't2': -1, 't3': -1}}
+        self.assertEqual(mat._get_key_values_dict(), expected)
+        reloaded = common_matrices.RawExecutionMatrix(filename=matfile, \
+                                                            cell_dtype=float)
+        self.assertEqual(reloaded._get_key_values_dict(), expected)
+
+        # Overlap is not allowed without override_existing
+        with patch('muteria.common.mix.ErrorHandler.error_exit', \
+                                            side_effect=RuntimeError) as err:
+            self.assertRaises(RuntimeError, loaded.add_data, \
+                                        {'2': {'t1': make(1.0, 1.0, 1, 1)}})
+            err.assert_called_once()
+
 def load_tests(loader, tests, ignore):
     """ Doc tests discovery (doctest discovered by unittest)
     """
@@ -86,5 +556,8 @@ if __name__ == '__main__':
     doc_testsuite = unittest.TestSuite()
     doc_testsuite.addTest(doctest.DocTestSuite(common_matrices))
 
+    testsuite_outlog = unittest.TestLoader().loadTestsFromTestCase(\
+                                                        Test_OutputLogData)
     unittest.TextTestRunner(verbosity=verbosity).run(testsuite_matrices)
+    unittest.TextTestRunner(verbosity=verbosity).run(testsuite_outlog)
     unittest.TextTestRunner(verbosity=verbosity).run(doc_testsuite)
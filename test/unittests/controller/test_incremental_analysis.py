@@ -0,0 +1,269 @@
+from __future__ import print_function
+import os, sys
+import shutil
+import tempfile
+
+import unittest
+
+import muteria.common.fs as common_fs
+import muteria.common.matrices as common_matrices
+import muteria.controller.explorer as fd_structure
+from muteria.controller.incremental_analysis import IncrementalAnalysis
+from muteria.drivers.criteria import TestCriteria as Criteria
+from muteria.drivers.criteria.criteria_info import MutantsInfoObject
+
+TMP_DIR_SUFFIX = '.muteria.test.tmp'
+
+OutputLogData = common_matrices.OutputLogData
+
+OLD_A = ['int f(int x) {', '  int y = x;', '  if (y > 0)', '    y = 1;', \
+                '  return y;', '}', 'int g() {', '  return 2;', '}']
+# line 4 changed, a comment inserted after line 3
+NEW_A = ['int f(int x) {', '  int y = x;', '  if (y > 0)', '    // set', \
+                '    y = 3;', '  return y;', '}', 'int g() {', '  return 2;', \
+                                                                        '}']
+B = ['int h() { return 0; }']
+
+def _outlog_dat(o_hash):
+    return {OutputLogData.OUTLOG_LEN: 1, OutputLogData.OUTLOG_HASH: o_hash, \
+                                    OutputLogData.RETURN_CODE: 0, \
+                                    OutputLogData.TIMEDOUT: False}
+
+def _make_matrix(filename, tests, rows):
+    mat = common_matrices.ExecutionMatrix(filename=filename, \
+                                                    non_key_col_list=tests)
+    for key, vals in rows.items():
+        mat.add_row_by_key(key, dict(zip(tests, vals)), serialize=False)
+    mat.serialize()
+
+def _read_matrix(filename):
+    mat = common_matrices.ExecutionMatrix(filename=filename)
+    return {k: {t: v for t, v in vals.items()} \
+                            for k, vals in mat._get_key_values_dict().items()}
+
+class Test_IncrementalAnalysis(unittest.TestCase):
+    def setUp(self):
+        self._worktmpdir = tempfile.mkdtemp(suffix=TMP_DIR_SUFFIX)
+        self.repo = os.path.join(self._worktmpdir, 'repo')
+        self.out = os.path.join(self._worktmpdir, 'out')
+        os.makedirs(os.path.join(self.repo, 'src'))
+        self.prev_tests = ['t1', 't2', 't3', 't4']
+
+        self._write_sources(OLD_A)
+        prev = self._make_explorer('history_1')
+        IncrementalAnalysis.save_source_snapshot(prev, self.repo, \
+                                                    ['src/a.c', 'src/b.c'])
+        _make_matrix(prev.get_file_pathname(\
+                    fd_structure.TEST_PASS_FAIL_MATRIX), self.prev_tests, \
+                                            {'program': [0, 1, 0, 0]})
+        ol = OutputLogData(filename=prev.get_file_pathname(\
+                                fd_structure.PROGRAM_TESTEXECUTION_OUTPUT))
+        ol.add_data({'program': {t: _outlog_dat('h'+t) \
+                                                for t in self.prev_tests}})
+        ol.serialize()
+        _make_matrix(prev.get_file_pathname(fd_structure.CRITERIA_MATRIX[\
+                            Criteria.STATEMENT_COVERAGE]), self.prev_tests, {\
+                                'gcov:src/a.c:2': [1, 1, 0, 0], \
+                                'gcov:src/a.c:3': [1, 1, 0, 0], \
+                                'gcov:src/a.c:4': [0, 1, 0, 0], \
+                                'gcov:src/a.c:5': [1, 1, 0, 0], \
+                                'gcov:src/a.c:8': [0, 0, 1, 0], \
+                                'gcov:src/b.c:1': [0, 0, 0, 1]})
+        self.prev = prev
+
+        self._write_sources(NEW_A)
+        self.head = self._make_explorer(fd_structure.TopExplorer.LATEST_NAME)
+        IncrementalAnalysis.save_source_snapshot(self.head, self.repo, \
+                                                    ['src/a.c', 'src/b.c'])
+        self.top_explorer = fd_structure.TopExplorer(self.out)
+
+    def tearDown(self):
+        shutil.rmtree(self._worktmpdir)
+
+    def _write_sources(self, a_lines):
+        for name, lines in (('a.c', a_lines), ('b.c', B)):
+            with open(os.path.join(self.repo, 'src', name), 'w') as fp:
+                fp.write('\n'.join(lines) + '\n')
+
+    def _make_explorer(self, name):
+        exp = fd_structure.Explorer(os.path.join(self.out, name))
+        for d in (fd_structure.RESULTS_MATRICES_DIR, \
+                        fd_structure.RESULTS_TESTEXECUTION_OUTPUTS_DIR, \
+                        fd_structure.CONTROLLER_DATA_DIR, \
+                        fd_structure.EXECUTION_TMP_DIR):
+            exp.get_or_create_and_get_dir(d)
+        return exp
+
+    def test_impact(self):
+        inc = IncrementalAnalysis.create(self.top_explorer, self.repo)
+        self.assertEqual(inc.info['changed_files'], {'src/a.c': \
+                                {'old_lines': [4], 'new_lines': [4, 5]}})
+        # only t2 covered the changed line
+        self.assertEqual(inc.info['affected_tests'], ['t2'])
+        self.assertEqual(inc.get_tests_to_execute(\
+                            ['t1', 't2', 't3', 't4', 't5']), ['t2', 't5'])
+        self.assertEqual(inc.map_elements(['gcov:src/a.c:2', \
+                        'gcov:src/a.c:4', 'gcov:src/a.c:5:0', \
+                        'gcov:src/a.c:f', 'gcov:src/b.c:1', 'x:unknown']), \
+                            {'gcov:src/a.c:2': 'gcov:src/a.c:2', \
+                            'gcov:src/a.c:6:0': 'gcov:src/a.c:5:0', \
+                            'gcov:src/a.c:f': 'gcov:src/a.c:f', \
+                            'gcov:src/b.c:1': 'gcov:src/b.c:1'})
+
+        # mutants are mapped by name and location
+        prev_info, info = MutantsInfoObject(), MutantsInfoObject()
+        prev_info.add_element('mart:1', mutant_type='ROR', \
+                                                    mutant_locs='src/a.c:5:3')
+        prev_info.add_element('mart:2', mutant_type='ROR', \
+                                                    mutant_locs='src/a.c:4:3')
+        prev_info.add_element('mart:3', mutant_type='ROR', \
+                                                    mutant_locs='src/a.c:8:3')
+        info.add_element('mart:1', mutant_type='ROR', \
+                                                    mutant_locs='src/a.c:6:3')
+        info.add_element('mart:2', mutant_type='ROR', \
+                                                    mutant_locs='src/a.c:5:3')
+        info.add_element('mart:3', mutant_type='AOR', \
+                                                    mutant_locs='src/a.c:9:3')
+        self.assertEqual(inc.map_elements(['mart:1', 'mart:2', 'mart:3'], \
+                                info_obj=info, prev_info_obj=prev_info), \
+                                                        {'mart:1': 'mart:1'})
+
+        # The mutants are renumbered: matched by their unique signature
+        prev_info, info = MutantsInfoObject(), MutantsInfoObject()
+        for info_obj, mutants in ((prev_info, [ \
+                    ('mart:1', 'ROR', ['src/a.c:3:9'], 'f', [4]), \
+                    ('mart:2', 'ROR', ['src/a.c:3:9'], 'f', [5]), \
+                    ('mart:3', 'AOR', ['src/a.c:8:10'], 'g', [1]), \
+                    ('mart:4', 'ROR', ['src/a.c:8:10'], 'g', [2]), \
+                    ('mart:5', 'ROR', ['src/a.c:8:12'], 'g', [3]), \
+                    ('mart:6', 'ROR', ['src/b.c:1:18'], 'h', [1]), \
+                    ('mart:7', 'ROR', ['src/b.c:1:18'], 'h', [2])]), \
+                                (info, [ \
+                    ('mart:1', 'ROR', ['src/b.c:1:18'], 'h', [2]), \
+                    ('mart:2', 'ROR', ['src/b.c:1:18'], 'h', [1]), \
+                    ('mart:3', 'ROR', ['src/a.c:9:12'], 'g', [3]), \
+                    ('mart:4', 'ROR', ['src/a.c:9:10'], 'g', [2]), \
+                    ('mart:5', 'AOR', ['src/a.c:9:10'], 'g', [1]), \
+                    ('mart:6', 'ROR', ['src/a.c:3:9'], 'f', [6]), \
+                    ('mart:7', 'ROR', ['src/a.c:3:9'], 'f', [7])])):
+            for mid, m_type, locs, func, ir_pos in mutants:
+                info_obj.add_element(mid, mutant_type=m_type, \
+                                mutant_locs=locs, mutant_function_name=func, \
+                                IRPosInFunc=ir_pos)
+        # The mutants of f are not unique (changed function, where the IR
+        # positions are not comparable), the others are in unchanged
+        # functions
+        self.assertEqual(inc.map_elements(['mart:'+str(i) \
+                                            for i in range(1, 8)], \
+                                info_obj=info, prev_info_obj=prev_info), \
+                            {'mart:1': 'mart:7', 'mart:2': 'mart:6', \
+                            'mart:3': 'mart:5', 'mart:4': 'mart:4', \
+                            'mart:5': 'mart:3'})
+
+        # The recorded impact is reloaded
+        with open(self.head.get_file_pathname(\
+                            fd_structure.INCREMENTAL_ANALYSIS_INFO)) as fp:
+            self.assertIn('"affected_tests"', fp.read())
+        self.assertEqual(IncrementalAnalysis.create(self.top_explorer, \
+                                        self.repo).affected_tests, set(['t2']))
+
+    def test_all_affected_and_missing_previous(self):
+        with open(os.path.join(self.repo, 'src', 'c.c'), 'w') as fp:
+            fp.write('int k;\n')
+        IncrementalAnalysis.save_source_snapshot(self.head, self.repo, \
+                                        ['src/a.c', 'src/b.c', 'src/c.c'])
+        inc = IncrementalAnalysis.create(self.top_explorer, self.repo)
+        self.assertEqual(inc.info['affected_tests'], self.prev_tests)
+        self.assertEqual(inc.get_tests_to_execute(['t1']), ['t1'])
+
+        shutil.rmtree(os.path.join(self.out, 'history_1'))
+        self.assertIsNone(IncrementalAnalysis.create(\
+                            fd_structure.TopExplorer(self.out), self.repo))
+
+    def test_carry_forward(self):
+        inc = IncrementalAnalysis.create(self.top_explorer, self.repo)
+
+        # pass fail
+        pf_file = self.head.get_file_pathname(\
+                                        fd_structure.TMP_TEST_PASS_FAIL_MATRIX)
+        _make_matrix(pf_file, ['t2', 't5'], {'program': [0, 1]})
+        pf_out = self.head.get_file_pathname(\
+                                fd_structure.TMP_PROGRAM_TESTEXECUTION_OUTPUT)
+        ol = OutputLogData(filename=pf_out)
+        ol.add_data({'program': {'t2': _outlog_dat('new2'), \
+                                            't5': _outlog_dat('new5')}})
+        ol.serialize()
+        inc.carry_forward(IncrementalAnalysis.PASSFAIL_NAME, pf_file, \
+                    self.prev.get_file_pathname(\
+                                        fd_structure.TEST_PASS_FAIL_MATRIX), \
+                    {'program': 'program'}, ['t1', 't3', 't4'], \
+                    outlog_file=pf_out, prev_outlog_file=\
+                                self.prev.get_file_pathname(\
+                                    fd_structure.PROGRAM_TESTEXECUTION_OUTPUT))
+        self.assertEqual(_read_matrix(pf_file), {'program': \
+                        {'t1': 0, 't2': 0, 't3': 0, 't4': 0, 't5': 1}})
+        ol = OutputLogData(filename=pf_out)
+        self.assertEqual({t: d[OutputLogData.OUTLOG_HASH] for t, d in \
+                    ol.get_objective_data('program').items()}, {'t1': 'ht1', \
+                    't2': 'new2', 't3': 'ht3', 't4': 'ht4', 't5': 'new5'})
+
+        # coverage, the new rows are inactive for the carried tests
+        cov_file = self.head.get_file_pathname(fd_structure\
+                            .TMP_CRITERIA_MATRIX[Criteria.STATEMENT_COVERAGE])
+        _make_matrix(cov_file, ['t2', 't5'], {\
+                    'gcov:src/a.c:2': [1, 1], 'gcov:src/a.c:3': [1, 1], \
+                    'gcov:src/a.c:5': [1, 0], 'gcov:src/a.c:6': [1, 1], \
+                    'gcov:src/a.c:9': [0, 0], 'gcov:src/b.c:1': [0, 1]})
+        prev_cov = self.prev.get_file_pathname(fd_structure.CRITERIA_MATRIX[\
+                                                Criteria.STATEMENT_COVERAGE])
+        elem_map = inc.map_elements(common_matrices.ExecutionMatrix(\
+                                                filename=prev_cov).get_keys())
+        inc.carry_forward('STATEMENT_COVERAGE', cov_file, prev_cov, \
+                            elem_map, ['t1', 't3', 't4'], infer_inactive=True)
+        cov = _read_matrix(cov_file)
+        self.assertEqual(cov['gcov:src/a.c:6'], \
+                            {'t1': 1, 't2': 1, 't3': 0, 't4': 0, 't5': 1})
+        self.assertEqual(cov['gcov:src/a.c:9'], \
+                            {'t1': 0, 't2': 0, 't3': 1, 't4': 0, 't5': 0})
+        self.assertEqual(cov['gcov:src/a.c:5'], \
+                            {'t1': 0, 't2': 1, 't3': 0, 't4': 0, 't5': 0})
+
+        # mutants, with the affected mutants executed by the carried tests
+        prev_sm = self.prev.get_file_pathname(fd_structure.CRITERIA_MATRIX[\
+                                                    Criteria.STRONG_MUTATION])
+        _make_matrix(prev_sm, self.prev_tests, {'mart:1': [1, 0, 0, 0], \
+                                                'mart:2': [0, 1, 0, 0]})
+        sm_file = self.head.get_file_pathname(fd_structure\
+                            .TMP_CRITERIA_MATRIX[Criteria.STRONG_MUTATION])
+        _make_matrix(sm_file, ['t2', 't5'], {'mart:1': [0, 0], \
+                                                        'mart:2': [1, 1]})
+        partial_file = self.head.get_file_pathname(fd_structure\
+                    .PARTIAL_TMP_CRITERIA_MATRIX[Criteria.STRONG_MUTATION])
+        _make_matrix(partial_file, ['t1', 't3', 't4'], \
+                                                    {'mart:2': [1, 0, 0]})
+        inc.carry_forward('STRONG_MUTATION', sm_file, prev_sm, \
+                        {'mart:1': 'mart:1'}, ['t1', 't3', 't4'], \
+                        partial_matrix_file=partial_file)
+        self.assertEqual(_read_matrix(sm_file), {\
+                    'mart:1': {'t1': 1, 't2': 0, 't3': 0, 't4': 0, 't5': 0}, \
+                    'mart:2': {'t1': 1, 't2': 1, 't3': 0, 't4': 0, 't5': 1}})
+
+        # The carried forward cells are recorded
+        info = common_fs.loadJSON(self.head.get_file_pathname(\
+                                    fd_structure.INCREMENTAL_ANALYSIS_INFO))
+        self.assertEqual(info['matrices']['PASSFAIL']['carried_forward'], \
+                            {'rows': {'program': 'program'}, \
+                                'tests': ['t1', 't3', 't4'], 'cells': 3})
+        self.assertEqual(info['matrices']['PASSFAIL']['executed_tests'], \
+                                                                ['t2', 't5'])
+        self.assertEqual(info['matrices']['STATEMENT_COVERAGE']\
+                                ['inferred_inactive']['rows'], \
+                                                        ['gcov:src/a.c:5'])
+        self.assertEqual(info['matrices']['STRONG_MUTATION']\
+                                        ['carried_forward']['cells'], 3)
+
+if __name__ == "__main__":
+    verbosity=2
+    suite = unittest.TestLoader().loadTestsFromTestCase(\
+                                                    Test_IncrementalAnalysis)
+    unittest.TextTestRunner(verbosity=verbosity).run(suite)
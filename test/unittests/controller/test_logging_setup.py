@@ -0,0 +1,138 @@
+from __future__ import print_function
+import os, sys
+import json
+import time
+import queue
+import shutil
+import logging
+import tempfile
+import threading
+import multiprocessing
+
+import unittest
+
+import muteria.controller.logging_setup as logging_setup
+
+TMP_DIR_SUFFIX = '.muteria.test.tmp'
+
+def _record(msg, name='muteria.test', level=logging.INFO):
+    return logging.LogRecord(name, level, __file__, 1, msg, None, None)
+
+def _log_in_child(handler):
+    with logging_setup.log_context(test='child_test'):
+        handler.handle(_record('from child'))
+
+class Test_LoggingSetup(unittest.TestCase):
+    def setUp(self):
+        self._worktmpdir = tempfile.mkdtemp(suffix=TMP_DIR_SUFFIX)
+
+    def tearDown(self):
+        shutil.rmtree(self._worktmpdir)
+
+    def test_context_and_json(self):
+        context_filter = logging_setup.ContextFilter(run_id='run1')
+        with logging_setup.log_context(task='T', tool='klee'):
+            with logging_setup.log_context(test='t1'):
+                rec = _record('hello %s')
+                rec.args = ('world',)
+                context_filter.filter(rec)
+            other = _record('x')
+            context_filter.filter(other)
+        obj = json.loads(logging_setup.JsonLinesFormatter().format(rec))
+        self.assertEqual((obj['message'], obj['run'], obj['task'], \
+                            obj['tool'], obj['test']), \
+                            ('hello world', 'run1', 'T', 'klee', 't1'))
+        self.assertNotIn('element', obj)
+        self.assertIsNone(other.test)
+        self.assertEqual(logging_setup.get_log_context(), {})
+
+    def test_context_in_parallel_workers(self):
+        import joblib
+        context_filter = logging_setup.ContextFilter(run_id='run1')
+        def work(test):
+            with logging_setup.log_context(test=test):
+                rec = _record('running')
+                context_filter.filter(rec)
+                time.sleep(0.01)
+                return (rec.run, rec.task, rec.tool, rec.element, rec.test)
+        tests = ['t' + str(i) for i in range(8)]
+        with logging_setup.log_context(task='T', tool='klee', element='m:1'):
+            # joblib may dispatch the calls from its threads, bound before
+            bound_work = logging_setup.bind_log_context(work)
+            res = joblib.Parallel(n_jobs=3, require='sharedmem')(\
+                        joblib.delayed(bound_work)(t) for t in tests)
+        self.assertEqual(res, [('run1', 'T', 'klee', 'm:1', t) \
+                                                            for t in tests])
+        self.assertEqual(logging_setup.get_log_context(), {})
+
+    def test_rate_limit(self):
+        rate_filter = logging_setup.RateLimitFilter(max_count=3, interval=0.2)
+        passed = [rate_filter.filter(_record('same')) for _ in range(10)]
+        self.assertEqual(passed, [True] * 3 + [False] * 7)
+        self.assertTrue(rate_filter.filter(_record('different')))
+        time.sleep(0.25)
+        rec = _record('same')
+        self.assertTrue(rate_filter.filter(rec))
+        self.assertIn('7 similar messages suppressed', rec.msg)
+
+    def test_rotation_and_retention(self):
+        logfile = os.path.join(self._worktmpdir, 'log.log')
+        handler = logging_setup.SizeAndTimeRotatingFileHandler(logfile, \
+                                max_bytes=100, backup_count=5, \
+                                rotation_interval=3600, retention=3600)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        # 5 records per file
+        for i in range(15):
+            handler.handle(_record('message number {}'.format(i % 10)))
+        self.assertEqual(len(os.listdir(self._worktmpdir)), 3)
+        # time based rotation, old rotated files are removed
+        old = time.time() - 7200
+        os.utime(logfile + '.2', (old, old))
+        handler.rollover_at = time.time() - 1
+        handler.handle(_record('last'))
+        handler.close()
+        self.assertEqual(sorted(os.listdir(self._worktmpdir)), \
+                                ['log.log', 'log.log.1', 'log.log.2'])
+        with open(logfile) as f:
+            self.assertEqual(f.read(), 'last\n')
+
+    def test_queue_and_forked_child(self):
+        logfile = os.path.join(self._worktmpdir, 'log.jsonl')
+        fh = logging.FileHandler(logfile)
+        fh.setFormatter(logging_setup.JsonLinesFormatter())
+        log_queue = queue.Queue()
+        handler = logging_setup.ProcessSafeQueueHandler(log_queue, \
+                    [(logfile, logging_setup.JsonLinesFormatter(), \
+                                                            logging.INFO)])
+        handler.addFilter(logging_setup.ContextFilter(run_id='r'))
+        listener = logging.handlers.QueueListener(log_queue, fh)
+        listener.start()
+        threads = [threading.Thread(target=handler.handle, \
+                        args=(_record('thread {}'.format(i)),)) \
+                                                        for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        listener.stop()
+        fh.close()
+
+        proc = multiprocessing.get_context('fork').Process(\
+                                        target=_log_in_child, args=(handler,))
+        proc.start()
+        proc.join()
+        self.assertEqual(proc.exitcode, 0)
+
+        with open(logfile) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(sorted(r['message'] for r in records[:4]), \
+                                ['thread {}'.format(i) for i in range(4)])
+        self.assertEqual((records[4]['message'], records[4]['test'], \
+                                    records[4]['run']), \
+                                    ('from child', 'child_test', 'r'))
+        self.assertNotEqual(records[4]['process'], os.getpid())
+
+if __name__ == "__main__":
+    verbosity=2
+    suite = unittest.TestLoader().loadTestsFromTestCase(Test_LoggingSetup)
+    unittest.TextTestRunner(verbosity=verbosity).run(suite)
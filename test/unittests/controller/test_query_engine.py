@@ -0,0 +1,131 @@
+from __future__ import print_function
+import os, sys
+import shutil
+import tempfile
+
+import unittest
+
+import muteria.common.matrices as common_matrices
+import muteria.controller.explorer as fd_structure
+import muteria.controller.query_engine as query_engine
+from muteria.drivers.criteria import TestCriteria as Criteria
+
+TMP_DIR_SUFFIX = '.muteria.test.tmp'
+
+OutputLogData = common_matrices.OutputLogData
+
+def _outlog_dat(o_len, o_hash, retcode=0, timedout=False):
+    return {OutputLogData.OUTLOG_LEN: o_len, OutputLogData.OUTLOG_HASH: \
+                            o_hash, OutputLogData.RETURN_CODE: retcode, \
+                                        OutputLogData.TIMEDOUT: timedout}
+
+class Test_ResultsQueryEngine(unittest.TestCase):
+    def setUp(self):
+        self._worktmpdir = tempfile.mkdtemp(suffix=TMP_DIR_SUFFIX)
+        self.tests = ['ut:t1', 'ut:t2', 'gen:t3']
+        # latest and history 1
+        self._make_outdir(fd_structure.TopExplorer.LATEST_NAME, \
+                    {'gcov:src/a.c:1': ['ut:t1'], \
+                        'gcov:src/a.c:2': ['ut:t1', 'gen:t3'], \
+                        'gcov:src/a.c:3': [], 'gcov:src/b.c:1': ['ut:t2']}, \
+                    {'ut:t1': _outlog_dat(3, 'h1'), \
+                        'ut:t2': _outlog_dat(4, 'h2'), \
+                        'gen:t3': _outlog_dat(5, 'h3', timedout=True)})
+        self._make_outdir('history_1', \
+                    {'gcov:src/a.c:1': [], 'gcov:src/a.c:2': ['gen:t3'], \
+                                                'gcov:src/b.c:1': ['ut:t2']}, \
+                    {'ut:t1': _outlog_dat(3, 'h1'), \
+                        'ut:t2': _outlog_dat(4, 'h2', retcode=1), \
+                        'gen:t3': _outlog_dat(7, 'h4', timedout=True)})
+        self.top_explorer = fd_structure.TopExplorer(self._worktmpdir)
+
+    def tearDown(self):
+        shutil.rmtree(self._worktmpdir)
+
+    def _make_outdir(self, name, cov, outlog):
+        exp = fd_structure.Explorer(os.path.join(self._worktmpdir, name))
+        exp.get_or_create_and_get_dir(fd_structure.RESULTS_MATRICES_DIR)
+        exp.get_or_create_and_get_dir(\
+                            fd_structure.RESULTS_TESTEXECUTION_OUTPUTS_DIR)
+        mat = common_matrices.ExecutionMatrix(filename=exp.get_file_pathname(\
+                fd_structure.CRITERIA_MATRIX[Criteria.STATEMENT_COVERAGE]), \
+                                                non_key_col_list=self.tests)
+        for key, active in cov.items():
+            mat.add_row_by_key(key, {t: (1 if t in active else 0) \
+                                    for t in self.tests}, serialize=False)
+        mat.serialize()
+        pf = common_matrices.ExecutionMatrix(filename=exp.get_file_pathname(\
+                                        fd_structure.TEST_PASS_FAIL_MATRIX), \
+                                                non_key_col_list=self.tests)
+        pf.add_row_by_key('program', {'ut:t1': 0, 'ut:t2': 1, 'gen:t3': 0}, \
+                                                            serialize=False)
+        pf.serialize()
+        ol = OutputLogData(filename=exp.get_file_pathname(\
+                                fd_structure.PROGRAM_TESTEXECUTION_OUTPUT))
+        ol.add_data({'program': outlog})
+        ol.serialize()
+
+    def test_queries(self):
+        engine = query_engine.ResultsQueryEngine(self.top_explorer)
+        self.assertEqual(engine.get_history_count(), 2)
+        self.assertEqual(sorted(engine.query('TESTS_OF_ELEMENT', \
+                        criterion='STATEMENT_COVERAGE', \
+                        element='gcov:src/a.c:2')), ['gen:t3', 'ut:t1'])
+        self.assertEqual(engine.tests_of_element(Criteria.STATEMENT_COVERAGE,\
+                                        'gcov:src/a.c:2', history=1), \
+                                                                ['gen:t3'])
+        self.assertIsNone(engine.tests_of_element(\
+                        Criteria.STATEMENT_COVERAGE, 'gcov:src/x.c:1'))
+        self.assertEqual(sorted(engine.query(\
+                        query_engine.QueryKinds.ELEMENTS_OF_TEST, \
+                        criterion='STATEMENT_COVERAGE', test='ut:t1')), \
+                                        ['gcov:src/a.c:1', 'gcov:src/a.c:2'])
+        self.assertEqual(engine.query('FAILING_TESTS'), ['ut:t2'])
+        self.assertEqual(engine.query('TOOLS', \
+                                        criterion='STATEMENT_COVERAGE'), \
+                                {'gcov': {'tests': 0, 'elements': 4}, \
+                                    'ut': {'tests': 2, 'elements': 0}, \
+                                    'gen': {'tests': 1, 'elements': 0}})
+        self.assertEqual(engine.file_coverage('STATEMENT_COVERAGE', 'a.c'), \
+                                        {0: {'total': 3, 'covered': 2}, \
+                                            1: {'total': 2, 'covered': 1}})
+        # the timed out outputs are equivalent
+        self.assertEqual(engine.query('OUTPUT_DIFF'), ['ut:t2'])
+        self.assertEqual(engine.get_outlog_index(1).get_test_data('gen:t3'),\
+                                                            (7, 'h4', 0, True))
+
+        with self.assertRaises(SystemExit):
+            engine.query('TESTS_OF_ELEMENT', criterion='STATEMENT_COVERAGE')
+        with self.assertRaises(SystemExit):
+            engine.query('bad')
+        with self.assertRaises(SystemExit):
+            engine.query('FAILING_TESTS', history=2)
+
+    def test_index_persistence(self):
+        engine = query_engine.ResultsQueryEngine(self.top_explorer)
+        index = engine.get_matrix_index(Criteria.STATEMENT_COVERAGE)
+        exp = self.top_explorer.get_latest_explorer()
+        self.assertTrue(os.path.isdir(exp.get_dir_pathname(\
+                                            fd_structure.QUERY_INDEX_DIR)))
+        mat_file = exp.get_file_pathname(\
+                    fd_structure.CRITERIA_MATRIX[Criteria.STATEMENT_COVERAGE])
+        self.assertTrue(query_engine.MatrixIndex.is_up_to_date(mat_file, \
+                                                            index.index_dir))
+        # The index is rebuilt when the matrix changes
+        mat = common_matrices.ExecutionMatrix(filename=mat_file)
+        mat.add_row_by_key('gcov:src/c.c:1', {'ut:t1': 1, 'ut:t2': 0, \
+                                                'gen:t3': 0}, serialize=True)
+        self.assertFalse(query_engine.MatrixIndex.is_up_to_date(mat_file, \
+                                                            index.index_dir))
+        engine = query_engine.ResultsQueryEngine(self.top_explorer)
+        self.assertEqual(engine.file_coverage(Criteria.STATEMENT_COVERAGE, \
+                            'src/c.c', histories=[0]), \
+                                            {0: {'total': 1, 'covered': 1}})
+        # missing matrix
+        self.assertIsNone(engine.get_matrix_index(Criteria.STRONG_MUTATION))
+
+if __name__ == "__main__":
+    verbosity=2
+    suite = unittest.TestLoader().loadTestsFromTestCase(\
+                                                    Test_ResultsQueryEngine)
+    unittest.TextTestRunner(verbosity=verbosity).run(suite)
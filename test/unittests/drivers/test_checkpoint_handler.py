@@ -0,0 +1,177 @@
+from __future__ import print_function
+import os, sys
+import json
+import time
+import socket
+import shutil
+import tempfile
+import threading
+import multiprocessing
+
+import unittest
+
+from muteria.common.fs import CheckpointState
+from muteria.drivers.checkpoint_handler import CheckPointHandler, \
+                                                    WorkUnitsCheckpoint
+
+TMP_DIR_SUFFIX = '.muteria.test.tmp'
+
+def _process_worker(journal, units, crash_after):
+    """ Process the units, exit without completing the unit claimed after
+        crash_after completions (if not None)
+    """
+    wu = WorkUnitsCheckpoint(journal)
+    n_done = 0
+    while True:
+        unit = wu.claim_next(units)
+        if unit is None:
+            break
+        if crash_after is not None and n_done == crash_after:
+            os._exit(1)
+        wu.complete(unit, {'by': os.getpid()})
+        n_done += 1
+    os._exit(0)
+
+class Test_WorkUnitsCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self._worktmpdir = tempfile.mkdtemp(suffix=TMP_DIR_SUFFIX)
+        self.journal = os.path.join(self._worktmpdir, "cp.units.test")
+
+    def tearDown(self):
+        shutil.rmtree(self._worktmpdir)
+
+    def test_claims_and_completions(self):
+        wu1 = WorkUnitsCheckpoint(self.journal)
+        wu2 = WorkUnitsCheckpoint(self.journal)
+        self.assertTrue(wu1.claim('t1', worker='w1'))
+        # renew by the holder, refused to the others
+        self.assertTrue(wu1.claim('t1', worker='w1'))
+        self.assertFalse(wu2.claim('t1', worker='w2'))
+        self.assertEqual(wu2.claim_next(['t1', 't2'], worker='w2'), 't2')
+        self.assertEqual(wu1.get_claimed(), {'t1': 'w1', 't2': 'w2'})
+        wu2.complete('t2', [1, {'x': None}], worker='w2')
+        self.assertEqual(wu1.get_done(), {'t2': [1, {'x': None}]})
+        self.assertFalse(wu1.claim('t2', worker='w1'))
+        wu1.release('t1', worker='w1')
+        self.assertTrue(wu2.claim('t1', worker='w2'))
+        self.assertEqual(wu1.wait_for('t2'), (True, [1, {'x': None}]))
+
+        # the journal is compacted, the other worker replays it
+        wu1.compact()
+        self.assertEqual(wu2.get_done(), {'t2': [1, {'x': None}]})
+        self.assertEqual(wu2.get_claimed(), {'t1': 'w2'})
+        with open(self.journal) as fp:
+            self.assertEqual(len(fp.readlines()), 2)
+
+        # an expired claim is reclaimed
+        wu3 = WorkUnitsCheckpoint(self.journal, lease_duration=0.01)
+        self.assertTrue(wu3.claim('t3', worker='w3'))
+        time.sleep(0.05)
+        self.assertEqual(wu1.reclaim_expired(), ['t3'])
+        self.assertEqual(wu1.wait_for('t3'), (False, None))
+
+    def test_dead_process_with_same_pid(self):
+        """ A lease of a dead process whose pid is the current process' pid
+            (e.g. pid 1 in containers) is not live
+        """
+        wu = WorkUnitsCheckpoint(self.journal)
+        own_pid_worker = "{}:{}:".format(socket.gethostname(), os.getpid())
+        with open(self.journal, 'w') as fp:
+            for unit, worker in (('t1', own_pid_worker + '999'), \
+                            ('t2', own_pid_worker + 'f00d:999'), \
+                            ('t3', wu.get_worker_id().rsplit(':', 1)[0] \
+                                                                + ':999')):
+                fp.write(json.dumps({'op': 'claim', 'unit': unit, \
+                    'worker': worker, 'expires': time.time() + 3600}) + '\n')
+        # only the lease of another thread of the current process is live
+        self.assertEqual(wu.reclaim_expired(), ['t1', 't2'])
+        self.assertTrue(wu.claim('t1'))
+        self.assertFalse(wu.claim('t3'))
+
+    def test_interrupted_write(self):
+        wu = WorkUnitsCheckpoint(self.journal)
+        wu.complete('t1', 0)
+        # record partially written by an interrupted worker
+        with open(self.journal, 'a') as fp:
+            fp.write('{"op": "done", "unit": "t2", "pay')
+        wu2 = WorkUnitsCheckpoint(self.journal)
+        self.assertEqual(wu2.get_done(), {'t1': 0})
+        wu2.complete('t3', 1)
+        self.assertEqual(WorkUnitsCheckpoint(self.journal).get_done(), \
+                                                        {'t1': 0, 't3': 1})
+
+    def test_concurrent_workers(self):
+        units = ['u'+str(i) for i in range(200)]
+        wu = WorkUnitsCheckpoint(self.journal)
+        counts = {}
+        lock = threading.Lock()
+        def work():
+            while True:
+                unit = wu.claim_next(units)
+                if unit is None:
+                    return
+                with lock:
+                    counts[unit] = counts.get(unit, 0) + 1
+                wu.complete(unit, unit)
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(counts, {u: 1 for u in units})
+        self.assertEqual(wu.get_done(), {u: u for u in units})
+
+    @unittest.skipIf(sys.platform.startswith('win'), "fork needed")
+    def test_crashed_processes(self):
+        units = ['u'+str(i) for i in range(60)]
+        ctx = multiprocessing.get_context('fork')
+        # a process crashes while holding a unit
+        crashed = ctx.Process(target=_process_worker, \
+                                            args=(self.journal, units, 5))
+        crashed.start()
+        crashed.join()
+        self.assertEqual(crashed.exitcode, 1)
+        wu = WorkUnitsCheckpoint(self.journal)
+        # only the in-flight unit is not completed, and its claim is not
+        # live (dead process)
+        self.assertEqual(len(wu.get_done()), 5)
+        self.assertEqual(wu.get_claimed(), {})
+
+        # resume with 2 concurrent processes
+        procs = [ctx.Process(target=_process_worker, \
+                            args=(self.journal, units, None)) for _ in (1, 2)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        self.assertEqual([p.exitcode for p in procs], [0, 0])
+        with open(self.journal) as fp:
+            n_done_records = len([l for l in fp if '"done"' in l])
+        self.assertEqual(n_done_records, len(units))
+        self.assertEqual(set(wu.get_done()), set(units))
+
+class Test_CheckPointHandlerWorkUnits(unittest.TestCase):
+    def test_removed_with_checkpoint(self):
+        tmpdir = tempfile.mkdtemp(suffix=TMP_DIR_SUFFIX)
+        try:
+            cp = CheckpointState(os.path.join(tmpdir, 'cp'), \
+                                            os.path.join(tmpdir, 'cp.bak'))
+            handler = CheckPointHandler(cp)
+            wu = handler.get_work_units('runtests', 1, 'tool')
+            wu.complete('t1')
+            self.assertTrue(handler.get_work_units('runtests', 1, 'tool')\
+                                                            .is_done('t1'))
+            handler.restart()
+            self.assertEqual(handler.get_work_units('runtests', 1, 'tool')\
+                                                            .get_done(), {})
+            handler.get_work_units('runtests').complete('t1')
+            handler.destroy()
+            self.assertEqual(os.listdir(tmpdir), [])
+        finally:
+            shutil.rmtree(tmpdir)
+
+if __name__ == "__main__":
+    verbosity=2
+    for tc in (Test_WorkUnitsCheckpoint, Test_CheckPointHandlerWorkUnits):
+        suite = unittest.TestLoader().loadTestsFromTestCase(tc)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
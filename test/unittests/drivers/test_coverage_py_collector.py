@@ -0,0 +1,134 @@
+from __future__ import print_function
+import os, sys
+import json
+import shutil
+import socket
+import tempfile
+import subprocess
+
+import unittest
+
+from muteria.drivers.criteria.tools_by_languages.python.coverage_py.collector\
+                            import StaticAnalysisCache, CoverageDataCollector, \
+                                COVERAGE_CHANNEL_ENV_VAR, \
+                                COVERAGE_TOKEN_ENV_VAR, PRELOAD_SOURCE
+
+try:
+    import coverage
+    coverage_installed = True
+except ImportError:
+    coverage_installed = False
+
+TMP_DIR_SUFFIX = '.muteria.test.tmp'
+
+def _send(address, payload):
+    """ send the payload as the preloaded program does at exit
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(address)
+        sock.sendall(json.dumps(payload).encode('utf-8'))
+        sock.shutdown(socket.SHUT_WR)
+        return sock.recv(1)
+    finally:
+        sock.close()
+
+@unittest.skipUnless(CoverageDataCollector.is_supported(), \
+                                                "unix sockets unsupported")
+class Test_CoverageDataCollector(unittest.TestCase):
+    def test_collect_and_merge(self):
+        collector = CoverageDataCollector()
+        try:
+            token = collector.new_token()
+            # two processes of the same test
+            self.assertEqual(_send(collector.get_address(), {'token': token, \
+                    'files': {'/a.py': [[1, 2], [[-1, 1], [1, 2]]]}}), b'1')
+            self.assertEqual(_send(collector.get_address(), {'token': token, \
+                    'files': {'/a.py': [[2, 3], [[2, 3]]], \
+                                            '/b.py': [[1], []]}}), b'1')
+            data = collector.pop_data(token)
+            self.assertEqual(data, {
+                    '/a.py': ({1, 2, 3}, {(-1, 1), (1, 2), (2, 3)}),
+                    '/b.py': ({1}, set())})
+            # reset after pop
+            self.assertEqual(collector.pop_data(token), {})
+        finally:
+            collector.close()
+        self.assertFalse(os.path.exists(collector.get_address()))
+
+    def test_data_by_token(self):
+        collector = CoverageDataCollector()
+        try:
+            token1 = collector.new_token()
+            token2 = collector.new_token()
+            self.assertNotEqual(token1, token2)
+            for token, line in ((token1, 1), (token2, 2), (None, 3), \
+                                                            ('unknown', 4)):
+                _send(collector.get_address(), {'token': token, \
+                                        'files': {'/a.py': [[line], []]}})
+            self.assertEqual(collector.pop_data(token2), \
+                                                {'/a.py': ({2}, set())})
+            # a process that outlived its test sends after the pop
+            _send(collector.get_address(), {'token': token2, \
+                                        'files': {'/a.py': [[5], []]}})
+            self.assertEqual(collector.pop_data(token2), {})
+            self.assertEqual(collector.pop_data(token1), \
+                                                {'/a.py': ({1}, set())})
+        finally:
+            collector.close()
+
+    @unittest.skipUnless(coverage_installed, "coverage.py is not installed")
+    def test_preload_send_failure_silent(self):
+        tmpdir = tempfile.mkdtemp(suffix=TMP_DIR_SUFFIX)
+        try:
+            with open(os.path.join(tmpdir, 'muteria_preload.py'), 'w') as f:
+                f.write(PRELOAD_SOURCE)
+            config = os.path.join(tmpdir, '.coveragerc')
+            open(config, 'w').close()
+            env = dict(os.environ)
+            env.update({'PYTHONPATH': tmpdir, \
+                        'COVERAGE_PROCESS_START': config, \
+                        COVERAGE_CHANNEL_ENV_VAR: \
+                                    os.path.join(tmpdir, 'missing_channel'), \
+                        COVERAGE_TOKEN_ENV_VAR: '0-0'})
+            proc = subprocess.Popen([sys.executable, '-c', \
+                                        'import muteria_preload'], env=env, \
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            out, err = proc.communicate()
+            self.assertEqual((proc.returncode, out, err), (0, b'', b''))
+        finally:
+            shutil.rmtree(tmpdir)
+
+@unittest.skipUnless(coverage_installed, "coverage.py is not installed")
+class Test_StaticAnalysisCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._worktmpdir = tempfile.mkdtemp(suffix=TMP_DIR_SUFFIX)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls._worktmpdir)
+
+    def test_persistent_cache(self):
+        src = os.path.join(self._worktmpdir, 'src.py')
+        cache_file = os.path.join(self._worktmpdir, 'cache.json')
+        with open(src, 'w') as f:
+            f.write("x = 1\nif x:\n    x = 2\n")
+        cache = StaticAnalysisCache(cache_file)
+        lines, arcs = cache.get(src)
+        self.assertEqual(lines, {1, 2, 3})
+        self.assertTrue((2, 3) in arcs)
+        cache.save()
+
+        # Reloaded from the file, same content in another file
+        other = os.path.join(self._worktmpdir, 'other.py')
+        shutil.copy(src, other)
+        cache = StaticAnalysisCache(cache_file)
+        self.assertEqual(cache.get(other), (lines, arcs))
+        self.assertFalse(cache.changed)
+
+if __name__ == "__main__":
+    verbosity=2
+    for tc in (Test_CoverageDataCollector, Test_StaticAnalysisCache):
+        suite = unittest.TestLoader().loadTestsFromTestCase(tc)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
@@ -0,0 +1,166 @@
+from __future__ import print_function
+
+import os
+import sys
+import time
+import shutil
+import signal
+import unittest
+
+import tempfile
+
+import muteria.common.matrices as common_matrices
+from muteria.drivers import DriversUtils
+
+TMP_DIR_SUFFIX = '.muteria.test.tmp'
+
+class Test_DriversUtils(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._worktmpdir = tempfile.mkdtemp(suffix=TMP_DIR_SUFFIX)
+        cls.target_mat = os.path.join(cls._worktmpdir, "target.csv")
+        cls.vector_mat = os.path.join(cls._worktmpdir, "vector.csv")
+        cls.target_out = os.path.join(cls._worktmpdir, "target.json")
+        cls.vector_out = os.path.join(cls._worktmpdir, "vector.json")
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls._worktmpdir)
+
+    def setUp(self):
+        for f in (self.target_mat, self.vector_mat, self.target_out, \
+                                                            self.vector_out):
+            if os.path.isfile(f):
+                os.remove(f)
+        tests = ['t1', 't2', 't3', 't4']
+        target = common_matrices.ExecutionMatrix(filename=self.target_mat, \
+                                                    non_key_col_list=tests)
+        target.add_row_by_key('m1', [1, 0, 0, 1], serialize=False)
+        target.add_row_by_key('m2', [0, -1, 1, 0], serialize=True)
+        vector = common_matrices.ExecutionMatrix(filename=self.vector_mat, \
+                                                non_key_col_list=tests+['t5'])
+        vector.add_row_by_key('program', [0, 0, 1, -1, 0], serialize=True)
+
+    @staticmethod
+    def _outlog(rc, timedout=False):
+        return {
+            common_matrices.OutputLogData.OUTLOG_LEN: 1,
+            common_matrices.OutputLogData.OUTLOG_HASH: 'h',
+            common_matrices.OutputLogData.RETURN_CODE: rc,
+            common_matrices.OutputLogData.TIMEDOUT: timedout,
+        }
+
+    def test_cover_when_difference_matrix(self):
+        DriversUtils.update_matrix_to_cover_when_difference(\
+                            self.target_mat, None, self.vector_mat, None)
+        res = common_matrices.ExecutionMatrix(filename=self.target_mat)
+        self.assertEqual(res._get_key_values_dict(), {
+                    'm1': {'t1': 1, 't2': 0, 't3': 1, 't4': -1},
+                    'm2': {'t1': 0, 't2': 0, 't3': 0, 't4': 0},
+        })
+
+    def test_cover_when_difference_outdata(self):
+        out = self._outlog
+        vector_out = common_matrices.OutputLogData(filename=self.vector_out)
+        vector_out.add_data({'program': {'t1': out(0), 't2': out(0), \
+                                    't3': out(0, True), 't4': out(0), \
+                                        't5': out(0)}}, serialize=True)
+        target_out = common_matrices.OutputLogData(filename=self.target_out)
+        target_out.add_data({
+            'm1': {'t1': out(1), 't2': out(0), 't3': out(2, True), \
+                                                            't4': out(1)},
+            # t4 missing
+            'm2': {'t1': dict(\
+                    common_matrices.OutputLogData.UNCERTAIN_TEST_OUTLOGDATA), \
+                            't2': out(3), 't3': out(0)},
+        }, check_all=False, serialize=True)
+        DriversUtils.update_matrix_to_cover_when_difference(\
+                            self.target_mat, self.target_out, \
+                                            self.vector_mat, self.vector_out)
+        res = common_matrices.ExecutionMatrix(filename=self.target_mat)
+        self.assertEqual(res._get_key_values_dict(), {
+                    'm1': {'t1': 1, 't2': 0, 't3': 0, 't4': -1},
+                    'm2': {'t1': 1, 't2': -1, 't3': 1, 't4': 0},
+        })
+
+    def test_resource_usage(self):
+        cost_data = common_matrices.ExecutionCostData
+        prog = sys.executable
+        # allocate ~64MB and spin a bit
+        args = ['-c', 'x = bytearray(64 * 1024 * 1024); sum(range(10**6))']
+        usage = cost_data.make_cost()
+        with DriversUtils.collect_resource_usage() as outer:
+            with DriversUtils.collect_resource_usage() as inner:
+                ret, _, _ = DriversUtils.execute_and_get_retcode_out_err(\
+                                prog, args_list=args, resource_usage=usage)
+            DriversUtils.execute_and_get_retcode_out_err('true')
+        self.assertEqual(ret, 0)
+        self.assertEqual(usage, inner)
+        self.assertGreater(usage[cost_data.CPU_TIME], 0)
+        self.assertGreater(usage[cost_data.MAX_RSS], 64 * 1024)
+        self.assertGreaterEqual(usage[cost_data.WALL_TIME], 0)
+        # Times are summed and the peak memory is the max
+        self.assertGreater(outer[cost_data.WALL_TIME], \
+                                                    usage[cost_data.WALL_TIME])
+        self.assertEqual(outer[cost_data.MAX_RSS], usage[cost_data.MAX_RSS])
+
+        # The usage is recorded on timeout
+        usage = cost_data.make_cost()
+        DriversUtils.execute_and_get_retcode_out_err('sleep', ['10'], \
+                        timeout=0.5, timeout_grace_period=1, \
+                                                        resource_usage=usage)
+        self.assertGreaterEqual(usage[cost_data.WALL_TIME], 0.5)
+        self.assertLess(usage[cost_data.WALL_TIME], 5)
+        self.assertIsNotNone(usage[cost_data.CPU_TIME])
+
+    def test_reported_resource_usage(self):
+        cost_data = common_matrices.ExecutionCostData
+        usage = cost_data.make_cost()
+        report = 'import os; os.write(int(os.environ["{}"]), ' \
+                                    'b"1.5 0.5 10000000 3 4\\n")'.format(\
+                                DriversUtils.RESOURCE_USAGE_REPORT_FD_ENV_VAR)
+        ret, _, _ = DriversUtils.execute_and_get_retcode_out_err(\
+                    sys.executable, ['-c', report], resource_usage=usage)
+        self.assertEqual(ret, 0)
+        self.assertGreaterEqual(usage[cost_data.CPU_TIME], 2.0)
+        self.assertEqual(usage[cost_data.MAX_RSS], 10000000)
+        self.assertGreaterEqual(usage[cost_data.IO_BLOCKS], 7)
+        # no report fd when the usage is not collected
+        _, out, _ = DriversUtils.execute_and_get_retcode_out_err('sh', \
+                    ['-c', 'echo "${}"'.format(\
+                            DriversUtils.RESOURCE_USAGE_REPORT_FD_ENV_VAR)])
+        self.assertEqual(out, '\n')
+
+    def test_execution_timeout(self):
+        # separated output and error
+        ret, out, err = DriversUtils.execute_and_get_retcode_out_err('sh', \
+                                ['-c', 'echo out; echo err >&2; exit 3'], \
+                                            timeout=10, merge_err_to_out=False)
+        self.assertEqual((ret, out, err), (3, 'out\n', 'err\n'))
+
+        # terminated on timeout
+        ret, _, _ = DriversUtils.execute_and_get_retcode_out_err('sleep', \
+                                ['10'], timeout=0.5, timeout_grace_period=1)
+        self.assertEqual(ret, -signal.SIGTERM)
+        self.assertIn(ret, DriversUtils.EXEC_TIMED_OUT_RET_CODE)
+
+        # killed after the grace period when the termination is ignored
+        start = time.monotonic()
+        ret, _, _ = DriversUtils.execute_and_get_retcode_out_err('sh', \
+                                ['-c', 'trap "" TERM; sleep 10'], \
+                                timeout=0.5, timeout_grace_period=1)
+        self.assertEqual(ret, -signal.SIGKILL)
+        self.assertLess(time.monotonic() - start, 5)
+
+        # a descendant keeping the output open is terminated on timeout
+        start = time.monotonic()
+        ret, out, _ = DriversUtils.execute_and_get_retcode_out_err('sh', \
+                                ['-c', '(sleep 10 &); echo out'], \
+                                timeout=0.5, timeout_grace_period=1)
+        self.assertEqual((ret, out), (0, 'out\n'))
+        self.assertLess(time.monotonic() - start, 5)
+
+if __name__ == '__main__':
+    verbosity = 2
+    testsuite = unittest.TestLoader().loadTestsFromTestCase(Test_DriversUtils)
+    unittest.TextTestRunner(verbosity=verbosity).run(testsuite)
@@ -0,0 +1,147 @@
+from __future__ import print_function
+import os, sys
+import random
+import shutil
+import tempfile
+
+import unittest
+
+import muteria.common.mix as common_mix
+import muteria.common.matrices as common_matrices
+import muteria.drivers.criteria as criteria_pkg
+import muteria.drivers.criteria.element_selection as element_selection
+from muteria.drivers.optimizers.criteriatestexecution.optimizerdefs import \
+                                            CriteriaOptimizers, \
+                                            check_is_right_optimizer
+
+Criteria = criteria_pkg.TestCriteria
+Selector = element_selection.CriteriaElementSelector
+Techniques = element_selection.CriteriaElementSelectionTechniques
+
+TMP_DIR_SUFFIX = '.muteria.test.tmp'
+
+class _InfoObj(object):
+    def __init__(self, data):
+        self.data = data
+    def has_element(self, elem):
+        return elem in self.data
+    def get_element_data(self, elem):
+        return self.data[elem]
+
+class Test_CriteriaElementSelector(unittest.TestCase):
+    def setUp(self):
+        self._worktmpdir = tempfile.mkdtemp(suffix=TMP_DIR_SUFFIX)
+        # 60 mutants of operator A, 30 of B and 10 of C
+        self.info = {}
+        for i in range(100):
+            op = 'A' if i < 60 else ('B' if i < 90 else 'C')
+            self.info[str(i)] = {'mutant_type': op, \
+                            'mutant_function_name': 'f'+str(i % 4), \
+                            'mutant_srclocs': ['file{}.c:{}'.format(i%2, i)]}
+        self.info_obj = _InfoObj(self.info)
+
+    def tearDown(self):
+        shutil.rmtree(self._worktmpdir)
+
+    def test_stratified_and_reproducible(self):
+        elems = list(self.info)
+        sel = Selector(seed=7).select(Techniques.STRATIFIED_BY_OPERATOR, \
+                                    elems, 10, info_obj=self.info_obj)
+        ops = [self.info[e]['mutant_type'] for e in sel]
+        self.assertEqual((ops.count('A'), ops.count('B'), ops.count('C')), \
+                                                                    (6, 3, 1))
+        # every stratum is represented, even if small
+        sel3 = Selector(seed=7).select('STRATIFIED_BY_OPERATOR', elems, 3, \
+                                                    info_obj=self.info_obj)
+        self.assertEqual(set(self.info[e]['mutant_type'] for e in sel3), \
+                                                            {'A', 'B', 'C'})
+        # reproducible with the seed, different with another salt
+        self.assertEqual(sel, Selector(seed=7).select(\
+                                Techniques.STRATIFIED_BY_OPERATOR, \
+                                list(reversed(elems)), 10, \
+                                info_obj=self.info_obj))
+        self.assertEqual(Selector(seed=3).select('DummyRandom', elems, 20), \
+                        Selector(seed=3).select(Techniques.RANDOM, elems, 20))
+        self.assertNotEqual(Selector(seed=3).select('RANDOM', elems, 20), \
+                Selector(seed=3).select('RANDOM', elems, 20, rng_salt='x'))
+        self.assertEqual(len(Selector().select(Techniques.STRATIFIED_BY_FILE, \
+                                    elems, 200, info_obj=self.info_obj)), 100)
+
+        sel = Selector(seed=1, operators=['C']).select(\
+                                    Techniques.OPERATOR_BASED, elems, 5, \
+                                                    info_obj=self.info_obj)
+        self.assertEqual(len(sel), 5)
+        self.assertTrue(all(self.info[e]['mutant_type'] == 'C' for e in sel))
+
+        self.assertIsNone(Selector.get_technique('bad'))
+        with self.assertRaises(SystemExit):
+            Selector().select('bad', elems, 5)
+
+    def test_stratified_interleaving(self):
+        strata = {'A': list(range(60)), 'B': list(range(60, 90)), \
+                                                'C': list(range(90, 100))}
+        sel = Selector.stratified_sample(strata, 10, random.Random(0))
+        # every prefix is approximately stratified: the first half has
+        # about the half (3) of the big stratum's selection (6)
+        for seed in range(10):
+            sel = Selector.stratified_sample(strata, 10, random.Random(seed))
+            self.assertTrue(2 <= len([e for e in sel[:5] if e < 60]) <= 4)
+
+    def test_dominance_pruning(self):
+        tests = ['t1', 't2', 't3']
+        matrix_file = os.path.join(self._worktmpdir, 'matrix.csv')
+        mat = common_matrices.ExecutionMatrix(filename=matrix_file, \
+                                                    non_key_col_list=tests)
+        kills = {'m1': ['t1'], 'm2': ['t1'], 'm3': ['t1', 't2'], \
+                                    'm4': ['t3'], 'm5': []}
+        for key, active in kills.items():
+            mat.add_row_by_key(key, {t: (1 if t in active else 0) \
+                                        for t in tests}, serialize=False)
+        mat.serialize()
+        # m2 duplicates m1 and m3 is subsumed by m1
+        self.assertEqual(Selector.prune_redundant(\
+                            ['m1', 'm2', 'm3', 'm4', 'm5', 'm6'], matrix_file), \
+                                                ['m1', 'm4', 'm5', 'm6'])
+        self.assertEqual(sorted(Selector(seed=0).select(\
+                            Techniques.DOMINANCE_PRUNING, list(kills), 10, \
+                            matrix_file=matrix_file)), ['m1', 'm4', 'm5'])
+        # no matrix, nothing pruned
+        self.assertEqual(Selector.prune_redundant(['m1', 'm2'], None), \
+                                                                ['m1', 'm2'])
+
+class Test_IncrementalSampling(unittest.TestCase):
+    def test_stop_on_confidence_interval(self):
+        self.assertTrue(check_is_right_optimizer(Criteria.STRONG_MUTATION, \
+                                    CriteriaOptimizers.INCREMENTAL_SAMPLING))
+        opt = CriteriaOptimizers.INCREMENTAL_SAMPLING.get_optimizer()(None, \
+                                    None, Criteria.STRONG_MUTATION, \
+                                    ci_width=0.2, confidence=0.95)
+        tos = [str(i) for i in range(1000)]
+        opt.reset('mart', tos, ['t1', 't2'])
+        self.assertIsNone(opt.get_confidence_interval())
+        fail = common_mix.GlobalConstants.FAIL_TEST_VERDICT
+        pass_ = common_mix.GlobalConstants.PASS_TEST_VERDICT
+        executed = 0
+        while opt.has_next_test_objective():
+            to = opt.get_next_test_objective()
+            self.assertEqual(to, tos[executed])
+            self.assertEqual(opt.get_test_execution_optimizer(to)\
+                                            .select_tests(100), ['t1', 't2'])
+            verdict = fail if executed % 2 == 0 else pass_
+            opt.feedback(to, {'t1': verdict, 't2': pass_})
+            executed += 1
+        # width 2 * 1.96 * sqrt(0.25/n) <= 0.2 => n close to 96, less with
+        # the finite population correction
+        self.assertTrue(80 <= executed <= 96, executed)
+        low, high = opt.get_confidence_interval()
+        self.assertTrue(low < 0.5 < high)
+
+        with self.assertRaises(SystemExit):
+            CriteriaOptimizers.INCREMENTAL_SAMPLING.get_optimizer()(None, \
+                                None, Criteria.STRONG_MUTATION, ci_width=0)
+
+if __name__ == "__main__":
+    verbosity=2
+    for tc in (Test_CriteriaElementSelector, Test_IncrementalSampling):
+        suite = unittest.TestLoader().loadTestsFromTestCase(tc)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
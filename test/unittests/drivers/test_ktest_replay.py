@@ -0,0 +1,137 @@
+from __future__ import print_function
+import os, sys
+import stat
+import shutil
+import tempfile
+
+import unittest
+
+from muteria.drivers.testgeneration.testcase_formats.ktest.ktest import \
+                        KTestTestFormat, ExecDirPool, KTestReplaySession
+import muteria.common.mix as common_mix
+from muteria.drivers.testgeneration import OutlogFingerprintMode
+from muteria.drivers.testgeneration import OutlogFingerprinter
+
+TMP_DIR_SUFFIX = '.muteria.test.tmp'
+
+# Fake klee-replay: counts the help calls, runs the executable with the
+# content of the ktest file as argument and reports the exit status
+FAKE_REPLAY_TOOL = """#!/bin/sh
+if [ "$1" = "--help" ]; then
+    echo x >> "$(dirname "$0")/help_calls"
+    echo "usage: klee-replay [--keep-replay-dir] <executable> <ktest>"
+    exit 1
+fi
+echo "KLEE-REPLAY: NOTE: Test file: $2"
+"$1" "$(cat "$2")"
+status=$?
+echo "KLEE-REPLAY: NOTE: EXIT STATUS: ABNORMAL $status (0 seconds)"
+exit 0
+"""
+
+FAKE_PROGRAM = """#!/bin/sh
+echo "arg: $1"
+touch created_file
+exit $1
+"""
+
+def _make_executable(filename, content):
+    with open(filename, 'w') as f:
+        f.write(content)
+    os.chmod(filename, os.stat(filename).st_mode | stat.S_IEXEC)
+
+class Test_KTestReplay(unittest.TestCase):
+    def setUp(self):
+        self._worktmpdir = tempfile.mkdtemp(suffix=TMP_DIR_SUFFIX)
+        self.bin_dir = os.path.join(self._worktmpdir, 'bin')
+        os.mkdir(self.bin_dir)
+        _make_executable(os.path.join(self.bin_dir, KTestTestFormat.tool), \
+                                                            FAKE_REPLAY_TOOL)
+        self.exe = os.path.join(self._worktmpdir, 'prog')
+        _make_executable(self.exe, FAKE_PROGRAM)
+        self.ktests = []
+        for i in range(3):
+            kt = os.path.join(self._worktmpdir, 'test{}.ktest'.format(i))
+            with open(kt, 'w') as f:
+                f.write(str(i))
+            self.ktests.append(kt)
+        self.pool_dir = os.path.join(self._worktmpdir, 'pool')
+
+    def tearDown(self):
+        shutil.rmtree(self._worktmpdir)
+
+    def _help_calls(self):
+        with open(os.path.join(self.bin_dir, 'help_calls')) as f:
+            return len(f.readlines())
+
+    def test_execute_test(self):
+        pool = ExecDirPool(root_dir=self.pool_dir)
+        for kt in self.ktests:
+            collected_output = []
+            verdict = KTestTestFormat.execute_test(self.exe, kt, None, \
+                            timeout=10, collected_output=collected_output, \
+                            custom_replay_tool_binary_dir=self.bin_dir, \
+                            exec_dir_pool=pool)
+            self.assertEqual(verdict, \
+                                common_mix.GlobalConstants.PASS_TEST_VERDICT)
+            i = self.ktests.index(kt)
+            self.assertEqual(collected_output, \
+                        [i, "arg: {}\n@MUTERIA.KLEE-REPLAY: EXIT STATUS: "
+                                        "ABNORMAL {}\n".format(i, i), False])
+        # Capabilities detected once, one execution dir reused and cleaned
+        self.assertEqual(self._help_calls(), 1)
+        self.assertEqual(os.listdir(self.pool_dir), ['execdir_0'])
+        self.assertEqual(os.listdir(os.path.join(self.pool_dir, \
+                                                            'execdir_0')), [])
+
+        # A modified replay tool is checked again
+        replay_tool = os.path.join(self.bin_dir, KTestTestFormat.tool)
+        st = os.stat(replay_tool)
+        os.utime(replay_tool, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        KTestTestFormat.execute_test(self.exe, self.ktests[0], None, \
+                            timeout=10, \
+                            custom_replay_tool_binary_dir=self.bin_dir, \
+                            exec_dir_pool=pool)
+        self.assertEqual(self._help_calls(), 2)
+
+    def test_replay_session(self):
+        with KTestReplaySession(self.exe, \
+                                custom_replay_tool_binary_dir=self.bin_dir, \
+                                exec_dir_pool_root=self.pool_dir) as session:
+            self.assertEqual(self._help_calls(), 1)
+            outputs = []
+            for kt in self.ktests:
+                collected_output = []
+                verdict = session.replay(kt, None, timeout=10, \
+                                        collected_output=collected_output, \
+                                        must_exist_dir_list=['d'])
+                self.assertEqual(verdict, \
+                                common_mix.GlobalConstants.PASS_TEST_VERDICT)
+                outputs.append(collected_output)
+            # each test is replayed with its own verdict and output
+            self.assertEqual(outputs, [[i, "arg: {}\n@MUTERIA.KLEE-REPLAY: "
+                                "EXIT STATUS: ABNORMAL {}\n".format(i, i), \
+                                False] for i in range(len(self.ktests))])
+            self.assertEqual(self._help_calls(), 1)
+            self.assertEqual(os.listdir(self.pool_dir), ['execdir_0'])
+        # the execution dirs of the session are removed on close
+        self.assertFalse(os.path.exists(self.pool_dir))
+
+    def test_execute_test_fingerprint(self):
+        pool = ExecDirPool(root_dir=self.pool_dir)
+        fingerprinter = OutlogFingerprinter(OutlogFingerprintMode.BLAKE2B_64)
+        collected_output = []
+        KTestTestFormat.execute_test(self.exe, self.ktests[2], None, \
+                            timeout=10, collected_output=collected_output, \
+                            custom_replay_tool_binary_dir=self.bin_dir, \
+                            exec_dir_pool=pool, \
+                            outlog_fingerprinter=fingerprinter)
+        out = "arg: 2\n@MUTERIA.KLEE-REPLAY: EXIT STATUS: ABNORMAL 2\n"
+        self.assertEqual(collected_output, [2, (len(out), \
+                        fingerprinter.get_fingerprint(out.encode())), False])
+
+if __name__ == "__main__":
+    verbosity=2
+    testsuite_replay = unittest.TestLoader().loadTestsFromTestCase(\
+                                                            Test_KTestReplay)
+    unittest.TextTestRunner(verbosity=verbosity).run(testsuite_replay)
@@ -0,0 +1,334 @@
+from __future__ import print_function
+import os, sys
+import time
+import shutil
+import tempfile
+import subprocess
+
+import unittest
+
+import muteria.common.fs as common_fs
+import muteria.common.matrices as common_matrices
+
+from muteria.drivers import DriversUtils
+from muteria.drivers.sandbox import ExecutionSandbox, ResourceLimit
+from muteria.drivers.criteria.tools_by_languages.c.mart.schemata import \
+                                        build_schemata_executable, \
+                                        build_forkserver_client, \
+                                        MetaMutantForkServer
+
+TMP_DIR_SUFFIX = '.muteria.test.tmp'
+
+C_COMPILER = None
+for _cc in ('clang', 'gcc', 'cc'):
+    if shutil.which(_cc) is not None:
+        C_COMPILER = _cc
+        break
+
+# Meta-mutant as written by Mart (mutant 2 changes the return value)
+META_MUTANT_SRC = r"""
+#include <stdio.h>
+#include <string.h>
+#include <time.h>
+#include <unistd.h>
+unsigned klee_semu_GenMu_Mutant_ID_Selector = 0;
+int main(int argc, char **argv) {
+    char line[64] = "";
+    int ret = argc;
+    if (klee_semu_GenMu_Mutant_ID_Selector == 2)
+        ret += 10;
+    if (fgets(line, sizeof(line), stdin) == NULL)
+        line[0] = '\0';
+    printf("mutant=%u arg=%s in=%s", klee_semu_GenMu_Mutant_ID_Selector, \
+                                            argc > 1 ? argv[1] : "", line);
+    if (argc > 1 && argv[1][0] == 's')
+        sleep(30);
+    if (argc > 1 && argv[1][0] == 'b')
+        while (clock() < CLOCKS_PER_SEC / 2)
+            ;
+    if (argc > 1 && argv[1][0] == 'f') {
+        char buf[4096];
+        FILE *f = fopen("written_file", "w");
+        int i;
+        memset(buf, 'x', sizeof(buf));
+        for (i = 0; f != NULL && i < 1024; i++)
+            fwrite(buf, 1, sizeof(buf), f);
+        if (f != NULL)
+            fclose(f);
+    }
+    return ret;
+}
+"""
+
+# Meta-mutant with mutation points reached by a constructor (mutants 3-4)
+CONSTRUCTOR_MUTANT_SRC = r"""
+#include <stdio.h>
+#include <unistd.h>
+unsigned klee_semu_GenMu_Mutant_ID_Selector = 0;
+void klee_semu_GenMu_Mutant_ID_Selector_Func(unsigned, unsigned);
+static int value;
+__attribute__((constructor))
+static void init(void) {
+    klee_semu_GenMu_Mutant_ID_Selector_Func(3, 4);
+    value = klee_semu_GenMu_Mutant_ID_Selector == 3 ? 30 : 1;
+}
+int main() {
+    klee_semu_GenMu_Mutant_ID_Selector_Func(1, 2);
+    if (klee_semu_GenMu_Mutant_ID_Selector == 1)
+        value += 10;
+    printf("value=%d pid=%d", value, (int) getpid());
+    return 0;
+}
+"""
+
+# Program's initialization in an object linked after the schemata runtime
+# (e.g. a library passed with the linking flags)
+LATE_INIT_SRC = r"""
+int muteria_test_init_count = 0;
+__attribute__((constructor))
+static void late_init(void) {
+    muteria_test_init_count++;
+}
+"""
+
+INIT_CHECK_SRC = r"""
+#include <stdio.h>
+extern int muteria_test_init_count;
+unsigned klee_semu_GenMu_Mutant_ID_Selector = 0;
+int main() {
+    printf("init=%d", muteria_test_init_count);
+    return 0;
+}
+"""
+
+# Program mutated with Mart for the real meta-mutant test
+MART_PROGRAM_SRC = r"""
+#include <stdio.h>
+#include <stdlib.h>
+static int offset;
+__attribute__((constructor))
+static void init(void) {
+    offset = 3;
+}
+int compute(int a, int b) {
+    if (a > b)
+        return a - b + offset;
+    return a * b + offset;
+}
+int main(int argc, char **argv) {
+    int a = argc > 1 ? atoi(argv[1]) : 0;
+    int b = argc > 2 ? atoi(argv[2]) : 0;
+    printf("%d\n", compute(a, b));
+    return 0;
+}
+"""
+
+@unittest.skipUnless(C_COMPILER is not None \
+                                and MetaMutantForkServer.is_supported(), \
+                            "no C compiler or fork server unsupported")
+class Test_MetaMutantForkServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._worktmpdir = tempfile.mkdtemp(suffix=TMP_DIR_SUFFIX)
+        src = os.path.join(cls._worktmpdir, 'meta.c')
+        with open(src, 'w') as f:
+            f.write(META_MUTANT_SRC)
+        cls.schemata_exe = os.path.join(cls._worktmpdir, 'meta')
+        cls.client_exe = os.path.join(cls._worktmpdir, 'client')
+        build_schemata_executable([src], cls.schemata_exe, \
+                                                        compiler=C_COMPILER)
+        build_forkserver_client(cls.client_exe, compiler=C_COMPILER)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls._worktmpdir)
+
+    def setUp(self):
+        self.server = MetaMutantForkServer(self.schemata_exe, self.client_exe)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def _run(self, mutant_id, arg, timeout=None):
+        env = os.environ.copy()
+        env.update(self.server.get_environment_vars(mutant_id))
+        return subprocess.run([self.server.get_executable(), arg], \
+                                input=b"data\n", env=env, timeout=timeout, \
+                                stdout=subprocess.PIPE)
+
+    def test_select_mutant_through_forkserver(self):
+        self.assertTrue(self.server.start())
+        self.assertEqual(self.server.get_executable(), self.client_exe)
+        for mid, retcode in ((0, 2), (2, 12), (5, 2)):
+            res = self._run(mid, 'x')
+            self.assertEqual(res.returncode, retcode)
+            self.assertEqual(res.stdout, \
+                        "mutant={} arg=x in=data\n".format(mid).encode())
+
+    def test_client_timeout_kills_execution(self):
+        self.assertTrue(self.server.start())
+        with self.assertRaises(subprocess.TimeoutExpired):
+            self._run(1, 'sleep', timeout=0.5)
+        time.sleep(0.5)
+        # only the server remains alive in its session (the finished
+        # connection handler is reaped at the next connection)
+        out = subprocess.run(['ps', '-o', 'pid=,stat=', '-s', \
+                                            str(self.server.proc.pid)], \
+                    stdout=subprocess.PIPE).stdout.decode().splitlines()
+        alive = [l.split()[0] for l in out if not l.split()[1].startswith('Z')]
+        self.assertEqual(alive, [str(self.server.proc.pid)])
+
+    def test_forkserver_after_all_constructors(self):
+        """ The fork server starts once the program is fully initialized,
+            including the constructors linked after the schemata runtime
+        """
+        srcs = []
+        for name, code in (('check.c', INIT_CHECK_SRC), \
+                                                ('late.c', LATE_INIT_SRC)):
+            srcs.append(os.path.join(self._worktmpdir, name))
+            with open(srcs[-1], 'w') as f:
+                f.write(code)
+        exe = os.path.join(self._worktmpdir, 'init_check')
+        build_schemata_executable(srcs[:1], exe, linking_flags=srcs[1], \
+                                                        compiler=C_COMPILER)
+        server = MetaMutantForkServer(exe, self.client_exe)
+        try:
+            self.assertTrue(server.start())
+            env = os.environ.copy()
+            env.update(server.get_environment_vars(1))
+            res = subprocess.run([server.get_executable()], env=env, \
+                                                    stdout=subprocess.PIPE)
+        finally:
+            server.stop()
+        self.assertEqual((res.returncode, res.stdout), (0, b"init=1"))
+
+    def test_forkserver_resource_usage_and_sandbox(self):
+        """ The forked executions' resource usage is reported by the client
+            and the executions are limited by the client's sandbox
+        """
+        self.assertTrue(self.server.start())
+        cost_data = common_matrices.ExecutionCostData
+        env = os.environ.copy()
+        env.update(self.server.get_environment_vars(2))
+        usage = cost_data.make_cost()
+        ret, out, _ = DriversUtils.execute_and_get_retcode_out_err(\
+                            self.server.get_executable(), ['b'], env=env, \
+                            timeout=20, resource_usage=usage)
+        self.assertEqual((ret, out), (12, "mutant=2 arg=b in="))
+        self.assertGreaterEqual(usage[cost_data.CPU_TIME], 0.4)
+
+        sandbox = ExecutionSandbox(disk_mb=1, use_cgroups=False)
+        with DriversUtils.sandboxed_execution(sandbox) as violations:
+            ret, _, _ = DriversUtils.execute_and_get_retcode_out_err(\
+                            self.server.get_executable(), ['f'], env=env, \
+                            timeout=20, cwd=self._worktmpdir)
+        self.assertEqual(violations, [ResourceLimit.DISK])
+        self.assertLessEqual(os.path.getsize(os.path.join(\
+                            self._worktmpdir, 'written_file')), 1024**2)
+
+    def test_constructor_mutants_executed_directly(self):
+        src = os.path.join(self._worktmpdir, 'ctor.c')
+        with open(src, 'w') as f:
+            f.write(CONSTRUCTOR_MUTANT_SRC)
+        exe = os.path.join(self._worktmpdir, 'ctor_meta')
+        build_schemata_executable([src], exe, compiler=C_COMPILER)
+        server = MetaMutantForkServer(exe, self.client_exe)
+        results = {}
+        try:
+            self.assertTrue(server.start())
+            for mid in (0, 1, 3, 4):
+                env = os.environ.copy()
+                env.update(server.get_environment_vars(mid))
+                p = subprocess.Popen([server.get_executable()], env=env, \
+                                                    stdout=subprocess.PIPE)
+                out, _ = p.communicate()
+                value, pid = [int(v.split('=')[1]) \
+                                            for v in out.decode().split()]
+                results[mid] = (value, pid == p.pid)
+        finally:
+            server.stop()
+        # (value, executed directly)
+        self.assertEqual(results, {0: (1, False), 1: (11, False), \
+                                            3: (30, True), 4: (1, True)})
+
+    def test_direct_execution(self):
+        # without server, the meta-mutant is executed directly
+        self.assertEqual(self.server.get_executable(), self.schemata_exe)
+        res = self._run(2, 'y')
+        self.assertEqual(res.returncode, 12)
+        self.assertEqual(res.stdout, b"mutant=2 arg=y in=data\n")
+        # client fallback when the server is gone
+        self.assertTrue(self.server.start())
+        env_vars = self.server.get_environment_vars(2)
+        self.server.stop()
+        env = os.environ.copy()
+        env.update(env_vars)
+        res = subprocess.run([self.client_exe, 'z'], input=b"", env=env, \
+                                                    stdout=subprocess.PIPE)
+        self.assertEqual(res.returncode, 12)
+        self.assertEqual(res.stdout, b"mutant=2 arg=z in=")
+
+@unittest.skipUnless(shutil.which('mart') is not None \
+                            and shutil.which('clang') is not None \
+                            and MetaMutantForkServer.is_supported(), \
+                            "Mart or clang unavailable")
+class Test_MartMetaMutantSchemata(unittest.TestCase):
+    """ Executions of a meta-mutant generated by Mart, through the fork
+        server, are those of the direct executions of the meta-mutant
+    """
+    def setUp(self):
+        self._worktmpdir = tempfile.mkdtemp(suffix=TMP_DIR_SUFFIX)
+
+    def tearDown(self):
+        shutil.rmtree(self._worktmpdir)
+
+    def test_mart_meta_mutant(self):
+        src = os.path.join(self._worktmpdir, 'prog.c')
+        with open(src, 'w') as f:
+            f.write(MART_PROGRAM_SRC)
+        bitcode = os.path.join(self._worktmpdir, 'prog.bc')
+        subprocess.check_call(['clang', '-g', '-c', '-emit-llvm', '-o', \
+                                                            bitcode, src])
+        subprocess.check_call(['mart', '-no-WM', '-no-COV', bitcode], \
+                            cwd=self._worktmpdir, stdout=subprocess.DEVNULL, \
+                                                    stderr=subprocess.DEVNULL)
+        mart_out = os.path.join(self._worktmpdir, 'mart-out-0')
+        mutant_ids = sorted(int(m) for m in common_fs.loadJSON(\
+                        os.path.join(mart_out, 'mutantsInfos.json')))
+        self.assertGreater(len(mutant_ids), 0)
+        schemata_exe = os.path.join(self._worktmpdir, 'meta')
+        client_exe = os.path.join(self._worktmpdir, 'client')
+        build_schemata_executable([os.path.join(mart_out, \
+                                'prog.MetaMu.bc')], schemata_exe)
+        build_forkserver_client(client_exe)
+
+        server = MetaMutantForkServer(schemata_exe, client_exe)
+        outputs = {}
+        try:
+            for use_server in (False, True):
+                if use_server:
+                    self.assertTrue(server.start())
+                for mid in [0] + mutant_ids:
+                    env = os.environ.copy()
+                    env.update(server.get_environment_vars(mid))
+                    res = subprocess.run([server.get_executable(), '7', \
+                                    '2'], env=env, stdout=subprocess.PIPE, \
+                                    stderr=subprocess.DEVNULL, timeout=10)
+                    outputs.setdefault(mid, []).append(\
+                                                (res.returncode, res.stdout))
+        finally:
+            server.stop()
+        self.assertEqual(outputs[0], [(0, b"8\n")] * 2)
+        for mid in mutant_ids:
+            self.assertEqual(outputs[mid][0], outputs[mid][1], \
+                                                    "mutant {}".format(mid))
+        self.assertTrue(any(outputs[mid][0] != outputs[0][0] \
+                                                    for mid in mutant_ids))
+
+if __name__ == "__main__":
+    verbosity=2
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite([\
+                    loader.loadTestsFromTestCase(Test_MetaMutantForkServer), \
+                    loader.loadTestsFromTestCase(Test_MartMetaMutantSchemata)])
+    unittest.TextTestRunner(verbosity=verbosity).run(suite)
@@ -0,0 +1,97 @@
+from __future__ import print_function
+import os, sys
+import shutil
+import tempfile
+
+import unittest
+
+import muteria.common.fs as common_fs
+from muteria.drivers.criteria.tools_by_languages.c.mart.mart import \
+                                                            CriteriaToolMart
+
+TMP_DIR_SUFFIX = '.muteria.test.tmp'
+
+class _FakeMart(object):
+    """ Only the attributes used to store the separated mutants
+    """
+    def __init__(self, mart_out):
+        self.separate_muts_folder_name = 'mutants.out'
+        self.separate_muts_dir = os.path.join(mart_out, \
+                                                self.separate_muts_folder_name)
+        self.archive_separated = True
+        self.meta_test_generation_obj = self
+    def get_archive_codec(self):
+        return None
+
+class Test_MartSeparatedMutantsStore(unittest.TestCase):
+    def setUp(self):
+        self._worktmpdir = tempfile.mkdtemp(suffix=TMP_DIR_SUFFIX)
+        self.mart = _FakeMart(self._worktmpdir)
+        for mid in ('1', '2', '3'):
+            mdir = os.path.join(self.mart.separate_muts_dir, mid)
+            os.makedirs(mdir)
+            with open(os.path.join(mdir, 'prog'), 'w') as f:
+                f.write("mutant "+mid)
+
+    def tearDown(self):
+        shutil.rmtree(self._worktmpdir)
+
+    def test_store_in_parallel(self):
+        CriteriaToolMart._compile_and_store_separated_mutants(self.mart, \
+                                            'prog', '', parallel_count=2)
+        self.assertFalse(os.path.isdir(self.mart.separate_muts_dir))
+        archive = common_fs.IndexedArchive.get_archive_filename_of(\
+                                                self.mart.separate_muts_dir)
+        self.assertEqual(set(common_fs.IndexedArchive.list_members(archive)),\
+                            {'mutants.out/'+m+s for m in ('1', '2', '3') \
+                                                    for s in ('', '/prog')})
+        self.assertEqual(common_fs.IndexedArchive.read_member(archive, \
+                                            'mutants.out/2/prog'), b"mutant 2")
+
+    def test_compile_bitcode_only_mutants(self):
+        """ The mutants written as bitcode only (mart ran with its no
+            compilation option) are compiled by the pool
+        """
+        if shutil.which('clang') is None:
+            self.skipTest("clang unavailable")
+        src = os.path.join(self._worktmpdir, 'm.c')
+        with open(src, 'w') as f:
+            f.write("int main() { return 0; }\n")
+        for mid in ('1', '2', '3'):
+            mdir = os.path.join(self.mart.separate_muts_dir, mid)
+            os.remove(os.path.join(mdir, 'prog'))
+            ret = os.system("clang -c -emit-llvm -o {} {}".format(\
+                                    os.path.join(mdir, 'prog.bc'), src))
+            self.assertEqual(ret, 0)
+        CriteriaToolMart._compile_and_store_separated_mutants(self.mart, \
+                            'prog', '', parallel_count=3, keep_bitcode=False)
+        archive = common_fs.IndexedArchive.get_archive_filename_of(\
+                                                self.mart.separate_muts_dir)
+        self.assertEqual(set(common_fs.IndexedArchive.list_members(archive)),\
+                            {'mutants.out/'+m+s for m in ('1', '2', '3') \
+                                                    for s in ('', '/prog')})
+
+    def test_mart_option_detection(self):
+        prog = os.path.join(self._worktmpdir, 'mart')
+        with open(prog, 'w') as f:
+            f.write("#!/bin/sh\necho '  -keep-mutants-bc   - Keep the bc'\n"
+                    "echo '  -no-compilation-x  - Other'\n")
+        os.chmod(prog, 0o755)
+        self.assertTrue(CriteriaToolMart._mart_has_option(prog, \
+                                                        '-keep-mutants-bc'))
+        self.assertFalse(CriteriaToolMart._mart_has_option(prog, \
+                            CriteriaToolMart.MART_NO_COMPILATION_OPTION))
+
+    def test_former_targz_store_migrated(self):
+        common_fs.TarGz.compressDir(self.mart.separate_muts_dir, \
+                                                    remove_in_directory=True)
+        archive = CriteriaToolMart._get_separated_mutants_archive(self.mart)
+        self.assertTrue(common_fs.IndexedArchive.is_archive_file(archive))
+        self.assertEqual(common_fs.IndexedArchive.read_member(archive, \
+                                            'mutants.out/3/prog'), b"mutant 3")
+
+if __name__ == "__main__":
+    verbosity=2
+    suite = unittest.TestLoader().loadTestsFromTestCase(\
+                                            Test_MartSeparatedMutantsStore)
+    unittest.TextTestRunner(verbosity=verbosity).run(suite)
@@ -0,0 +1,90 @@
+from __future__ import print_function
+import os, sys
+import doctest
+
+import unittest
+
+import muteria.drivers.testgeneration as testgeneration
+from muteria.drivers.testgeneration import OutlogFingerprintMode
+from muteria.drivers.testgeneration import OutlogFingerprinter
+
+class Test_OutlogFingerprint(unittest.TestCase):
+    def test_modes(self):
+        for mode, bits in ((OutlogFingerprintMode.BLAKE2B_64, 64), \
+                                    (OutlogFingerprintMode.BLAKE2B_128, 128)):
+            fp = mode.compute(b'some output')
+            self.assertTrue(type(fp) == int and 0 <= fp < 2**bits)
+            self.assertEqual(fp, mode.compute(b'some output'))
+            self.assertNotEqual(fp, mode.compute(b'some output.'))
+        self.assertEqual(OutlogFingerprintMode.SHA512.compute(b'x'), \
+            'a4abd4448c49562d828115d13a1fccea927f52b4d5459297f8b43e42da89238b'
+            'c13626e43dcb38ddb082488927ec904fb42057443983e88585179d50551afe62')
+
+    def test_collision_check(self):
+        fingerprinter = OutlogFingerprinter(OutlogFingerprintMode.BLAKE2B_64, \
+                                                collision_check=True)
+        for data in (b'abc', b'abcdefgh' * 10000):
+            fp = fingerprinter.get_fingerprint(data)
+            self.assertEqual(fp, fingerprinter.get_fingerprint(data))
+            # The output is kept, its SHA-512 is not computed
+            kept = fingerprinter.fingerprint2kept[fp]
+            self.assertEqual(kept.raw, data)
+            self.assertIsNone(kept.sha512)
+            # Simulate a collision with another output
+            fingerprinter.fingerprint2kept[fp] = \
+                                    testgeneration._KeptOutput(raw=data + b'_')
+            self.assertEqual(fingerprinter.get_fingerprint(data), \
+                                    OutlogFingerprintMode.SHA512.compute(data))
+        self.assertEqual(fingerprinter.collisions_count, 2)
+
+        stream = fingerprinter.new_stream()
+        stream.update(b'abc')
+        self.assertEqual(stream.get_fingerprint(), \
+                                    OutlogFingerprintMode.SHA512.compute(b'abc'))
+        self.assertEqual(fingerprinter.collisions_count, 3)
+
+        # Over the kept outputs size, the SHA-512 digest is kept
+        fingerprinter = OutlogFingerprinter(OutlogFingerprintMode.BLAKE2B_64, \
+                                                collision_check=True)
+        fingerprinter.KEPT_OUTPUTS_MAX_BYTES = 5
+        fp = fingerprinter.get_fingerprint(b'abc')
+        self.assertEqual(fingerprinter.fingerprint2kept[fp].raw, b'abc')
+        for data in (b'defgh', b'ijklmnop'):
+            fp = fingerprinter.get_fingerprint(data)
+            kept = fingerprinter.fingerprint2kept[fp]
+            self.assertIsNone(kept.raw)
+            self.assertEqual(len(kept.sha512), 64)
+            stream = fingerprinter.new_stream()
+            for i in range(len(data)):
+                stream.update(data[i:i+1])
+            self.assertEqual(stream.get_fingerprint(), fp)
+        fingerprinter.fingerprint2kept[fp] = \
+                                testgeneration._KeptOutput(raw=b'ijklmnoq')
+        stream = fingerprinter.new_stream()
+        stream.update(b'ijklmnop')
+        self.assertEqual(stream.get_fingerprint(), \
+                            OutlogFingerprintMode.SHA512.compute(b'ijklmnop'))
+        self.assertEqual(fingerprinter.collisions_count, 1)
+
+        # No check for SHA512
+        self.assertFalse(OutlogFingerprinter(OutlogFingerprintMode.SHA512, \
+                                            collision_check=True).collision_check)
+
+    def test_mode_name(self):
+        fingerprinter = OutlogFingerprinter(OutlogFingerprintMode.BLAKE2B_64)
+        self.assertEqual(fingerprinter.get_mode_name(), \
+                                    OutlogFingerprintMode.BLAKE2B_64.get_str())
+        self.assertEqual(fingerprinter.get_mode_name(hash_outlog=False), \
+                                    OutlogFingerprinter.NO_FINGERPRINT_MODE)
+
+def load_tests(loader, tests, ignore):
+    tests.addTests(doctest.DocTestSuite(testgeneration))
+    return tests
+
+if __name__ == "__main__":
+    verbosity=2
+    testsuite_fingerprint = unittest.TestLoader().loadTestsFromTestCase(\
+                                                    Test_OutlogFingerprint)
+    doc_testsuite = doctest.DocTestSuite(testgeneration)
+    unittest.TextTestRunner(verbosity=verbosity).run(testsuite_fingerprint)
+    unittest.TextTestRunner(verbosity=verbosity).run(doc_testsuite)
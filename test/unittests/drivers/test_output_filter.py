@@ -0,0 +1,113 @@
+from __future__ import print_function
+import os, sys
+import re
+import random
+import doctest
+
+import unittest
+
+import muteria.drivers.testgeneration.output_filter as output_filter
+from muteria.drivers.testgeneration.output_filter import OutputNoiseFilter
+from muteria.drivers.testgeneration import OutlogFingerprintMode
+from muteria.drivers.testgeneration import OutlogFingerprinter
+from muteria.drivers.testgeneration.testcase_formats.ktest.ktest import \
+                                                            KTestTestFormat
+
+def _line_by_line(out, clean_regex, status_regex):
+    """ Clean the whole output line by line
+    """
+    if len(out) > 0 and out[-1] == '\n':
+        out = out[:-1]
+        last_char = '\n'
+    else:
+        last_char = ''
+    res = []
+    for line in out.encode('utf-8').splitlines():
+        line = line.decode('utf-8')
+        if status_regex.search(line) is not None:
+            res.append('@' + line)
+        elif clean_regex.search(line) is None:
+            res.append(line)
+    return '\n'.join(res) + last_char
+
+def _filter_by_chunks(out, clean_regex, status_regex, rng, sink=None):
+    noise_filter = OutputNoiseFilter([clean_regex], \
+                rewrite_regexes=[(status_regex, lambda l: '@' + l)], sink=sink)
+    data = out.encode('utf-8')
+    pos = 0
+    while pos < len(data):
+        size = rng.randint(1, 7)
+        noise_filter.feed(data[pos:pos+size])
+        pos += size
+    noise_filter.finish()
+    return noise_filter
+
+class Test_OutputNoiseFilter(unittest.TestCase):
+    def test_same_as_line_by_line(self):
+        clean_regex = KTestTestFormat.clean_everything_regex_old
+        status_regex = re.compile("^EXIT STATUS: ")
+        pieces = ["out", "été", "", "klee-replay: ARGS: -x", \
+                    "EXIT STATUS: NORMAL", "note: pty master: closed", \
+                    "TIMEOUT: ATTEMPTING GDB EXIT"]
+        rng = random.Random(0)
+        for _ in range(3000):
+            out = ''.join(rng.choice(pieces) + \
+                                    rng.choice(['\n', '\r\n', '\r', '']) \
+                                    for _ in range(rng.randint(0, 10)))
+            expected = _line_by_line(out, clean_regex, status_regex)
+            self.assertEqual(_filter_by_chunks(out, clean_regex, \
+                                        status_regex, rng).get_output(), \
+                                                        expected, repr(out))
+
+    def test_crlf_line_ends(self):
+        """ The final line ends are handled as the klee-replay noise removal
+        """
+        clean_regex = KTestTestFormat.clean_everything_regex_new
+        status_regex = KTestTestFormat.status_regex_new
+        for out, expected in (('x\r\n\r\n', 'x\n\n'), ('x\n\n', 'x\n'), \
+                            ('\r', ''), ('x\r', 'x'), ('x\r\r', 'x\n'), \
+                            ('\r\n', '\n'), ('x\r\ny\r\n', 'x\ny\n'), \
+                            ('KLEE-REPLAY: NOTE: x\r', ''), \
+                            ('KLEE-REPLAY: NOTE: x\r\n', '\n')):
+            for seed in range(5):
+                self.assertEqual(_filter_by_chunks(out, clean_regex, \
+                            re.compile("^EXIT STATUS: "), \
+                            random.Random(seed)).get_output(), expected, \
+                                                                    repr(out))
+            self.assertEqual(KTestTestFormat._remove_output_noise(0, out, \
+                                    clean_regex, status_regex)[1], expected)
+
+    def test_sink_fingerprint(self):
+        clean_regex = re.compile("^noise")
+        out = "a\nnoise 1\né\nnoise 2\nb\n"
+        fingerprinter = OutlogFingerprinter(OutlogFingerprintMode.BLAKE2B_64, \
+                                                        collision_check=True)
+        stream = fingerprinter.new_stream()
+        _filter_by_chunks(out, clean_regex, re.compile("^status"), \
+                                    random.Random(1), sink=stream.update)
+        self.assertEqual(stream.get_length(), len("a\né\nb\n"))
+        self.assertEqual(stream.get_fingerprint(), \
+                fingerprinter.get_fingerprint("a\né\nb\n".encode()))
+        self.assertEqual(fingerprinter.collisions_count, 0)
+
+        # The klee-replay noise removal keeps its behavior
+        retcode, res, exit_status = KTestTestFormat._remove_output_noise(0, \
+                            "KLEE-REPLAY: NOTE: Test file: t\nx\n"
+                            "KLEE-REPLAY: NOTE: EXIT STATUS: ABNORMAL 3 "
+                                                        "(0 seconds)\n", \
+                            KTestTestFormat.clean_everything_regex_new, \
+                            KTestTestFormat.status_regex_new)
+        self.assertEqual((retcode, res, exit_status), \
+                (0, "x\n@MUTERIA.KLEE-REPLAY: EXIT STATUS: ABNORMAL 3\n", 3))
+
+def load_tests(loader, tests, ignore):
+    tests.addTests(doctest.DocTestSuite(output_filter))
+    return tests
+
+if __name__ == "__main__":
+    verbosity=2
+    testsuite_filter = unittest.TestLoader().loadTestsFromTestCase(\
+                                                    Test_OutputNoiseFilter)
+    doc_testsuite = doctest.DocTestSuite(output_filter)
+    unittest.TextTestRunner(verbosity=verbosity).run(testsuite_filter)
+    unittest.TextTestRunner(verbosity=verbosity).run(doc_testsuite)
@@ -0,0 +1,193 @@
+from __future__ import print_function
+import os, sys
+import time
+import shutil
+import tempfile
+import py_compile
+import importlib.util
+
+import unittest
+
+from muteria.drivers.testgeneration.testcase_formats.python_unittest import \
+                        python_unittest_runner, PythonUnittestWorkerPool
+from muteria.drivers.testgeneration.testcase_formats.python_unittest import \
+                                                            unittest_worker
+from muteria.common.mix import GlobalConstants
+
+TMP_DIR_SUFFIX = '.muteria.test.tmp'
+
+LIB_SRC = """
+STATE = []
+def f(x):
+    return x + 1
+"""
+
+# The module state must be reset between the tests
+TEST_LIB_SRC = """
+import unittest
+import lib
+class Test(unittest.TestCase):
+    def test_f(self):
+        lib.STATE.append(1)
+        print("state", len(lib.STATE))
+        self.assertEqual(lib.f(1), 2)
+"""
+
+TEST_SLOW_SRC = """
+import time
+import unittest
+class Test(unittest.TestCase):
+    def test_slow(self):
+        time.sleep(30)
+"""
+
+TEST_MOD_SRC = """
+import unittest
+class Test(unittest.TestCase):
+    def test_x(self):
+        print("in test_x")
+"""
+
+def _write(filename, content):
+    with open(filename, 'w') as f:
+        f.write(content)
+
+def _write_package(root_dir):
+    """ pkg.sub.test_mod
+    """
+    sub_dir = os.path.join(root_dir, 'pkg', 'sub')
+    os.makedirs(sub_dir)
+    _write(os.path.join(root_dir, 'pkg', '__init__.py'), '')
+    _write(os.path.join(sub_dir, '__init__.py'), '')
+    _write(os.path.join(sub_dir, 'test_mod.py'), TEST_MOD_SRC)
+
+class Test_UnittestWorkerTestName(unittest.TestCase):
+    def setUp(self):
+        self._worktmpdir = tempfile.mkdtemp(suffix=TMP_DIR_SUFFIX)
+        _write_package(self._worktmpdir)
+        sys.path.insert(0, self._worktmpdir)
+
+    def tearDown(self):
+        sys.path.remove(self._worktmpdir)
+        for name in list(sys.modules):
+            if name == 'pkg' or name.startswith('pkg.'):
+                del sys.modules[name]
+        shutil.rmtree(self._worktmpdir)
+
+    def test_dotted_name_module(self):
+        """ The module is the longest importable prefix
+        """
+        for name in ('pkg.sub.test_mod.Test.test_x', 'pkg.sub.test_mod'):
+            self.assertEqual(\
+                        unittest_worker._test_name_to_module_and_name(name), \
+                                                    ('pkg.sub.test_mod', name))
+        self.assertEqual(unittest_worker._test_name_to_module_and_name(\
+                                'pkg.missing.Test'), ('pkg', 'pkg.missing.Test'))
+        self.assertEqual(unittest_worker._test_name_to_module_and_name(\
+                                'nopkg_x.Test'), ('nopkg_x', 'nopkg_x.Test'))
+
+@unittest.skipUnless(PythonUnittestWorkerPool.is_supported(), \
+                                        "python unittest worker unsupported")
+class Test_PythonUnittestWorkerPool(unittest.TestCase):
+    def setUp(self):
+        self._worktmpdir = tempfile.mkdtemp(suffix=TMP_DIR_SUFFIX)
+        _write(os.path.join(self._worktmpdir, 'lib.py'), LIB_SRC)
+        _write(os.path.join(self._worktmpdir, 'test_lib.py'), TEST_LIB_SRC)
+        _write(os.path.join(self._worktmpdir, 'test_slow.py'), TEST_SLOW_SRC)
+        self.pool = PythonUnittestWorkerPool()
+
+    def tearDown(self):
+        self.pool.shutdown()
+        shutil.rmtree(self._worktmpdir)
+
+    def test_run_reuse_and_reset(self):
+        for _ in range(3):
+            retcode, out, timedout = self.pool.run_test('test_lib.py', \
+                                                            self._worktmpdir)
+            self.assertEqual(retcode, 0)
+            self.assertFalse(timedout)
+            self.assertIn("state 1\n", out)
+            self.assertIn("test_f (test_lib.Test", out)
+        self.assertEqual(len(self.pool.idle_workers), 1)
+
+    def test_stale_worker_replaced(self):
+        retcode, _, _ = self.pool.run_test('test_lib.py', self._worktmpdir)
+        self.assertEqual(retcode, 0)
+        worker = self.pool.idle_workers[0][1]
+        # Mutate the code under test
+        time.sleep(0.01)
+        _write(os.path.join(self._worktmpdir, 'lib.py'), \
+                                        LIB_SRC.replace("x + 1", "x + 2"))
+        retcode, out, _ = self.pool.run_test('test_lib.py', self._worktmpdir)
+        self.assertEqual(retcode, 1)
+        self.assertIn("FAIL", out)
+        self.assertIsNot(self.pool.idle_workers[0][1], worker)
+
+    def test_stale_worker_same_mtime(self):
+        """ The mutants are copied into the repository with their original
+            modification time
+        """
+        lib_file = os.path.join(self._worktmpdir, 'lib.py')
+        # byte code of the original source cached in the repository
+        py_compile.compile(lib_file, \
+                                cfile=importlib.util.cache_from_source(lib_file))
+        retcode, _, _ = self.pool.run_test('test_lib.py', self._worktmpdir)
+        self.assertEqual(retcode, 0)
+        lib_stat = os.stat(lib_file)
+        _write(lib_file, LIB_SRC.replace("x + 1", "x + 2"))
+        os.utime(lib_file, ns=(lib_stat.st_atime_ns, lib_stat.st_mtime_ns))
+        retcode, out, _ = self.pool.run_test('test_lib.py', self._worktmpdir)
+        self.assertEqual(retcode, 1)
+        self.assertIn("FAIL", out)
+
+        # Rewriting the same content does not make the worker stale
+        worker = self.pool.idle_workers[0][1]
+        _write(lib_file, LIB_SRC.replace("x + 1", "x + 2"))
+        self.pool.run_test('test_lib.py', self._worktmpdir)
+        self.assertIs(self.pool.idle_workers[0][1], worker)
+
+    def test_dotted_name(self):
+        _write_package(self._worktmpdir)
+        retcode, out, _ = self.pool.run_test('pkg.sub.test_mod.Test.test_x', \
+                                                            self._worktmpdir)
+        self.assertEqual(retcode, 0)
+        self.assertIn("in test_x", out)
+
+    def test_timeout(self):
+        start = time.time()
+        retcode, _, timedout = self.pool.run_test('test_slow.py', \
+                                            self._worktmpdir, timeout=0.5)
+        self.assertLess(time.time() - start, 10)
+        self.assertTrue(timedout)
+        self.assertEqual(retcode, -9)
+
+    def test_env_vars_key(self):
+        self.pool.run_test('test_lib.py', self._worktmpdir)
+        self.pool.run_test('test_lib.py', self._worktmpdir, \
+                                                    env_vars={'X_VAR': '1'})
+        self.assertEqual(len(self.pool.idle_workers), 2)
+        self.assertFalse(PythonUnittestWorkerPool.is_supported(\
+                                    {'COVERAGE_PROCESS_START': 'x.coveragerc'}))
+
+    def test_runner_collected_output(self):
+        for use_worker_pool in (True, False):
+            collected_output = []
+            verdict = python_unittest_runner('test_lib.py', self._worktmpdir, \
+                                    None, None, None, \
+                                    collected_output=collected_output, \
+                                    use_worker_pool=use_worker_pool)
+            self.assertEqual(verdict, GlobalConstants.PASS_TEST_VERDICT)
+            self.assertEqual(len(collected_output), 3)
+            self.assertEqual(collected_output[0], 0)
+            self.assertIn("state 1\n", collected_output[1])
+            self.assertFalse(collected_output[2])
+
+if __name__ == "__main__":
+    verbosity=2
+    testsuite_pool = unittest.TestLoader().loadTestsFromTestCase(\
+                                            Test_PythonUnittestWorkerPool)
+    testsuite_name = unittest.TestLoader().loadTestsFromTestCase(\
+                                            Test_UnittestWorkerTestName)
+
+    unittest.TextTestRunner(verbosity=verbosity).run(testsuite_pool)
+    unittest.TextTestRunner(verbosity=verbosity).run(testsuite_name)
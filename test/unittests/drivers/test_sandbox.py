@@ -0,0 +1,163 @@
+from __future__ import print_function
+import os, sys
+import shutil
+import resource
+import tempfile
+import subprocess
+
+import unittest
+
+import muteria.common.mix as common_mix
+import muteria.common.matrices as common_matrices
+from muteria.drivers import DriversUtils
+from muteria.drivers.sandbox import ExecutionSandbox, ResourceLimit
+
+TMP_DIR_SUFFIX = '.muteria.test.tmp'
+
+class Test_ExecutionSandbox(unittest.TestCase):
+    def setUp(self):
+        self._worktmpdir = tempfile.mkdtemp(suffix=TMP_DIR_SUFFIX)
+
+    def tearDown(self):
+        shutil.rmtree(self._worktmpdir)
+
+    def _run(self, sandbox, code, timeout=None):
+        with DriversUtils.sandboxed_execution(sandbox) as violations:
+            ret, out, _ = DriversUtils.execute_and_get_retcode_out_err(\
+                        sys.executable, args_list=['-c', code], \
+                                                            timeout=timeout)
+        return ret, out, violations
+
+    def test_private_tmp_and_disk_quota(self):
+        sandbox = ExecutionSandbox(disk_mb=1, use_cgroups=False, \
+                                                tmp_root=self._worktmpdir)
+        ret, out, violations = self._run(sandbox, \
+                                    "import os; print(os.environ['TMPDIR'])")
+        self.assertEqual((ret, violations), (0, []))
+        tmp_dir = out.strip()
+        self.assertEqual(os.path.dirname(tmp_dir), self._worktmpdir)
+        # removed after the execution
+        self.assertFalse(os.path.exists(tmp_dir))
+
+        _, _, violations = self._run(sandbox, "import os; open(os.path.join("
+                        "os.environ['TMPDIR'], 'f'), 'wb').write(b'x' * 10)")
+        self.assertEqual(violations, [])
+        _, _, violations = self._run(sandbox, "import os; open(os.path.join("
+                "os.environ['TMPDIR'], 'f'), 'wb').write(b'x' * 2 * 1024**2)")
+        self.assertEqual(violations, [ResourceLimit.DISK])
+        self.assertEqual(os.listdir(self._worktmpdir), [])
+
+    def test_cpu_quota_rlimit(self):
+        sandbox = ExecutionSandbox(cpu_quota=0.5, use_cgroups=False)
+        _, _, violations = self._run(sandbox, "while True: pass", timeout=2)
+        self.assertEqual(violations, [ResourceLimit.CPU])
+        # no sandbox
+        _, _, violations = self._run(None, "pass")
+        self.assertEqual(violations, [])
+
+    def test_exec_wrappers_rlimits(self):
+        """ The rlimits are set by prlimit, or by the Python interpreter
+        """
+        code = "import resource as r; print([r.getrlimit(l) for l in " \
+                        "(r.RLIMIT_AS, r.RLIMIT_CPU, r.RLIMIT_FSIZE)])"
+        expected = str([(512 * 1024**2,) * 2, (5, 6), (1024**2,) * 2])
+        for prlimit in (ExecutionSandbox.PRLIMIT, None):
+            class _Sandbox(ExecutionSandbox):
+                PRLIMIT = prlimit
+            sandbox = _Sandbox(memory_mb=512, cpu_quota=0.5, disk_mb=1, \
+                                                            use_cgroups=False)
+            ret, out, violations = self._run(sandbox, code, timeout=10)
+            self.assertEqual((ret, out.strip(), violations), \
+                                                        (0, expected, []))
+        # the program is executed by the Python wrapper
+        cmd = sandbox.start_execution(timeout=10).wrap_command(['true'])
+        self.assertEqual(cmd[:3], [sys.executable, '-S', '-c'])
+        self.assertEqual(cmd[-1], 'true')
+
+    def test_simulated_cgroup(self):
+        """ Use a directory as cgroup v2 hierarchy
+        """
+        class _Sandbox(ExecutionSandbox):
+            CGROUP_ROOT = self._worktmpdir
+        with open(os.path.join(self._worktmpdir, 'cgroup.controllers'), \
+                                                                    'w') as f:
+            f.write('cpu memory pids')
+        with open('/proc/self/cgroup') as f:
+            if '0::/\n' not in f.readlines():
+                self.skipTest("process not in the root cgroup")
+        sandbox = _Sandbox(memory_mb=1, max_pids=4, cpu_quota=0.5)
+        self.assertTrue(sandbox.uses_cgroups())
+        sb_exec = sandbox.start_execution()
+        # the process of the program is attached to the cgroup by the exec
+        # wrapper (without rlimits)
+        out = subprocess.check_output(sb_exec.wrap_command([sys.executable, \
+                    '-c', 'import os, resource; print(os.getpid(), '
+                            'resource.getrlimit(resource.RLIMIT_AS)[0])']))
+        with open(sb_exec.cgroup_procs) as f:
+            self.assertEqual(out.decode().split(), \
+                            [f.read().strip(), str(resource.RLIM_INFINITY)])
+        for filename, val in (('memory.max', str(1024**2)), \
+                                    ('pids.max', '4'), \
+                                    ('cpu.max', '50000 100000')):
+            with open(os.path.join(sb_exec.cgroup, filename)) as f:
+                self.assertEqual(f.read(), val)
+        with open(sb_exec.cgroup_procs, 'w') as f:
+            f.write('')
+        with open(os.path.join(sb_exec.cgroup, 'memory.events'), 'w') as f:
+            f.write('low 0\nhigh 0\nmax 3\noom 1\noom_kill 1\n')
+        with open(os.path.join(sb_exec.cgroup, 'pids.events'), 'w') as f:
+            f.write('max 2\n')
+        with open(os.path.join(sb_exec.cgroup, 'cpu.stat'), 'w') as f:
+            f.write('usage_usec 500000\nnr_periods 10\nnr_throttled 3\n')
+        # memory has precedence
+        self.assertEqual(sb_exec.finish(-9), ResourceLimit.MEMORY)
+
+        # the throttled executions violate the CPU limit at the timeout
+        for timedout, expected in ((False, None), (True, ResourceLimit.CPU)):
+            sb_exec = sandbox.start_execution(timeout=1)
+            with open(sb_exec.cgroup_procs, 'w') as f:
+                f.write('')
+            with open(os.path.join(sb_exec.cgroup, 'cpu.stat'), 'w') as f:
+                f.write('usage_usec 500000\nnr_periods 10\n'
+                                                        'nr_throttled 3\n')
+            self.assertEqual(sb_exec.finish(-15, timedout=timedout), expected)
+
+    def test_matrix_verdict(self):
+        mat_file = os.path.join(self._worktmpdir, 'matrix.csv')
+        mat = common_matrices.ExecutionMatrix(filename=mat_file, \
+                                            non_key_col_list=['t1', 't2'])
+        other_verdicts = (common_mix.GlobalConstants.FAIL_TEST_VERDICT, \
+                            common_mix.GlobalConstants.PASS_TEST_VERDICT, \
+                            common_mix.GlobalConstants.TEST_EXECUTION_ERROR, \
+                            common_mix.GlobalConstants.UNCERTAIN_TEST_VERDICT)
+        vals = set()
+        for limit_index, limit in enumerate(ResourceLimit):
+            verdict = limit.get_test_verdict()
+            self.assertNotIn(verdict, other_verdicts)
+            val = mat.getResourceLimitCellVal(limit_index)
+            self.assertNotEqual(val, mat.getActiveCellDefaultVal())
+            self.assertTrue(mat.is_active_cell_func(val))
+            vals.add(val)
+            self.assertEqual(common_mix.GlobalConstants\
+                .RESOURCE_LIMIT_TEST_VERDICTS.index(verdict), limit_index)
+            mat.add_row_by_key(limit.get_str(), {'t1': val, 't2': 0})
+        # one distinct value per limit
+        self.assertEqual(len(vals), len(ResourceLimit))
+        # round trip through the matrix file
+        val_to_verdict = {mat.getResourceLimitCellVal(i): v for i, v in \
+                enumerate(common_mix.GlobalConstants\
+                                            .RESOURCE_LIMIT_TEST_VERDICTS)}
+        loaded = common_matrices.ExecutionMatrix(filename=mat_file)
+        for key, cols in loaded.query_active_columns_of_rows().items():
+            self.assertEqual(cols, ['t1'])
+            row = loaded.to_pandas_df().set_index(loaded.get_key_colname())
+            self.assertEqual(val_to_verdict[row.loc[key, 't1']], \
+                                    ResourceLimit[key].get_test_verdict())
+        self.assertEqual(common_matrices.RawExecutionMatrix(\
+                non_key_col_list=['t1']).getResourceLimitCellVal(0), \
+                                            mat.getActiveCellDefaultVal())
+
+if __name__ == "__main__":
+    verbosity=2
+    suite = unittest.TestLoader().loadTestsFromTestCase(Test_ExecutionSandbox)
+    unittest.TextTestRunner(verbosity=verbosity).run(suite)
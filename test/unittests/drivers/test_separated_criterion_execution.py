@@ -0,0 +1,155 @@
+from __future__ import print_function
+import os, sys
+import shutil
+import tempfile
+import threading
+
+import unittest
+
+import muteria.common.mix as common_mix
+import muteria.common.matrices as common_matrices
+from muteria.drivers.criteria import TestCriteria
+from muteria.drivers.criteria.criteria_info import MutantsInfoObject
+from muteria.drivers.criteria.base_testcriteriatool import BaseCriteriaTool
+from muteria.drivers.checkpoint_handler import WorkUnitsCheckpoint
+
+TMP_DIR_SUFFIX = '.muteria.test.tmp'
+
+class _FakeConfig(object):
+    SEPARATED_TEST_EXECUTION_EXTRA_TIMEOUT_TIMES = None
+    def get_tool_config_alias(self):
+        return 'faketool'
+
+class _FakeCheckpointHandler(object):
+    def __init__(self, journal):
+        self.journal = journal
+    def get_work_units(self, func_name, taskid=None, tool=None):
+        return WorkUnitsCheckpoint(self.journal)
+    def do_checkpoint(self, func_name, taskid, tool=None):
+        pass
+
+class _FakePrioritization(object):
+    """ Execute the elements in order, with all the tests
+    """
+    def reset(self, toolalias, elements, tests):
+        self.elements = list(elements)
+        self.tests = list(tests)
+    def has_next_test_objective(self):
+        return len(self.elements) > 0
+    def get_next_test_objective(self):
+        return self.elements.pop(0)
+    def feedback(self, element, test_to_verdict):
+        pass
+    def get_test_execution_optimizer(self, element):
+        return self
+    def select_tests(self, num, is_proportion=False):
+        return self.tests
+
+class _FakeCriteriaTool(object):
+    """ The element executable path is the element, the test 't1' fails
+    """
+    _get_tce_executed_elements = BaseCriteriaTool._get_tce_executed_elements
+
+    def __init__(self, fail_on=()):
+        self.config = _FakeConfig()
+        self.meta_test_generation_obj = self
+        self.fail_on = fail_on
+        self.executed = []
+    def get_criterion_info_object(self, criterion):
+        return MutantsInfoObject()
+    def _setup_separated_execution(self, criterion):
+        pass
+    def _teardown_separated_execution(self, criterion):
+        pass
+    def _get_criterion_element_executable_path(self, criterion, element):
+        return element
+    def _get_criterion_element_environment_vars(self, criterion, element):
+        return None
+    def runtests(self, meta_testcases, exe_path_map, **kwargs):
+        if exe_path_map in self.fail_on:
+            raise RuntimeError("execution of {} failed".format(exe_path_map))
+        self.executed.append(exe_path_map)
+        return {tc: common_mix.GlobalConstants.FAIL_TEST_VERDICT \
+                        if tc == 't1' \
+                        else common_mix.GlobalConstants.PASS_TEST_VERDICT \
+                                            for tc in meta_testcases}, None
+
+class Test_SeparatedCriterionExecution(unittest.TestCase):
+    def setUp(self):
+        self._worktmpdir = tempfile.mkdtemp(suffix=TMP_DIR_SUFFIX)
+        self.journal = os.path.join(self._worktmpdir, "cp.units.test")
+
+    def tearDown(self):
+        shutil.rmtree(self._worktmpdir)
+
+    def _run(self, tool, elements):
+        matrix = common_matrices.ExecutionMatrix(filename=os.path.join(\
+                                        self._worktmpdir, 'matrix.csv'), \
+                                            non_key_col_list=['t1', 't2'])
+        BaseCriteriaTool._runtest_separate_criterion_program(tool, \
+                            TestCriteria.STRONG_MUTATION, ['t1', 't2'], \
+                            matrix, None, elements, \
+                            prioritization_module=_FakePrioritization(), \
+                            checkpoint_handler=_FakeCheckpointHandler(\
+                                                            self.journal), \
+                            cp_calling_func_name='runtests', \
+                            cp_calling_done_task_id=1, \
+                            cp_calling_tool='faketool')
+        return matrix
+
+    def test_elements_claimed(self):
+        # another worker executes 'm2'
+        claimed = threading.Event()
+        def other_worker():
+            work_units = WorkUnitsCheckpoint(self.journal)
+            work_units.claim('m2')
+            claimed.set()
+            work_units.complete('m2', [{'t1': 0, 't2': 1}, None, None])
+        thread = threading.Thread(target=other_worker)
+        thread.start()
+        claimed.wait()
+        thread.join()
+
+        tool = _FakeCriteriaTool(fail_on=('m3',))
+        with self.assertRaises(RuntimeError):
+            self._run(tool, ['m1', 'm2', 'm3', 'm4'])
+        self.assertEqual(tool.executed, ['m1'])
+        work_units = WorkUnitsCheckpoint(self.journal)
+        self.assertEqual(sorted(work_units.get_done()), ['m1', 'm2'])
+        # the claim of the failed element is released
+        self.assertEqual(work_units.get_claimed(), {})
+
+        # resume
+        tool = _FakeCriteriaTool()
+        matrix = self._run(tool, ['m1', 'm2', 'm3', 'm4'])
+        self.assertEqual(tool.executed, ['m3', 'm4'])
+        self.assertEqual(matrix.query_active_columns_of_rows(), \
+                    {'m1': ['t1'], 'm2': ['t2'], 'm3': ['t1'], 'm4': ['t1']})
+
+    def test_wait_for_claimed_element(self):
+        """ The element claimed by another live worker is not executed,
+            its result is loaded when the worker completes it
+        """
+        claimed = threading.Event()
+        def other_worker():
+            work_units = WorkUnitsCheckpoint(self.journal)
+            work_units.claim('m1')
+            claimed.set()
+            # let the execution wait for the element
+            threading.Event().wait(2 * WorkUnitsCheckpoint.POLL_INTERVAL)
+            work_units.complete('m1', [{'t1': 0, 't2': 1}, None, None])
+        thread = threading.Thread(target=other_worker)
+        thread.start()
+        claimed.wait()
+        tool = _FakeCriteriaTool()
+        matrix = self._run(tool, ['m1', 'm2'])
+        thread.join()
+        self.assertEqual(tool.executed, ['m2'])
+        self.assertEqual(matrix.query_active_columns_of_rows(), \
+                                            {'m1': ['t2'], 'm2': ['t1']})
+
+if __name__ == "__main__":
+    verbosity=2
+    suite = unittest.TestLoader().loadTestsFromTestCase(\
+                                            Test_SeparatedCriterionExecution)
+    unittest.TextTestRunner(verbosity=verbosity).run(suite)
@@ -0,0 +1,133 @@
+from __future__ import print_function
+import os, sys
+import shutil
+import tempfile
+import subprocess
+
+import unittest
+
+import muteria.common.fs as common_fs
+from muteria.drivers.criteria import TestCriteria
+from muteria.drivers.criteria.tce import TrivialCompilerEquivalence
+from muteria.drivers.criteria.criteria_info import MutantsInfoObject
+from muteria.drivers.criteria.base_testcriteriatool import BaseCriteriaTool
+from muteria.drivers.criteria.tools_by_languages.c.mart.mart import \
+                                                            CriteriaToolMart
+
+TMP_DIR_SUFFIX = '.muteria.test.tmp'
+
+C_COMPILER = None
+for _cc in ('clang', 'gcc', 'cc'):
+    if shutil.which(_cc) is not None:
+        C_COMPILER = _cc
+        break
+
+SRC = "int main(int argc, char **argv) { return argc %s 2; }\n"
+
+class _FakeMart(object):
+    """ Only the attributes used to store the separated mutants
+    """
+    def __init__(self, mart_out):
+        self.separate_muts_folder_name = 'mutants.out'
+        self.separate_muts_dir = os.path.join(mart_out, \
+                                                self.separate_muts_folder_name)
+        self.archive_separated = True
+        self.meta_test_generation_obj = self
+    def get_archive_codec(self):
+        return None
+
+class _FakeTool(object):
+    def __init__(self, info_obj):
+        self.info_obj = info_obj
+    def get_criterion_info_object(self, criterion):
+        return self.info_obj
+
+class Test_TrivialCompilerEquivalence(unittest.TestCase):
+    def setUp(self):
+        self._worktmpdir = tempfile.mkdtemp(suffix=TMP_DIR_SUFFIX)
+
+    def tearDown(self):
+        shutil.rmtree(self._worktmpdir)
+
+    def _compile(self, name, operator):
+        """ Compile with debug info in a specific directory, so that only
+            the non-semantic parts differ for the same operator
+        """
+        src_dir = os.path.join(self._worktmpdir, 'src', name)
+        os.makedirs(src_dir)
+        src = os.path.join(src_dir, name + '.c')
+        with open(src, 'w') as f:
+            f.write(SRC % operator)
+        exe = os.path.join(self._worktmpdir, name)
+        subprocess.check_call([C_COMPILER, '-g', '-O1', src, '-o', exe])
+        return exe
+
+    @unittest.skipIf(C_COMPILER is None, "no C compiler")
+    def test_compiled_classes(self):
+        tce = TrivialCompilerEquivalence(\
+                                original_exe=self._compile('orig', '+'))
+        for mid, op in (('1', '+'), ('2', '-'), ('3', '*'), ('10', '-'), \
+                                                                ('4', '-')):
+            tce.add_element(mid, self._compile('m'+mid, op))
+        res = tce.get_equivalence_classes()
+        self.assertEqual(res[TrivialCompilerEquivalence.CLASSES_KEY], \
+                                                        {'2': ['4', '10']})
+        self.assertEqual(res[TrivialCompilerEquivalence.EQUIVALENT_KEY], \
+                                                                        ['1'])
+
+    def test_raw_content_and_dump(self):
+        for name, content in (('a', 'x'), ('b', 'y'), ('c', 'x')):
+            with open(os.path.join(self._worktmpdir, name), 'w') as f:
+                f.write(content)
+        tce = TrivialCompilerEquivalence()
+        for name in ('a', 'b', 'c'):
+            tce.add_element(name, os.path.join(self._worktmpdir, name))
+        tce_file = os.path.join(self._worktmpdir, 'tce.json')
+        self.assertIsNone(TrivialCompilerEquivalence.load(tce_file))
+        tce.dump(tce_file)
+        self.assertEqual(TrivialCompilerEquivalence.load(tce_file), \
+                    {TrivialCompilerEquivalence.CLASSES_KEY: {'a': ['c']}, \
+                            TrivialCompilerEquivalence.EQUIVALENT_KEY: []})
+
+    def test_mart_store_with_tce(self):
+        mart = _FakeMart(self._worktmpdir)
+        for mid, content in (('1', 'x'), ('2', 'y'), ('3', 'y')):
+            mdir = os.path.join(mart.separate_muts_dir, mid)
+            os.makedirs(mdir)
+            with open(os.path.join(mdir, 'prog'), 'w') as f:
+                f.write(content)
+        tce = TrivialCompilerEquivalence()
+        CriteriaToolMart._compile_and_store_separated_mutants(mart, \
+                                        'prog', '', parallel_count=2, tce=tce)
+        self.assertEqual(tce.get_equivalence_classes()[\
+                    TrivialCompilerEquivalence.CLASSES_KEY], {'2': ['3']})
+
+    def test_fan_out_elements(self):
+        info = MutantsInfoObject()
+        for mid in ('1', '2', '3', '4', '5'):
+            info.add_element(mid)
+        # '9' is not an element (e.g. removed duplicate)
+        info.set_equivalence_classes({\
+                TrivialCompilerEquivalence.CLASSES_KEY: \
+                                    {'1': ['3', '9'], '2': ['4', '5']}, \
+                TrivialCompilerEquivalence.EQUIVALENT_KEY: ['2', '9']})
+        self.assertEqual(info.get_equivalence_classes(), \
+                                            {'1': ['3'], '2': ['4', '5']})
+        self.assertEqual(info.get_likely_equivalent_elements(), ['2'])
+
+        tool = _FakeTool(info)
+        executed, fan_out = BaseCriteriaTool._get_tce_executed_elements(\
+                tool, TestCriteria.STRONG_MUTATION, ['5', '3', '4', '1'])
+        self.assertEqual(executed, ['5', '3'])
+        self.assertEqual(fan_out, {'4': '5', '1': '3'})
+
+        tool = _FakeTool(MutantsInfoObject())
+        executed, fan_out = BaseCriteriaTool._get_tce_executed_elements(\
+                tool, TestCriteria.STRONG_MUTATION, ['5', '3'])
+        self.assertEqual((executed, fan_out), (['5', '3'], {}))
+
+if __name__ == "__main__":
+    verbosity=2
+    suite = unittest.TestLoader().loadTestsFromTestCase(\
+                                            Test_TrivialCompilerEquivalence)
+    unittest.TextTestRunner(verbosity=verbosity).run(suite)
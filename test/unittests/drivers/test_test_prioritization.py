@@ -0,0 +1,140 @@
+from __future__ import print_function
+import os, sys
+import shutil
+import tempfile
+
+import unittest
+
+import muteria.common.matrices as common_matrices
+import muteria.controller.explorer as outdir_struct
+import muteria.drivers.criteria as criteria_pkg
+import muteria.drivers.optimizers.testexecution.prioritization as \
+                                                                prioritization
+import muteria.drivers.optimizers.testexecution.optimizerdefs as \
+                                                                test_opt_module
+from muteria.drivers.optimizers.criteriatestexecution.optimizerdefs import \
+                                            CriteriaOptimizers, \
+                                            check_is_right_optimizer
+
+Criteria = criteria_pkg.TestCriteria
+Optimizers = test_opt_module.TestOptimizers
+Engine = prioritization.TestPrioritizationEngine
+Data = prioritization.PrioritizationData
+Strategies = prioritization.PrioritizationStrategies
+
+TMP_DIR_SUFFIX = '.muteria.test.tmp'
+
+def _data(coverage=None, history=None, cost=None, impact=None):
+    data = Data()
+    for attr, val in (('coverage', coverage), ('history', history), \
+                                        ('cost', cost), ('impact', impact)):
+        if val is not None:
+            if attr in ('coverage', 'impact'):
+                val = {t: set(e) for t, e in val.items()}
+            setattr(data, attr, val)
+    return data
+
+def _write_matrix(filename, tests, rows):
+    mat = common_matrices.ExecutionMatrix(filename=filename, \
+                                                    non_key_col_list=tests)
+    for key, active in rows.items():
+        mat.add_row_by_key(key, {t: (1 if t in active else 0) \
+                                        for t in tests}, serialize=False)
+    mat.serialize()
+
+class Test_PrioritizationEngine(unittest.TestCase):
+    def test_additional_coverage(self):
+        data = _data(coverage={'a': [1, 2], 'b': [1, 2, 3], 'c': [4], \
+                                                    'd': [1, 2, 3], 'e': []})
+        order = Engine({Strategies.ADDITIONAL_COVERAGE: 1}).prioritize(\
+                                            ['a', 'b', 'c', 'd', 'e'], data)
+        # b covers most, then c adds 4, then reset: d (first of the
+        # largest), then a, then e (covers nothing)
+        self.assertEqual(order, ['b', 'c', 'd', 'a', 'e'])
+
+    def test_cost_history_and_impact(self):
+        data = _data(coverage={'a': [1, 2, 3, 4], 'b': [1, 2]}, \
+                                                    cost={'a': 10, 'b': 1})
+        # coverage per cost
+        self.assertEqual(Engine({Strategies.ADDITIONAL_COVERAGE: 1, \
+                                        Strategies.EXECUTION_COST: 1})\
+                                .prioritize(['a', 'b'], data), ['b', 'a'])
+        self.assertEqual(Engine({Strategies.ADDITIONAL_COVERAGE: 1})\
+                                .prioritize(['a', 'b'], data), ['a', 'b'])
+        # unknown cost tests have the mean cost
+        self.assertEqual(Engine({Strategies.EXECUTION_COST: 1})\
+                        .prioritize(['a', 'x', 'b'], data), ['b', 'x', 'a'])
+
+        data = _data(history={'a': 0, 'b': 3, 'c': 1})
+        self.assertEqual(Engine({Strategies.HISTORICAL_FAILURE: 1})\
+                        .prioritize(['a', 'b', 'c'], data), ['b', 'c', 'a'])
+
+        data = _data(coverage={'a': [1, 2, 3], 'b': [4]}, impact={'b': [4]})
+        self.assertEqual(Engine({Strategies.ADDITIONAL_COVERAGE: 1, \
+                                            Strategies.DIFF_IMPACT: 2})\
+                                .prioritize(['a', 'b'], data), ['b', 'a'])
+
+        with self.assertRaises(SystemExit):
+            Engine({'bad_strategy': 1})
+
+class Test_PrioritizedOptimizers(unittest.TestCase):
+    def setUp(self):
+        self._worktmpdir = tempfile.mkdtemp(suffix=TMP_DIR_SUFFIX)
+        self.explorer = outdir_struct.Explorer(self._worktmpdir)
+        self.explorer.get_or_create_and_get_dir(\
+                                            outdir_struct.RESULTS_MATRICES_DIR)
+        self.tests = ['t:a', 't:b', 't:c']
+        _write_matrix(self.explorer.get_file_pathname(\
+                    outdir_struct.CRITERIA_MATRIX[\
+                                            Criteria.STATEMENT_COVERAGE]), \
+                    self.tests, {'gcov:src/main.c:1': ['t:a', 't:b'], \
+                                 'gcov:src/main.c:2': ['t:b'], \
+                                 'gcov:src/util.c:7': ['t:c']})
+        _write_matrix(self.explorer.get_file_pathname(\
+                    outdir_struct.CRITERIA_MATRIX[\
+                                            Criteria.STRONG_MUTATION]), \
+                    self.tests, {'mart:1': ['t:a'], 'mart:2': ['t:c']})
+
+    def tearDown(self):
+        shutil.rmtree(self._worktmpdir)
+
+    def test_load_data(self):
+        data = Data.from_explorer(self.explorer, \
+                                            changed_code={'util.c': [7]})
+        self.assertEqual({t: len(c) for t, c in data.coverage.items()}, \
+                                                {'t:a': 1, 't:b': 2, 't:c': 1})
+        self.assertEqual(data.history, {'t:a': 1, 't:b': 0, 't:c': 1})
+        self.assertEqual(list(data.impact), ['t:c'])
+
+    def test_optimizers(self):
+        opt = Optimizers.PRIORITIZED.get_optimizer()(None, self.explorer, \
+                        strategies={Strategies.ADDITIONAL_COVERAGE: 1}, \
+                        changed_code=None)
+        opt.reset(None, self.tests)
+        self.assertEqual(opt.select_tests(100), ['t:b', 't:c', 't:a'])
+        # non meta tests and recorded times
+        opt = Optimizers.PRIORITIZED.get_optimizer()(None, self.explorer, \
+                        strategies={Strategies.ADDITIONAL_COVERAGE: 1, \
+                                    Strategies.EXECUTION_COST: 1})
+        opt.reset('t', ['a', 'b', 'c'], test_execution_times=\
+                                    {'t:a': 1.0, 't:b': 100.0, 't:c': 1.0})
+        self.assertEqual(opt.select_tests(2, is_proportion=False), \
+                                                                ['a', 'c'])
+
+        self.assertTrue(check_is_right_optimizer(\
+                Criteria.STATEMENT_COVERAGE, CriteriaOptimizers.PRIORITIZED))
+        copt = CriteriaOptimizers.PRIORITIZED.get_optimizer()(None, \
+                            self.explorer, Criteria.STRONG_MUTATION, \
+                            strategies={Strategies.ADDITIONAL_COVERAGE: 1})
+        copt.reset('mart', ['1', '2', '3'], self.tests)
+        # the killing tests of the mutant first
+        self.assertEqual(copt.get_test_execution_optimizer('2')\
+                                .select_tests(100), ['t:c', 't:b', 't:a'])
+        self.assertEqual(copt.get_test_execution_optimizer('3')\
+                                .select_tests(100), ['t:b', 't:c', 't:a'])
+
+if __name__ == "__main__":
+    verbosity=2
+    for tc in (Test_PrioritizationEngine, Test_PrioritizedOptimizers):
+        suite = unittest.TestLoader().loadTestsFromTestCase(tc)
+        unittest.TextTestRunner(verbosity=verbosity).run(suite)
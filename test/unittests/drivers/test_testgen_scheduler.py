@@ -0,0 +1,105 @@
+from __future__ import print_function
+import os, sys
+import time
+import threading
+
+import unittest
+
+import muteria.drivers.testgeneration.testgen_scheduler as testgen_scheduler
+
+Scheduler = testgen_scheduler.TestGenerationScheduler
+Task = testgen_scheduler.TestGenerationTask
+
+class _Recorder(object):
+    """ Record the tasks running concurrently
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = set()
+        self.max_concurrent = 0
+        self.concurrent_with = {}
+        self.max_times = {}
+
+    def make_func(self, name, duration=0.2, fail=False):
+        def func(max_time):
+            with self.lock:
+                self.max_times[name] = max_time
+                self.concurrent_with.setdefault(name, set())
+                for other in self.running:
+                    self.concurrent_with[name].add(other)
+                    self.concurrent_with[other].add(name)
+                self.running.add(name)
+                self.max_concurrent = max(self.max_concurrent, \
+                                                        len(self.running))
+            time.sleep(duration)
+            with self.lock:
+                self.running.remove(name)
+            if fail:
+                raise RuntimeError("failed " + name)
+        return func
+
+class Test_Scheduler(unittest.TestCase):
+    def test_cpu_budget_and_time_slice(self):
+        rec = _Recorder()
+        tasks = [Task(n, rec.make_func(n)) \
+                                                for n in ('a', 'b', 'c', 'd')]
+        done = []
+        start = time.time()
+        Scheduler(cpu_budget=2, time_slice=10).run(tasks, max_time=60, \
+                            on_task_done=lambda t: done.append(\
+                                        (t.name, threading.current_thread())))
+        self.assertLess(time.time() - start, 0.7)
+        self.assertEqual(rec.max_concurrent, 2)
+        self.assertEqual(sorted(n for n, _ in done), ['a', 'b', 'c', 'd'])
+        # checkpointing is done in the calling thread
+        self.assertTrue(all(th is threading.current_thread() \
+                                                            for _, th in done))
+        self.assertEqual(set(rec.max_times.values()), {10})
+
+        sched = Scheduler(time_slice=10)
+        self.assertEqual(sched.get_task_max_time(None), 10)
+        self.assertEqual(sched.get_task_max_time(5), 5)
+        self.assertEqual(Scheduler().get_task_max_time(None), \
+                                                                        None)
+
+    def test_memory_budget_and_exclusive(self):
+        rec = _Recorder()
+        tasks = [
+            Task('big1', rec.make_func('big1'), \
+                                                    memory_estimate_mb=600),
+            Task('big2', rec.make_func('big2'), \
+                                                    memory_estimate_mb=600),
+            Task('small', rec.make_func('small'), \
+                                                    memory_estimate_mb=300),
+            Task('excl', rec.make_func('excl'), exclusive=True),
+            Task('huge', rec.make_func('huge'), \
+                                                    memory_estimate_mb=5000),
+        ]
+        Scheduler(cpu_budget=4, memory_budget_mb=1000).run(tasks)
+        self.assertNotIn('big2', rec.concurrent_with['big1'])
+        # the small task fits along a big one
+        self.assertTrue(len(rec.concurrent_with['small']) > 0)
+        self.assertEqual(rec.concurrent_with['excl'], set())
+        # exceeding the budget, run alone
+        self.assertEqual(rec.concurrent_with['huge'], set())
+
+    def test_failure(self):
+        rec = _Recorder()
+        tasks = [Task('ok', rec.make_func('ok', duration=0.3)),
+                Task('bad', rec.make_func('bad', duration=0.1, \
+                                                                fail=True)),
+                Task('after', rec.make_func('after'))]
+        done = []
+        with self.assertRaises(RuntimeError):
+            Scheduler(cpu_budget=2).run(tasks, \
+                                    on_task_done=lambda t: done.append(t.name))
+        # the running task finished and was checkpointed, no task started
+        # after the failure
+        self.assertEqual(done, ['ok'])
+        self.assertNotIn('after', rec.max_times)
+
+if __name__ == "__main__":
+    verbosity=2
+    suite = unittest.TestLoader().loadTestsFromTestCase(\
+                                                Test_Scheduler)
+    unittest.TextTestRunner(verbosity=verbosity).run(suite)
@@ -0,0 +1,54 @@
+from __future__ import print_function
+import os, sys
+import subprocess
+
+import unittest
+
+from muteria.drivers import ToolsModulesLoader, LazyToolsModules
+
+class Test_ToolsManifest(unittest.TestCase):
+    def test_manifest_matches_modules(self):
+        for category in (ToolsModulesLoader.TESTCASES_TOOLS, \
+                                        ToolsModulesLoader.CRITERIA_TOOLS):
+            manifest = ToolsModulesLoader.get_tools_manifest(category)
+            modules = ToolsModulesLoader.get_tools_modules(category)
+            self.assertEqual(set(manifest), set(modules))
+            for language, tools in manifest.items():
+                self.assertIsInstance(modules[language], LazyToolsModules)
+                self.assertEqual(set(tools), set(modules[language]))
+                for toolname, entry in tools.items():
+                    self.assertIsNotNone(entry, toolname + " not in manifest")
+                    module = modules[language][toolname]
+                    self.assertTrue(modules[language].is_loaded(toolname))
+                    types = entry[ToolsModulesLoader.MANIFEST_TOOL_TYPES]
+                    for attr in ('StaticTestcaseTool', 'DynamicTestcaseTool',\
+                                                        'StaticCriteriaTool'):
+                        tool_cls = getattr(module, attr, None)
+                        self.assertEqual(tool_cls is not None, attr in types, \
+                                                        toolname + ' ' + attr)
+                        if tool_cls is not None and \
+                                    category == \
+                                        ToolsModulesLoader.CRITERIA_TOOLS:
+                            self.assertEqual(sorted(c.get_str() for c in \
+                                        tool_cls.get_supported_criteria()), \
+                                sorted(entry[\
+                                    ToolsModulesLoader.MANIFEST_CRITERIA]))
+
+    def test_lazy_loading(self):
+        code = ';'.join(['import sys', \
+            'import muteria.controller.main_controller', \
+            'from muteria.drivers import ToolsModulesLoader as T', \
+            'm = T.get_tools_modules(T.CRITERIA_TOOLS)', \
+            'assert "gcov" in m["c"] and "gcov" in list(m["c"])', \
+            'print(sorted(k for k in sys.modules if k.split(".")[0] in ' \
+                + '("pandas", "networkx") or "tools_by_languages" in k))'])
+        out = subprocess.check_output([sys.executable, '-c', code])
+        self.assertEqual(out.decode('UTF-8').strip(), '[]')
+        with self.assertRaises(KeyError):
+            ToolsModulesLoader.get_tools_modules(\
+                            ToolsModulesLoader.CRITERIA_TOOLS)['c']['no_tool']
+
+if __name__ == "__main__":
+    verbosity=2
+    suite = unittest.TestLoader().loadTestsFromTestCase(Test_ToolsManifest)
+    unittest.TextTestRunner(verbosity=verbosity).run(suite)
@@ -0,0 +1,119 @@
+from __future__ import print_function
+import os, sys
+import shutil
+import tempfile
+
+import unittest
+
+import muteria.common.matrices as common_matrices
+import muteria.statistics.mutant_quality_indicators as mqi
+
+TMP_DIR_SUFFIX = '.muteria.test.tmp'
+
+class Test_MutantQualityIndicators(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._worktmpdir = tempfile.mkdtemp(suffix=TMP_DIR_SUFFIX)
+        cls.sm_file = os.path.join(cls._worktmpdir, "sm.csv")
+        cls.wm_file = os.path.join(cls._worktmpdir, "wm.csv")
+        cls.exp_out_file = os.path.join(cls._worktmpdir, "exp_out.json")
+        cls.out_file = os.path.join(cls._worktmpdir, "out.json")
+
+        tests = ['t1', 't2', 't3', 't4']
+        sm = common_matrices.ExecutionMatrix(filename=cls.sm_file, \
+                                                    non_key_col_list=tests)
+        sm.add_row_by_key('m1', [1, 0, 0, 0], serialize=False)
+        sm.add_row_by_key('m2', [1, 1, 1, 0], serialize=False)
+        sm.add_row_by_key('m3', [0, 0, 0, 0], serialize=False)
+        sm.add_row_by_key('m4', [0, 1, -1, 1], serialize=True)
+
+        # Different rows and columns order than sm
+        wm_tests = ['t4', 't3', 't2', 't1']
+        wm = common_matrices.ExecutionMatrix(filename=cls.wm_file, \
+                                                non_key_col_list=wm_tests)
+        wm.add_row_by_key('m4', [1, 1, 1, 1], serialize=False)
+        wm.add_row_by_key('m3', [0, 0, 0, 0], serialize=False)
+        wm.add_row_by_key('m2', [1, 1, 1, 1], serialize=False)
+        wm.add_row_by_key('m1', [1, 1, 1, 1], serialize=True)
+
+        def outlog(rc):
+            return {
+                common_matrices.OutputLogData.OUTLOG_LEN: 1,
+                common_matrices.OutputLogData.OUTLOG_HASH: 'h',
+                common_matrices.OutputLogData.RETURN_CODE: rc,
+                common_matrices.OutputLogData.TIMEDOUT: False,
+            }
+        exp_out = common_matrices.OutputLogData(filename=cls.exp_out_file)
+        exp_out.add_data({'program': {t: outlog(0) for t in tests}}, \
+                                                                serialize=True)
+        # t2 reveals the fault
+        out = common_matrices.OutputLogData(filename=cls.out_file)
+        out.add_data({'program': {t: outlog(1 if t == 't2' else 0) \
+                                        for t in tests}}, serialize=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls._worktmpdir)
+
+    def test_hard_to_kill(self):
+        ratio, hard = mqi.getHardToKillMutants(self.sm_file, threshold=0.3)
+        self.assertEqual(ratio, {'m1': 0.25, 'm2': 0.75, 'm3': 1, 'm4': 0.5})
+        self.assertEqual(hard, ['m1'])
+
+        ratio, hard = mqi.getHardToKillMutants(self.sm_file, threshold=0.3, \
+                                                selected_tests=['t1', 't2'])
+        self.assertEqual(ratio, {'m1': 0.5, 'm2': 1, 'm3': 1, 'm4': 0.5})
+        self.assertEqual(hard, [])
+
+    def test_hard_to_propagate(self):
+        ratio, hard = mqi.getHardToPropagateMutants(self.sm_file, \
+                                                self.wm_file, threshold=0.3)
+        self.assertEqual(ratio, {'m1': 0.25, 'm2': 0.75, 'm3': 1, 'm4': 0.5})
+        self.assertEqual(hard, ['m1'])
+
+    def test_fault_revealing(self):
+        fr_set, fr = mqi.getFaultRevealingMutants(self.sm_file, \
+                                            self.exp_out_file, self.out_file)
+        self.assertEqual(fr, {'m1': 0.0, 'm2': 1.0/3, 'm3': -1.0, 'm4': 0.5})
+        self.assertEqual(fr_set, [])
+
+        fr_set, fr = mqi.getFaultRevealingMutants(self.sm_file, \
+                                        self.exp_out_file, self.out_file, \
+                                    threshold=0.5, selected_tests=['t2', 't4'])
+        self.assertEqual(fr, {'m1': -1.0, 'm2': 1.0, 'm3': -1.0, 'm4': 0.5})
+        self.assertEqual(set(fr_set), {'m2', 'm4'})
+
+    def test_all_indicators(self):
+        res = mqi.getAllMutantQualityIndicators(self.sm_file, \
+                            weak_mutant_kill_matrix_file=self.wm_file, \
+                            expected_program_output_file=self.exp_out_file, \
+                            program_output_file=self.out_file, \
+                            hard_to_kill_threshold=0.3, \
+                            hard_to_propagate_threshold=0.3)
+        self.assertEqual(set(res), set(mqi.MutantQualityIndicators))
+        self.assertEqual(\
+                    res[mqi.MutantQualityIndicators.SUBSUMING_MUTANTS], \
+                    mqi.getSubsumingMutants(self.sm_file))
+        self.assertEqual(\
+                    res[mqi.MutantQualityIndicators.HARD_TO_KILL_MUTANTS], \
+                    mqi.getHardToKillMutants(self.sm_file, threshold=0.3))
+        self.assertEqual(\
+                res[mqi.MutantQualityIndicators.HARD_TO_PROPAGATE_MUTANTS], \
+                mqi.getHardToPropagateMutants(self.sm_file, self.wm_file, \
+                                                            threshold=0.3))
+        self.assertEqual(\
+                res[mqi.MutantQualityIndicators.FAULT_REVEALING_MUTANTS], \
+                mqi.getFaultRevealingMutants(self.sm_file, \
+                                            self.exp_out_file, self.out_file))
+
+        res = mqi.getAllMutantQualityIndicators(self.sm_file)
+        self.assertEqual(set(res), \
+                        {mqi.MutantQualityIndicators.SUBSUMING_MUTANTS, \
+                            mqi.MutantQualityIndicators.HARD_TO_KILL_MUTANTS})
+
+if __name__ == "__main__":
+    verbosity=2
+    testsuite_mqi = unittest.TestLoader().loadTestsFromTestCase(\
+                                                Test_MutantQualityIndicators)
+
+    unittest.TextTestRunner(verbosity=verbosity).run(testsuite_mqi)